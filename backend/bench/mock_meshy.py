@@ -0,0 +1,382 @@
+import argparse
+import asyncio
+import io
+import json
+import logging
+import math
+import os
+import random
+import tempfile
+import time
+import uuid
+from collections import Counter
+from dataclasses import asdict, dataclass, fields
+from typing import Optional
+
+import aiohttp
+import numpy as np
+from aiohttp import web
+from PIL import Image
+
+from backend.services.glb import write_glb
+from backend.services.webhooks import sign_payload
+
+logger = logging.getLogger(__name__)
+
+# Локальная замена Meshy API для нагрузочных тестов без расхода кредитов:
+# создание задач, опрос статуса с кривой прогресса, отказы, 429 и скачивание
+# GLB/превью заданного размера с задержкой и ограничением скорости.
+# С webhook_url заглушка, как Meshy, присылает подписанные события о смене статуса
+
+
+@dataclass
+class MockSettings:
+    generation_seconds: float = 20.0    # время генерации одной задачи
+    generation_jitter: float = 0.25     # разброс времени генерации (доля)
+    failure_rate: float = 0.0           # доля задач, завершающихся FAILED
+    submit_rate_per_minute: float = 0.0 # лимит создания задач (0 — без лимита), сверх него — 429
+    server_error_rate: float = 0.0      # доля запросов с ответом 503
+    submit_latency: float = 0.2         # задержка ответа на создание задачи, с
+    poll_latency: float = 0.05          # задержка ответа на запрос статуса, с
+    download_latency: float = 0.1       # задержка до первого байта файла, с
+    download_bandwidth: float = 0.0     # байт/с на одно скачивание (0 — без ограничения)
+    download_error_rate: float = 0.0    # доля скачиваний, оборванных на середине
+    model_size: int = 2 * 1024 * 1024   # примерный размер GLB, байт
+    thumbnail_size: int = 64 * 1024     # примерный размер превью, байт
+    webhook_url: str = ""               # куда слать события о смене статуса (пусто — не слать)
+    webhook_secret: str = ""            # секрет подписи событий
+    webhook_loss_rate: float = 0.0      # доля событий, не доставленных совсем
+    seed: Optional[int] = None
+
+
+@dataclass
+class MockTask:
+    task_id: str
+    kind: str
+    created_at: float
+    duration: float
+    fails: bool
+
+
+def build_model(size: int) -> bytes:
+    """Волнистая сетка-поверхность: валидный GLB, на котором работают оптимизация и LOD"""
+    side = max(2, int(math.sqrt(size / 36)))  # 12 байт на вершину и ~24 байта индексов на вершину
+    grid = np.linspace(-1.0, 1.0, side, dtype=np.float32)
+    x, z = np.meshgrid(grid, grid)
+    y = 0.1 * np.sin(4 * x) * np.cos(4 * z)
+    positions = np.stack([x, y, z], axis=-1).reshape(-1, 3).astype(np.float32)
+
+    rows = np.arange(side - 1)
+    corner = (rows[:, None] * side + rows[None, :]).reshape(-1).astype(np.uint32)
+    indices = np.stack(
+        [corner, corner + side, corner + 1, corner + 1, corner + side, corner + side + 1], axis=-1
+    ).reshape(-1).astype(np.uint32)
+
+    binary = positions.tobytes() + indices.tobytes()
+    gltf = {
+        "asset": {"version": "2.0", "generator": "mock-meshy"},
+        "scene": 0,
+        "scenes": [{"nodes": [0]}],
+        "nodes": [{"mesh": 0}],
+        "meshes": [{"primitives": [{"attributes": {"POSITION": 0}, "indices": 1, "mode": 4}]}],
+        "accessors": [
+            {"bufferView": 0, "componentType": 5126, "count": len(positions), "type": "VEC3",
+             "min": positions.min(axis=0).tolist(), "max": positions.max(axis=0).tolist()},
+            {"bufferView": 1, "componentType": 5125, "count": len(indices), "type": "SCALAR"},
+        ],
+        "bufferViews": [
+            {"buffer": 0, "byteOffset": 0, "byteLength": positions.nbytes},
+            {"buffer": 0, "byteOffset": positions.nbytes, "byteLength": indices.nbytes},
+        ],
+        "buffers": [{"byteLength": len(binary)}],
+    }
+    # write_glb пишет в файл — собираем модель один раз при старте
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "model.glb")
+        write_glb(path, gltf, binary)
+        with open(path, "rb") as f:
+            return f.read()
+
+
+def build_thumbnail(size: int) -> bytes:
+    """Шум плохо сжимается, поэтому размер PNG близок к w*h*3"""
+    side = max(8, int(math.sqrt(size / 3)))
+    pixels = np.random.default_rng(0).integers(0, 256, (side, side, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def progress_at(task: MockTask, now: float) -> int:
+    """S-образная кривая: медленный старт, быстрая середина, долгий хвост, как у Meshy"""
+    fraction = min(1.0, max(0.0, (now - task.created_at) / task.duration))
+    return int(100 * fraction * fraction * (3 - 2 * fraction))
+
+
+class MockMeshy:
+    """Состояние заглушки: задачи, лимит создания и счетчики запросов"""
+
+    def __init__(self, settings: MockSettings):
+        self.settings = settings
+        self.random = random.Random(settings.seed)
+        self.tasks: dict[str, MockTask] = {}
+        self.requests: Counter = Counter()
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self._submit_times: list[float] = []
+        self._deliveries: set[asyncio.Task] = set()
+        self._webhook_session: Optional[aiohttp.ClientSession] = None
+        self.base_url = ""
+        self.files = {
+            "model.glb": (build_model(settings.model_size), "model/gltf-binary"),
+            "thumbnail.png": (build_thumbnail(settings.thumbnail_size), "image/png"),
+        }
+
+    def stats(self) -> dict:
+        by_status = Counter()
+        now = time.monotonic()
+        for task in self.tasks.values():
+            by_status[self._status(task, now)] += 1
+        return {
+            "requests": dict(self.requests),
+            "bytes_sent": self.bytes_sent,
+            "bytes_received": self.bytes_received,
+            "tasks": len(self.tasks),
+            "task_status": dict(by_status),
+            "settings": asdict(self.settings),
+        }
+
+    def reset(self) -> None:
+        self.tasks.clear()
+        self.requests.clear()
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self._submit_times.clear()
+        for delivery in self._deliveries:
+            delivery.cancel()
+
+    async def close(self) -> None:
+        for delivery in list(self._deliveries):
+            delivery.cancel()
+        await asyncio.gather(*self._deliveries, return_exceptions=True)
+        if self._webhook_session is not None:
+            await self._webhook_session.close()
+
+    def _status(self, task: MockTask, now: float) -> str:
+        if now - task.created_at >= task.duration:
+            return "FAILED" if task.fails else "SUCCEEDED"
+        return "PENDING" if now - task.created_at < min(1.0, task.duration / 10) else "IN_PROGRESS"
+
+    def _count(self, name: str, status: int) -> None:
+        self.requests[f"{name}:{status}"] += 1
+
+    def _rate_limited(self) -> Optional[float]:
+        """Скользящее окно в минуту; возвращает Retry-After, если лимит исчерпан"""
+        limit = self.settings.submit_rate_per_minute
+        if limit <= 0:
+            return None
+        now = time.monotonic()
+        self._submit_times = [moment for moment in self._submit_times if now - moment < 60]
+        if len(self._submit_times) >= limit:
+            return 60 - (now - self._submit_times[0])
+        self._submit_times.append(now)
+        return None
+
+    async def create_task(self, request: web.Request) -> web.Response:
+        kind = request.match_info["kind"]
+        self.bytes_received += len(await request.read())
+        await asyncio.sleep(self.settings.submit_latency)
+        if self.random.random() < self.settings.server_error_rate:
+            self._count("submit", 503)
+            return web.json_response({"message": "Service unavailable"}, status=503)
+        retry_after = self._rate_limited()
+        if retry_after is not None:
+            self._count("submit", 429)
+            return web.json_response(
+                {"message": "Too many requests"}, status=429, headers={"Retry-After": str(math.ceil(retry_after))}
+            )
+
+        jitter = self.settings.generation_jitter
+        task = MockTask(
+            task_id=str(uuid.uuid4()),
+            kind=kind,
+            created_at=time.monotonic(),
+            duration=max(0.1, self.settings.generation_seconds * self.random.uniform(1 - jitter, 1 + jitter)),
+            fails=self.random.random() < self.settings.failure_rate,
+        )
+        self.tasks[task.task_id] = task
+        self.base_url = f"{request.scheme}://{request.host}"
+        if self.settings.webhook_url:
+            delivery = asyncio.create_task(self._deliver_events(task))
+            self._deliveries.add(delivery)
+            delivery.add_done_callback(self._deliveries.discard)
+        self._count("submit", 202)
+        return web.json_response({"result": task.task_id}, status=202)
+
+    async def task_status(self, request: web.Request) -> web.Response:
+        await asyncio.sleep(self.settings.poll_latency)
+        task = self.tasks.get(request.match_info["task_id"])
+        if task is None or task.kind != request.match_info["kind"]:
+            self._count("poll", 404)
+            return web.json_response({"message": "Task not found"}, status=404)
+        if self.random.random() < self.settings.server_error_rate:
+            self._count("poll", 503)
+            return web.json_response({"message": "Service unavailable"}, status=503)
+
+        self._count("poll", 200)
+        return web.json_response(self._task_body(task, time.monotonic(), f"{request.scheme}://{request.host}"))
+
+    def _task_body(self, task: MockTask, now: float, base_url: str) -> dict:
+        status = self._status(task, now)
+        body = {"id": task.task_id, "status": status, "progress": progress_at(task, now)}
+        if status == "SUCCEEDED":
+            base = f"{base_url}/files/{task.task_id}"
+            body["model_urls"] = {"glb": f"{base}/model.glb"}
+            body["thumbnail_url"] = f"{base}/thumbnail.png"
+        elif status == "FAILED":
+            body["progress"] = 0
+            body["task_error"] = {"message": "Simulated generation failure"}
+        return body
+
+    async def _deliver_events(self, task: MockTask) -> None:
+        """События при начале генерации и при завершении задачи"""
+        started_after = min(1.0, task.duration / 10)
+        for moment in (started_after, task.duration):
+            await asyncio.sleep(max(0.0, task.created_at + moment - time.monotonic()))
+            if task.task_id not in self.tasks:
+                return
+            if self.random.random() < self.settings.webhook_loss_rate:
+                self._count("webhook", 0)
+                continue
+            await self._send_event(self._task_body(task, time.monotonic(), self.base_url))
+
+    async def _send_event(self, body: dict) -> None:
+        """Повторяет доставку с паузой, пока получатель не ответит 2xx (не больше 5 попыток)"""
+        if self._webhook_session is None:
+            self._webhook_session = aiohttp.ClientSession()
+        payload = json.dumps(body).encode()
+        for attempt in range(5):
+            headers = {
+                "Content-Type": "application/json",
+                "X-Meshy-Signature": sign_payload(self.settings.webhook_secret, payload),
+            }
+            try:
+                async with self._webhook_session.post(self.settings.webhook_url, data=payload, headers=headers) as response:
+                    self._count("webhook", response.status)
+                    if response.status < 300:
+                        return
+            except aiohttp.ClientError:
+                self._count("webhook", 599)
+            await asyncio.sleep(2 ** attempt)
+
+    async def download(self, request: web.Request) -> web.StreamResponse:
+        name = request.match_info["name"]
+        if name not in self.files or request.match_info["task_id"] not in self.tasks:
+            self._count("download", 404)
+            raise web.HTTPNotFound()
+        content, content_type = self.files[name]
+        await asyncio.sleep(self.settings.download_latency)
+
+        start = 0
+        status = 200
+        headers = {"Content-Type": content_type, "ETag": f'"{name}-{len(content)}"', "Accept-Ranges": "bytes"}
+        range_header = request.headers.get("Range", "")
+        if range_header.startswith("bytes="):
+            start = int(range_header[6:].split("-", 1)[0] or 0)
+            if start >= len(content):
+                self._count("download", 416)
+                return web.Response(status=416, headers={"Content-Range": f"bytes */{len(content)}"})
+            status = 206
+            headers["Content-Range"] = f"bytes {start}-{len(content) - 1}/{len(content)}"
+        headers["Content-Length"] = str(len(content) - start)
+
+        response = web.StreamResponse(status=status, headers=headers)
+        await response.prepare(request)
+        self._count("download", status)
+        # Обрыв на середине проверяет докачку через Range
+        cut_at = len(content)
+        if self.random.random() < self.settings.download_error_rate:
+            cut_at = start + (len(content) - start) // 2
+        chunk_size = 64 * 1024
+        bandwidth = self.settings.download_bandwidth
+        for offset in range(start, cut_at, chunk_size):
+            chunk = content[offset:min(offset + chunk_size, cut_at)]
+            await response.write(chunk)
+            self.bytes_sent += len(chunk)
+            if bandwidth > 0:
+                await asyncio.sleep(len(chunk) / bandwidth)
+        if cut_at < len(content):
+            request.transport.close()
+            return response
+        await response.write_eof()
+        return response
+
+    async def get_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats())
+
+    async def post_reset(self, request: web.Request) -> web.Response:
+        self.reset()
+        return web.json_response({"status": "ok"})
+
+
+def create_app(settings: MockSettings) -> web.Application:
+    mock = MockMeshy(settings)
+    app = web.Application(client_max_size=256 * 1024 * 1024)
+    app["mock"] = mock
+    kinds = "{kind:image-to-3d|multi-image-to-3d}"
+    app.router.add_post(f"/{kinds}", mock.create_task)
+    app.router.add_get(f"/{kinds}/{{task_id}}", mock.task_status)
+    app.router.add_get("/files/{task_id}/{name}", mock.download)
+    app.router.add_get("/_stats", mock.get_stats)
+    app.router.add_post("/_reset", mock.post_reset)
+
+    async def close_mock(app: web.Application) -> None:
+        await mock.close()
+
+    app.on_cleanup.append(close_mock)
+    return app
+
+
+async def start_server(settings: MockSettings, host: str = "127.0.0.1", port: int = 0) -> tuple[web.AppRunner, str]:
+    """Запускает заглушку в текущем event loop; возвращает runner и базовый URL для MESHY_BASE_URL"""
+    runner = web.AppRunner(create_app(settings), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner, f"http://{host}:{runner.addresses[0][1]}"
+
+
+def add_settings_arguments(parser: argparse.ArgumentParser, defaults: Optional[MockSettings] = None) -> None:
+    """Параметры заглушки в командной строке: --generation-seconds, --failure-rate и т. д."""
+    defaults = defaults or MockSettings()
+    for item in fields(MockSettings):
+        default = getattr(defaults, item.name)
+        parser.add_argument(
+            "--" + item.name.replace("_", "-"),
+            type=type(default) if default is not None else int,
+            default=None,
+            help=f"default: {default}",
+        )
+
+
+def settings_from_arguments(args: argparse.Namespace, defaults: Optional[MockSettings] = None) -> MockSettings:
+    values = asdict(defaults or MockSettings())
+    for name in values:
+        if getattr(args, name, None) is not None:
+            values[name] = getattr(args, name)
+    return MockSettings(**values)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Local Meshy API stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    add_settings_arguments(parser)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    settings = settings_from_arguments(args)
+    logger.info(f"Mock Meshy API on http://{args.host}:{args.port} with {settings}")
+    web.run_app(create_app(settings), host=args.host, port=args.port, access_log=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,384 @@
+import argparse
+import asyncio
+import io
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Optional
+
+import aiohttp
+from PIL import Image
+
+from backend.bench.mock_meshy import MockSettings, add_settings_arguments, settings_from_arguments, start_server
+
+logger = logging.getLogger(__name__)
+
+# Нагрузочный прогон бэкенда против локальной заглушки Meshy: N одновременных
+# загрузок и опрос статуса до завершения. Результат сравнивается с сохраненным
+# базовым прогоном, чтобы регрессии производительности были видны сразу
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+BASELINES_DIR = Path(__file__).resolve().parent / "baselines"
+TERMINAL_STATUSES = {"SUCCEEDED", "FAILED", "CANCELED", "TIMEOUT", "ERROR"}
+
+# Все клиенты прогона приходят с одного адреса — пользовательские лимиты очереди снимаем
+APP_ENV = {
+    "SUBMIT_USER_RATE_PER_MINUTE": "100000",
+    "SUBMIT_USER_BURST": "100000",
+    "SUBMIT_MAX_IN_FLIGHT_PER_USER": "100000",
+    "SUBMIT_MAX_QUEUED_PER_USER": "100000",
+    "POLL_MIN_INTERVAL": "1",
+    "POLL_MAX_INTERVAL": "5",
+}
+
+
+@dataclass
+class Scenario:
+    tasks: int
+    concurrency: int
+    multi_image_share: float = 0.2
+    image_side: int = 256          # сторона загружаемого изображения, пикселей
+    status_interval: float = 1.0   # как часто клиент спрашивает статус
+    timeout: float = 600.0         # предел ожидания одной задачи клиентом
+    mock: MockSettings = field(default_factory=MockSettings)
+    env: dict = field(default_factory=dict)
+    webhooks: bool = False         # заглушка присылает бэкенду события о смене статуса
+
+
+SCENARIOS = {
+    "smoke": Scenario(tasks=10, concurrency=5, mock=MockSettings(generation_seconds=3, model_size=256 * 1024, seed=1)),
+    "steady": Scenario(
+        tasks=100, concurrency=25,
+        mock=MockSettings(generation_seconds=20, seed=1),
+        env={"SUBMIT_RATE_PER_MINUTE": "600", "SUBMIT_BURST": "20", "SUBMIT_MAX_IN_FLIGHT": "50"},
+    ),
+    "rate-limited": Scenario(
+        tasks=40, concurrency=20,
+        mock=MockSettings(generation_seconds=5, submit_rate_per_minute=20, model_size=512 * 1024, seed=1),
+        env={"SUBMIT_RATE_PER_MINUTE": "600", "SUBMIT_BURST": "20", "SUBMIT_MAX_IN_FLIGHT": "50"},
+    ),
+    # Фото с телефона: крупные JPEG, в Meshy уходят в base64 внутри JSON
+    "uploads": Scenario(
+        tasks=20, concurrency=10, image_side=4000,
+        mock=MockSettings(generation_seconds=3, model_size=256 * 1024, seed=1),
+        env={"SUBMIT_RATE_PER_MINUTE": "600", "SUBMIT_BURST": "20", "SUBMIT_MAX_IN_FLIGHT": "50"},
+    ),
+    "flaky": Scenario(
+        tasks=50, concurrency=20,
+        mock=MockSettings(
+            generation_seconds=5, failure_rate=0.1, server_error_rate=0.05, download_error_rate=0.1,
+            download_bandwidth=4 * 1024 * 1024, seed=1,
+        ),
+        env={"SUBMIT_RATE_PER_MINUTE": "600", "SUBMIT_BURST": "20", "SUBMIT_MAX_IN_FLIGHT": "50"},
+    ),
+    # Завершение по вебхукам, опрос только страхует; для сравнения — тот же прогон с --env MESHY_WEBHOOK_SECRET=
+    "webhooks": Scenario(
+        tasks=40, concurrency=20, webhooks=True,
+        mock=MockSettings(generation_seconds=20, model_size=256 * 1024, seed=1),
+        env={"SUBMIT_RATE_PER_MINUTE": "600", "SUBMIT_BURST": "20", "SUBMIT_MAX_IN_FLIGHT": "50"},
+    ),
+}
+
+# Метрики для сравнения с базовым прогоном: True — чем больше, тем лучше
+COMPARED = {
+    "throughput_tasks_per_minute": True,
+    "upload_latency_p50": False,
+    "upload_latency_p99": False,
+    "status_latency_p50": False,
+    "status_latency_p99": False,
+    "task_duration_p50": False,
+    "task_duration_p99": False,
+    "peak_rss_mb": False,
+    "outbound_requests_per_task": False,
+    "upload_bytes_per_task": False,
+}
+
+
+@dataclass
+class Samples:
+    upload: list[float] = field(default_factory=list)
+    status: list[float] = field(default_factory=list)
+    task: list[float] = field(default_factory=list)
+    final_status: dict = field(default_factory=dict)
+    rejected: int = 0
+
+
+def percentile(values: list[float], q: float) -> Optional[float]:
+    """Перцентиль с линейной интерполяцией между соседними значениями"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * q
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def make_image(rng: random.Random, side: int) -> bytes:
+    """Уникальное изображение на задачу (иначе сработает дедупликация запросов), похожее на фото с телефона"""
+    gradient = Image.linear_gradient("L").resize((side, side))
+    image = Image.merge("RGB", (gradient, gradient.rotate(90), Image.effect_noise((side, side), 40)))
+    image.putpixel((0, 0), (rng.randrange(256), rng.randrange(256), rng.randrange(256)))
+    buffer = io.BytesIO()
+    image.save(buffer, "JPEG", quality=95)
+    return buffer.getvalue()
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def wait_ready(session: aiohttp.ClientSession, base_url: str, process: subprocess.Popen, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Backend exited with code {process.returncode} before becoming ready")
+        try:
+            async with session.get(f"{base_url}/health") as response:
+                if response.status == 200:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("Backend did not become ready in time")
+
+
+async def run_task(
+    session: aiohttp.ClientSession, base_url: str, scenario: Scenario, images: list[bytes], samples: Samples
+) -> None:
+    """Один клиент: загрузка изображений и опрос статуса до завершения задачи"""
+    form = aiohttp.FormData()
+    if len(images) > 1:
+        endpoint = "create-multi-image-task"
+        for index, image in enumerate(images):
+            form.add_field("files", image, filename=f"view{index}.jpg", content_type="image/jpeg")
+    else:
+        endpoint = "create-task"
+        form.add_field("file", images[0], filename="image.jpg", content_type="image/jpeg")
+
+    started = time.perf_counter()
+    async with session.post(f"{base_url}/api/meshy/{endpoint}", data=form) as response:
+        body = await response.json()
+    samples.upload.append(time.perf_counter() - started)
+    if response.status != 200:
+        samples.rejected += 1
+        logger.warning(f"Upload rejected: {response.status} {body}")
+        return
+
+    task_id = body["task_id"]
+    status = body.get("status")
+    deadline = time.monotonic() + scenario.timeout
+    while status not in TERMINAL_STATUSES and time.monotonic() < deadline:
+        await asyncio.sleep(scenario.status_interval)
+        request_started = time.perf_counter()
+        async with session.get(f"{base_url}/api/meshy/task-status/{task_id}") as response:
+            body = await response.json()
+        samples.status.append(time.perf_counter() - request_started)
+        status = body.get("status") if response.status == 200 else status
+    samples.task.append(time.perf_counter() - started)
+    final = status if status in TERMINAL_STATUSES else "CLIENT_TIMEOUT"
+    samples.final_status[final] = samples.final_status.get(final, 0) + 1
+
+
+def peak_rss_mb() -> float:
+    """Пиковый RSS самого большого завершенного дочернего процесса (бэкенд или его воркеры)"""
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    # Linux отдает килобайты, macOS — байты
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run_scenario(name: str, scenario: Scenario, keep_dir: Optional[str] = None) -> dict:
+    workdir = keep_dir or tempfile.mkdtemp(prefix="hack3d-bench-")
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    webhook_env = {}
+    if scenario.webhooks:
+        scenario.mock.webhook_url = f"{base_url}/api/meshy/webhook"
+        scenario.mock.webhook_secret = scenario.mock.webhook_secret or "bench-webhook-secret"
+        webhook_env = {"MESHY_WEBHOOK_SECRET": scenario.mock.webhook_secret}
+    mock_runner, mock_url = await start_server(scenario.mock)
+    env = {
+        **os.environ,
+        **APP_ENV,
+        **webhook_env,
+        **scenario.env,
+        "GENERATION_BACKEND": "meshy",
+        "MESHY_BASE_URL": mock_url,
+        "MESHY_API_KEY": "bench",
+        "DATA_DIR": os.path.join(workdir, "data"),
+        "MODELS_DIR": os.path.join(workdir, "models"),
+    }
+    env.pop("DATABASE_URL", None)
+    os.makedirs(env["MODELS_DIR"], exist_ok=True)
+    log_path = os.path.join(workdir, "backend.log")
+    log_file = open(log_path, "w")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=REPO_ROOT, env=env, stdout=log_file, stderr=subprocess.STDOUT,
+    )
+
+    samples = Samples()
+    rng = random.Random(scenario.mock.seed)
+    connector = aiohttp.TCPConnector(limit=scenario.concurrency * 2)
+    try:
+        async with aiohttp.ClientSession(connector=connector) as session:
+            await wait_ready(session, base_url, process)
+            semaphore = asyncio.Semaphore(scenario.concurrency)
+
+            # Изображения готовятся заранее: в этом же event loop работает заглушка Meshy
+            uploads = [
+                [make_image(rng, scenario.image_side) for _ in range(2 if rng.random() < scenario.multi_image_share else 1)]
+                for _ in range(scenario.tasks)
+            ]
+
+            async def client(index: int) -> None:
+                images = uploads[index]
+                async with semaphore:
+                    try:
+                        await run_task(session, base_url, scenario, images, samples)
+                    except aiohttp.ClientError as e:
+                        samples.final_status["CLIENT_ERROR"] = samples.final_status.get("CLIENT_ERROR", 0) + 1
+                        logger.error(f"Client {index} failed: {str(e)}")
+
+            logger.info(f"Scenario {name}: {scenario.tasks} tasks, concurrency {scenario.concurrency}")
+            started = time.perf_counter()
+            await asyncio.gather(*(client(index) for index in range(scenario.tasks)))
+            wall = time.perf_counter() - started
+
+            async with session.get(f"{mock_url}/_stats") as response:
+                mock_stats = await response.json()
+    finally:
+        # SIGINT — штатная остановка uvicorn с выполнением shutdown lifespan
+        process.send_signal(signal.SIGINT)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+        log_file.close()
+        await mock_runner.cleanup()
+
+    # События вебхуков — входящие запросы к бэкенду, а не запросы к Meshy
+    outbound = sum(count for name, count in mock_stats["requests"].items() if not name.startswith("webhook:"))
+    completed = sum(samples.final_status.values())
+    succeeded = samples.final_status.get("SUCCEEDED", 0)
+
+    def rounded(value: Optional[float]) -> Optional[float]:
+        return None if value is None else round(value, 4)
+
+    return {
+        "scenario": name,
+        "settings": {**asdict(scenario), "mock": asdict(scenario.mock)},
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "wall_seconds": round(wall, 2),
+        "completed": completed,
+        "rejected": samples.rejected,
+        "final_status": samples.final_status,
+        "throughput_tasks_per_minute": round(succeeded / wall * 60, 2) if wall else None,
+        "upload_latency_p50": rounded(percentile(samples.upload, 0.5)),
+        "upload_latency_p99": rounded(percentile(samples.upload, 0.99)),
+        "status_latency_p50": rounded(percentile(samples.status, 0.5)),
+        "status_latency_p99": rounded(percentile(samples.status, 0.99)),
+        "task_duration_p50": rounded(percentile(samples.task, 0.5)),
+        "task_duration_p99": rounded(percentile(samples.task, 0.99)),
+        "peak_rss_mb": peak_rss_mb(),
+        "outbound_requests": mock_stats["requests"],
+        "outbound_requests_per_task": round(outbound / scenario.tasks, 2),
+        "outbound_bytes": mock_stats["bytes_sent"],
+        "upload_bytes_per_task": round(mock_stats["bytes_received"] / max(1, mock_stats["tasks"])),
+        "backend_log": log_path,
+    }
+
+
+def compare(result: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Метрики, ухудшившиеся больше чем на tolerance относительно базового прогона"""
+    regressions = []
+    for metric, higher_is_better in COMPARED.items():
+        current, previous = result.get(metric), baseline.get(metric)
+        if current is None or not previous:
+            continue
+        change = (current - previous) / previous
+        worse = -change if higher_is_better else change
+        marker = "REGRESSION" if worse > tolerance else ""
+        print(f"  {metric:<30} {previous:>12} -> {current:<12} {change:+.1%} {marker}")
+        if marker:
+            regressions.append(metric)
+    return regressions
+
+
+def print_result(result: dict) -> None:
+    print(f"Scenario {result['scenario']} @ {result['revision']}: {result['wall_seconds']}s wall")
+    for key in ("final_status", "rejected", *COMPARED, "outbound_requests", "outbound_bytes", "backend_log"):
+        print(f"  {key:<30} {result[key]}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test the backend against the local Meshy stand-in")
+    parser.add_argument("scenario", choices=sorted(SCENARIOS))
+    parser.add_argument("--tasks", type=int)
+    parser.add_argument("--concurrency", type=int)
+    parser.add_argument("--env", action="append", default=[], metavar="NAME=VALUE",
+                        help="extra backend setting, e.g. --env LOD_RATIOS=")
+    parser.add_argument("--output", help="write the result as JSON")
+    parser.add_argument("--save-baseline", action="store_true", help=f"store the result in {BASELINES_DIR}")
+    parser.add_argument("--baseline", help="compare with this result file (default: stored baseline of the scenario)")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative regression")
+    parser.add_argument("--keep-dir", help="backend data directory (default: temporary)")
+    add_settings_arguments(parser)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    scenario = SCENARIOS[args.scenario]
+    scenario.mock = settings_from_arguments(args, scenario.mock)
+    scenario.tasks = args.tasks or scenario.tasks
+    scenario.concurrency = args.concurrency or scenario.concurrency
+    for item in args.env:
+        name, _, value = item.partition("=")
+        scenario.env[name] = value
+
+    result = asyncio.run(run_scenario(args.scenario, scenario, args.keep_dir))
+    print_result(result)
+    if args.output:
+        Path(args.output).write_text(json.dumps(result, indent=2, ensure_ascii=False))
+
+    baseline_path = Path(args.baseline) if args.baseline else BASELINES_DIR / f"{args.scenario}.json"
+    if args.save_baseline:
+        BASELINES_DIR.mkdir(exist_ok=True)
+        (BASELINES_DIR / f"{args.scenario}.json").write_text(json.dumps(result, indent=2, ensure_ascii=False))
+        print(f"Baseline saved to {BASELINES_DIR / f'{args.scenario}.json'}")
+    elif baseline_path.exists():
+        print(f"Compared with {baseline_path} (revision {json.loads(baseline_path.read_text()).get('revision')}):")
+        if compare(result, json.loads(baseline_path.read_text()), args.tolerance):
+            sys.exit(1)
+    else:
+        print(f"No baseline at {baseline_path}; run with --save-baseline to record one")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,141 @@
-from fastapi import FastAPI
+import asyncio
+from contextlib import asynccontextmanager
+from functools import partial
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from pathlib import Path
 from backend.routers import (
+    batches,
     meshy,
-    auth      # Новый роутер для работы с Meshy.ai
+    auth,      # Новый роутер для работы с Meshy.ai
+    models,
+    model_files
 )
+from backend.services.admission import AdmissionQueue
+from backend.services.batch_store import batch_store
+from backend.services.db_pool import DatabasePool
+from backend.services.dedup_cache import dedup_cache
+from backend.services.generation import create_generation_backend
+from backend.services.http_client import create_http_session, close_http_session
+from backend.services.image_preprocessing import prune_cache_periodically
+from backend.services.metrics import (
+    CONTENT_TYPE, MetricsMiddleware, bind_active_tasks, mark_process_dead, monitor_event_loop_lag, render
+)
+from backend.services.model_catalog import model_catalog, rescan_periodically
+from backend.services.model_storage import model_storage
+from backend.services.passwords import password_hasher
+from backend.services.poll_scheduler import PollScheduler
+from backend.services.task_leases import task_leases
+from backend.services.task_store import evict_finished_periodically, task_store
+from backend.services.thumbnails import thumbnail_stage
+from backend.services.uploads import UploadLimitMiddleware
+from backend.services.worker_pool import worker_pool
+from backend import config
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Хранилище задач и индекс дедупликации запросов генерации
+    await task_store.open()
+    dedup_cache.open()
+    batch_store.open()
+    # Индекс файлов моделей; файлы задач из плоского MODELS_DIR переносятся в подкаталоги до сканирования каталога
+    model_storage.open()
+    model_catalog.open()
+    # Пул процессов для обработки скачанных моделей
+    worker_pool.start()
+    # Один пул HTTP-соединений на всё приложение (Meshy API и CDN с моделями)
+    app.state.http_session = create_http_session()
+    # Пул соединений PostgreSQL для авторизации
+    app.state.db_pool = DatabasePool(config.DATABASE_URL)
+    await app.state.db_pool.open()
+    # Хэширование паролей вне event loop
+    password_hasher.start()
+    # Источник генерации: Meshy API, локальный воркер Hunyuan3D или заглушка
+    app.state.generation_backend = create_generation_backend(config.GENERATION_BACKEND, app.state.http_session)
+    await app.state.generation_backend.start()
+    # Лимиты Meshy общие для аккаунта — при нескольких процессах каждый берет свою долю
+    workers = config.WORKERS
+    # Единый планировщик опроса статусов всех задач генерации
+    # Место в лимите одновременных задач освобождается, когда задача уходит из опроса
+    # С вебхуками о смене статуса сообщает Meshy, а редкий опрос только страхует от потерянных событий
+    webhook_intervals = {}
+    if config.MESHY_WEBHOOK_SECRET and config.GENERATION_BACKEND == "meshy":
+        webhook_intervals = dict(
+            min_interval=config.POLL_WEBHOOK_INTERVAL,
+            max_interval=max(config.POLL_MAX_INTERVAL, config.POLL_WEBHOOK_INTERVAL),
+            initial_delay=config.POLL_WEBHOOK_INTERVAL,
+        )
+    app.state.poll_scheduler = PollScheduler(
+        poll_fn=partial(meshy.poll_task, app.state.http_session, app.state.generation_backend),
+        on_timeout=meshy.mark_task_timeout,
+        on_finished=lambda task_id: app.state.admission_queue.release(task_id),
+        requests_per_second=config.POLL_REQUESTS_PER_SECOND / workers,
+        **webhook_intervals,
+    )
+    # Очередь отправки задач с лимитами частоты и числа одновременных задач
+    app.state.admission_queue = AdmissionQueue(
+        submit_fn=partial(meshy.admit_submission, app.state.generation_backend, app.state.poll_scheduler),
+        on_failure=meshy.fail_submission,
+        on_change=meshy.publish_queue_position,
+        rate_per_minute=config.SUBMIT_RATE_PER_MINUTE / workers,
+        burst=max(1, config.SUBMIT_BURST // workers),
+        max_in_flight=max(1, config.SUBMIT_MAX_IN_FLIGHT // workers),
+        max_in_flight_batch=max(1, config.SUBMIT_MAX_IN_FLIGHT_BATCH // workers),
+        max_queued=max(1, config.SUBMIT_MAX_QUEUED // workers),
+    )
+    app.state.poll_scheduler.start()
+    app.state.admission_queue.start()
+    # Аренды задач: этот процесс продлевает свои и подбирает задачи без владельца —
+    # не завершившиеся до рестарта или оставшиеся от упавшего процесса
+    task_leases.start(
+        owned=lambda: [*app.state.admission_queue.task_ids(), *app.state.poll_scheduler.task_ids()],
+        on_lost=partial(meshy.drop_task, app.state.poll_scheduler, app.state.admission_queue),
+        adopt=partial(meshy.adopt_tasks, app.state.poll_scheduler, app.state.generation_backend, app.state.admission_queue),
+    )
+    # Метрики: размер очереди и опроса, запаздывание event loop
+    bind_active_tasks(app.state.admission_queue, app.state.poll_scheduler)
+    loop_lag = asyncio.create_task(monitor_event_loop_lag())
+    eviction = asyncio.create_task(
+        evict_finished_periodically(task_store, config.TASK_TTL, config.TASK_EVICTION_INTERVAL)
+    )
+    preprocess_pruning = asyncio.create_task(
+        prune_cache_periodically(config.PREPROCESS_CACHE_DIR, config.PREPROCESS_CACHE_TTL, config.TASK_EVICTION_INTERVAL)
+    )
+    # Каталог моделей сверяется с диском при старте и затем периодически
+    catalog_rescan = asyncio.create_task(rescan_periodically(model_catalog, config.CATALOG_RESCAN_INTERVAL, thumbnail_stage.refresh))
+    # Квота на файлы моделей: давно не запрашивавшиеся модели вытесняются
+    model_storage.start(on_evict=meshy.forget_evicted_task, after_collect=thumbnail_stage.refresh)
+    try:
+        yield
+    finally:
+        loop_lag.cancel()
+        catalog_rescan.cancel()
+        eviction.cancel()
+        preprocess_pruning.cancel()
+        await app.state.admission_queue.stop()
+        await app.state.poll_scheduler.stop()
+        await task_leases.stop()
+        await model_storage.stop()
+        await app.state.generation_backend.stop()
+        await close_http_session(app.state.http_session)
+        await app.state.db_pool.close()
+        password_hasher.shutdown()
+        worker_pool.shutdown()
+        model_catalog.close()
+        model_storage.close()
+        batch_store.close()
+        dedup_cache.close()
+        await task_store.close()
+        mark_process_dead()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+
+# Ограничение размера загрузок до разбора multipart-формы
+# (добавляется до CORS, чтобы ответ 413 тоже получил CORS-заголовки)
+app.add_middleware(UploadLimitMiddleware, path_limits={"/api/meshy/batches": config.BATCH_MAX_REQUEST_BYTES})
 
 # Настройка CORS для взаимодействия с фронтендом
 app.add_middleware(
@@ -18,21 +146,42 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Время ответа по шаблонам маршрутов (внешний слой — учитывает и ответы других middleware)
+app.add_middleware(MetricsMiddleware)
+
 # Создаем директорию для моделей если её нет
-models_dir = "/home/user/HpProject/frontend/public/models"
+models_dir = config.MODELS_DIR
 Path(models_dir).mkdir(parents=True, exist_ok=True)
 
-# Подключаем статическую раздачу файлов для моделей
-app.mount("/models", StaticFiles(directory=models_dir), name="models")
+# Раздача файлов моделей: ETag, Range, сжатые варианты и долгий кэш
+app.include_router(model_files.router, prefix="/models")
 
 # Подключение маршрутов
 app.include_router(meshy.router, prefix="/api/meshy")  # Новый роутер для 3D моделей
+app.include_router(batches.router, prefix="/api/meshy/batches")  # Пакетная генерация
 app.include_router(auth.router, prefix="/api/auth")
+app.include_router(models.router, prefix="/api/models")  # Каталог моделей для галереи
 
 @app.get("/")
 async def root():
     return {"message": "Welcome to the Pregnancy Planning API with 3D Model Generation"}
 
+@app.get("/health")
+async def health(request: Request):
+    """Проверка готовности: база пользователей отвечает через пул соединений"""
+    database = await request.app.state.db_pool.health()
+    healthy = database["status"] in ("ok", "disabled")
+    return JSONResponse(
+        {"status": "ok" if healthy else "degraded", "database": database},
+        status_code=200 if healthy else 503,
+    )
+
+@app.get("/metrics")
+async def metrics():
+    """Метрики в формате Prometheus"""
+    return Response(render(), media_type=CONTENT_TYPE)
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
+    # Автоперезагрузка — только по UVICORN_RELOAD=1: один процесс WEB_CONCURRENCY еще не значит разработку
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=config.RELOAD, workers=config.WORKERS)
\ No newline at end of file
@@ -1,69 +1,83 @@
 # backend/routers/auth.py
 
-from fastapi import APIRouter, HTTPException
+import logging
+
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
-from passlib.context import CryptContext
 import asyncpg
 
-router = APIRouter()
+from backend import config
+from backend.services.db_pool import DatabasePool, get_db_pool
+from backend.services.metrics import observe_db
+from backend.services.passwords import password_hasher
+from backend.services.tokens import create_access_token, get_current_user
 
-DATABASE_URL = "" # Убедитесь, что URL верный
+router = APIRouter()
+logger = logging.getLogger(__name__)
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Запросы фиксированы, поэтому asyncpg подготавливает их один раз на соединение
+SELECT_USER = "SELECT username, password FROM users WHERE username = $1"
+UPDATE_PASSWORD = "UPDATE users SET password = $2 WHERE username = $1"
+# Гонка двух одновременных регистраций решается самой базой: вторая вставка ничего не вернет
+INSERT_USER = """
+    INSERT INTO users (username, password, first_name, last_name)
+    VALUES ($1, $2, '', '')
+    ON CONFLICT DO NOTHING
+    RETURNING username
+"""
 
 class UserRegister(BaseModel):
     username: str
     password: str
 
-async def connect_db():
-    try:
-        conn = await asyncpg.connect(DATABASE_URL)
-        print("Database connection successful")
-        return conn
-    except Exception as e:
-        db_error_message = f"Database connection failed: {e}"
-        print(db_error_message)
-        # Логируем тело ответа перед отправкой HTTPException
-        response_payload = {"detail": f"Database error: {str(e)}"}
-        print(f"Sending error response: {response_payload}")
-        raise HTTPException(status_code=500, detail=response_payload["detail"])
+def _token_response(message: str, username: str) -> dict:
+    return {
+        "message": message,
+        "access_token": create_access_token(username),
+        "token_type": "bearer",
+        "expires_in": config.JWT_ACCESS_TTL,
+    }
 
 @router.post("/login-or-register")
-async def login_or_register(user: UserRegister):
-    print(f"Received request: username={user.username}, password (length)={len(user.password)}") # Не логируйте сам пароль
-    conn = await connect_db()
+async def login_or_register(user: UserRegister, db: DatabasePool = Depends(get_db_pool)):
+    logger.info(f"Login request: username={user.username}")  # пароль не логируем
     try:
-        user_in_db = await conn.fetchrow("SELECT * FROM users WHERE username = $1", user.username)
-        print(f"User in DB: {user_in_db}")
-        
-        if not user_in_db:
-            hashed_password = pwd_context.hash(user.password)
-            # print(f"Creating new user with hashed password: {hashed_password}") # Хеш тоже чувствительная информация
-            print(f"Creating new user: {user.username}")
-            await conn.execute(
-                """
-                INSERT INTO users (username, password, first_name, last_name)
-                VALUES ($1, $2, '', '')
-                """,
-                user.username, hashed_password
-            )
-            print("User created successfully")
-            response_payload = {"message": "User created successfully"}
-            print(f"Sending response: {response_payload}") # <--- Логируем ответ
-            return response_payload
-        else:
-            print("User already exists")
-            response_payload = {"message": "User already exists, no changes made"}
-            print(f"Sending response: {response_payload}") # <--- Логируем ответ
-            return response_payload
-    except Exception as e:
-        server_error_message = f"Error processing request: {e}"
-        print(server_error_message)
-        # Логируем тело ответа перед отправкой HTTPException
-        response_payload = {"detail": f"Server error: {str(e)}"}
-        print(f"Sending error response: {response_payload}")
-        raise HTTPException(status_code=500, detail=response_payload["detail"])
-    finally:
-        if conn: # Убедимся, что conn существует перед закрытием
-            await conn.close()
-            print("Database connection closed")
\ No newline at end of file
+        async with db.acquire() as conn:
+            with observe_db("select_user"):
+                user_in_db = await conn.fetchrow(SELECT_USER, user.username)
+
+        if user_in_db is None:
+            hashed_password = await password_hasher.hash(user.password)
+            async with db.acquire() as conn:
+                with observe_db("insert_user"):
+                    created = await conn.fetchrow(INSERT_USER, user.username, hashed_password)
+            if created is not None:
+                logger.info(f"User created: {user.username}")
+                return _token_response("User created successfully", user.username)
+            # Пользователя успели зарегистрировать параллельно — проверяем пароль как при входе
+            async with db.acquire() as conn:
+                with observe_db("select_user"):
+                    user_in_db = await conn.fetchrow(SELECT_USER, user.username)
+
+        valid, new_hash = await password_hasher.verify(user.password, user_in_db["password"])
+        if not valid:
+            logger.info(f"Invalid password for {user.username}")
+            raise HTTPException(status_code=401, detail="Invalid username or password")
+        if new_hash:
+            # Стоимость bcrypt изменилась — обновляем хэш при успешном входе
+            async with db.acquire() as conn:
+                with observe_db("update_password"):
+                    await conn.execute(UPDATE_PASSWORD, user.username, new_hash)
+
+        logger.info(f"User logged in: {user.username}")
+        return _token_response("User already exists, no changes made", user.username)
+    except HTTPException:
+        raise
+    except (asyncpg.PostgresError, OSError) as e:
+        logger.error(f"Error processing login for {user.username}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Server error: {str(e)}")
+
+@router.get("/me")
+async def current_user(username: str = Depends(get_current_user)):
+    """Пользователь из access-токена (без обращения к базе)"""
+    return {"username": username}
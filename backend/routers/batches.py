@@ -0,0 +1,345 @@
+import json
+import logging
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from pydantic import BaseModel
+from starlette.datastructures import UploadFile
+
+from backend import config
+from backend.routers.meshy import cancel_task, open_spooled_files, submit_deduplicated, submitter_key
+from backend.services.admission import AdmissionQueue, get_admission_queue
+from backend.services.batch_store import Batch, BatchItem, batch_store
+from backend.services.generation import GenerationBackend, get_generation_backend, spool_files
+from backend.services.poll_scheduler import PollScheduler, get_poll_scheduler
+from backend.services.task_store import TERMINAL_STATUSES, TaskRecord, task_store
+from backend.services.tokens import get_optional_user
+from backend.services.uploads import check_upload_sizes
+
+router = APIRouter()
+logger = logging.getLogger(__name__)
+
+ALLOWED_FORMATS = ("image/jpeg", "image/jpg", "image/png")
+
+# Параметры по умолчанию — как у create-task и create-multi-image-task
+DEFAULT_PARAMS = {
+    "single-image": {
+        "ai_model": "meshy-4", "topology": "triangle", "target_polycount": 30000,
+        "should_texture": True, "enable_pbr": False,
+    },
+    "multi-image": {
+        "ai_model": "meshy-5", "topology": "triangle", "target_polycount": 30000, "should_texture": True,
+    },
+}
+ITEM_PARAMS = {"ai_model", "topology", "target_polycount", "should_texture", "enable_pbr", "texture_prompt", "quality"}
+
+# Элемент без задачи: не отправлен (ошибка при создании пакета) или задача уже удалена из хранилища
+NOT_SUBMITTED = "NOT_SUBMITTED"
+MISSING = "MISSING"
+# Элементы, которые можно перезапустить
+RETRYABLE_STATUSES = {"FAILED", "ERROR", "TIMEOUT", "CANCELED", NOT_SUBMITTED, MISSING}
+
+class BatchItemStatus(BaseModel):
+    index: int
+    label: Optional[str] = None
+    task_id: Optional[str] = None
+    status: str
+    progress: int
+    attempts: int
+    local_model_path: Optional[str] = None
+    thumbnail_url: Optional[str] = None
+    error: Optional[str] = None
+    queue: Optional[dict] = None
+
+class BatchStatus(BaseModel):
+    batch_id: str
+    name: Optional[str] = None
+    state: str
+    created_at: float
+    total: int
+    counts: dict[str, int]
+    progress: int
+    items: list[BatchItemStatus]
+
+class BatchSummary(BaseModel):
+    batch_id: str
+    owner: str
+    name: Optional[str] = None
+    created_at: float
+    canceled: bool
+    items: int
+
+def _parse_manifest(raw) -> dict:
+    if raw is None:
+        return {}
+    try:
+        manifest = json.loads(raw)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid manifest JSON: {str(e)}")
+    if not isinstance(manifest, dict):
+        raise HTTPException(status_code=400, detail="Manifest must be a JSON object")
+    return manifest
+
+def _plan_items(manifest: dict, files: list[UploadFile]) -> list[tuple[Optional[str], str, dict, list[UploadFile]]]:
+    """Состав пакета: (подпись, тип задачи, параметры, изображения) для каждого элемента"""
+    names = Counter(file.filename for file in files)
+    by_name = {file.filename: file for file in files}
+
+    def resolve(position: int, ref) -> UploadFile:
+        # Изображение элемента задается индексом загруженного файла или его именем
+        if isinstance(ref, int) and 0 <= ref < len(files):
+            return files[ref]
+        if isinstance(ref, str) and names[ref] == 1:
+            return by_name[ref]
+        if isinstance(ref, str) and names[ref] > 1:
+            raise HTTPException(status_code=400, detail=f"Item {position}: file name '{ref}' is ambiguous, use an index")
+        raise HTTPException(status_code=400, detail=f"Item {position}: unknown file {ref!r}")
+
+    shared = manifest.get("params") or {}
+    entries = manifest.get("items")
+    if entries is None:
+        # Без списка элементов каждый файл — отдельная задача
+        entries = [{"files": [index]} for index in range(len(files))]
+    if not entries:
+        raise HTTPException(status_code=400, detail="Batch has no items")
+    if len(entries) > config.BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"Batch exceeds {config.BATCH_MAX_ITEMS} items")
+
+    planned = []
+    for position, entry in enumerate(entries):
+        refs = entry.get("files") or []
+        if not 1 <= len(refs) <= 4:
+            raise HTTPException(status_code=400, detail=f"Item {position}: 1-4 images required")
+        item_files = [resolve(position, ref) for ref in refs]
+        for file in item_files:
+            if file.content_type not in ALLOWED_FORMATS:
+                raise HTTPException(status_code=400, detail=f"Item {position}: supported formats: JPG, JPEG, PNG")
+        check_upload_sizes(item_files)
+
+        kind = "single-image" if len(item_files) == 1 else "multi-image"
+        params = {**DEFAULT_PARAMS[kind], **shared, **(entry.get("params") or {})}
+        unknown = set(params) - ITEM_PARAMS
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Item {position}: unknown params {sorted(unknown)}")
+        if kind == "multi-image":
+            params.pop("enable_pbr", None)  # Multi-Image API его не принимает
+        params = {name: value for name, value in params.items() if value is not None}
+        label = entry.get("label") or Path(item_files[0].filename or "").stem or None
+        planned.append((label, kind, params, item_files))
+    return planned
+
+def _submitted_by(record: TaskRecord) -> tuple[Optional[str], Optional[str]]:
+    """Кто и в какой полосе создал задачу (до и после отправки в источник)"""
+    submission = record.extra.get("submission")
+    if submission:
+        return submission["user"], submission["lane"]
+    return record.extra.get("submitter"), record.extra.get("lane")
+
+async def _submit_item(batch: Batch, item: BatchItem, backend: GenerationBackend, queue: AdmissionQueue, no_cache: bool):
+    files = open_spooled_files(item.files)
+    try:
+        task_id, reused = await submit_deduplicated(
+            backend, queue, item.kind, item.params, files, no_cache, batch.owner, lane="batch"
+        )
+    finally:
+        for file in files:
+            file.file.close()
+    item.task_id = task_id
+    item.attempts += 1
+    item.error = None
+    item.reused = reused
+    await batch_store.set_item_task(batch.batch_id, item.index, task_id, item.attempts, reused)
+
+async def _submit_items(batch: Batch, items: list[BatchItem], backend: GenerationBackend, queue: AdmissionQueue, no_cache: bool):
+    for item in items:
+        try:
+            await _submit_item(batch, item, backend, queue, no_cache)
+        except Exception as e:
+            # Остальные элементы отправляем; этот помечается FAILED, его можно перезапустить через retry
+            error = e.detail if isinstance(e, HTTPException) else str(e)
+            logger.error(f"Error submitting item {item.index} of batch {batch.batch_id}: {error}")
+            item.task_id = None
+            item.attempts += 1
+            item.error = error
+            item.reused = False
+            try:
+                await batch_store.set_item_error(batch.batch_id, item.index, error, item.attempts)
+            except Exception as store_error:
+                logger.error(f"Error saving state of item {item.index} of batch {batch.batch_id}: {str(store_error)}")
+
+async def _item_records(batch: Batch) -> dict[str, TaskRecord]:
+    return await task_store.get_many([item.task_id for item in batch.items if item.task_id])
+
+async def build_batch_status(batch: Batch, queue: AdmissionQueue) -> BatchStatus:
+    """Сводка по пакету одним ответом: счетчики по статусам, общий прогресс и результаты элементов"""
+    records = await _item_records(batch)
+    items = []
+    counts = Counter()
+    progress = 0
+    for item in batch.items:
+        record = records.get(item.task_id) if item.task_id else None
+        if record is None:
+            status = MISSING if item.task_id else "FAILED" if item.error else NOT_SUBMITTED
+            item_progress = 0
+        else:
+            status = record.status
+            # Завершенный элемент (в том числе неудачный) больше не задерживает пакет
+            item_progress = 100 if record.finished else record.progress
+        counts[status] += 1
+        progress += item_progress
+        items.append(BatchItemStatus(
+            index=item.index,
+            label=item.label,
+            task_id=item.task_id,
+            status=status,
+            progress=item_progress,
+            attempts=item.attempts,
+            local_model_path=record.local_model_path if record else None,
+            thumbnail_url=record.local_thumbnail_path if record else None,
+            error=record.error if record else item.error,
+            queue=queue.describe(item.task_id) if status == "QUEUED" else None
+        ))
+
+    settled = TERMINAL_STATUSES | {NOT_SUBMITTED, MISSING}
+    if any(status not in settled for status in counts):
+        state = "running"
+    elif batch.canceled:
+        state = "canceled"
+    elif counts["SUCCEEDED"] == len(batch.items):
+        state = "succeeded"
+    else:
+        state = "completed_with_errors"
+
+    return BatchStatus(
+        batch_id=batch.batch_id,
+        name=batch.name,
+        state=state,
+        created_at=batch.created_at,
+        total=len(batch.items),
+        counts=dict(counts),
+        progress=round(progress / len(batch.items)) if batch.items else 100,
+        items=items
+    )
+
+async def get_batch_or_404(batch_id: str) -> Batch:
+    batch = await batch_store.get(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return batch
+
+@router.post("", response_model=BatchStatus)
+async def create_batch(
+    request: Request,
+    no_cache: bool = False,
+    backend: GenerationBackend = Depends(get_generation_backend),
+    queue: AdmissionQueue = Depends(get_admission_queue),
+    username: Optional[str] = Depends(get_optional_user)
+):
+    """Создает пакет задач: изображения в полях files, состав и параметры — в JSON-поле manifest.
+
+    manifest: {"name": ..., "params": {общие параметры},
+               "items": [{"files": [индекс или имя файла, ...], "label": ..., "params": {...}}]}.
+    Без items каждый файл становится отдельной задачей. Задачи идут в пакетной полосе очереди.
+    """
+    # Тело разбирается потоково: файлы больше мегабайта сразу уходят во временные файлы на диске
+    form = await request.form(max_files=config.BATCH_MAX_ITEMS * 4, max_fields=100)
+    try:
+        files = [value for value in form.getlist("files") if isinstance(value, UploadFile)]
+        manifest = _parse_manifest(form.get("manifest"))
+        planned = _plan_items(manifest, files)
+        for _, kind, params, _ in planned:
+            backend.validate(kind, params)
+        user = submitter_key(request, username)
+        queue.check(user, "batch", count=len(planned))
+
+        # Исходные изображения хранятся с пакетом, чтобы перезапуск не требовал повторной загрузки
+        batch = Batch(batch_id=str(uuid.uuid4()), owner=user, name=manifest.get("name"))
+        for index, (label, kind, params, item_files) in enumerate(planned):
+            item_dir = batch_store.batch_dir(batch.batch_id) / str(index)
+            item_dir.mkdir(parents=True, exist_ok=True)
+            paths = await spool_files(item_files, item_dir)
+            batch.items.append(BatchItem(
+                index=index,
+                kind=kind,
+                params=params,
+                files=[
+                    {"path": path, "filename": file.filename, "content_type": file.content_type}
+                    for path, file in zip(paths, item_files)
+                ],
+                label=label
+            ))
+    finally:
+        await form.close()
+
+    await batch_store.create(batch)
+    await _submit_items(batch, batch.items, backend, queue, no_cache)
+    logger.info(f"Batch {batch.batch_id} created with {len(batch.items)} items by {user}")
+    return await build_batch_status(batch, queue)
+
+@router.get("", response_model=list[BatchSummary])
+async def list_batches(limit: int = Query(50, ge=1, le=500)):
+    """Последние пакеты (от новых к старым)"""
+    return await batch_store.list_batches(limit)
+
+@router.get("/{batch_id}", response_model=BatchStatus)
+async def get_batch_status(batch_id: str, queue: AdmissionQueue = Depends(get_admission_queue)):
+    """Сводный статус пакета"""
+    batch = await get_batch_or_404(batch_id)
+    return await build_batch_status(batch, queue)
+
+@router.post("/{batch_id}/cancel", response_model=BatchStatus)
+async def cancel_batch(
+    batch_id: str,
+    scheduler: PollScheduler = Depends(get_poll_scheduler),
+    queue: AdmissionQueue = Depends(get_admission_queue)
+):
+    """Отменяет незавершенные задачи пакета"""
+    batch = await get_batch_or_404(batch_id)
+    records = await _item_records(batch)
+    # Только задачи, созданные этим пакетом: переиспользованные дедупликацией
+    # (из других пакетов того же владельца или из чужих запросов) не трогаем
+    own_task_ids = {item.task_id for item in batch.items if item.task_id and not item.reused}
+    canceled = 0
+    for task_id in own_task_ids:
+        record = records.get(task_id)
+        if record is None or record.finished or _submitted_by(record) != (batch.owner, "batch"):
+            continue
+        await cancel_task(record, scheduler, queue, "Canceled with batch")
+        canceled += 1
+    batch.canceled = True
+    await batch_store.set_canceled(batch_id, True)
+    logger.info(f"Batch {batch_id} canceled, {canceled} tasks stopped")
+    return await build_batch_status(batch, queue)
+
+@router.post("/{batch_id}/retry", response_model=BatchStatus)
+async def retry_batch(
+    batch_id: str,
+    backend: GenerationBackend = Depends(get_generation_backend),
+    queue: AdmissionQueue = Depends(get_admission_queue)
+):
+    """Перезапускает неудавшиеся, отмененные и неотправленные элементы пакета"""
+    batch = await get_batch_or_404(batch_id)
+    records = await _item_records(batch)
+    failed = []
+    for item in batch.items:
+        record = records.get(item.task_id) if item.task_id else None
+        status = record.status if record else (MISSING if item.task_id else NOT_SUBMITTED)
+        if status in RETRYABLE_STATUSES:
+            failed.append(item)
+    if failed:
+        queue.check(batch.owner, "batch", count=len(failed))
+        batch.canceled = False
+        await batch_store.set_canceled(batch_id, False)
+        await _submit_items(batch, failed, backend, queue, no_cache=False)
+        logger.info(f"Batch {batch_id}: retrying {len(failed)} items")
+    return await build_batch_status(batch, queue)
+
+@router.delete("/{batch_id}")
+async def delete_batch(batch_id: str):
+    """Удаляет пакет и сохраненные изображения; задачи и модели остаются"""
+    if await batch_store.delete(batch_id):
+        return {"message": f"Batch {batch_id} deleted"}
+    raise HTTPException(status_code=404, detail="Batch not found")
@@ -1,25 +1,51 @@
 import os
 import asyncio
 import aiohttp
-import aiofiles
-from fastapi import APIRouter, HTTPException, UploadFile, File, BackgroundTasks
-from fastapi.responses import JSONResponse
-from fastapi.staticfiles import StaticFiles
+from fastapi import APIRouter, HTTPException, UploadFile, File, Depends, Query, Request, Response, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import Optional
-import base64
+import hashlib
+import json
+import time
 import uuid
 from pathlib import Path
 import logging
+import shutil
+
+from starlette.datastructures import Headers
+
+from backend import config
+from backend.services.admission import AdmissionQueue, Submission, get_admission_queue
+from backend.services.asset_downloader import Asset, download_assets, plan_task_assets
+from backend.services.dedup_cache import DedupEntry, compute_dedup_key, dedup_cache
+from backend.services.generation import (
+    PREVIEW_STAGES, GenerationBackend, SubmissionError, get_generation_backend, preview_filename, spool_files
+)
+from backend.services.model_catalog import model_catalog
+from backend.services.glb_optimizer import optimize_glb_file
+from backend.services.image_preprocessing import preprocess_files
+from backend.services.lod import generate_lods
+from backend.services.metrics import TASK_DURATION, WEBHOOK_EVENTS, observe_task_phase
+from backend.services.model_serving import precompress_file
+from backend.services.model_storage import model_storage
+from backend.services.poll_scheduler import PollOutcome, PollScheduler, get_poll_scheduler
+from backend.services.task_events import task_events
+from backend.services.task_leases import task_leases
+from backend.services.task_store import TERMINAL_STATUSES, TaskRecord, compact_meshy_data, task_store
+from backend.services.thumbnails import thumbnail_stage
+from backend.services.tokens import get_optional_user
+from backend.services.uploads import check_upload_sizes
+from backend.services.webhooks import verify_signature
+from backend.services.worker_pool import worker_pool
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Конфигурация
-MESHY_API_KEY = os.getenv("MESHY_API_KEY", "api_от меши")
-MESHY_BASE_URL = "https://api.meshy.ai/openapi/v1"
-MODELS_DIR = "/home/user/HpProject/frontend/public/models"
+MODELS_DIR = config.MODELS_DIR
+TASK_EVENTS_HEARTBEAT = 15  # секунд между keep-alive сообщениями в потоке событий
 
 # Создаем директорию для моделей если её нет
 Path(MODELS_DIR).mkdir(parents=True, exist_ok=True)
@@ -32,16 +58,28 @@ class MeshyTaskResponse(BaseModel):
     status: str
     progress: int
     message: str
+    cached: bool = False
+    queue: Optional[dict] = None
 
 class MeshyTaskStatus(BaseModel):
     task_id: str
     status: str
     progress: int
+    stage: Optional[str] = None
     model_urls: Optional[dict] = None
     thumbnail_url: Optional[str] = None
     texture_urls: Optional[list] = None
     created_at: Optional[int] = None
     finished_at: Optional[int] = None
+    local_model_path: Optional[str] = None
+    error: Optional[str] = None
+    optimization: Optional[dict] = None
+    lods: Optional[list] = None
+    download: Optional[dict] = None
+    assets: Optional[list] = None
+    previews: Optional[list] = None
+    preview_url: Optional[str] = None
+    queue: Optional[dict] = None
 
 class MeshyTaskCreate(BaseModel):
     ai_model: str = "meshy-4"
@@ -51,109 +89,533 @@ class MeshyTaskCreate(BaseModel):
     enable_pbr: bool = False
     texture_prompt: Optional[str] = None
 
-# Хранилище активных задач (в продакшене лучше использовать Redis или базу данных)
-active_tasks = {}
+class MeshyTaskList(BaseModel):
+    tasks: list[dict]
+    next_cursor: Optional[str] = None
+
+def build_task_status(record: TaskRecord, queue: Optional[dict] = None) -> MeshyTaskStatus:
+    """Собирает ответ со статусом задачи из записи хранилища (queue — позиция в очереди отправки)"""
+    task_data = record.data
+    previews = record.extra.get("previews")
+
+    return MeshyTaskStatus(
+        task_id=record.task_id,
+        status=record.status,
+        progress=record.progress,
+        stage=task_data.get("stage"),
+        model_urls=task_data.get("model_urls"),
+        thumbnail_url=record.local_thumbnail_path,
+        texture_urls=task_data.get("texture_urls"),
+        created_at=task_data.get("created_at"),
+        finished_at=task_data.get("finished_at"),
+        local_model_path=record.local_model_path,
+        error=record.error,
+        optimization=record.extra.get("optimization"),
+        lods=record.extra.get("lods"),
+        download=record.extra.get("download"),
+        assets=record.extra.get("assets"),
+        previews=previews,
+        preview_url=previews[-1]["url"] if previews else None,
+        queue=queue
+    )
+
+def publish_task_status(record: TaskRecord):
+    """Отправляет текущий статус задачи всем подписчикам SSE/WebSocket"""
+    if task_events.subscribers(record.task_id):
+        task_events.publish(record.task_id, build_task_status(record).model_dump_json())
+
+def publish_queue_position(submission: Submission, queue: dict):
+    """Очередь сдвинулась: у задачи в очереди меняется только позиция"""
+    if task_events.subscribers(submission.task_id):
+        status = MeshyTaskStatus(task_id=submission.task_id, status="QUEUED", progress=0, queue=queue)
+        task_events.publish(submission.task_id, status.model_dump_json())
+
+async def get_task_or_404(task_id: str) -> TaskRecord:
+    record = await task_store.get(task_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Task not found")
+    return record
+
+# Параметры опроса для каждого типа задачи
+TASK_KINDS = {
+    "single-image": {
+        "endpoint": "image-to-3d",
+        "file_prefix": "",
+        "log_name": "Task",
+        "image_field": "image_url",
+        "as_list": False,
+        "timeout": 600,  # 10 минут
+    },
+    "multi-image": {
+        "endpoint": "multi-image-to-3d",
+        "file_prefix": "multi_",
+        "log_name": "Multi-Image task",
+        "image_field": "image_urls",
+        "as_list": True,
+        "timeout": 1200,  # 20 минут
+    },
+}
+
+def _is_stale_event(record: TaskRecord, event: dict) -> bool:
+    """Событие пришло позже более нового: вебхуки доставляются не по порядку"""
+    return event.get("status") not in TERMINAL_STATUSES and event.get("progress", 0) < record.progress
+
+async def poll_task(
+    session: aiohttp.ClientSession, backend: GenerationBackend, task_id: str, kind: str, event: Optional[dict] = None
+) -> PollOutcome:
+    """Один опрос статуса задачи; при готовности скачивает модель и превью.
+
+    event — статус из вебхука: с ним запрос к источнику не нужен.
+    """
+    kind_info = TASK_KINDS[kind]
+    log_name = kind_info["log_name"]
+
+    record = await task_store.get(task_id)
+    if record is None or record.finished:
+        return PollOutcome(done=True)  # задачу удалили или отменили (возможно, в другом процессе)
+
+    # У задач из очереди свой идентификатор; задачи до появления очереди хранятся под id источника
+    remote_id = record.extra.get("remote_id", task_id)
+    if event is None and record.extra.get("webhook"):
+        # Событие принял другой процесс и оставил его в задаче
+        event = record.extra["webhook"]
+        await task_store.update_extra(task_id, webhook=None)
+    if event is not None and not _is_stale_event(record, event):
+        data = event
+    else:
+        data = await backend.fetch_status(remote_id, kind_info)
+    if data is None:
+        return PollOutcome(done=False, error=True)
+
+    status = data.get("status")
+    progress = data.get("progress", 0)
+
+    logger.info(f"{log_name} {task_id} status: {status}, progress: {progress}%")
+
+    # Обновляем статус в хранилище (без полного ответа Meshy)
+    record.status = status
+    record.progress = progress
+    record.data = compact_meshy_data(data)
+    if status != "SUCCEEDED":
+        if status in ["FAILED", "CANCELED"]:
+            record.error = data.get("task_error", {}).get("message", "Unknown error")
+        if not await task_store.update_unfinished(
+            task_id, status=status, progress=progress, data=record.data, error=record.error
+        ):
+            return PollOutcome(done=True)  # задачу отменили, пока шел запрос к источнику
+        if data.get("preview_urls"):
+            await fetch_previews(session, record, kind_info, data["preview_urls"], backend.local_files_dir)
+        # Об успехе сообщаем подписчикам только после скачивания файлов
+        publish_task_status(record)
+    else:
+        # До окончания скачивания задача остается незавершенной — после рестарта ее подхватит опрос
+        record.status = "DOWNLOADING"
+        if not record.extra.get("generated_at"):
+            record.extra["generated_at"] = time.time()
+            observe_task_phase("generating", record.extra.get("admitted_at"), record.extra["generated_at"])
+            await task_store.update_extra(task_id, generated_at=record.extra["generated_at"])
+        if not await task_store.update_unfinished(task_id, status=record.status, progress=progress, data=record.data):
+            return PollOutcome(done=True)
+
+    if status == "SUCCEEDED":
+        try:
+            # Все файлы задачи скачиваются параллельно; прогресс виден в статусе
+            def on_progress(snapshot: dict):
+                record.extra["download"] = snapshot
+                publish_task_status(record)
+
+            assets = plan_task_assets(task_id, kind_info["file_prefix"], data)
+            results = await download_assets(session, assets, MODELS_DIR, on_progress, backend.local_files_dir)
+            record.extra["assets"] = results
+            await task_store.update_extra(task_id, download=record.extra.get("download"), assets=results)
+
+            for result in results:
+                if "error" in result:
+                    continue
+                if result["kind"] == "model" and result["filename"].endswith(".glb"):
+                    record.local_model_path = result["url"]
+                elif result["kind"] == "thumbnail":
+                    record.local_thumbnail_path = result["url"]
+
+            if record.local_model_path:
+                await process_downloaded_model(record, os.path.basename(record.local_model_path))
+            await remove_previews(record)
+            await register_task_files(record)
+            await backend.release(remote_id)
+        except Exception as e:
+            logger.error(f"Error downloading assets for {task_id}: {str(e)}")
+            record.status = "ERROR"
+            record.error = str(e)
+            await task_store.update(task_id, status=record.status, error=record.error)
+            await dedup_cache.forget_task(task_id)
+            observe_task_finished(record)
+            publish_task_status(record)
+            return PollOutcome(done=True, progress=progress)
+
+        record.status = status
+        await task_store.update(
+            task_id,
+            status=status,
+            local_model_path=record.local_model_path,
+            local_thumbnail_path=record.local_thumbnail_path
+        )
+        await dedup_cache.record_result(task_id, record.local_model_path, record.local_thumbnail_path)
+        observe_task_phase("downloading", record.extra.get("generated_at"), time.time())
+        observe_task_finished(record)
+        publish_task_status(record)
+        logger.info(f"{log_name} {task_id} completed successfully")
+        return PollOutcome(done=True, progress=progress)
+    elif status in ["FAILED", "CANCELED"]:
+        logger.error(f"{log_name} {task_id} failed with status: {status}, error: {record.error}")
+        await dedup_cache.forget_task(task_id)
+        observe_task_finished(record)
+        return PollOutcome(done=True, progress=progress)
+
+    return PollOutcome(done=False, progress=progress)
+
+def observe_task_finished(record: TaskRecord):
+    """Полное время жизни задачи по итоговому статусу"""
+    TASK_DURATION.labels(record.status).observe(max(0.0, time.time() - record.created_at))
+
+async def fetch_previews(
+    session: aiohttp.ClientSession, record: TaskRecord, kind_info: dict, preview_urls: dict, local_root: Optional[str]
+):
+    """Промежуточные модели прогрессивной генерации: каждая следующая заменяет предыдущую"""
+    known = {preview["stage"] for preview in record.extra.get("previews") or []}
+    model_filename = f"{kind_info['file_prefix']}{record.task_id}.glb"
+    pending = [stage for stage in PREVIEW_STAGES if preview_urls.get(stage) and stage not in known]
+    if not pending:
+        return
+    assets = [Asset(preview_urls[stage], preview_filename(model_filename, stage), "preview") for stage in pending]
+    # Черновики необязательны: ошибки скачивания записываются в результат, а не пробрасываются
+    results = await download_assets(session, assets, MODELS_DIR, local_root=local_root)
+    previews = (record.extra.get("previews") or []) + [
+        {"stage": stage, "url": result["url"]} for stage, result in zip(pending, results) if "url" in result
+    ]
+    previews.sort(key=lambda preview: PREVIEW_STAGES.index(preview["stage"]))
+    record.extra["previews"] = previews
+    await task_store.update_extra(record.task_id, previews=previews)
+    publish_task_status(record)
+
+async def remove_previews(record: TaskRecord):
+    """Готовая модель заменяет черновики — их файлы больше не нужны"""
+    previews = record.extra.get("previews")
+    if not previews:
+        return
+    for preview in previews:
+        try:
+            await asyncio.to_thread(os.remove, model_storage.path(os.path.basename(preview["url"])))
+        except FileNotFoundError:
+            pass
+    record.extra["previews"] = None
+    await task_store.update_extra(record.task_id, previews=None)
 
-async def download_model_file(url: str, filename: str) -> str:
-    """Скачивает файл модели и сохраняет локально"""
+async def process_downloaded_model(record: TaskRecord, filename: str):
+    """Обработка скачанной модели в пуле процессов: оптимизация, сжатые варианты, каталог"""
+    file_path = model_storage.path(filename)
+
+    if config.GLB_OPTIMIZE:
+        try:
+            result = await worker_pool.run(optimize_glb_file, file_path)
+        except Exception as e:
+            # Неудачная оптимизация не мешает отдать исходную модель
+            logger.error(f"Error optimizing {filename}: {str(e)}")
+            result = {"optimized": False, "reason": str(e)}
+        else:
+            if result["optimized"]:
+                logger.info(f"Optimized {filename}: {result['original_size']} -> {result['optimized_size']} bytes")
+        record.extra["optimization"] = result
+        await task_store.update_extra(record.task_id, optimization=result)
+
+    # Уровни детализации строим из уже оптимизированного файла
+    levels = [{"level": 0, "filename": filename}]
+    if config.LOD_RATIOS:
+        try:
+            levels = await worker_pool.run(generate_lods, file_path, config.LOD_RATIOS)
+        except Exception as e:
+            logger.error(f"Error generating LODs for {filename}: {str(e)}")
+    lods = [
+        {**level, "url": f"/models/{filename}?lod={level['level']}"}
+        for level in levels
+    ]
+    record.extra["lods"] = lods
+    await task_store.update_extra(record.task_id, lods=lods)
+
+    # Сжатые варианты готовим один раз, а не на каждый запрос
+    for level in levels:
+        await worker_pool.run(precompress_file, model_storage.path(level["filename"]))
+    await model_catalog.add_model(filename, record.task_id)
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url) as response:
-                if response.status == 200:
-                    file_path = os.path.join(MODELS_DIR, filename)
-                    async with aiofiles.open(file_path, 'wb') as f:
-                        async for chunk in response.content.iter_chunked(8192):
-                            await f.write(chunk)
-                    return f"/models/{filename}"
-                else:
-                    raise HTTPException(status_code=400, detail=f"Failed to download file: {response.status}")
+        await thumbnail_stage.refresh()
     except Exception as e:
-        logger.error(f"Error downloading file {url}: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Download error: {str(e)}")
-
-async def check_task_status_and_download(task_id: str):
-    """Проверяет статус задачи и скачивает модель при готовности"""
-    headers = {
-        "Authorization": f"Bearer {MESHY_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    
-    max_attempts = 300  # 5 минут при проверке каждые секунду
-    attempt = 0
-    
+        # Превью галереи вторичны: задача все равно считается выполненной
+        logger.error(f"Error refreshing gallery thumbnails: {str(e)}")
+
+async def register_task_files(record: TaskRecord):
+    """Учитывает файлы готовой задачи в хранилище; совпадающие с уже сохраненными заменяются жесткими ссылками"""
     try:
-        async with aiohttp.ClientSession() as session:
-            while attempt < max_attempts:
-                try:
-                    async with session.get(f"{MESHY_BASE_URL}/image-to-3d/{task_id}", headers=headers) as response:
-                        if response.status == 200:
-                            data = await response.json()
-                            status = data.get("status")
-                            progress = data.get("progress", 0)
-                            
-                            logger.info(f"Task {task_id} status: {status}, progress: {progress}%")
-                            
-                            # Обновляем статус в хранилище
-                            active_tasks[task_id] = {
-                                "status": status,
-                                "progress": progress,
-                                "data": data,
-                                "type": active_tasks[task_id].get("type", "single-image")
-                            }
-                            
-                            if status == "SUCCEEDED":
-                                # Скачиваем модель
-                                model_urls = data.get("model_urls", {})
-                                if model_urls.get("glb"):
-                                    filename = f"{task_id}.glb"
-                                    local_path = await download_model_file(model_urls["glb"], filename)
-                                    active_tasks[task_id]["local_model_path"] = local_path
-                                
-                                # Скачиваем превью
-                                if data.get("thumbnail_url"):
-                                    thumbnail_filename = f"{task_id}_thumbnail.png"
-                                    thumbnail_path = await download_model_file(data["thumbnail_url"], thumbnail_filename)
-                                    active_tasks[task_id]["local_thumbnail_path"] = thumbnail_path
-                                
-                                logger.info(f"Task {task_id} completed successfully")
-                                break
-                            elif status in ["FAILED", "CANCELED"]:
-                                error_msg = data.get("task_error", {}).get("message", "Unknown error")
-                                logger.error(f"Task {task_id} failed with status: {status}, error: {error_msg}")
-                                active_tasks[task_id]["error"] = error_msg
-                                break
-                            
-                            await asyncio.sleep(2)  # Ждем 2 секунды перед следующей проверкой
-                            attempt += 1
-                        else:
-                            logger.error(f"Error checking task status: {response.status}")
-                            error_text = await response.text()
-                            logger.error(f"Response: {error_text}")
-                            await asyncio.sleep(5)  # Ждем дольше при ошибке
-                            attempt += 1
-                except Exception as e:
-                    logger.error(f"Exception during status check for {task_id}: {str(e)}")
-                    await asyncio.sleep(5)
-                    attempt += 1
-            
-            if attempt >= max_attempts:
-                logger.warning(f"Task {task_id} timed out after {max_attempts} attempts")
-                active_tasks[task_id]["status"] = "TIMEOUT"
-                
+        linked = await model_storage.register_task(record.task_id)
     except Exception as e:
-        logger.error(f"Error in background task for {task_id}: {str(e)}")
-        active_tasks[task_id]["status"] = "ERROR"
-        active_tasks[task_id]["error"] = str(e)
+        logger.error(f"Error registering files of {record.task_id}: {str(e)}")
+        return
+    model_filename = os.path.basename(record.local_model_path) if record.local_model_path else None
+    if model_filename in linked:
+        # У жесткой ссылки mtime исходного файла — каталог обновляется сразу, а не при пересканировании
+        await model_catalog.add_model(model_filename, record.task_id)
+
+async def forget_task_files(task_id: str, filenames: list[str]):
+    """Файлы задачи удалены: модель убирается из каталога, задача — из дедупликации"""
+    await dedup_cache.forget_task(task_id)
+    for filename in filenames:
+        if filename.endswith(".glb"):
+            await model_catalog.remove_model(filename)
+
+async def forget_evicted_task(task_id: str, filenames: list[str]):
+    """Файлы задачи вытеснены по квоте: задача остается, но ссылок на файлы в ней больше нет"""
+    await forget_task_files(task_id, filenames)
+    if await task_store.get(task_id) is not None:
+        await task_store.update(task_id, local_model_path=None, local_thumbnail_path=None)
+        await task_store.update_extra(task_id, evicted_at=time.time(), lods=None, assets=None)
+
+async def mark_task_timeout(task_id: str, kind: str):
+    """Помечает задачу, не завершившуюся за отведенное время"""
+    record = await task_store.get(task_id)
+    if record is not None:
+        record.status = "TIMEOUT"
+        await task_store.update(task_id, status=record.status)
+        await dedup_cache.forget_task(task_id)
+        observe_task_finished(record)
+        publish_task_status(record)
+
+async def adopt_tasks(scheduler: PollScheduler, backend: GenerationBackend, queue: AdmissionQueue, records: list[TaskRecord]):
+    """Задачи без владельца (после рестарта или падения другого процесса): в очередь отправки или на опрос"""
+    for record in sorted(records, key=lambda record: record.created_at):
+        kind_info = TASK_KINDS.get(record.type)
+        if kind_info is None:
+            continue
+        submission = record.extra.get("submission")
+        if record.status == "QUEUED":
+            if submission is None:
+                continue
+            queue.enqueue(Submission(record.task_id, record.type, submission["user"], submission["lane"]))
+            continue
+        if record.extra.get("submitter"):
+            queue.track(record.task_id, record.extra["submitter"], record.extra.get("lane", "interactive"))
+        # Даем задаче остаток исходного лимита, но не меньше минуты на проверку
+        remaining = backend.timeout_for(kind_info) - (time.time() - record.created_at)
+        # Пока процесс не работал, события вебхуков могли потеряться — первый опрос сразу
+        scheduler.schedule(record.task_id, record.type, timeout=max(remaining, 60), delay=0.0)
+    if records:
+        logger.info(f"Resumed {len(records)} unfinished tasks")
+
+def drop_task(scheduler: PollScheduler, queue: AdmissionQueue, task_id: str):
+    """Аренду задачи перехватил другой процесс — здесь ее больше не отправляем и не опрашиваем"""
+    queue.cancel(task_id)
+    scheduler.cancel(task_id)
+
+def _spool_dir(task_id: str) -> Path:
+    return Path(config.SUBMIT_SPOOL_DIR) / task_id
+
+def open_spooled_files(spooled_files: list[dict]) -> list[UploadFile]:
+    """Сохраненные изображения в виде UploadFile — источники генерации принимают именно их"""
+    return [
+        UploadFile(
+            open(spooled["path"], "rb"),
+            size=os.path.getsize(spooled["path"]),
+            filename=spooled["filename"],
+            headers=Headers({"content-type": spooled["content_type"]})
+        )
+        for spooled in spooled_files
+    ]
+
+async def _remove_spool(task_id: str):
+    await asyncio.to_thread(shutil.rmtree, _spool_dir(task_id), True)
+
+async def submit_generation(
+    backend: GenerationBackend,
+    queue: AdmissionQueue,
+    kind: str,
+    request_data: dict,
+    files: list[UploadFile],
+    user: str,
+    lane: str = "interactive"
+) -> str:
+    """Сохраняет задачу со статусом QUEUED и ставит ее в очередь отправки; возвращает task_id"""
+    backend.validate(kind, request_data)
+    queue.check(user, lane)
+
+    # UploadFile закроется вместе с запросом, а задача может ждать в очереди дольше
+    task_id = str(uuid.uuid4())
+    # Аренда раньше записи: иначе задачу могли бы принять за брошенную и подобрать другим процессом
+    await task_leases.acquire(task_id)
+    spool_dir = _spool_dir(task_id)
+    spool_dir.mkdir(parents=True, exist_ok=True)
+    paths = await spool_files(files, spool_dir)
+    submission = {
+        "params": request_data,
+        "user": user,
+        "lane": lane,
+        "files": [
+            {"path": path, "filename": file.filename, "content_type": file.content_type}
+            for path, file in zip(paths, files)
+        ],
+    }
+    await task_store.put(TaskRecord(task_id=task_id, type=kind, status="QUEUED", extra={"submission": submission}))
+    queue.enqueue(Submission(task_id, kind, user, lane))
+
+    logger.info(f"{TASK_KINDS[kind]['log_name']} {task_id} queued for {backend.name} ({lane})")
+    return task_id
+
+async def admit_submission(backend: GenerationBackend, scheduler: PollScheduler, submission: Submission):
+    """Очередь дошла до задачи: отправляет ее в источник генерации и ставит на опрос"""
+    record = await task_store.get(submission.task_id)
+    if record is None or record.status != "QUEUED":
+        raise SubmissionError("Task was deleted or canceled while queued")
+    kind_info = TASK_KINDS[record.type]
+
+    spooled_files = record.extra["submission"]["files"]
+    if config.PREPROCESS_IMAGES:
+        # Не в обработчике запроса: создание задачи не ждет декодирования фото.
+        # Повторная отправка после 429 берет результат из кэша
+        spooled_files = await preprocess_files(spooled_files)
+    files = open_spooled_files(spooled_files)
+    try:
+        remote_id = await backend.submit(record.type, kind_info, record.extra["submission"]["params"], files)
+    finally:
+        for file in files:
+            file.file.close()
+
+    record = await task_store.get(submission.task_id)
+    if record is None or record.status != "QUEUED":
+        # Задачу удалили или отменили, пока она отправлялась
+        await backend.release(remote_id)
+        raise SubmissionError("Task was canceled while being submitted")
+
+    record.status = "PENDING"
+    admitted = {
+        "remote_id": remote_id, "submitter": submission.user, "lane": submission.lane,
+        "submission": None, "admitted_at": time.time(),
+    }
+    observe_task_phase("queued", record.created_at, admitted["admitted_at"])
+    record.extra.update(admitted)
+    await task_store.update(record.task_id, status=record.status)
+    await task_store.update_extra(record.task_id, **admitted)
+    await _remove_spool(record.task_id)
+
+    scheduler.schedule(record.task_id, record.type, timeout=backend.timeout_for(kind_info))
+    publish_task_status(record)
+    logger.info(f"{kind_info['log_name']} {record.task_id} created successfully via {backend.name} as {remote_id}")
+
+async def fail_submission(submission: Submission, error: str):
+    """Источник генерации окончательно отказал в приеме задачи"""
+    await _remove_spool(submission.task_id)
+    await dedup_cache.forget_task(submission.task_id)
+    record = await task_store.get(submission.task_id)
+    if record is None or record.finished:
+        return
+    record.status = "FAILED"
+    record.error = error
+    await task_store.update(record.task_id, status=record.status, error=record.error)
+    await task_store.update_extra(record.task_id, submission=None)
+    observe_task_finished(record)
+    publish_task_status(record)
+
+async def cancel_task(record: TaskRecord, scheduler: PollScheduler, queue: AdmissionQueue, reason: str):
+    """Снимает незавершенную задачу с очереди и опроса; уже начатую генерацию источник доведет сам"""
+    if queue.cancel(record.task_id):
+        await _remove_spool(record.task_id)
+    scheduler.cancel(record.task_id)
+    record.status = "CANCELED"
+    record.error = reason
+    await task_store.update(record.task_id, status=record.status, error=record.error)
+    await dedup_cache.forget_task(record.task_id)
+    observe_task_finished(record)
+    publish_task_status(record)
+
+async def _dedup_entry_usable(entry: DedupEntry) -> bool:
+    """Можно ли отдать задачу из кэша дедупликации вместо новой генерации"""
+    record = await task_store.get(entry.task_id)
+    if record is not None:
+        return record.status not in TERMINAL_STATUSES - {"SUCCEEDED"}
+
+    # Задача уже удалена из хранилища, но модель скачана — восстанавливаем готовую задачу
+    if entry.local_model_path:
+        model_file = model_storage.path(os.path.basename(entry.local_model_path))
+        if os.path.exists(model_file):
+            await task_store.put(TaskRecord(
+                task_id=entry.task_id,
+                type=entry.kind,
+                status="SUCCEEDED",
+                progress=100,
+                local_model_path=entry.local_model_path,
+                local_thumbnail_path=entry.local_thumbnail_path
+            ))
+            return True
+    return False
+
+async def submit_deduplicated(
+    backend: GenerationBackend,
+    queue: AdmissionQueue,
+    kind: str,
+    request_data: dict,
+    files: list[UploadFile],
+    no_cache: bool,
+    user: str,
+    lane: str = "interactive"
+) -> tuple[str, bool]:
+    """Отдает существующую задачу для тех же изображений и параметров или создает новую"""
+    async def submit() -> str:
+        return await submit_generation(backend, queue, kind, request_data, files, user, lane)
+
+    if no_cache:
+        return await submit(), False
+
+    key = await compute_dedup_key(kind, request_data, files)
+    task_id, reused = await dedup_cache.get_or_submit(key, kind, submit, is_usable=_dedup_entry_usable)
+    if reused:
+        logger.info(f"Reusing task {task_id} for duplicate {kind} request")
+    return task_id, reused
+
+def submitter_key(request: Request, username: Optional[str]) -> str:
+    """Кого ограничивают пользовательские лимиты: владельца токена или адрес клиента"""
+    if username:
+        return f"user:{username}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+async def _reused_task_response(task_id: str, queue: AdmissionQueue) -> MeshyTaskResponse:
+    record = await get_task_or_404(task_id)
+    return MeshyTaskResponse(
+        task_id=task_id,
+        status=record.status,
+        progress=record.progress,
+        message="Identical request found. Existing task reused.",
+        cached=True,
+        queue=queue.describe(task_id)
+    )
+
+def _queued_task_response(task_id: str, queue: AdmissionQueue, message: str) -> MeshyTaskResponse:
+    return MeshyTaskResponse(
+        task_id=task_id,
+        status="QUEUED",
+        progress=0,
+        message=message,
+        queue=queue.describe(task_id)
+    )
 
 @router.post("/create-multi-image-task", response_model=MeshyTaskResponse)
 async def create_multi_image_task(
-    background_tasks: BackgroundTasks,
+    request: Request,
     files: list[UploadFile] = File(...),
     ai_model: str = "meshy-5",
     topology: str = "triangle",
     target_polycount: int = 30000,
     should_texture: bool = True,
-    texture_prompt: Optional[str] = None
+    texture_prompt: Optional[str] = None,
+    quality: Optional[str] = None,
+    no_cache: bool = False,
+    backend: GenerationBackend = Depends(get_generation_backend),
+    queue: AdmissionQueue = Depends(get_admission_queue),
+    username: Optional[str] = Depends(get_optional_user)
 ):
     """Создает новую задачу для генерации 3D модели из нескольких изображений"""
     
@@ -170,18 +632,12 @@ async def create_multi_image_task(
         if file.content_type not in allowed_formats:
             raise HTTPException(status_code=400, detail="Supported formats: JPG, JPEG, PNG")
     
+    # Проверяем размеры до кодирования
+    check_upload_sizes(files)
+    
     try:
-        # Конвертируем все файлы в base64
-        image_urls = []
-        for file in files:
-            file_content = await file.read()
-            base64_image = base64.b64encode(file_content).decode('utf-8')
-            data_uri = f"data:{file.content_type};base64,{base64_image}"
-            image_urls.append(data_uri)
-        
-        # Подготавливаем данные для запроса
+        # Подготавливаем данные для запроса (изображения добавляются потоково)
         request_data = {
-            "image_urls": image_urls,
             "ai_model": ai_model,  # Multi-Image поддерживает только meshy-5
             "topology": topology,
             "target_polycount": target_polycount,
@@ -190,138 +646,42 @@ async def create_multi_image_task(
         
         if texture_prompt:
             request_data["texture_prompt"] = texture_prompt
+        # Уровень качества учитывает только локальная генерация
+        if quality:
+            request_data["quality"] = quality
         
-        # Отправляем запрос к Meshy Multi-Image API
-        headers = {
-            "Authorization": f"Bearer {MESHY_API_KEY}",
-            "Content-Type": "application/json"
-        }
-        
-        logger.info(f"Sending Multi-Image request to Meshy API with {len(image_urls)} images")
+        # Отправляем запрос к Meshy Multi-Image API (или берем готовую задачу из кэша)
+        task_id, reused = await submit_deduplicated(
+            backend, queue, "multi-image", request_data, files, no_cache, submitter_key(request, username)
+        )
+        if reused:
+            return await _reused_task_response(task_id, queue)
         
-        async with aiohttp.ClientSession() as session:
-            async with session.post(f"{MESHY_BASE_URL}/multi-image-to-3d", json=request_data, headers=headers) as response:
-                # Meshy API возвращает 202 (Accepted) для успешных запросов
-                if response.status in [200, 202]:
-                    result = await response.json()
-                    task_id = result.get("result")
-                    
-                    if not task_id:
-                        logger.error(f"No task_id in Multi-Image response: {result}")
-                        raise HTTPException(status_code=500, detail="Invalid response from Meshy Multi-Image API")
-                    
-                    # Инициализируем задачу в хранилище
-                    active_tasks[task_id] = {
-                        "status": "PENDING",
-                        "progress": 0,
-                        "data": {},
-                        "type": "multi-image"
-                    }
-                    
-                    # Запускаем фоновую задачу для мониторинга
-                    background_tasks.add_task(check_multi_image_task_status_and_download, task_id)
-                    
-                    logger.info(f"Multi-Image task {task_id} created successfully")
-                    
-                    return MeshyTaskResponse(
-                        task_id=task_id,
-                        status="PENDING",
-                        progress=0,
-                        message=f"Multi-Image task created successfully with {len(image_urls)} images. Processing started."
-                    )
-                else:
-                    error_text = await response.text()
-                    logger.error(f"Meshy Multi-Image API error: {response.status} - {error_text}")
-                    raise HTTPException(status_code=400, detail=f"Meshy Multi-Image API error ({response.status}): {error_text}")
+        return _queued_task_response(
+            task_id, queue, f"Multi-Image task with {len(files)} images queued for generation."
+        )
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error creating Multi-Image Meshy task: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
-async def check_multi_image_task_status_and_download(task_id: str):
-    """Проверяет статус Multi-Image задачи и скачивает модель при готовности"""
-    headers = {
-        "Authorization": f"Bearer {MESHY_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    
-    max_attempts = 600  # 10 минут при проверке каждые секунду
-    attempt = 0
-    
-    try:
-        async with aiohttp.ClientSession() as session:
-            while attempt < max_attempts:
-                try:
-                    async with session.get(f"{MESHY_BASE_URL}/multi-image-to-3d/{task_id}", headers=headers) as response:
-                        if response.status == 200:
-                            data = await response.json()
-                            status = data.get("status")
-                            progress = data.get("progress", 0)
-                            
-                            logger.info(f"Multi-Image task {task_id} status: {status}, progress: {progress}%")
-                            
-                            # Обновляем статус в хранилище
-                            active_tasks[task_id] = {
-                                "status": status,
-                                "progress": progress,
-                                "data": data,
-                                "type": "multi-image"
-                            }
-                            
-                            if status == "SUCCEEDED":
-                                # Скачиваем модель
-                                model_urls = data.get("model_urls", {})
-                                if model_urls.get("glb"):
-                                    filename = f"multi_{task_id}.glb"
-                                    local_path = await download_model_file(model_urls["glb"], filename)
-                                    active_tasks[task_id]["local_model_path"] = local_path
-                                
-                                # Скачиваем превью
-                                if data.get("thumbnail_url"):
-                                    thumbnail_filename = f"multi_{task_id}_thumbnail.png"
-                                    thumbnail_path = await download_model_file(data["thumbnail_url"], thumbnail_filename)
-                                    active_tasks[task_id]["local_thumbnail_path"] = thumbnail_path
-                                
-                                logger.info(f"Multi-Image task {task_id} completed successfully")
-                                break
-                            elif status in ["FAILED", "CANCELED"]:
-                                error_msg = data.get("task_error", {}).get("message", "Unknown error")
-                                logger.error(f"Multi-Image task {task_id} failed with status: {status}, error: {error_msg}")
-                                active_tasks[task_id]["error"] = error_msg
-                                break
-                            
-                            await asyncio.sleep(2)  # Ждем 2 секунды перед следующей проверкой
-                            attempt += 1
-                        else:
-                            logger.error(f"Error checking Multi-Image task status: {response.status}")
-                            error_text = await response.text()
-                            logger.error(f"Response: {error_text}")
-                            await asyncio.sleep(5)  # Ждем дольше при ошибке
-                            attempt += 1
-                except Exception as e:
-                    logger.error(f"Exception during Multi-Image status check for {task_id}: {str(e)}")
-                    await asyncio.sleep(5)
-                    attempt += 1
-            
-            if attempt >= max_attempts:
-                logger.warning(f"Multi-Image task {task_id} timed out after {max_attempts} attempts")
-                active_tasks[task_id]["status"] = "TIMEOUT"
-                
-    except Exception as e:
-        logger.error(f"Error in Multi-Image background task for {task_id}: {str(e)}")
-        active_tasks[task_id]["status"] = "ERROR"
-        active_tasks[task_id]["error"] = str(e)
-
 @router.post("/create-task", response_model=MeshyTaskResponse)
 async def create_meshy_task(
-    background_tasks: BackgroundTasks,
+    request: Request,
     file: UploadFile = File(...),
     ai_model: str = "meshy-4",
     topology: str = "triangle",
     target_polycount: int = 30000,
     should_texture: bool = True,
     enable_pbr: bool = False,
-    texture_prompt: Optional[str] = None
+    texture_prompt: Optional[str] = None,
+    quality: Optional[str] = None,
+    no_cache: bool = False,
+    backend: GenerationBackend = Depends(get_generation_backend),
+    queue: AdmissionQueue = Depends(get_admission_queue),
+    username: Optional[str] = Depends(get_optional_user)
 ):
     """Создает новую задачу для генерации 3D модели из изображения"""
     
@@ -333,15 +693,12 @@ async def create_meshy_task(
     if file.content_type not in allowed_formats:
         raise HTTPException(status_code=400, detail="Supported formats: JPG, JPEG, PNG")
     
+    # Проверяем размер до кодирования
+    check_upload_sizes([file])
+    
     try:
-        # Читаем файл и конвертируем в base64
-        file_content = await file.read()
-        base64_image = base64.b64encode(file_content).decode('utf-8')
-        data_uri = f"data:{file.content_type};base64,{base64_image}"
-        
-        # Подготавливаем данные для запроса
+        # Подготавливаем данные для запроса (изображение добавляется потоково)
         request_data = {
-            "image_url": data_uri,
             "ai_model": ai_model,
             "topology": topology,
             "target_polycount": target_polycount,
@@ -351,118 +708,227 @@ async def create_meshy_task(
         
         if texture_prompt:
             request_data["texture_prompt"] = texture_prompt
+        # Уровень качества учитывает только локальная генерация
+        if quality:
+            request_data["quality"] = quality
         
-        # Отправляем запрос к Meshy API
-        headers = {
-            "Authorization": f"Bearer {MESHY_API_KEY}",
-            "Content-Type": "application/json"
-        }
-        
-        logger.info(f"Sending request to Meshy API with data: {request_data.keys()}")
+        # Отправляем запрос к Meshy API (или берем готовую задачу из кэша)
+        task_id, reused = await submit_deduplicated(
+            backend, queue, "single-image", request_data, [file], no_cache, submitter_key(request, username)
+        )
+        if reused:
+            return await _reused_task_response(task_id, queue)
         
-        async with aiohttp.ClientSession() as session:
-            async with session.post(f"{MESHY_BASE_URL}/image-to-3d", json=request_data, headers=headers) as response:
-                # Meshy API возвращает 202 (Accepted) для успешных запросов
-                if response.status in [200, 202]:
-                    result = await response.json()
-                    task_id = result.get("result")
-                    
-                    if not task_id:
-                        logger.error(f"No task_id in response: {result}")
-                        raise HTTPException(status_code=500, detail="Invalid response from Meshy API")
-                    
-                    # Инициализируем задачу в хранилище
-                    active_tasks[task_id] = {
-                        "status": "PENDING",
-                        "progress": 0,
-                        "data": {},
-                        "type": "single-image"
-                    }
-                    
-                    # Запускаем фоновую задачу для мониторинга
-                    background_tasks.add_task(check_task_status_and_download, task_id)
-                    
-                    logger.info(f"Task {task_id} created successfully")
-                    
-                    return MeshyTaskResponse(
-                        task_id=task_id,
-                        status="PENDING",
-                        progress=0,
-                        message="Task created successfully. Processing started."
-                    )
-                else:
-                    error_text = await response.text()
-                    logger.error(f"Meshy API error: {response.status} - {error_text}")
-                    raise HTTPException(status_code=400, detail=f"Meshy API error ({response.status}): {error_text}")
+        return _queued_task_response(task_id, queue, "Task queued for generation.")
     
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error creating Meshy task: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
 @router.get("/task-status/{task_id}", response_model=MeshyTaskStatus)
-async def get_task_status(task_id: str, type: str = "image-to-3d"):
-    """Получает статус задачи генерации 3D модели"""
-    
-    if task_id not in active_tasks:
-        raise HTTPException(status_code=404, detail="Task not found")
-    
-    task_info = active_tasks[task_id]
-    task_data = task_info.get("data", {})
+async def get_task_status(
+    request: Request,
+    task_id: str,
+    type: str = "image-to-3d",
+    queue: AdmissionQueue = Depends(get_admission_queue)
+):
+    """Получает статус задачи генерации 3D модели (с поддержкой ETag)"""
     
-    return MeshyTaskStatus(
-        task_id=task_id,
-        status=task_info["status"],
-        progress=task_info["progress"],
-        model_urls=task_data.get("model_urls"),
-        thumbnail_url=task_info.get("local_thumbnail_path"),
-        texture_urls=task_data.get("texture_urls"),
-        created_at=task_data.get("created_at"),
-        finished_at=task_data.get("finished_at")
+    record = await get_task_or_404(task_id)
+    body = build_task_status(record, queue.describe(task_id)).model_dump_json()
+    etag = '"' + hashlib.sha1(body.encode()).hexdigest() + '"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    # Статус не изменился с прошлого запроса — отвечаем без тела
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+
+    return Response(content=body, media_type="application/json", headers=headers)
+
+async def _task_status_stream(task_id: str, queue: AdmissionQueue):
+    """Текущий снимок статуса, затем обновления до завершения задачи"""
+    # При нескольких процессах задачу может опрашивать другой процесс: его
+    # обновления видны только в хранилище, поэтому между событиями сверяемся с ним
+    shared = config.WORKERS > 1
+    heartbeat = config.TASK_EVENTS_STORE_POLL if shared else TASK_EVENTS_HEARTBEAT
+    # Подписываемся до чтения снимка, чтобы не пропустить обновление между ними
+    events = task_events.subscribe(task_id, heartbeat=heartbeat)
+    try:
+        record = await task_store.get(task_id)
+        if record is None:
+            return
+        snapshot = build_task_status(record, queue.describe(task_id))
+        yield snapshot.model_dump_json()
+        if snapshot.status in TERMINAL_STATUSES:
+            return
+        updated_at = record.updated_at
+        idle = 0.0
+        async for payload in events:
+            if payload is None and shared:
+                record = await task_store.get(task_id)
+                if record is None:
+                    return
+                if record.updated_at != updated_at:
+                    updated_at = record.updated_at
+                    payload = build_task_status(record, queue.describe(task_id)).model_dump_json()
+                else:
+                    idle += heartbeat
+                    if idle < TASK_EVENTS_HEARTBEAT:
+                        continue
+            idle = 0.0
+            yield payload
+            if payload is not None and json.loads(payload)["status"] in TERMINAL_STATUSES:
+                return
+    finally:
+        events.close()
+
+@router.get("/task-events/{task_id}")
+async def stream_task_status(task_id: str, queue: AdmissionQueue = Depends(get_admission_queue)):
+    """Server-Sent Events: статус, прогресс и путь к модели по мере обновления"""
+
+    await get_task_or_404(task_id)
+
+    async def event_stream():
+        async for payload in _task_status_stream(task_id, queue):
+            if payload is None:
+                yield ": ping\n\n"
+            else:
+                yield f"event: status\ndata: {payload}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
 
+@router.websocket("/ws/task-status/{task_id}")
+async def task_status_websocket(
+    websocket: WebSocket, task_id: str, queue: AdmissionQueue = Depends(get_admission_queue)
+):
+    """WebSocket-вариант потока статусов задачи"""
+    if await task_store.get(task_id) is None:
+        await websocket.close(code=4404)
+        return
+
+    await websocket.accept()
+    try:
+        async for payload in _task_status_stream(task_id, queue):
+            if payload is None:
+                await websocket.send_json({"type": "ping"})
+            else:
+                await websocket.send_text(payload)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+
 @router.get("/download-model/{task_id}")
 async def download_model(task_id: str):
     """Возвращает ссылку на скачанную модель"""
     
-    if task_id not in active_tasks:
-        raise HTTPException(status_code=404, detail="Task not found")
-    
-    task_info = active_tasks[task_id]
+    record = await get_task_or_404(task_id)
     
-    if task_info["status"] != "SUCCEEDED":
+    if record.status != "SUCCEEDED":
         raise HTTPException(status_code=400, detail="Model is not ready yet")
     
-    local_model_path = task_info.get("local_model_path")
-    local_thumbnail_path = task_info.get("local_thumbnail_path")
-    
-    if not local_model_path:
+    if not record.local_model_path:
         raise HTTPException(status_code=404, detail="Model file not found")
     
     return JSONResponse({
-        "model_url": local_model_path,
-        "thumbnail_url": local_thumbnail_path,
+        "model_url": record.local_model_path,
+        "thumbnail_url": record.local_thumbnail_path,
         "status": "ready"
     })
 
-@router.get("/tasks")
-async def list_tasks():
-    """Возвращает список всех задач"""
+@router.get("/tasks", response_model=MeshyTaskList)
+async def list_tasks(
+    status: Optional[str] = None,
+    type: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500)
+):
+    """Возвращает страницу задач (от новых к старым) с фильтрами по статусу и типу"""
+    try:
+        records, next_cursor = await task_store.list_tasks(status=status, type=type, cursor=cursor, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
     tasks = []
-    for task_id, task_info in active_tasks.items():
+    for record in records:
         tasks.append({
-            "task_id": task_id,
-            "status": task_info["status"],
-            "progress": task_info["progress"],
-            "type": task_info.get("type", "single-image"),
-            "has_model": "local_model_path" in task_info
+            "task_id": record.task_id,
+            "status": record.status,
+            "progress": record.progress,
+            "type": record.type,
+            "has_model": record.local_model_path is not None
         })
-    return {"tasks": tasks}
+    return MeshyTaskList(tasks=tasks, next_cursor=next_cursor)
+
+@router.post("/webhook")
+async def receive_webhook(request: Request, scheduler: PollScheduler = Depends(get_poll_scheduler)):
+    """Событие Meshy об изменении статуса задачи: задача обрабатывается сразу, не дожидаясь опроса"""
+    if not config.MESHY_WEBHOOK_SECRET:
+        raise HTTPException(status_code=404, detail="Webhooks are disabled")
+
+    body = await request.body()
+    signature = request.headers.get(config.MESHY_WEBHOOK_SIGNATURE_HEADER, "")
+    if not verify_signature(config.MESHY_WEBHOOK_SECRET, signature, body, config.MESHY_WEBHOOK_TOLERANCE):
+        WEBHOOK_EVENTS.labels("invalid_signature").inc()
+        raise HTTPException(status_code=401, detail="Invalid signature")
+
+    try:
+        event = json.loads(body)
+        remote_id = str(event["id"])
+        status = str(event["status"])
+    except (ValueError, KeyError, TypeError):
+        WEBHOOK_EVENTS.labels("invalid").inc()
+        raise HTTPException(status_code=400, detail="Invalid event")
+
+    # Meshy повторяет доставку, пока не получит 2xx, и повтор может прийти в другой процесс
+    event_key = f"{remote_id}:{status}:{event.get('progress', 0)}"
+    if not await task_store.remember_event(event_key, config.MESHY_WEBHOOK_DEDUP_TTL):
+        WEBHOOK_EVENTS.labels("duplicate").inc()
+        return {"status": "duplicate"}
+
+    try:
+        # Задачи до появления очереди хранятся под id источника
+        record = await task_store.find_by_remote_id(remote_id) or await task_store.get(remote_id)
+        if record is None or record.finished:
+            result = "ignored"
+        elif scheduler.poll_now(record.task_id, event):
+            result = "accepted"
+        else:
+            # Задачу опрашивает другой процесс: событие подхватит его ближайший опрос
+            await task_store.update_extra(record.task_id, webhook=event)
+            result = "deferred"
+    except Exception:
+        # Meshy повторит доставку — повтор не должен отсеяться как дубликат
+        await task_store.forget_event(event_key)
+        raise
+
+    logger.info(f"Webhook for task {remote_id} ({status}): {result}")
+    WEBHOOK_EVENTS.labels(result).inc()
+    return {"status": result}
 
 @router.delete("/task/{task_id}")
-async def delete_task(task_id: str):
-    """Удаляет задачу из памяти"""
-    if task_id in active_tasks:
-        del active_tasks[task_id]
+async def delete_task(
+    task_id: str,
+    scheduler: PollScheduler = Depends(get_poll_scheduler),
+    queue: AdmissionQueue = Depends(get_admission_queue)
+):
+    """Удаляет задачу из хранилища вместе с ее файлами"""
+    if await task_store.delete(task_id):
+        if queue.cancel(task_id):
+            await _remove_spool(task_id)
+        scheduler.cancel(task_id)
+        removed = await model_storage.remove_task(task_id)
+        if removed:
+            await forget_task_files(task_id, removed)
+            try:
+                await thumbnail_stage.refresh()
+            except Exception as e:
+                logger.error(f"Error refreshing gallery thumbnails: {str(e)}")
         return {"message": f"Task {task_id} deleted"}
     else:
-        raise HTTPException(status_code=404, detail="Task not found")
\ No newline at end of file
+        raise HTTPException(status_code=404, detail="Task not found")
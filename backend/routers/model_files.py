@@ -0,0 +1,117 @@
+import asyncio
+import mimetypes
+import os
+import stat as stat_module
+from email.utils import formatdate
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+
+from backend import config
+from backend.services.lod import lod_filename
+from backend.services.model_serving import (
+    ENCODINGS,
+    ModelFileResponse,
+    cache_control_for,
+    etag_cache,
+    parse_accept_encoding,
+    parse_range,
+)
+from backend.services.model_storage import UNINDEXED_SUFFIXES, model_storage
+
+router = APIRouter()
+
+def _stat(path: str):
+    try:
+        result = os.stat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    return result if stat_module.S_ISREG(result.st_mode) else None
+
+def _etag_matches(header: str, etags: list[str]) -> str:
+    """Возвращает совпавший ETag из If-None-Match (или пустую строку)"""
+    candidates = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    if "*" in candidates:
+        return etags[0]
+    for etag in etags:
+        if etag in candidates:
+            return etag
+    return ""
+
+@router.api_route("/{filename}", methods=["GET", "HEAD"])
+async def serve_model_file(filename: str, request: Request, lod: Optional[int] = Query(None, ge=0, le=9)):
+    """Раздает GLB, превью и другие файлы моделей; ?lod=N выбирает уровень детализации"""
+    if "/" in filename or "\\" in filename or filename.startswith("."):
+        raise HTTPException(status_code=404, detail="Not Found")
+    # Недокачанные, промежуточные файлы и оригиналы до оптимизации не раздаем
+    if filename.endswith(UNINDEXED_SUFFIXES):
+        raise HTTPException(status_code=404, detail="Not Found")
+
+    cache_control = cache_control_for(filename)
+    path = model_storage.path(filename)
+    if lod and filename.endswith(".glb"):
+        # Уровня еще нет — отдаем ближайший более детальный, но без долгого кеширования
+        for level in range(lod, -1, -1):
+            candidate = model_storage.path(lod_filename(filename, level))
+            file_stat = await asyncio.to_thread(_stat, candidate)
+            if file_stat is not None:
+                path = candidate
+                break
+        if level != lod:
+            cache_control = "no-cache"
+    else:
+        file_stat = await asyncio.to_thread(_stat, path)
+    if file_stat is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+    # Время обращения — для вытеснения давно не запрашивавшихся моделей по квоте
+    model_storage.touch(filename)
+
+    etag = await etag_cache.get(path, file_stat)
+    content_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    send_body = request.method != "HEAD"
+    headers = {
+        "ETag": etag,
+        "Cache-Control": cache_control,
+        "Last-Modified": formatdate(file_stat.st_mtime, usegmt=True),
+        "Accept-Ranges": "bytes",
+        "Vary": "Accept-Encoding",
+    }
+
+    # Сжатые варианты имеют собственные ETag
+    variant_etags = {encoding: f'{etag[:-1]}-{encoding}"' for encoding, _ in ENCODINGS}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        matched = _etag_matches(if_none_match, [etag, *variant_etags.values()])
+        if matched:
+            headers["ETag"] = matched
+            return Response(status_code=304, headers=headers)
+
+    # Диапазоны отдаем только из несжатого файла
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range == etag):
+        ranges = parse_range(range_header, file_stat.st_size, config.MODELS_MAX_RANGES)
+        if ranges == []:
+            headers["Content-Range"] = f"bytes */{file_stat.st_size}"
+            return Response(status_code=416, headers=headers)
+        if ranges:
+            return ModelFileResponse(
+                path, file_stat.st_size, headers, status_code=206, ranges=ranges,
+                content_type=content_type, send_body=send_body
+            )
+
+    # Полный файл: выбираем заранее сжатый вариант по Accept-Encoding
+    accepted = parse_accept_encoding(request.headers.get("accept-encoding", ""))
+    for encoding, suffix in ENCODINGS:
+        if accepted.get(encoding, 0) <= 0:
+            continue
+        variant_stat = await asyncio.to_thread(_stat, path + suffix)
+        if variant_stat is None or variant_stat.st_mtime_ns < file_stat.st_mtime_ns:
+            continue
+        headers["Content-Encoding"] = encoding
+        headers["ETag"] = variant_etags[encoding]
+        return ModelFileResponse(
+            path + suffix, variant_stat.st_size, headers, content_type=content_type, send_body=send_body
+        )
+
+    return ModelFileResponse(path, file_stat.st_size, headers, content_type=content_type, send_body=send_body)
@@ -0,0 +1,58 @@
+import hashlib
+
+from fastapi import APIRouter, HTTPException, Query, Request, Response
+from pydantic import BaseModel
+from typing import Optional
+
+from backend.services.model_catalog import model_catalog
+
+router = APIRouter()
+
+class CatalogModel(BaseModel):
+    filename: str
+    task_id: Optional[str] = None
+    size: int
+    content_hash: str
+    meshes: Optional[int] = None
+    primitives: Optional[int] = None
+    vertices: Optional[int] = None
+    triangles: Optional[int] = None
+    bbox_min: Optional[list[float]] = None
+    bbox_max: Optional[list[float]] = None
+    created_at: float
+    model_url: str
+    thumbnail_url: Optional[str] = None
+    thumbnails: Optional[dict] = None
+    sprite: Optional[dict] = None
+
+class CatalogPage(BaseModel):
+    items: list[CatalogModel]
+    total: int
+    limit: int
+    offset: int
+
+@router.get("", response_model=CatalogPage)
+async def list_models(
+    request: Request,
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+    sort: str = "created_at",
+    order: str = Query("desc", pattern="^(asc|desc)$")
+):
+    """Каталог сохраненных моделей с метаданными GLB (с поддержкой ETag)"""
+
+    # ETag зависит от версии каталога и параметров страницы — проверяем его до запроса к индексу
+    query_hash = hashlib.sha1(f"{limit}:{offset}:{sort}:{order}".encode()).hexdigest()[:12]
+    # Версию читаем до страницы: изменение между ними даст новые данные под старым ETag, а не наоборот
+    etag = f'"catalog-{await model_catalog.version()}-{query_hash}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+
+    try:
+        items, total = await model_catalog.page(limit=limit, offset=offset, sort=sort, descending=order == "desc")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    page = CatalogPage(items=items, total=total, limit=limit, offset=offset)
+    return Response(content=page.model_dump_json(), media_type="application/json", headers=headers)
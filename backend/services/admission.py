@@ -0,0 +1,296 @@
+import asyncio
+import bisect
+import itertools
+import logging
+import math
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
+
+from fastapi import HTTPException
+from starlette.requests import HTTPConnection
+
+from backend import config
+from backend.services.generation import SubmissionError
+from backend.services.rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Очередь отправки задач в источник генерации. Задачи ждут со статусом QUEUED
+# и уходят в Meshy с общей и пользовательской частотой, не больше заданного
+# числа одновременно генерируемых задач; 429 с Retry-After приостанавливает очередь
+
+# Полосы в порядке приоритета: интерактивные запросы обгоняют пакетные.
+# Пакетная полоса не подчиняется пользовательским лимитам, но занимает
+# не больше своей доли одновременных задач, оставляя место интерактивным
+LANES = ("interactive", "batch")
+
+
+@dataclass
+class Submission:
+    task_id: str
+    kind: str
+    user: str
+    lane: str = "interactive"
+    attempts: int = 0
+    seq: int = 0
+
+
+SubmitFn = Callable[[Submission], Awaitable[None]]
+FailFn = Callable[[Submission, str], Awaitable[None]]
+ChangeFn = Callable[[Submission, dict], None]
+
+
+class AdmissionQueue:
+    """Приоритетная очередь с токен-бакетами и лимитом одновременных задач"""
+
+    def __init__(
+        self,
+        submit_fn: SubmitFn,
+        on_failure: FailFn,
+        on_change: Optional[ChangeFn] = None,
+        rate_per_minute: float = config.SUBMIT_RATE_PER_MINUTE,
+        burst: int = config.SUBMIT_BURST,
+        user_rate_per_minute: float = config.SUBMIT_USER_RATE_PER_MINUTE,
+        user_burst: int = config.SUBMIT_USER_BURST,
+        max_in_flight: int = config.SUBMIT_MAX_IN_FLIGHT,
+        max_in_flight_per_user: int = config.SUBMIT_MAX_IN_FLIGHT_PER_USER,
+        max_in_flight_batch: int = config.SUBMIT_MAX_IN_FLIGHT_BATCH,
+        max_queued: int = config.SUBMIT_MAX_QUEUED,
+        max_queued_per_user: int = config.SUBMIT_MAX_QUEUED_PER_USER,
+        max_attempts: int = config.SUBMIT_MAX_ATTEMPTS,
+        retry_delay: float = config.SUBMIT_RETRY_DELAY,
+    ):
+        self._submit_fn = submit_fn
+        self._on_failure = on_failure
+        self._on_change = on_change
+        self._bucket = TokenBucket(rate=rate_per_minute / 60, capacity=max(1, burst))
+        self._user_rate = user_rate_per_minute / 60
+        self._user_burst = max(1, user_burst)
+        self._user_buckets: dict[str, TokenBucket] = {}
+        self.max_in_flight = max_in_flight
+        self.max_in_flight_per_user = max_in_flight_per_user
+        self.max_in_flight_batch = max_in_flight_batch
+        self.max_queued = max_queued
+        self.max_queued_per_user = max_queued_per_user
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._order: list[tuple[int, int, str]] = []  # (полоса, порядковый номер, task_id)
+        self._queued: dict[str, Submission] = {}
+        self._active: dict[str, tuple[str, str]] = {}  # task_id → (пользователь, полоса): отправлены и еще не завершены
+        self._counter = itertools.count(1)
+        self._blocked_until = 0.0
+        self._wakeup = asyncio.Event()
+        self._runner: Optional[asyncio.Task] = None
+        self._inflight: set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self._queued)
+
+    def task_ids(self) -> list[str]:
+        """Задачи, за которые отвечает очередь: ждущие отправки и отправляемые"""
+        return [*self._queued, *self._active]
+
+    def check(self, user: str, lane: str = "interactive", count: int = 1) -> None:
+        """Отказ сразу, если в очереди нет места для count задач (до сохранения загруженных файлов)"""
+        if len(self._queued) + count > self.max_queued:
+            raise HTTPException(
+                status_code=503,
+                detail="Generation queue is full, try again later",
+                headers={"Retry-After": str(math.ceil(self._estimated_wait(len(self._queued))))}
+            )
+        if lane != "interactive":
+            return
+        queued = sum(1 for submission in self._queued.values() if submission.user == user and submission.lane == lane)
+        if queued + count > self.max_queued_per_user:
+            raise HTTPException(
+                status_code=429,
+                detail=f"Too many queued tasks: at most {self.max_queued_per_user} per user",
+                headers={"Retry-After": str(math.ceil(1 / self._user_rate))}
+            )
+
+    def enqueue(self, submission: Submission) -> None:
+        if submission.lane not in LANES:
+            raise ValueError(f"Unknown lane: {submission.lane}")
+        if not submission.seq:
+            submission.seq = next(self._counter)
+        self._queued[submission.task_id] = submission
+        bisect.insort(self._order, self._key(submission))
+        self._wakeup.set()
+
+    def track(self, task_id: str, user: str, lane: str = "interactive") -> None:
+        """Учитывает уже отправленную задачу (после рестарта)"""
+        self._active[task_id] = (user, lane)
+
+    def release(self, task_id: str) -> None:
+        """Задача завершилась — освобождаем место для следующей"""
+        if self._active.pop(task_id, None) is not None:
+            self._wakeup.set()
+
+    def cancel(self, task_id: str) -> bool:
+        submission = self._queued.pop(task_id, None)
+        if submission is None:
+            return False
+        self._order.remove(self._key(submission))
+        self._notify()
+        return True
+
+    def describe(self, task_id: str) -> Optional[dict]:
+        """Позиция задачи в очереди и оценка ожидания по лимиту отправки"""
+        submission = self._queued.get(task_id)
+        if submission is None:
+            return None
+        position = bisect.bisect_left(self._order, self._key(submission)) + 1
+        return {
+            "position": position,
+            "length": len(self._queued),
+            "lane": submission.lane,
+            "estimated_wait": round(self._estimated_wait(position)),
+        }
+
+    def stats(self) -> dict:
+        return {
+            "queued": len(self._queued),
+            "in_flight": len(self._active),
+            "paused_for": round(max(0.0, self._blocked_until - time.monotonic()), 1),
+        }
+
+    def start(self) -> None:
+        if self._runner is None:
+            self._runner = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+            self._runner = None
+        for task in list(self._inflight):
+            task.cancel()
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+
+    @staticmethod
+    def _key(submission: Submission) -> tuple[int, int, str]:
+        return LANES.index(submission.lane), submission.seq, submission.task_id
+
+    def _estimated_wait(self, position: int) -> float:
+        paused = max(0.0, self._blocked_until - time.monotonic())
+        return paused + max(0.0, position - self._bucket.available()) / self._bucket.rate
+
+    def _user_bucket(self, user: str) -> TokenBucket:
+        bucket = self._user_buckets.get(user)
+        if bucket is None:
+            bucket = self._user_buckets[user] = TokenBucket(rate=self._user_rate, capacity=self._user_burst)
+        return bucket
+
+    def _prune_user_buckets(self) -> None:
+        """Полный бакет не отличается от нового — бакеты неактивных пользователей не храним"""
+        for user in [user for user, bucket in self._user_buckets.items() if bucket.available() >= bucket.capacity]:
+            del self._user_buckets[user]
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            delay = self._dispatch()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def _dispatch(self) -> Optional[float]:
+        """Отправляет все задачи, которые позволяют лимиты; возвращает паузу до следующей попытки"""
+        now = time.monotonic()
+        if now < self._blocked_until:
+            return self._blocked_until - now
+        if not self._order:
+            self._prune_user_buckets()
+            return None
+
+        delay = None
+        dispatched = False
+        per_user = Counter(user for user, lane in self._active.values() if lane == "interactive")
+        batch_active = sum(1 for _, lane in self._active.values() if lane == "batch")
+        for key in list(self._order):
+            if len(self._active) >= self.max_in_flight:
+                break  # ждем release()
+            submission = self._queued[key[2]]
+            user_bucket = None
+            if submission.lane == "batch":
+                if batch_active >= self.max_in_flight_batch:
+                    break  # дальше в очереди только пакетные задачи
+            else:
+                if per_user[submission.user] >= self.max_in_flight_per_user:
+                    continue
+                user_bucket = self._user_bucket(submission.user)
+                user_wait = user_bucket.wait_time()
+                if user_wait > 0:
+                    # Пользователь исчерпал свой лимит — пропускаем вперед задачи других
+                    delay = user_wait if delay is None else min(delay, user_wait)
+                    continue
+            wait = self._bucket.take()
+            if wait > 0:
+                delay = wait if delay is None else min(delay, wait)
+                break
+            if user_bucket is not None:
+                user_bucket.take()
+
+            self._order.remove(key)
+            del self._queued[submission.task_id]
+            self._active[submission.task_id] = (submission.user, submission.lane)
+            if submission.lane == "batch":
+                batch_active += 1
+            else:
+                per_user[submission.user] += 1
+            dispatched = True
+            self._spawn(self._submit(submission))
+
+        if dispatched:
+            self._notify()
+        return delay
+
+    def _notify(self) -> None:
+        """Очередь сдвинулась — сообщаем новые позиции"""
+        if self._on_change is None:
+            return
+        for key in self._order:
+            submission = self._queued[key[2]]
+            self._on_change(submission, self.describe(submission.task_id))
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    async def _submit(self, submission: Submission) -> None:
+        try:
+            await self._submit_fn(submission)
+        except SubmissionError as e:
+            self._active.pop(submission.task_id, None)
+            submission.attempts += 1
+            if e.retryable and submission.attempts < self.max_attempts:
+                delay = e.retry_after if e.retry_after is not None else self.retry_delay * 2 ** (submission.attempts - 1)
+                # Лимит источника общий для всех: приостанавливаем всю очередь, задача остается на своем месте
+                self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+                logger.warning(
+                    f"Submission of {submission.task_id} rejected ({str(e)}), "
+                    f"retrying in {delay:.1f}s (attempt {submission.attempts})"
+                )
+                self.enqueue(submission)
+            else:
+                logger.error(f"Submission of {submission.task_id} failed: {str(e)}")
+                await self._on_failure(submission, str(e))
+        except Exception as e:
+            self._active.pop(submission.task_id, None)
+            logger.error(f"Submission of {submission.task_id} failed: {str(e)}")
+            await self._on_failure(submission, str(e))
+        finally:
+            self._wakeup.set()
+
+
+def get_admission_queue(connection: HTTPConnection) -> AdmissionQueue:
+    """Зависимость FastAPI (HTTP и WebSocket): очередь отправки задач, созданная в lifespan приложения"""
+    return connection.app.state.admission_queue
@@ -0,0 +1,253 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+
+import aiofiles
+import aiohttp
+
+from backend import config
+from backend.services.metrics import DOWNLOAD_BYTES, DOWNLOAD_THROUGHPUT
+from backend.services.model_storage import shard_path
+
+logger = logging.getLogger(__name__)
+
+# Скачивание файлов завершенной задачи: все ассеты параллельно, во временный
+# файл с атомарным переименованием (частичный файл никогда не раздается),
+# докачка через Range после обрыва, проверка размера и sha256
+
+PARTIAL_SUFFIX = ".part"
+
+
+class DownloadError(Exception):
+    def __init__(self, message: str, retryable: bool = True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+@dataclass
+class Asset:
+    url: str
+    filename: str
+    kind: str             # model / texture / thumbnail
+    required: bool = False
+
+
+def _extension(url: str, default: str) -> str:
+    ext = os.path.splitext(urlparse(url).path)[1].lower()
+    return ext if ext and len(ext) <= 6 else default
+
+
+def plan_task_assets(task_id: str, prefix: str, data: dict) -> list[Asset]:
+    """Список файлов задачи: форматы модели, текстуры и превью"""
+    assets = []
+    model_urls = data.get("model_urls") or {}
+    for fmt in config.DOWNLOAD_MODEL_FORMATS:
+        if model_urls.get(fmt):
+            assets.append(Asset(model_urls[fmt], f"{prefix}{task_id}.{fmt}", "model", required=fmt == "glb"))
+    if config.DOWNLOAD_TEXTURES:
+        for index, textures in enumerate(data.get("texture_urls") or []):
+            for name, url in textures.items():
+                if url:
+                    filename = f"{prefix}{task_id}_texture_{index}_{name}{_extension(url, '.png')}"
+                    assets.append(Asset(url, filename, "texture"))
+    if data.get("thumbnail_url"):
+        assets.append(Asset(data["thumbnail_url"], f"{prefix}{task_id}_thumbnail.png", "thumbnail"))
+    return assets
+
+
+class _Progress:
+    """Суммарный прогресс скачивания с ограничением частоты уведомлений"""
+
+    def __init__(self, count: int, callback: Optional[Callable[[dict], None]], interval: float = 0.5):
+        self.sizes: dict[str, int] = {}
+        self.totals: dict[str, int] = {}
+        self.count = count
+        self.done = 0
+        self.callback = callback
+        self.interval = interval
+        self._last = 0.0
+
+    def snapshot(self) -> dict:
+        return {
+            "bytes": sum(self.sizes.values()),
+            "total": sum(self.totals.values()) or None,
+            "files": self.done,
+            "files_total": self.count,
+        }
+
+    def update(self, filename: str, size: int, total: Optional[int] = None, force: bool = False) -> None:
+        self.sizes[filename] = size
+        if total:
+            self.totals[filename] = total
+        now = time.monotonic()
+        if self.callback is not None and (force or now - self._last >= self.interval):
+            self._last = now
+            self.callback(self.snapshot())
+
+
+async def _hash_existing(path: str, chunk_size: int):
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(path, "rb") as f:
+            while chunk := await f.read(chunk_size):
+                digest.update(chunk)
+                size += len(chunk)
+    except FileNotFoundError:
+        pass
+    return digest, size
+
+
+async def _fetch_once(session, asset: Asset, part_path: str, validators: dict, progress: _Progress,
+                      chunk_size: int) -> tuple[str, int]:
+    """Одна попытка скачивания с продолжением с уже полученного байта.
+
+    validators общий для всех попыток: ETag запоминается сразу по приходу заголовков,
+    чтобы докачка после обрыва на середине шла с If-Range.
+    """
+    digest, offset = await _hash_existing(part_path, chunk_size)
+    headers = {}
+    if offset:
+        headers["Range"] = f"bytes={offset}-"
+        if validators.get("etag"):
+            headers["If-Range"] = validators["etag"]
+
+    async with session.get(asset.url, headers=headers) as response:
+        if response.status == 416 and offset:
+            # Файл уже скачан целиком — сверяем с полным размером из Content-Range
+            total = response.headers.get("Content-Range", "").rpartition("/")[2]
+            if total.isdigit() and int(total) == offset:
+                return digest.hexdigest(), offset
+            raise DownloadError(f"Range not satisfiable for {asset.filename}")
+        if response.status not in (200, 206):
+            # Ошибки клиента (кроме таймаута и лимита) повтором не исправить
+            retryable = response.status >= 500 or response.status in (408, 429)
+            raise DownloadError(f"Failed to download {asset.filename}: HTTP {response.status}", retryable)
+
+        validators["etag"] = response.headers.get("ETag") or validators.get("etag")
+        if response.status == 200 and offset:
+            # Сервер не поддерживает докачку (или файл изменился) — начинаем сначала
+            digest, offset = hashlib.sha256(), 0
+        expected = None
+        if response.content_length is not None and "Content-Encoding" not in response.headers:
+            expected = offset + response.content_length
+
+        size = offset
+        async with aiofiles.open(part_path, "ab" if offset else "wb") as f:
+            async for chunk in response.content.iter_chunked(chunk_size):
+                await f.write(chunk)
+                digest.update(chunk)
+                size += len(chunk)
+                progress.update(asset.filename, size, expected)
+
+    if expected is not None and size != expected:
+        raise DownloadError(f"Incomplete download of {asset.filename}: {size} of {expected} bytes")
+    return digest.hexdigest(), size
+
+
+def _local_source(url_path: str, local_root: Optional[str]) -> str:
+    """Путь файла по file://-ссылке; принимаются только файлы из каталога заданий локальной генерации.
+
+    Ссылки из ответов Meshy и тел вебхуков иначе позволили бы скопировать в MODELS_DIR
+    любой файл сервера.
+    """
+    if local_root is None:
+        raise DownloadError("file:// URLs are accepted only from the local generation backend", retryable=False)
+    source = os.path.realpath(url2pathname(url_path))
+    root = os.path.realpath(local_root)
+    if os.path.commonpath([source, root]) != root:
+        raise DownloadError(f"file:// URL outside of {root}", retryable=False)
+    return source
+
+
+def _copy_local(source: str, part_path: str, chunk_size: int) -> tuple[str, int]:
+    """file:// — результат локальной генерации: копируем с тем же хэшированием"""
+    digest = hashlib.sha256()
+    size = 0
+    with open(source, "rb") as src, open(part_path, "wb") as dst:
+        while chunk := src.read(chunk_size):
+            dst.write(chunk)
+            digest.update(chunk)
+            size += len(chunk)
+    return digest.hexdigest(), size
+
+
+async def _download_remote(session: aiohttp.ClientSession, asset: Asset, part_path: str, progress: _Progress,
+                           chunk_size: int, retries: int) -> tuple[str, int]:
+    validators = {}
+    for attempt in range(retries + 1):
+        try:
+            return await _fetch_once(session, asset, part_path, validators, progress, chunk_size)
+        except (aiohttp.ClientError, asyncio.TimeoutError, DownloadError) as e:
+            if attempt == retries or not getattr(e, "retryable", True):
+                raise DownloadError(str(e), retryable=False) from e
+            delay = config.DOWNLOAD_RETRY_DELAY * 2 ** attempt
+            logger.warning(f"Retrying download of {asset.filename} in {delay:.1f}s: {str(e)}")
+            await asyncio.sleep(delay)
+
+
+async def download_asset(session: aiohttp.ClientSession, asset: Asset, models_dir: str, progress: _Progress,
+                         chunk_size: int = config.DOWNLOAD_CHUNK_SIZE, retries: int = config.DOWNLOAD_RETRIES,
+                         local_root: Optional[str] = None) -> dict:
+    """Скачивает один файл с повторами; на место кладется только полностью проверенный файл.
+
+    local_root — каталог, из которого разрешено копировать файлы по file://-ссылкам.
+    """
+    final_path = shard_path(models_dir, asset.filename)
+    part_path = final_path + PARTIAL_SUFFIX
+    parsed = urlparse(asset.url)
+    source = _local_source(parsed.path, local_root) if parsed.scheme == "file" else None
+    await asyncio.to_thread(os.makedirs, os.path.dirname(final_path), exist_ok=True)
+    if source is not None:
+        try:
+            sha256, size = await asyncio.to_thread(_copy_local, source, part_path, chunk_size)
+        except OSError as e:
+            raise DownloadError(f"{asset.filename}: {str(e)}", retryable=False) from e
+    else:
+        started = time.perf_counter()
+        sha256, size = await _download_remote(session, asset, part_path, progress, chunk_size, retries)
+        DOWNLOAD_BYTES.labels(asset.kind).inc(size)
+        DOWNLOAD_THROUGHPUT.labels(asset.kind).observe(size / max(time.perf_counter() - started, 1e-6))
+
+    await asyncio.to_thread(os.replace, part_path, final_path)
+    progress.done += 1
+    progress.update(asset.filename, size, size, force=True)
+    return {
+        "filename": asset.filename,
+        "kind": asset.kind,
+        "url": f"/models/{asset.filename}",
+        "size": size,
+        "sha256": sha256,
+    }
+
+
+async def download_assets(session: aiohttp.ClientSession, assets: list[Asset], models_dir: str,
+                          on_progress: Optional[Callable[[dict], None]] = None,
+                          local_root: Optional[str] = None) -> list[dict]:
+    """Параллельно скачивает ассеты; ошибка обязательного файла пробрасывается, остальные записываются"""
+    progress = _Progress(len(assets), on_progress)
+    semaphore = asyncio.Semaphore(config.DOWNLOAD_CONCURRENCY)
+
+    async def run(asset: Asset) -> dict:
+        async with semaphore:
+            try:
+                return await download_asset(session, asset, models_dir, progress, local_root=local_root)
+            except DownloadError as e:
+                if asset.required:
+                    raise
+                logger.error(f"Error downloading optional asset {asset.filename}: {str(e)}")
+                return {"filename": asset.filename, "kind": asset.kind, "error": str(e)}
+
+    tasks = [asyncio.create_task(run(asset)) for asset in assets]
+    try:
+        return list(await asyncio.gather(*tasks))
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
@@ -0,0 +1,195 @@
+import asyncio
+import json
+import shutil
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+from backend import config
+
+# Пакеты генерации: один запрос — много задач (например, все кости отдела).
+# Состав пакета и исходные изображения элементов хранятся отдельно от задач,
+# чтобы неудавшийся элемент можно было перезапустить без повторной загрузки
+
+
+@dataclass
+class BatchItem:
+    index: int
+    kind: str
+    params: dict
+    files: list[dict]  # path, filename, content_type
+    label: Optional[str] = None
+    task_id: Optional[str] = None
+    attempts: int = 0
+    error: Optional[str] = None   # почему элемент не удалось отправить
+    reused: bool = False          # задачу отдала дедупликация: она создана другим запросом
+
+
+@dataclass
+class Batch:
+    batch_id: str
+    owner: str
+    name: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    canceled: bool = False
+    items: list[BatchItem] = field(default_factory=list)
+
+
+class BatchStore:
+    """Пакеты и их элементы в SQLite; изображения элементов — в files_dir/<batch_id>"""
+
+    def __init__(self, db_path: str, files_dir: str):
+        self.db_path = db_path
+        self.files_dir = Path(files_dir)
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def open(self) -> None:
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.files_dir.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS batches (
+                batch_id TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                name TEXT,
+                created_at REAL NOT NULL,
+                canceled INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS batch_items (
+                batch_id TEXT NOT NULL,
+                item_index INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                label TEXT,
+                params TEXT NOT NULL,
+                files TEXT NOT NULL,
+                task_id TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                reused INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (batch_id, item_index)
+            )
+            """
+        )
+        existing = {row[1] for row in self._conn.execute("PRAGMA table_info(batch_items)")}
+        for column, definition in (("error", "TEXT"), ("reused", "INTEGER NOT NULL DEFAULT 0")):
+            if column not in existing:
+                self._conn.execute(f"ALTER TABLE batch_items ADD COLUMN {column} {definition}")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS batches_created_at ON batches (created_at)")
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def batch_dir(self, batch_id: str) -> Path:
+        return self.files_dir / batch_id
+
+    def _execute(self, sql: str, params: tuple = ()) -> list:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _insert(self, batch: Batch) -> None:
+        with self._lock:
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.execute(
+                    "INSERT INTO batches (batch_id, owner, name, created_at, canceled) VALUES (?, ?, ?, ?, ?)",
+                    (batch.batch_id, batch.owner, batch.name, batch.created_at, int(batch.canceled)),
+                )
+                self._conn.executemany(
+                    "INSERT INTO batch_items (batch_id, item_index, kind, label, params, files, task_id, attempts, "
+                    "error, reused) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    [
+                        (batch.batch_id, item.index, item.kind, item.label, json.dumps(item.params),
+                         json.dumps(item.files), item.task_id, item.attempts, item.error, int(item.reused))
+                        for item in batch.items
+                    ],
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _get(self, batch_id: str) -> Optional[Batch]:
+        rows = self._execute(
+            "SELECT batch_id, owner, name, created_at, canceled FROM batches WHERE batch_id = ?", (batch_id,)
+        )
+        if not rows:
+            return None
+        batch_id, owner, name, created_at, canceled = rows[0]
+        batch = Batch(batch_id=batch_id, owner=owner, name=name, created_at=created_at, canceled=bool(canceled))
+        for index, kind, label, params, files, task_id, attempts, error, reused in self._execute(
+            "SELECT item_index, kind, label, params, files, task_id, attempts, error, reused FROM batch_items "
+            "WHERE batch_id = ? ORDER BY item_index",
+            (batch_id,),
+        ):
+            batch.items.append(BatchItem(
+                index=index, kind=kind, label=label, params=json.loads(params), files=json.loads(files),
+                task_id=task_id, attempts=attempts, error=error, reused=bool(reused),
+            ))
+        return batch
+
+    async def create(self, batch: Batch) -> None:
+        await asyncio.to_thread(self._insert, batch)
+
+    async def get(self, batch_id: str) -> Optional[Batch]:
+        return await asyncio.to_thread(self._get, batch_id)
+
+    async def list_batches(self, limit: int = 50) -> list[dict]:
+        rows = await asyncio.to_thread(
+            self._execute,
+            "SELECT b.batch_id, b.owner, b.name, b.created_at, b.canceled, COUNT(i.item_index) "
+            "FROM batches b LEFT JOIN batch_items i ON i.batch_id = b.batch_id "
+            "GROUP BY b.batch_id ORDER BY b.created_at DESC LIMIT ?",
+            (limit,),
+        )
+        return [
+            {"batch_id": batch_id, "owner": owner, "name": name, "created_at": created_at,
+             "canceled": bool(canceled), "items": items}
+            for batch_id, owner, name, created_at, canceled, items in rows
+        ]
+
+    async def set_item_task(self, batch_id: str, index: int, task_id: str, attempts: int, reused: bool) -> None:
+        await asyncio.to_thread(
+            self._execute,
+            "UPDATE batch_items SET task_id = ?, attempts = ?, error = NULL, reused = ? "
+            "WHERE batch_id = ? AND item_index = ?",
+            (task_id, attempts, int(reused), batch_id, index),
+        )
+
+    async def set_item_error(self, batch_id: str, index: int, error: str, attempts: int) -> None:
+        """Элемент не удалось отправить: задачи у него нет, его можно перезапустить"""
+        await asyncio.to_thread(
+            self._execute,
+            "UPDATE batch_items SET task_id = NULL, attempts = ?, error = ?, reused = 0 "
+            "WHERE batch_id = ? AND item_index = ?",
+            (attempts, error, batch_id, index),
+        )
+
+    async def set_canceled(self, batch_id: str, canceled: bool) -> None:
+        await asyncio.to_thread(
+            self._execute, "UPDATE batches SET canceled = ? WHERE batch_id = ?", (int(canceled), batch_id)
+        )
+
+    async def delete(self, batch_id: str) -> bool:
+        def delete() -> int:
+            with self._lock:
+                self._conn.execute("DELETE FROM batch_items WHERE batch_id = ?", (batch_id,))
+                return self._conn.execute("DELETE FROM batches WHERE batch_id = ?", (batch_id,)).rowcount
+
+        deleted = await asyncio.to_thread(delete)
+        await asyncio.to_thread(shutil.rmtree, self.batch_dir(batch_id), True)
+        return deleted > 0
+
+
+batch_store = BatchStore(config.BATCH_DB_PATH, config.BATCH_FILES_DIR)
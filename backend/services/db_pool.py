@@ -0,0 +1,121 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Optional
+
+import asyncpg
+from fastapi import HTTPException, Request
+
+from backend import config
+from backend.services.metrics import DB_OPERATION_DURATION
+
+logger = logging.getLogger(__name__)
+
+# Пул соединений PostgreSQL на всё приложение вместо asyncpg.connect на каждый
+# запрос. asyncpg кэширует подготовленные запросы на каждом соединении пула,
+# поэтому повторяющиеся запросы авторизации не разбираются сервером заново
+
+RECONNECT_INTERVAL = 5.0  # пауза между попытками поднять пул, если база недоступна
+
+
+class DatabasePool:
+    """Обертка над asyncpg.Pool с замером ожидания свободного соединения"""
+
+    def __init__(self, dsn: str):
+        self.dsn = dsn
+        self._pool: Optional[asyncpg.Pool] = None
+        self._retry_at = 0.0
+        self.acquired = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.timeouts = 0
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.dsn)
+
+    async def open(self) -> None:
+        if not self.configured:
+            logger.warning("DATABASE_URL is not set, authentication is disabled")
+            return
+        # Соединения создаются лениво: недоступная база не мешает запуску остального API
+        self._pool = asyncpg.create_pool(
+            self.dsn,
+            min_size=config.DB_POOL_MIN_SIZE,
+            max_size=config.DB_POOL_MAX_SIZE,
+            command_timeout=config.DB_COMMAND_TIMEOUT,
+            statement_cache_size=config.DB_STATEMENT_CACHE_SIZE,
+            max_inactive_connection_lifetime=config.DB_MAX_INACTIVE_LIFETIME,
+        )
+        try:
+            await self._pool
+        except (OSError, asyncpg.PostgresError) as e:
+            logger.error(f"Database pool initialization failed: {str(e)}")
+            self._pool = None
+            self._retry_at = time.monotonic() + RECONNECT_INTERVAL
+
+    async def close(self) -> None:
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+    async def _ensure_pool(self) -> asyncpg.Pool:
+        # База могла быть недоступна при старте — пробуем подключиться снова
+        if self._pool is None and self.configured and time.monotonic() >= self._retry_at:
+            started = time.perf_counter()
+            await self.open()
+            DB_OPERATION_DURATION.labels("connect").observe(time.perf_counter() - started)
+        if self._pool is None:
+            raise HTTPException(status_code=503, detail="Database is not available")
+        return self._pool
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[asyncpg.Connection]:
+        pool = await self._ensure_pool()
+        started = time.perf_counter()
+        try:
+            conn = await pool.acquire(timeout=config.DB_POOL_ACQUIRE_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            logger.warning(f"Timed out waiting {config.DB_POOL_ACQUIRE_TIMEOUT}s for a database connection")
+            raise HTTPException(status_code=503, detail="Database is busy, try again later")
+        waited = time.perf_counter() - started
+        DB_OPERATION_DURATION.labels("acquire").observe(waited)
+        self.acquired += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+        try:
+            yield conn
+        finally:
+            await pool.release(conn)
+
+    def stats(self) -> dict:
+        pool = self._pool
+        return {
+            "size": pool.get_size() if pool else 0,
+            "idle": pool.get_idle_size() if pool else 0,
+            "max_size": config.DB_POOL_MAX_SIZE,
+            "acquired": self.acquired,
+            "wait_avg_ms": round(self.wait_total / self.acquired * 1000, 3) if self.acquired else 0.0,
+            "wait_max_ms": round(self.wait_max * 1000, 3),
+            "timeouts": self.timeouts,
+        }
+
+    async def health(self) -> dict:
+        """Проверяет, что пул выдает соединение и база отвечает"""
+        if not self.configured:
+            return {"status": "disabled"}
+        started = time.perf_counter()
+        try:
+            async with self.acquire() as conn:
+                await conn.fetchval("SELECT 1", timeout=config.DB_POOL_ACQUIRE_TIMEOUT)
+        except (HTTPException, OSError, asyncio.TimeoutError, asyncpg.PostgresError) as e:
+            detail = e.detail if isinstance(e, HTTPException) else str(e)
+            return {"status": "error", "error": detail, **self.stats()}
+        return {"status": "ok", "latency_ms": round((time.perf_counter() - started) * 1000, 3), **self.stats()}
+
+
+def get_db_pool(request: Request) -> DatabasePool:
+    """Зависимость FastAPI: возвращает пул, созданный в lifespan приложения"""
+    return request.app.state.db_pool
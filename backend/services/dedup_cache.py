@@ -0,0 +1,171 @@
+import asyncio
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+from fastapi import UploadFile
+
+from backend import config
+
+# Дедупликация генераций: ключ — хэш байтов изображений вместе с параметрами.
+# Повтор запроса отдает уже созданную задачу (или готовую модель) вместо новой платной задачи
+
+# Параметры генерации, влияющие на результат
+DEDUP_PARAMS = ("ai_model", "topology", "target_polycount", "should_texture", "enable_pbr", "texture_prompt", "quality")
+
+
+@dataclass
+class DedupEntry:
+    key: str
+    task_id: str
+    kind: str
+    local_model_path: Optional[str] = None
+    local_thumbnail_path: Optional[str] = None
+
+
+async def compute_dedup_key(kind: str, params: dict, files: list[UploadFile], chunk_size: int = 1024 * 1024) -> str:
+    """Хэширует изображения (потоково) вместе с параметрами генерации"""
+    digest = hashlib.sha256()
+    canonical = {name: params.get(name) for name in DEDUP_PARAMS}
+    digest.update(json.dumps({"kind": kind, "params": canonical}, sort_keys=True).encode())
+    for file in files:
+        file_digest = hashlib.sha256()
+        await file.seek(0)
+        while True:
+            chunk = await file.read(chunk_size)
+            if not chunk:
+                break
+            file_digest.update(chunk)
+        await file.seek(0)
+        digest.update(file_digest.digest())
+    return digest.hexdigest()
+
+
+class DedupCache:
+    """Персистентный индекс ключ → задача (SQLite) и склейка одновременных дублей"""
+
+    def __init__(self, db_path: str, ttl: int = config.DEDUP_TTL, max_entries: int = config.DEDUP_MAX_ENTRIES):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        # Запросы, которые прямо сейчас отправляются в Meshy
+        self._inflight: dict[str, asyncio.Future] = {}
+
+    def open(self) -> None:
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS dedup (
+                key TEXT PRIMARY KEY,
+                task_id TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                local_model_path TEXT,
+                local_thumbnail_path TEXT,
+                created_at REAL NOT NULL,
+                last_used_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS dedup_task_id ON dedup (task_id)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS dedup_last_used ON dedup (last_used_at)")
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _execute(self, sql: str, params: tuple = ()) -> list:
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _get(self, key: str) -> Optional[DedupEntry]:
+        rows = self._execute(
+            "SELECT key, task_id, kind, local_model_path, local_thumbnail_path FROM dedup "
+            "WHERE key = ? AND last_used_at > ?",
+            (key, time.time() - self.ttl),
+        )
+        if not rows:
+            return None
+        self._execute("UPDATE dedup SET last_used_at = ? WHERE key = ?", (time.time(), key))
+        return DedupEntry(*rows[0])
+
+    def _put(self, key: str, task_id: str, kind: str) -> None:
+        now = time.time()
+        self._execute(
+            "INSERT OR REPLACE INTO dedup (key, task_id, kind, created_at, last_used_at) VALUES (?, ?, ?, ?, ?)",
+            (key, task_id, kind, now, now),
+        )
+        self._evict()
+
+    def _evict(self) -> None:
+        """Удаляет записи старше TTL и самые давно использованные сверх лимита"""
+        self._execute("DELETE FROM dedup WHERE last_used_at <= ?", (time.time() - self.ttl,))
+        self._execute(
+            "DELETE FROM dedup WHERE key IN ("
+            "SELECT key FROM dedup ORDER BY last_used_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    async def record_result(self, task_id: str, local_model_path: Optional[str], local_thumbnail_path: Optional[str]) -> None:
+        """Запоминает пути к файлам готовой модели — они переживут потерю задачи"""
+        await asyncio.to_thread(
+            self._execute,
+            "UPDATE dedup SET local_model_path = ?, local_thumbnail_path = ? WHERE task_id = ?",
+            (local_model_path, local_thumbnail_path, task_id),
+        )
+
+    async def forget_task(self, task_id: str) -> None:
+        """Убирает из индекса неудавшуюся задачу"""
+        await asyncio.to_thread(self._execute, "DELETE FROM dedup WHERE task_id = ?", (task_id,))
+
+    async def forget(self, key: str) -> None:
+        await asyncio.to_thread(self._execute, "DELETE FROM dedup WHERE key = ?", (key,))
+
+    async def get_or_submit(
+        self,
+        key: str,
+        kind: str,
+        submit: Callable[[], Awaitable[str]],
+        is_usable: Callable[[DedupEntry], Awaitable[bool]],
+    ) -> tuple[str, bool]:
+        """Возвращает (task_id, reused): существующую задачу или результат submit()"""
+        entry = await asyncio.to_thread(self._get, key)
+        if entry is not None:
+            if await is_usable(entry):
+                return entry.task_id, True
+            await self.forget(key)
+
+        # Такой же запрос уже отправляется — ждем его результата
+        waiter = self._inflight.get(key)
+        if waiter is not None:
+            return await asyncio.shield(waiter), True
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            task_id = await submit()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # ошибка уже передана вызывающему, ожидающих может не быть
+            raise
+        else:
+            await asyncio.to_thread(self._put, key, task_id, kind)
+            future.set_result(task_id)
+            return task_id, False
+        finally:
+            self._inflight.pop(key, None)
+
+
+dedup_cache = DedupCache(config.DEDUP_DB_PATH)
@@ -0,0 +1,454 @@
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import re
+import shutil
+import struct
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Optional
+
+import aiohttp
+from fastapi import HTTPException, Request, UploadFile
+
+from backend import config
+from backend.services.glb import write_glb
+from backend.services.metrics import GENERATION_CALL_DURATION
+from backend.services.rate_limit import parse_retry_after
+from backend.services.uploads import build_image_request_body
+
+logger = logging.getLogger(__name__)
+
+# Подключаемые источники генерации. Все они отдают статус в формате ответа
+# Meshy (status, progress, model_urls, thumbnail_url, task_error), поэтому опрос,
+# скачивание и обработка моделей в routers/meshy.py одинаковы для любого источника
+
+
+# Параметры, которые понимает только локальная генерация
+LOCAL_ONLY_PARAMS = ("quality",)
+
+# Промежуточные модели прогрессивной генерации: черновик и полная сетка без текстуры
+PREVIEW_STAGES = ("preview", "shape")
+PREVIEW_FILE_RE = re.compile(r"\.(preview|shape)\.glb$")
+
+
+def preview_filename(model_filename: str, stage: str) -> str:
+    """task.glb → task.preview.glb"""
+    return f"{model_filename[:-len('.glb')]}.{stage}.glb"
+
+
+class SubmissionError(Exception):
+    """Источник не принял задачу; retryable — стоит повторить позже (не раньше retry_after секунд)"""
+
+    def __init__(self, message: str, retryable: bool = False, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+class GenerationBackend(ABC):
+    name = ""
+    # Каталог, из которого источник отдает результаты ссылками file:// (None — только HTTP)
+    local_files_dir: Optional[str] = None
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    def timeout_for(self, kind_info: dict) -> float:
+        return kind_info["timeout"]
+
+    def validate(self, kind: str, params: dict) -> None:
+        """Проверка параметров до постановки в очередь (HTTPException 400)"""
+
+    @abstractmethod
+    async def submit(self, kind: str, kind_info: dict, params: dict, files: list[UploadFile]) -> str:
+        """Создает задачу генерации; возвращает ее идентификатор в источнике или бросает SubmissionError"""
+
+    @abstractmethod
+    async def fetch_status(self, task_id: str, kind_info: dict) -> Optional[dict]:
+        """Статус задачи в формате Meshy; None — временная ошибка, опрос повторится"""
+
+    async def release(self, task_id: str) -> None:
+        """Вызывается после скачивания результатов: можно удалить промежуточные файлы"""
+
+
+class MeshyBackend(GenerationBackend):
+    """Облачный Meshy API"""
+
+    name = "meshy"
+
+    def __init__(self, session: aiohttp.ClientSession):
+        self.session = session
+
+    @staticmethod
+    def _headers() -> dict:
+        return {
+            "Authorization": f"Bearer {config.MESHY_API_KEY}",
+            "Content-Type": "application/json"
+        }
+
+    async def submit(self, kind: str, kind_info: dict, params: dict, files: list[UploadFile]) -> str:
+        api_name = "Meshy Multi-Image API" if kind == "multi-image" else "Meshy API"
+        params = {name: value for name, value in params.items() if name not in LOCAL_ONLY_PARAMS}
+        body, content_length = build_image_request_body(
+            params, files, kind_info["image_field"], as_list=kind_info["as_list"]
+        )
+        headers = {**self._headers(), "Content-Length": str(content_length)}
+
+        logger.info(f"Sending {kind_info['log_name']} request to Meshy API with {len(files)} images, params: {params.keys()}")
+
+        started = time.perf_counter()
+        status = "error"
+        try:
+            async with self.session.post(f"{config.MESHY_BASE_URL}/{kind_info['endpoint']}", data=body, headers=headers) as response:
+                status = str(response.status)
+                # Meshy API возвращает 202 (Accepted) для успешных запросов
+                if response.status not in [200, 202]:
+                    error_text = await response.text()
+                    logger.error(f"{api_name} error: {response.status} - {error_text}")
+                    # 429 и 5xx временные; 402 — закончились кредиты, повтор не поможет
+                    raise SubmissionError(
+                        f"{api_name} error ({response.status}): {error_text}",
+                        retryable=response.status == 429 or response.status >= 500,
+                        retry_after=parse_retry_after(response.headers.get("Retry-After"))
+                    )
+                result = await response.json()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise SubmissionError(f"{api_name} request failed: {str(e)}", retryable=True)
+        finally:
+            GENERATION_CALL_DURATION.labels(self.name, "submit", status).observe(time.perf_counter() - started)
+
+        task_id = result.get("result")
+        if not task_id:
+            logger.error(f"No task_id in {api_name} response: {result}")
+            raise SubmissionError(f"Invalid response from {api_name}")
+        return task_id
+
+    async def fetch_status(self, task_id: str, kind_info: dict) -> Optional[dict]:
+        url = f"{config.MESHY_BASE_URL}/{kind_info['endpoint']}/{task_id}"
+        started = time.perf_counter()
+        status = "error"
+        try:
+            async with self.session.get(url, headers=self._headers()) as response:
+                status = str(response.status)
+                if response.status != 200:
+                    logger.error(f"Error checking {kind_info['log_name']} status: {response.status}")
+                    logger.error(f"Response: {await response.text()}")
+                    return None
+                return await response.json()
+        finally:
+            GENERATION_CALL_DURATION.labels(self.name, "poll", status).observe(time.perf_counter() - started)
+
+
+async def spool_files(files: list[UploadFile], job_dir: Path) -> list[str]:
+    """Сохраняет загруженные изображения: UploadFile закроется вместе с запросом"""
+    paths = []
+    for index, file in enumerate(files):
+        path = job_dir / f"input_{index}{Path(file.filename or '').suffix.lower() or '.png'}"
+
+        def copy(source=file.file, target=path):
+            source.seek(0)
+            with open(target, "wb") as out:
+                shutil.copyfileobj(source, out, 1024 * 1024)
+
+        await asyncio.to_thread(copy)
+        paths.append(str(path))
+    return paths
+
+
+def _job_status(job: dict) -> dict:
+    """Состояние локального задания в формате ответа Meshy"""
+    status = {"status": job["status"], "progress": job.get("progress", 0), "stage": job.get("stage")}
+    if job.get("preview_paths"):
+        status["preview_urls"] = {stage: Path(path).as_uri() for stage, path in job["preview_paths"].items()}
+    if job["status"] == "SUCCEEDED":
+        status["model_urls"] = {"glb": Path(job["model_path"]).as_uri()}
+        if job.get("thumbnail_path"):
+            status["thumbnail_url"] = Path(job["thumbnail_path"]).as_uri()
+    if job.get("error"):
+        status["task_error"] = {"message": job["error"]}
+    return status
+
+
+# Состояние локального задания в его каталоге: статус видят все процессы uvicorn,
+# а не только тот, что отправил задание (аренду задачи может подобрать другой)
+JOB_STATE_FILE = "job.json"
+
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class LocalBackend(GenerationBackend):
+    """Постоянно работающий процесс Hunyuan3D с очередью заданий"""
+
+    name = "local"
+
+    def __init__(self, jobs_dir: str):
+        self.jobs_dir = Path(jobs_dir)
+        self.local_files_dir = str(self.jobs_dir)
+        self._context = multiprocessing.get_context("spawn")
+        self._process = None
+        self._jobs_queue = None
+        self._events = None
+        self._reader: Optional[threading.Thread] = None
+        self._jobs: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._worker_error: Optional[str] = None
+        self.ready = False
+
+    def timeout_for(self, kind_info: dict) -> float:
+        return config.LOCAL_TASK_TIMEOUT
+
+    def _settings(self) -> dict:
+        return {
+            "shape_model": config.LOCAL_SHAPE_MODEL,
+            "shape_subfolder": config.LOCAL_SHAPE_SUBFOLDER,
+            "shape_variant": config.LOCAL_SHAPE_VARIANT,
+            "texture_model": config.LOCAL_TEXTURE_MODEL,
+            "quality_tiers": config.LOCAL_QUALITY_TIERS,
+            "default_quality": config.LOCAL_DEFAULT_QUALITY,
+            "progressive": config.LOCAL_PROGRESSIVE,
+            "preview_quality": config.LOCAL_PREVIEW_QUALITY,
+            "seed": config.LOCAL_SEED,
+        }
+
+    def _start_process(self) -> None:
+        # Импорт по имени: модуль воркера не тянет torch на уровне модуля
+        from backend.services.hunyuan_worker import worker_main
+
+        self.ready = False
+        self._worker_error = None
+        self._jobs_queue = self._context.Queue()
+        self._events = self._context.Queue()
+        self._process = self._context.Process(
+            target=worker_main, args=(self._jobs_queue, self._events, self._settings()),
+            name="hunyuan-worker", daemon=True
+        )
+        self._process.start()
+        self._reader = threading.Thread(target=self._read_events, args=(self._events,), daemon=True)
+        self._reader.start()
+        logger.info(f"Started local generation worker (pid {self._process.pid})")
+
+    def _read_events(self, events) -> None:
+        while True:
+            try:
+                task_id, fields = events.get()
+            except (EOFError, OSError, ValueError):
+                return
+            if task_id is None:
+                if fields["status"] == "READY":
+                    self.ready = True
+                    logger.info(f"Local generation worker ready in {fields['load_seconds']}s")
+                elif fields["status"] == "FAILED":
+                    self._worker_error = fields["error"]
+                    logger.error(f"Local generation worker failed: {fields['error']}")
+                continue
+            with self._lock:
+                job = self._jobs.get(task_id)
+                if job is not None:
+                    job.update(fields)
+                    job = dict(job)
+            if job is not None:
+                self._save_job(task_id, job)
+
+    def _save_job(self, task_id: str, job: dict) -> None:
+        path = self.jobs_dir / task_id / JOB_STATE_FILE
+        tmp_path = path.with_suffix(".tmp")
+        try:
+            tmp_path.write_text(json.dumps(job))
+            os.replace(tmp_path, path)
+        except OSError as e:
+            # Каталог удаляет release() после скачивания результата
+            logger.warning(f"Could not save state of local job {task_id}: {str(e)}")
+
+    def _load_job(self, task_id: str) -> Optional[dict]:
+        try:
+            return json.loads((self.jobs_dir / task_id / JOB_STATE_FILE).read_text())
+        except (OSError, ValueError):
+            return None
+
+    def _fail_lost_jobs(self) -> None:
+        """Воркер завершился — задания, которые он держал, уже не выполнятся"""
+        failed = {}
+        with self._lock:
+            for task_id, job in self._jobs.items():
+                if job["status"] in ("PENDING", "IN_PROGRESS"):
+                    job.update(status="FAILED", error=self._worker_error or "Local generation worker exited")
+                    failed[task_id] = dict(job)
+        for task_id, job in failed.items():
+            self._save_job(task_id, job)
+
+    async def start(self) -> None:
+        self.jobs_dir.mkdir(parents=True, exist_ok=True)
+        await asyncio.to_thread(self._start_process)
+
+    async def stop(self) -> None:
+        if self._process is None:
+            return
+        self._jobs_queue.put(None)
+        await asyncio.to_thread(self._process.join, 10)
+        if self._process.is_alive():
+            self._process.terminate()
+        self._events.close()
+        self._process = None
+
+    def validate(self, kind: str, params: dict) -> None:
+        quality = params.get("quality")
+        if quality is not None and quality not in config.LOCAL_QUALITY_TIERS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown quality '{quality}', expected one of: {', '.join(config.LOCAL_QUALITY_TIERS)}"
+            )
+
+    async def submit(self, kind: str, kind_info: dict, params: dict, files: list[UploadFile]) -> str:
+        if self._worker_error is not None:
+            # Пайплайны не загрузились: новый воркер упадет так же, нужен перезапуск сервера
+            raise SubmissionError(f"Local generation worker is unavailable: {self._worker_error}")
+        if self._process is None or not self._process.is_alive():
+            self._fail_lost_jobs()
+            await asyncio.to_thread(self._start_process)
+
+        task_id = str(uuid.uuid4())
+        job_dir = self.jobs_dir / task_id
+        job_dir.mkdir(parents=True, exist_ok=True)
+        images = await spool_files(files, job_dir)
+        job = {"status": "PENDING", "progress": 0, "worker_pid": self._process.pid}
+        with self._lock:
+            self._jobs[task_id] = job
+        await asyncio.to_thread(self._save_job, task_id, dict(job))
+        self._jobs_queue.put({
+            "task_id": task_id,
+            "kind": kind,
+            "params": params,
+            "images": images,
+            "output_dir": str(job_dir),
+        })
+        logger.info(f"Queued local {kind_info['log_name']} {task_id} with {len(images)} images")
+        return task_id
+
+    async def fetch_status(self, task_id: str, kind_info: dict) -> Optional[dict]:
+        if self._process is not None and not self._process.is_alive():
+            self._fail_lost_jobs()
+        with self._lock:
+            job = self._jobs.get(task_id)
+            if job is not None:
+                return _job_status(job)
+
+        # Задание отправил другой процесс uvicorn (или этот до рестарта) — состояние в каталоге задания
+        job = await asyncio.to_thread(self._load_job, task_id)
+        if job is None:
+            return {"status": "FAILED", "progress": 0, "task_error": {"message": "Local job was lost on restart"}}
+        if job["status"] in ("PENDING", "IN_PROGRESS") and not _pid_alive(job.get("worker_pid")):
+            # Воркер Hunyuan3D завершается вместе с процессом, который его запустил
+            job.update(status="FAILED", error="Local generation worker exited")
+        return _job_status(job)
+
+    async def release(self, task_id: str) -> None:
+        with self._lock:
+            self._jobs.pop(task_id, None)
+        await asyncio.to_thread(shutil.rmtree, self.jobs_dir / task_id, True)
+
+
+def _write_fake_glb(path: str) -> None:
+    """Тетраэдр — минимальная валидная модель для заглушки"""
+    positions = struct.pack("<12f", 0, 0, 0, 1, 0, 0, 0, 1, 0, 0, 0, 1)
+    indices = struct.pack("<12H", 0, 2, 1, 0, 1, 3, 0, 3, 2, 1, 2, 3)
+    binary = positions + indices
+    gltf = {
+        "asset": {"version": "2.0", "generator": "fake-backend"},
+        "scene": 0,
+        "scenes": [{"nodes": [0]}],
+        "nodes": [{"mesh": 0}],
+        "meshes": [{"primitives": [{"attributes": {"POSITION": 0}, "indices": 1, "mode": 4}]}],
+        "accessors": [
+            {"bufferView": 0, "componentType": 5126, "count": 4, "type": "VEC3", "min": [0, 0, 0], "max": [1, 1, 1]},
+            {"bufferView": 1, "componentType": 5123, "count": 12, "type": "SCALAR"},
+        ],
+        "bufferViews": [
+            {"buffer": 0, "byteOffset": 0, "byteLength": len(positions)},
+            {"buffer": 0, "byteOffset": len(positions), "byteLength": len(indices)},
+        ],
+        "buffers": [{"byteLength": len(binary)}],
+    }
+    write_glb(path, gltf, binary)
+
+
+class FakeBackend(GenerationBackend):
+    """Заглушка для тестов: прогресс растет со временем, результат — тетраэдр.
+
+    Время начала хранится в каталоге задания, как состояние LocalBackend: задачу,
+    отправленную одним процессом uvicorn, может опрашивать другой.
+    """
+
+    name = "fake"
+
+    def __init__(self, jobs_dir: str, duration: float):
+        self.jobs_dir = Path(jobs_dir)
+        self.local_files_dir = str(self.jobs_dir)
+        self.duration = duration
+
+    def _save_started(self, task_id: str, started_at: float) -> None:
+        job_dir = self.jobs_dir / task_id
+        job_dir.mkdir(parents=True, exist_ok=True)
+        tmp_path = job_dir / f"{JOB_STATE_FILE}.tmp"
+        tmp_path.write_text(json.dumps({"started_at": started_at}))
+        os.replace(tmp_path, job_dir / JOB_STATE_FILE)
+
+    def _load_started(self, task_id: str) -> Optional[float]:
+        try:
+            return json.loads((self.jobs_dir / task_id / JOB_STATE_FILE).read_text())["started_at"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    async def submit(self, kind: str, kind_info: dict, params: dict, files: list[UploadFile]) -> str:
+        task_id = str(uuid.uuid4())
+        await asyncio.to_thread(self._save_started, task_id, time.time())
+        return task_id
+
+    async def fetch_status(self, task_id: str, kind_info: dict) -> Optional[dict]:
+        started = await asyncio.to_thread(self._load_started, task_id)
+        if started is None:
+            return {"status": "FAILED", "progress": 0, "task_error": {"message": "Unknown fake task"}}
+        elapsed = time.time() - started
+        if elapsed < self.duration:
+            return {"status": "IN_PROGRESS", "progress": int(elapsed / self.duration * 100)}
+
+        model_path = self.jobs_dir / task_id / "model.glb"
+        if not model_path.exists():
+            await asyncio.to_thread(_write_fake_glb, str(model_path))
+        return {"status": "SUCCEEDED", "progress": 100, "model_urls": {"glb": model_path.as_uri()}}
+
+    async def release(self, task_id: str) -> None:
+        await asyncio.to_thread(shutil.rmtree, self.jobs_dir / task_id, True)
+
+
+def create_generation_backend(name: str, session: aiohttp.ClientSession) -> GenerationBackend:
+    if name == "meshy":
+        return MeshyBackend(session)
+    if name == "local":
+        return LocalBackend(config.LOCAL_JOBS_DIR)
+    if name == "fake":
+        return FakeBackend(config.LOCAL_JOBS_DIR, config.FAKE_GENERATION_SECONDS)
+    raise ValueError(f"Unknown generation backend: {name}")
+
+
+def get_generation_backend(request: Request) -> GenerationBackend:
+    """Зависимость FastAPI: источник генерации, созданный в lifespan приложения"""
+    return request.app.state.generation_backend
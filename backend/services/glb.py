@@ -0,0 +1,137 @@
+import json
+import struct
+from typing import BinaryIO
+
+# Чтение бинарного glTF (GLB): заголовок, JSON-чанк и сводка по геометрии
+
+GLB_MAGIC = b"glTF"
+CHUNK_JSON = 0x4E4F534A
+CHUNK_BIN = 0x004E4942
+
+# Режим примитива glTF: 4 — TRIANGLES, 5 — TRIANGLE_STRIP, 6 — TRIANGLE_FAN
+MODE_TRIANGLES = 4
+COMPONENT_FLOAT = 5126
+
+
+class GLBError(ValueError):
+    pass
+
+
+def read_glb_json(stream: BinaryIO) -> dict:
+    """Читает только заголовок и JSON-чанк, не загружая бинарные данные"""
+    header = stream.read(12)
+    if len(header) < 12:
+        raise GLBError("File is too short for a GLB header")
+    magic, version, _length = struct.unpack("<4sII", header)
+    if magic != GLB_MAGIC:
+        raise GLBError("Not a GLB file")
+    if version != 2:
+        raise GLBError(f"Unsupported glTF version {version}")
+
+    chunk_header = stream.read(8)
+    if len(chunk_header) < 8:
+        raise GLBError("Missing JSON chunk")
+    chunk_length, chunk_type = struct.unpack("<II", chunk_header)
+    if chunk_type != CHUNK_JSON:
+        raise GLBError("First GLB chunk must be JSON")
+    return json.loads(stream.read(chunk_length))
+
+
+def _dequantization(gltf: dict) -> dict[int, tuple[list, list]]:
+    """Сдвиг и масштаб узлов, деквантующих позиции меша (KHR_mesh_quantization), по индексу меша"""
+    transforms = {}
+    for node in gltf.get("nodes", []):
+        if "mesh" in node and "matrix" not in node and "rotation" not in node:
+            transforms.setdefault(node["mesh"], (node.get("translation", [0, 0, 0]), node.get("scale", [1, 1, 1])))
+    return transforms
+
+
+def summarize_gltf(gltf: dict) -> dict:
+    """Считает меши, примитивы, вершины, треугольники и общий bounding box.
+
+    Bounding box берется из min/max аксессоров POSITION без учета трансформаций узлов;
+    исключение — целочисленные (квантованные) позиции: их переводит в исходные
+    единицы сдвиг и масштаб узла меша.
+    """
+    accessors = gltf.get("accessors", [])
+    meshes = gltf.get("meshes", [])
+    dequantization = _dequantization(gltf)
+    primitives = vertices = triangles = 0
+    bbox_min = [float("inf")] * 3
+    bbox_max = [float("-inf")] * 3
+
+    for mesh_index, mesh in enumerate(meshes):
+        for primitive in mesh.get("primitives", []):
+            primitives += 1
+            position = primitive.get("attributes", {}).get("POSITION")
+            if position is None:
+                continue
+            accessor = accessors[position]
+            vertices += accessor["count"]
+            if "min" in accessor and "max" in accessor:
+                low, high = accessor["min"], accessor["max"]
+                if accessor.get("componentType") != COMPONENT_FLOAT and mesh_index in dequantization:
+                    translation, scale = dequantization[mesh_index]
+                    corners = [
+                        [value * factor + offset for value, factor, offset in zip(bound, scale, translation)]
+                        for bound in (low, high)
+                    ]
+                    # Отрицательный масштаб меняет границы местами
+                    low = [min(a, b) for a, b in zip(*corners)]
+                    high = [max(a, b) for a, b in zip(*corners)]
+                bbox_min = [min(a, b) for a, b in zip(bbox_min, low)]
+                bbox_max = [max(a, b) for a, b in zip(bbox_max, high)]
+
+            mode = primitive.get("mode", MODE_TRIANGLES)
+            count = accessors[primitive["indices"]]["count"] if "indices" in primitive else accessor["count"]
+            if mode == MODE_TRIANGLES:
+                triangles += count // 3
+            elif mode in (5, 6):
+                triangles += max(count - 2, 0)
+
+    has_bbox = bbox_min[0] != float("inf")
+    return {
+        "meshes": len(meshes),
+        "primitives": primitives,
+        "vertices": vertices,
+        "triangles": triangles,
+        "bbox_min": bbox_min if has_bbox else None,
+        "bbox_max": bbox_max if has_bbox else None,
+    }
+
+
+def read_glb_summary(path: str) -> dict:
+    with open(path, "rb") as f:
+        return summarize_gltf(read_glb_json(f))
+
+
+def read_glb(path: str) -> tuple[dict, bytes]:
+    """Читает GLB целиком: JSON и бинарный чанк"""
+    with open(path, "rb") as f:
+        gltf = read_glb_json(f)
+        binary = b""
+        chunk_header = f.read(8)
+        if len(chunk_header) == 8:
+            chunk_length, chunk_type = struct.unpack("<II", chunk_header)
+            if chunk_type == CHUNK_BIN:
+                binary = f.read(chunk_length)
+    return gltf, binary
+
+
+def _pad(data: bytes, fill: bytes) -> bytes:
+    return data + fill * (-len(data) % 4)
+
+
+def write_glb(path: str, gltf: dict, binary: bytes) -> int:
+    """Записывает GLB (JSON добивается пробелами, BIN — нулями); возвращает размер"""
+    json_chunk = _pad(json.dumps(gltf, separators=(",", ":")).encode(), b" ")
+    binary = _pad(binary, b"\0")
+    length = 12 + 8 + len(json_chunk) + (8 + len(binary) if binary else 0)
+    with open(path, "wb") as f:
+        f.write(struct.pack("<4sII", GLB_MAGIC, 2, length))
+        f.write(struct.pack("<II", len(json_chunk), CHUNK_JSON))
+        f.write(json_chunk)
+        if binary:
+            f.write(struct.pack("<II", len(binary), CHUNK_BIN))
+            f.write(binary)
+    return length
@@ -0,0 +1,289 @@
+import os
+from typing import Optional
+
+import numpy as np
+
+from backend.services.glb import MODE_TRIANGLES, read_glb, write_glb
+
+# Оптимизация GLB после скачивания: склейка дубликатов вершин, квантование
+# атрибутов (KHR_mesh_quantization), переупорядочивание треугольников для
+# локальности кэша вершин и пересборка бинарного чанка без лишних данных.
+# Функции выполняются в пуле процессов, поэтому принимают и возвращают простые типы
+
+QUANTIZATION_EXTENSION = "KHR_mesh_quantization"
+# Оригинал до оптимизации хранится рядом с моделью, но не раздается и не занимает квоту
+ORIGINAL_SUFFIX = ".orig"
+
+BYTE, UNSIGNED_BYTE, SHORT, UNSIGNED_SHORT, UNSIGNED_INT, FLOAT = 5120, 5121, 5122, 5123, 5125, 5126
+ARRAY_BUFFER, ELEMENT_ARRAY_BUFFER = 34962, 34963
+
+COMPONENT_DTYPES = {
+    BYTE: np.dtype("<i1"),
+    UNSIGNED_BYTE: np.dtype("<u1"),
+    SHORT: np.dtype("<i2"),
+    UNSIGNED_SHORT: np.dtype("<u2"),
+    UNSIGNED_INT: np.dtype("<u4"),
+    FLOAT: np.dtype("<f4"),
+}
+DTYPE_COMPONENTS = {dtype: component for component, dtype in COMPONENT_DTYPES.items()}
+TYPE_SIZES = {"SCALAR": 1, "VEC2": 2, "VEC3": 3, "VEC4": 4, "MAT2": 4, "MAT3": 9, "MAT4": 16}
+SIZE_TYPES = {1: "SCALAR", 2: "VEC2", 3: "VEC3", 4: "VEC4"}
+
+
+class UnsupportedGLB(Exception):
+    pass
+
+
+def read_accessor(gltf: dict, binary: bytes, index: int, dequantize: bool = True) -> np.ndarray:
+    """Возвращает данные аксессора массивом (count, components)"""
+    accessor = gltf["accessors"][index]
+    if "sparse" in accessor:
+        raise UnsupportedGLB("sparse accessors")
+    dtype = COMPONENT_DTYPES[accessor["componentType"]]
+    components = TYPE_SIZES[accessor["type"]]
+    count = accessor["count"]
+    if "bufferView" not in accessor:
+        return np.zeros((count, components), dtype=np.float32 if dequantize else dtype)
+
+    view = gltf["bufferViews"][accessor["bufferView"]]
+    offset = view.get("byteOffset", 0) + accessor.get("byteOffset", 0)
+    stride = view.get("byteStride") or dtype.itemsize * components
+    data = np.ndarray(
+        shape=(count, components), dtype=dtype, buffer=binary, offset=offset,
+        strides=(stride, dtype.itemsize),
+    ).copy()
+    if not dequantize:
+        return data
+    if accessor.get("normalized"):
+        limit = float(np.iinfo(dtype).max)
+        return np.maximum(data.astype(np.float32) / limit, -1.0)
+    return data.astype(np.float32) if dtype.kind == "f" else data
+
+
+def copy_images(gltf: dict, binary: bytes, builder: "BinaryBuilder") -> None:
+    """Переносит встроенные изображения в новый буфер как есть"""
+    for image in gltf.get("images", []):
+        if "bufferView" in image:
+            view = gltf["bufferViews"][image["bufferView"]]
+            start = view.get("byteOffset", 0)
+            image["bufferView"] = builder.add_view(binary[start:start + view["byteLength"]])
+
+
+def unsupported_reason(gltf: dict) -> Optional[str]:
+    if gltf.get("extensionsRequired"):
+        return f"required extensions {gltf['extensionsRequired']}"
+    if gltf.get("animations") or gltf.get("skins"):
+        return "animations or skins"
+    buffers = gltf.get("buffers", [])
+    if len(buffers) != 1 or "uri" in buffers[0]:
+        return "external or multiple buffers"
+    for mesh in gltf.get("meshes", []):
+        if "weights" in mesh:
+            return "morph targets"
+        for primitive in mesh.get("primitives", []):
+            if primitive.get("targets"):
+                return "morph targets"
+            if primitive.get("mode", MODE_TRIANGLES) != MODE_TRIANGLES:
+                return "non-triangle primitives"
+            if "POSITION" not in primitive.get("attributes", {}):
+                return "primitive without POSITION"
+    return None
+
+
+def _morton_order(points: np.ndarray) -> np.ndarray:
+    """Порядок точек вдоль кривой Мортона (Z-order) в 30-битной сетке"""
+    low, high = points.min(axis=0), points.max(axis=0)
+    extent = np.where(high > low, high - low, 1.0)
+    grid = ((points - low) / extent * 1023).astype(np.uint64)
+
+    def spread(x):
+        x = (x | (x << np.uint64(16))) & np.uint64(0x030000FF)
+        x = (x | (x << np.uint64(8))) & np.uint64(0x0300F00F)
+        x = (x | (x << np.uint64(4))) & np.uint64(0x030C30C3)
+        x = (x | (x << np.uint64(2))) & np.uint64(0x09249249)
+        return x
+
+    codes = spread(grid[:, 0]) | (spread(grid[:, 1]) << np.uint64(1)) | (spread(grid[:, 2]) << np.uint64(2))
+    return np.argsort(codes, kind="stable")
+
+
+def _quantize_attribute(name: str, values: np.ndarray, center: np.ndarray, scale: float):
+    """Возвращает (данные, componentType, normalized) для записи атрибута"""
+    if name == "POSITION":
+        return np.round((values - center) / scale).astype(np.int16), SHORT, False
+    if name == "NORMAL":
+        return np.round(np.clip(values, -1, 1) * 127).astype(np.int8), BYTE, True
+    if name == "TANGENT":
+        return np.round(np.clip(values, -1, 1) * 127).astype(np.int8), BYTE, True
+    if name.startswith("TEXCOORD_") and values.size and values.min() >= 0 and values.max() <= 1:
+        return np.round(values * 65535).astype(np.uint16), UNSIGNED_SHORT, True
+    return None
+
+
+class BinaryBuilder:
+    """Собирает новый бинарный чанк и списки bufferViews/accessors"""
+
+    def __init__(self):
+        self.data = bytearray()
+        self.views: list[dict] = []
+        self.accessors: list[dict] = []
+
+    def add_view(self, payload: bytes, target: Optional[int] = None, stride: Optional[int] = None) -> int:
+        self.data.extend(b"\0" * (-len(self.data) % 4))
+        view = {"buffer": 0, "byteOffset": len(self.data), "byteLength": len(payload)}
+        if target is not None:
+            view["target"] = target
+        if stride is not None:
+            view["byteStride"] = stride
+        self.data.extend(payload)
+        self.views.append(view)
+        return len(self.views) - 1
+
+    def add_vertex_attribute(self, values: np.ndarray, component: int, normalized: bool, with_bounds: bool) -> int:
+        count, components = values.shape
+        row_bytes = values.dtype.itemsize * components
+        # Шаг вершинного атрибута должен быть кратен 4 байтам
+        padding = (-row_bytes % 4) // values.dtype.itemsize
+        padded = np.ascontiguousarray(np.pad(values, ((0, 0), (0, padding))) if padding else values)
+        view = self.add_view(padded.tobytes(), ARRAY_BUFFER, padded.dtype.itemsize * padded.shape[1])
+        accessor = {
+            "bufferView": view,
+            "componentType": component,
+            "count": count,
+            "type": SIZE_TYPES[components],
+        }
+        if normalized:
+            accessor["normalized"] = True
+        if with_bounds:
+            accessor["min"] = values.min(axis=0).tolist()
+            accessor["max"] = values.max(axis=0).tolist()
+        self.accessors.append(accessor)
+        return len(self.accessors) - 1
+
+    def add_indices(self, indices: np.ndarray, vertex_count: int) -> int:
+        dtype = np.uint16 if vertex_count < 65536 else np.uint32
+        view = self.add_view(indices.astype(dtype).tobytes(), ELEMENT_ARRAY_BUFFER)
+        self.accessors.append({
+            "bufferView": view,
+            "componentType": UNSIGNED_SHORT if dtype == np.uint16 else UNSIGNED_INT,
+            "count": int(indices.size),
+            "type": "SCALAR",
+        })
+        return len(self.accessors) - 1
+
+
+def _optimize_primitive(gltf, binary, primitive, builder, center, scale, stats) -> None:
+    attributes = primitive["attributes"]
+    positions = read_accessor(gltf, binary, attributes["POSITION"])
+    vertex_count = len(positions)
+    if "indices" in primitive:
+        indices = read_accessor(gltf, binary, primitive["indices"], dequantize=False).astype(np.int64).ravel()
+    else:
+        indices = np.arange(vertex_count, dtype=np.int64)
+    stats["vertices_before"] += vertex_count
+
+    # Квантуем атрибуты; неподдерживаемые оставляем в исходном формате
+    encoded = {}
+    for name, accessor_index in attributes.items():
+        accessor = gltf["accessors"][accessor_index]
+        quantized = _quantize_attribute(name, read_accessor(gltf, binary, accessor_index), center, scale)
+        if quantized is None:
+            raw = read_accessor(gltf, binary, accessor_index, dequantize=False)
+            quantized = (raw, accessor["componentType"], bool(accessor.get("normalized")))
+        encoded[name] = quantized
+
+    # Склеиваем вершины, совпадающие после квантования по всем атрибутам
+    names = sorted(encoded)
+    rows = np.concatenate(
+        [np.ascontiguousarray(encoded[name][0]).view(np.uint8).reshape(vertex_count, -1) for name in names], axis=1
+    )
+    rows = np.ascontiguousarray(rows).view(np.dtype((np.void, rows.shape[1]))).ravel()
+    _, representative, inverse = np.unique(rows, return_index=True, return_inverse=True)
+    triangles = inverse.ravel()[indices].reshape(-1, 3)
+
+    # Вырожденные треугольники после склейки не нужны
+    valid = (triangles[:, 0] != triangles[:, 1]) & (triangles[:, 1] != triangles[:, 2]) & (triangles[:, 0] != triangles[:, 2])
+    triangles = triangles[valid]
+
+    # Треугольники — вдоль кривой Мортона, вершины — в порядке первого использования
+    if len(triangles):
+        centroids = positions[representative][triangles].mean(axis=1)
+        triangles = triangles[_morton_order(centroids)]
+    flat = triangles.ravel()
+    used, first_use = np.unique(flat, return_index=True)
+    vertex_order = used[np.argsort(first_use)]
+    remap = np.empty(len(representative), dtype=np.int64)
+    remap[vertex_order] = np.arange(len(vertex_order))
+    source_vertices = representative[vertex_order]
+
+    new_attributes = {}
+    for name in names:
+        values, component, normalized = encoded[name]
+        new_attributes[name] = builder.add_vertex_attribute(
+            values[source_vertices], component, normalized, with_bounds=name == "POSITION"
+        )
+    primitive["attributes"] = new_attributes
+    primitive["indices"] = builder.add_indices(remap[flat], len(vertex_order))
+    stats["vertices_after"] += len(vertex_order)
+    stats["triangles"] += len(triangles)
+
+
+def optimize_glb_file(path: str) -> dict:
+    """Оптимизирует GLB на месте; оригинал сохраняется рядом как <имя>.orig"""
+    original_size = os.path.getsize(path)
+    gltf, binary = read_glb(path)
+    reason = unsupported_reason(gltf)
+    if reason:
+        return {"optimized": False, "reason": reason, "original_size": original_size}
+
+    builder = BinaryBuilder()
+    stats = {"vertices_before": 0, "vertices_after": 0, "triangles": 0}
+
+    copy_images(gltf, binary, builder)
+
+    mesh_transforms = {}
+    for mesh_index, mesh in enumerate(gltf.get("meshes", [])):
+        # Общая для меша равномерная шкала квантования позиций, чтобы не искажать нормали
+        positions = np.concatenate([
+            read_accessor(gltf, binary, primitive["attributes"]["POSITION"]) for primitive in mesh["primitives"]
+        ])
+        low, high = positions.min(axis=0), positions.max(axis=0)
+        center = (low + high) / 2
+        scale = float(np.max(high - low) / 2 / 32767) or 1.0
+        mesh_transforms[mesh_index] = (center.tolist(), scale)
+        for primitive in mesh["primitives"]:
+            _optimize_primitive(gltf, binary, primitive, builder, center, scale, stats)
+
+    # Деквантование позиций — через трансформацию дочернего узла с мешем
+    nodes = gltf.get("nodes", [])
+    for node in list(nodes):
+        if "mesh" not in node:
+            continue
+        mesh_index = node.pop("mesh")
+        center, scale = mesh_transforms[mesh_index]
+        nodes.append({"mesh": mesh_index, "translation": center, "scale": [scale, scale, scale]})
+        node.setdefault("children", []).append(len(nodes) - 1)
+
+    gltf["accessors"] = builder.accessors
+    gltf["bufferViews"] = builder.views
+    gltf["buffers"] = [{"byteLength": len(builder.data)}]
+    for key in ("extensionsUsed", "extensionsRequired"):
+        extensions = gltf.setdefault(key, [])
+        if QUANTIZATION_EXTENSION not in extensions:
+            extensions.append(QUANTIZATION_EXTENSION)
+
+    tmp_path = path + ".opt.tmp"
+    optimized_size = write_glb(tmp_path, gltf, bytes(builder.data))
+    if optimized_size >= original_size:
+        os.remove(tmp_path)
+        return {"optimized": False, "reason": "no size reduction", "original_size": original_size}
+
+    # Оригинал сохраняем, оптимизированный файл занимает его место атомарно
+    os.replace(path, path + ORIGINAL_SUFFIX)
+    os.replace(tmp_path, path)
+    return {
+        "optimized": True,
+        "original_size": original_size,
+        "optimized_size": optimized_size,
+        **stats,
+    }
@@ -0,0 +1,34 @@
+import aiohttp
+from fastapi import Request
+
+from backend import config
+
+# Общий HTTP-клиент приложения: один пул keep-alive соединений
+# к api.meshy.ai и CDN вместо новой сессии на каждый запрос
+
+
+def create_http_session() -> aiohttp.ClientSession:
+    """Создает сессию с пулом соединений, кэшем DNS и таймаутами из конфигурации"""
+    connector = aiohttp.TCPConnector(
+        limit=config.HTTP_POOL_LIMIT,
+        limit_per_host=config.HTTP_POOL_LIMIT_PER_HOST,
+        ttl_dns_cache=config.HTTP_DNS_CACHE_TTL,
+        use_dns_cache=True,
+        keepalive_timeout=config.HTTP_KEEPALIVE_TIMEOUT,
+    )
+    timeout = aiohttp.ClientTimeout(
+        total=config.HTTP_TOTAL_TIMEOUT,
+        connect=config.HTTP_CONNECT_TIMEOUT,
+        sock_read=config.HTTP_READ_TIMEOUT,
+    )
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+
+async def close_http_session(session: aiohttp.ClientSession) -> None:
+    """Закрывает сессию и все соединения пула"""
+    await session.close()
+
+
+def get_http_session(request: Request) -> aiohttp.ClientSession:
+    """Зависимость FastAPI: возвращает сессию, созданную в lifespan приложения"""
+    return request.app.state.http_session
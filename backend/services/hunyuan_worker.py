@@ -0,0 +1,176 @@
+import os
+import time
+import traceback
+
+# Процесс локальной генерации на Hunyuan3D (бывший routers/open-source-variant.py).
+# Пайплайны загружаются один раз при старте процесса и остаются в памяти;
+# задания приходят через очередь, прогресс по шагам уходит обратно событиями.
+# torch и hy3dgen импортируются только здесь, внутри дочернего процесса
+
+# Порядок ракурсов для мультивидовой модели: изображения сопоставляются по порядку загрузки
+VIEWS = ("front", "left", "back", "right")
+
+# Доли общего прогресса, отведенные этапам
+STAGE_PROGRESS = {
+    "background": (0, 5),
+    "preview": (5, 15),
+    "shape": (15, 70),
+    "postprocess": (70, 75),
+    "texture": (75, 95),
+    "export": (95, 100),
+}
+
+
+def _emit(events, task_id, **fields):
+    events.put((task_id, fields))
+
+
+def _stage(events, task_id, stage, fraction=0.0):
+    start, end = STAGE_PROGRESS[stage]
+    _emit(events, task_id, status="IN_PROGRESS", stage=stage, progress=int(start + (end - start) * fraction))
+
+
+def _count_steps(pipeline, on_step):
+    """Прогресс по шагам диффузии: оборачиваем шаг планировщика пайплайна"""
+    scheduler = getattr(pipeline, "scheduler", None)
+    step = getattr(scheduler, "step", None)
+    if step is None:
+        return lambda: None
+
+    def counted(*args, **kwargs):
+        result = step(*args, **kwargs)
+        on_step()
+        return result
+
+    scheduler.step = counted
+    return lambda: setattr(scheduler, "step", step)
+
+
+def _remove_backgrounds(images, rembg):
+    """Отдельный этап: фон удаляется только у изображений без прозрачности"""
+    from PIL import Image
+
+    prepared = []
+    for path in images:
+        image = Image.open(path)
+        if image.mode != "RGBA":
+            image = rembg(image.convert("RGB"))
+        prepared.append(image.convert("RGBA"))
+    return prepared
+
+
+def _save_atomic(save, path):
+    tmp_path = path + ".tmp"
+    save(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _generate_shape(shape_pipeline, views, tier, seed, events, task_id, stage):
+    """Генерация сетки с параметрами уровня качества и прогрессом по шагам"""
+    import torch
+
+    steps = tier["inference_steps"]
+    done = [0]
+
+    def on_step():
+        done[0] += 1
+        _stage(events, task_id, stage, min(done[0] / steps, 1.0))
+
+    _stage(events, task_id, stage)
+    restore = _count_steps(shape_pipeline, on_step)
+    try:
+        return shape_pipeline(
+            image=views,
+            num_inference_steps=steps,
+            octree_resolution=tier["octree_resolution"],
+            num_chunks=tier["num_chunks"],
+            generator=torch.manual_seed(seed),
+            output_type="trimesh"
+        )[0]
+    finally:
+        restore()
+
+
+def _export(mesh, output_dir, name):
+    path = os.path.join(output_dir, f"{name}.glb")
+    _save_atomic(lambda target: mesh.export(target, file_type="glb"), path)
+    return path
+
+
+def _run_job(job, pipelines, settings, events):
+    from hy3dgen.shapegen import FaceReducer
+
+    task_id = job["task_id"]
+    params = job["params"]
+    output_dir = job["output_dir"]
+    rembg, shape_pipeline, texture_pipeline = pipelines
+    tiers = settings["quality_tiers"]
+    quality = params.get("quality") or settings["default_quality"]
+    tier = tiers[quality]
+    should_texture = params.get("should_texture", True)
+
+    _stage(events, task_id, "background")
+    images = _remove_backgrounds(job["images"], rembg)
+    views = dict(zip(VIEWS, images))
+    thumbnail_path = os.path.join(output_dir, "thumbnail.png")
+    _save_atomic(lambda path: images[0].save(path, format="PNG"), thumbnail_path)
+
+    # Черновик низкого разрешения без текстуры: модель можно смотреть уже через секунды
+    preview_paths = {}
+    if settings["progressive"] and quality != settings["preview_quality"]:
+        preview = _generate_shape(
+            shape_pipeline, views, tiers[settings["preview_quality"]], settings["seed"], events, task_id, "preview"
+        )
+        preview_paths["preview"] = _export(preview, output_dir, "preview")
+        _emit(events, task_id, stage="preview", preview_paths=dict(preview_paths))
+
+    mesh = _generate_shape(shape_pipeline, views, tier, settings["seed"], events, task_id, "shape")
+
+    _stage(events, task_id, "postprocess")
+    if params.get("target_polycount"):
+        mesh = FaceReducer()(mesh, max_facenum=int(params["target_polycount"]))
+
+    if should_texture:
+        if settings["progressive"]:
+            # Полная сетка без текстуры заменяет черновик, пока идет текстурирование
+            preview_paths["shape"] = _export(mesh, output_dir, "shape")
+            _emit(events, task_id, stage="shape", preview_paths=dict(preview_paths))
+        _stage(events, task_id, "texture")
+        mesh = texture_pipeline(mesh, image=images[0])
+
+    _stage(events, task_id, "export")
+    model_path = _export(mesh, output_dir, "model")
+    _emit(events, task_id, status="SUCCEEDED", progress=100, stage="done",
+          model_path=model_path, thumbnail_path=thumbnail_path)
+
+
+def worker_main(jobs, events, settings: dict) -> None:
+    """Точка входа процесса: загружает пайплайны и обрабатывает задания до сигнала остановки"""
+    started = time.time()
+    try:
+        from hy3dgen.rembg import BackgroundRemover
+        from hy3dgen.shapegen import Hunyuan3DDiTFlowMatchingPipeline
+        from hy3dgen.texgen import Hunyuan3DPaintPipeline
+
+        rembg = BackgroundRemover()
+        shape_pipeline = Hunyuan3DDiTFlowMatchingPipeline.from_pretrained(
+            settings["shape_model"],
+            subfolder=settings["shape_subfolder"],
+            variant=settings["shape_variant"]
+        )
+        texture_pipeline = Hunyuan3DPaintPipeline.from_pretrained(settings["texture_model"])
+    except Exception as e:
+        _emit(events, None, status="FAILED", error=f"Failed to load pipelines: {e}")
+        return
+    _emit(events, None, status="READY", load_seconds=round(time.time() - started, 1))
+
+    pipelines = (rembg, shape_pipeline, texture_pipeline)
+    while True:
+        job = jobs.get()
+        if job is None:
+            break
+        try:
+            _run_job(job, pipelines, settings, events)
+        except Exception as e:
+            traceback.print_exc()
+            _emit(events, job["task_id"], status="FAILED", error=str(e))
@@ -0,0 +1,173 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from pathlib import Path
+
+from PIL import Image, ImageOps
+
+from backend import config
+from backend.services.metrics import UPLOAD_BYTES
+from backend.services.worker_pool import worker_pool
+
+logger = logging.getLogger(__name__)
+
+# Подготовка загруженных изображений перед отправкой: фото с телефона (12 Мп JPEG,
+# огромные PNG) уходят в Meshy внутри JSON в base64, поэтому каждый лишний байт
+# становится 4/3 байта запроса. Вся работа с изображениями — в пуле процессов
+
+# Meshy принимает только JPEG и PNG: PNG — для изображений с прозрачностью
+FORMATS = {".jpg": ("JPEG", "image/jpeg"), ".png": ("PNG", "image/png")}
+ORIGINAL_FORMATS = {"JPEG": ".jpg", "PNG": ".png"}
+ORIENTATION_TAG = 0x0112
+# Меняется вместе с алгоритмом, чтобы старые результаты в кэше не использовались
+PREPROCESS_VERSION = 1
+
+_background_remover = None  # загружается один раз в каждом процессе пула
+
+
+def preprocess_settings() -> dict:
+    return {
+        "version": PREPROCESS_VERSION,
+        "max_edge": config.PREPROCESS_MAX_EDGE,
+        "jpeg_quality": config.PREPROCESS_JPEG_QUALITY,
+        "remove_background": config.PREPROCESS_REMOVE_BACKGROUND,
+    }
+
+
+def _file_digest(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _remove_background(image: Image.Image) -> Image.Image:
+    global _background_remover
+    if _background_remover is None:
+        from hy3dgen.rembg import BackgroundRemover
+        _background_remover = BackgroundRemover()
+    return _background_remover(image.convert("RGB")).convert("RGBA")
+
+
+def _has_alpha(image: Image.Image) -> bool:
+    return image.mode in ("RGBA", "LA", "PA") or (image.mode == "P" and "transparency" in image.info)
+
+
+def _result(path: Path, original_size: int, cached: bool) -> dict:
+    return {
+        "path": str(path),
+        "content_type": FORMATS[path.suffix][1],
+        "original_size": original_size,
+        "size": path.stat().st_size,
+        "cached": cached,
+    }
+
+
+def preprocess_image(path: str, cache_dir: str, settings: dict) -> dict:
+    """Поворот по EXIF, уменьшение, удаление фона и перекодирование; выполняется в пуле процессов"""
+    original_size = os.path.getsize(path)
+    key = hashlib.sha256(
+        (_file_digest(path) + json.dumps(settings, sort_keys=True)).encode()
+    ).hexdigest()
+    cache = Path(cache_dir)
+    for suffix in FORMATS:
+        cached = cache / f"{key}{suffix}"
+        if cached.exists():
+            os.utime(cached)  # срок хранения в кэше отсчитывается от последнего использования
+            return _result(cached, original_size, cached=True)
+
+    with Image.open(path) as source:
+        original_format = source.format
+        # Телефон пишет кадр как снят с сенсора и поворот в EXIF; Meshy тег не учитывает
+        changed = source.getexif().get(ORIENTATION_TAG, 1) != 1
+        image = ImageOps.exif_transpose(source)
+        image.load()
+    if max(image.size) > settings["max_edge"]:
+        image.thumbnail((settings["max_edge"], settings["max_edge"]), Image.Resampling.LANCZOS)
+        changed = True
+    if settings["remove_background"] and not _has_alpha(image):
+        image = _remove_background(image)
+        changed = True
+
+    cache.mkdir(parents=True, exist_ok=True)
+    suffix = ".png" if _has_alpha(image) else ".jpg"
+    target = cache / f"{key}{suffix}"
+    tmp_path = cache / f"{key}.{os.getpid()}.tmp"
+    if suffix == ".png":
+        image.convert("RGBA").save(tmp_path, format="PNG", optimize=True)
+    else:
+        image.convert("RGB").save(
+            tmp_path, format="JPEG", quality=settings["jpeg_quality"], optimize=True, progressive=True
+        )
+
+    # Небольшой JPEG/PNG без поворота и уменьшения перекодирование только увеличит
+    original_suffix = ORIGINAL_FORMATS.get(original_format)
+    if not changed and original_suffix and os.path.getsize(tmp_path) >= original_size:
+        os.remove(tmp_path)
+        target = cache / f"{key}{original_suffix}"
+        shutil.copyfile(path, tmp_path)
+    os.replace(tmp_path, target)
+    return _result(target, original_size, cached=False)
+
+
+async def preprocess_files(spooled_files: list[dict]) -> list[dict]:
+    """Подготовленные копии сохраненных изображений; при ошибке остается исходный файл"""
+    settings = preprocess_settings()
+    results = await asyncio.gather(
+        *(worker_pool.run(preprocess_image, spooled["path"], config.PREPROCESS_CACHE_DIR, settings)
+          for spooled in spooled_files),
+        return_exceptions=True,
+    )
+    prepared = []
+    for spooled, result in zip(spooled_files, results):
+        if isinstance(result, Exception):
+            # Неподготовленное изображение все равно можно отправить
+            logger.error(f"Error preprocessing {spooled['filename']}: {str(result)}")
+            UPLOAD_BYTES.labels("original").inc(os.path.getsize(spooled["path"]))
+            UPLOAD_BYTES.labels("prepared").inc(os.path.getsize(spooled["path"]))
+            prepared.append(spooled)
+            continue
+        UPLOAD_BYTES.labels("original").inc(result["original_size"])
+        UPLOAD_BYTES.labels("prepared").inc(result["size"])
+        stem = Path(spooled["filename"] or "image").stem
+        prepared.append({
+            "path": result["path"],
+            "filename": stem + Path(result["path"]).suffix,
+            "content_type": result["content_type"],
+        })
+        logger.info(
+            f"Prepared {spooled['filename']}: {result['original_size']} -> {result['size']} bytes"
+            f"{' (cached)' if result['cached'] else ''}"
+        )
+    return prepared
+
+
+def prune_cache(cache_dir: str, ttl: float) -> int:
+    """Удаляет результаты, которые не использовались дольше ttl"""
+    removed = 0
+    deadline = time.time() - ttl
+    for path in Path(cache_dir).glob("*"):
+        try:
+            if path.stat().st_mtime < deadline:
+                path.unlink()
+                removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+async def prune_cache_periodically(cache_dir: str, ttl: float, interval: float) -> None:
+    """Фоновая очистка кэша подготовленных изображений"""
+    while True:
+        try:
+            removed = await asyncio.to_thread(prune_cache, cache_dir, ttl)
+            if removed:
+                logger.info(f"Removed {removed} unused preprocessed images")
+        except Exception as e:
+            logger.error(f"Error pruning preprocessed images: {str(e)}")
+        await asyncio.sleep(interval)
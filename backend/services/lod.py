@@ -0,0 +1,208 @@
+import copy
+import os
+import re
+
+import numpy as np
+
+from backend.services.glb import read_glb, write_glb
+from backend.services.glb_optimizer import BinaryBuilder, copy_images, read_accessor, unsupported_reason
+
+# Уровни детализации (LOD) для скачанных моделей. Упрощение — кластеризация
+# вершин по сетке с выбором положения кластера по минимуму квадрик ошибки
+# (Lindstrom, "Out-of-core simplification"): хорошо векторизуется в NumPy.
+# Швы UV-развертки сохраняются: вершины разных UV-островов не склеиваются
+
+LOD_FILE_RE = re.compile(r"\.lod(\d+)\.glb$")
+
+
+def lod_filename(filename: str, level: int) -> str:
+    """model.glb → model.lod1.glb; нулевой уровень — сам исходный файл"""
+    if level == 0:
+        return filename
+    return f"{filename[:-len('.glb')]}.lod{level}.glb"
+
+
+def _charts(indices: np.ndarray, vertex_count: int) -> np.ndarray:
+    """Метки компонент связности по треугольникам (UV-острова разделены дубликатами вершин)"""
+    labels = np.arange(vertex_count)
+    triangles = indices.reshape(-1, 3)
+    while True:
+        triangle_min = labels[triangles].min(axis=1)
+        updated = labels.copy()
+        for corner in range(3):
+            np.minimum.at(updated, triangles[:, corner], triangle_min)
+        # Сжатие путей: метка указывает на корень своей компоненты
+        while True:
+            jumped = updated[updated]
+            if np.array_equal(jumped, updated):
+                break
+            updated = jumped
+        if np.array_equal(updated, labels):
+            return labels
+        labels = updated
+
+
+def _vertex_quadrics(positions: np.ndarray, triangles: np.ndarray) -> np.ndarray:
+    """Сумма квадрик плоскостей смежных треугольников (взвешенных по площади) для каждой вершины"""
+    p0, p1, p2 = (positions[triangles[:, corner]] for corner in range(3))
+    normals = np.cross(p1 - p0, p2 - p0)
+    area = np.linalg.norm(normals, axis=1)
+    unit = normals / np.where(area > 0, area, 1)[:, None]
+    planes = np.concatenate([unit, -(unit * p0).sum(axis=1, keepdims=True)], axis=1)
+    face_quadrics = planes[:, :, None] * planes[:, None, :] * (area / 2)[:, None, None]
+    quadrics = np.zeros((len(positions), 4, 4))
+    for corner in range(3):
+        np.add.at(quadrics, triangles[:, corner], face_quadrics)
+    return quadrics
+
+
+def _cluster(positions, triangles, charts, quadrics, resolution):
+    """Одна кластеризация с заданным числом ячеек по длинной оси"""
+    low = positions.min(axis=0)
+    cell_size = float((positions.max(axis=0) - low).max()) / resolution or 1.0
+    cells = np.floor((positions - low) / cell_size).astype(np.int64)
+    keys = np.concatenate([cells, charts[:, None]], axis=1)
+    _, cluster = np.unique(keys, axis=0, return_inverse=True)
+    cluster = cluster.ravel()
+
+    new_triangles = cluster[triangles]
+    valid = (
+        (new_triangles[:, 0] != new_triangles[:, 1])
+        & (new_triangles[:, 1] != new_triangles[:, 2])
+        & (new_triangles[:, 0] != new_triangles[:, 2])
+    )
+    new_triangles = new_triangles[valid]
+    # Одинаковые треугольники (с точностью до поворота) оставляем один раз
+    if len(new_triangles):
+        _, first = np.unique(np.sort(new_triangles, axis=1), axis=0, return_index=True)
+        new_triangles = new_triangles[np.sort(first)]
+    return cluster, new_triangles, cell_size, low
+
+
+def _cluster_positions(positions, cluster, quadrics, cell_size, low):
+    """Точка минимума суммарной квадрики кластера, ограниченная его ячейкой"""
+    count = cluster.max() + 1
+    cluster_quadrics = np.zeros((count, 4, 4))
+    np.add.at(cluster_quadrics, cluster, quadrics)
+    sizes = np.bincount(cluster, minlength=count)
+    means = np.zeros((count, 3))
+    np.add.at(means, cluster, positions)
+    means /= sizes[:, None]
+
+    a = cluster_quadrics[:, :3, :3]
+    b = -cluster_quadrics[:, :3, 3]
+    # Плохо обусловленные системы (плоские и вырожденные участки) — берем среднее
+    stable = np.abs(np.linalg.det(a)) > 1e-12 * np.maximum(np.abs(a).max(axis=(1, 2)), 1e-30) ** 3
+    optimal = means.copy()
+    if stable.any():
+        optimal[stable] = np.linalg.solve(a[stable], b[stable][:, :, None])[:, :, 0]
+
+    cell_low = low + np.floor((means - low) / cell_size) * cell_size
+    return np.clip(optimal, cell_low - cell_size * 0.5, cell_low + cell_size * 1.5)
+
+
+def simplify(positions: np.ndarray, indices: np.ndarray, target_triangles: int):
+    """Возвращает (representative, optimal_positions, triangles) для целевого числа треугольников"""
+    triangles = indices.reshape(-1, 3)
+    charts = _charts(indices, len(positions))
+    quadrics = _vertex_quadrics(positions, triangles)
+
+    # Бинарный поиск разрешения сетки: число треугольников растет с разрешением
+    low_res, high_res = 1, 2048
+    best = None
+    for _ in range(12):
+        resolution = (low_res + high_res) // 2
+        result = _cluster(positions, triangles, charts, quadrics, resolution)
+        if len(result[1]) > target_triangles:
+            high_res = resolution - 1
+        else:
+            best = result
+            low_res = resolution + 1
+        if low_res > high_res:
+            break
+    if best is None:
+        best = _cluster(positions, triangles, charts, quadrics, 1)
+
+    cluster, new_triangles, cell_size, low = best
+    optimal = _cluster_positions(positions, cluster, quadrics, cell_size, low)
+
+    # Атрибуты (нормали, UV) берем у вершины кластера, ближайшей к найденной точке
+    distance = np.linalg.norm(positions - optimal[cluster], axis=1)
+    order = np.lexsort((distance, cluster))
+    first = np.concatenate([[True], cluster[order][1:] != cluster[order][:-1]])
+    representative = order[first]
+    return representative, optimal, new_triangles
+
+
+def _simplify_primitive(gltf, binary, primitive, builder, ratio) -> int:
+    attributes = primitive["attributes"]
+    positions = read_accessor(gltf, binary, attributes["POSITION"]).astype(np.float64)
+    if "indices" in primitive:
+        indices = read_accessor(gltf, binary, primitive["indices"], dequantize=False).astype(np.int64).ravel()
+    else:
+        indices = np.arange(len(positions), dtype=np.int64)
+
+    target = max(1, int(len(indices) // 3 * ratio))
+    representative, optimal, triangles = simplify(positions, indices, target)
+
+    # Оставляем только кластеры, на которые ссылаются треугольники
+    used, remap = np.unique(triangles.ravel(), return_inverse=True)
+    new_attributes = {}
+    for name, accessor_index in attributes.items():
+        accessor = gltf["accessors"][accessor_index]
+        if name == "POSITION":
+            values = optimal[used]
+            dtype = read_accessor(gltf, binary, accessor_index, dequantize=False).dtype
+            if dtype.kind in "iu":
+                info = np.iinfo(dtype)
+                values = np.clip(np.round(values), info.min, info.max)
+            values = values.astype(dtype)
+        else:
+            values = read_accessor(gltf, binary, accessor_index, dequantize=False)[representative[used]]
+        new_attributes[name] = builder.add_vertex_attribute(
+            values, accessor["componentType"], bool(accessor.get("normalized")), with_bounds=name == "POSITION"
+        )
+    primitive["attributes"] = new_attributes
+    primitive["indices"] = builder.add_indices(remap, len(used))
+    return len(triangles)
+
+
+def _triangle_count(gltf: dict, primitive: dict) -> int:
+    accessor = primitive.get("indices", primitive["attributes"]["POSITION"])
+    return gltf["accessors"][accessor]["count"] // 3
+
+
+def generate_lods(path: str, ratios: list[float]) -> list[dict]:
+    """Создает файлы LOD1..N рядом с моделью; возвращает описание всех уровней, включая LOD0"""
+    source_gltf, binary = read_glb(path)
+    filename = os.path.basename(path)
+    source_triangles = sum(
+        _triangle_count(source_gltf, primitive)
+        for mesh in source_gltf.get("meshes", [])
+        for primitive in mesh["primitives"]
+    )
+    levels = [{"level": 0, "filename": filename, "triangles": source_triangles, "size": os.path.getsize(path)}]
+
+    # Квантование из оптимизатора поддерживаем, остальные расширения и анимации — нет
+    required = [name for name in source_gltf.get("extensionsRequired", []) if name != "KHR_mesh_quantization"]
+    if unsupported_reason({**source_gltf, "extensionsRequired": required}):
+        return levels
+
+    for level, ratio in enumerate(ratios, start=1):
+        gltf = copy.deepcopy(source_gltf)
+        builder = BinaryBuilder()
+        copy_images(gltf, binary, builder)
+        triangles = 0
+        for mesh in gltf.get("meshes", []):
+            for primitive in mesh["primitives"]:
+                triangles += _simplify_primitive(gltf, binary, primitive, builder, ratio)
+        gltf["accessors"] = builder.accessors
+        gltf["bufferViews"] = builder.views
+        gltf["buffers"] = [{"byteLength": len(builder.data)}]
+
+        lod_path = os.path.join(os.path.dirname(path), lod_filename(filename, level))
+        tmp_path = lod_path + ".tmp"
+        size = write_glb(tmp_path, gltf, bytes(builder.data))
+        os.replace(tmp_path, lod_path)
+        levels.append({"level": level, "filename": os.path.basename(lod_path), "triangles": triangles, "size": size})
+    return levels
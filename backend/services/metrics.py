@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+# Метрики в формате Prometheus (GET /metrics). Замер — это чтение часов и
+# инкремент счетчика под локом, поэтому инструментирование не выключается в продакшене.
+# Метки только с ограниченным набором значений: шаблон маршрута, код ответа, этап
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
+# При нескольких процессах uvicorn каждый пишет метрики в файлы этого каталога,
+# а /metrics любого процесса отдает сумму (каталог очищают перед запуском)
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+# Сетевые задержки: от миллисекунд до минуты
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Этапы задачи: от секунд до часа (локальная генерация с очередью)
+PHASE_BUCKETS = (1, 5, 10, 30, 60, 120, 300, 600, 1200, 1800, 3600)
+
+HTTP_REQUEST_DURATION = Histogram(
+    "hack3d_http_request_duration_seconds", "Время обработки HTTP-запроса",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS,
+)
+GENERATION_CALL_DURATION = Histogram(
+    "hack3d_generation_call_duration_seconds", "Запросы к источнику генерации (создание задачи и опрос статуса)",
+    ["backend", "operation", "status"], buckets=LATENCY_BUCKETS,
+)
+POLL_ATTEMPTS = Histogram(
+    "hack3d_task_poll_attempts", "Число опросов статуса на одну задачу",
+    buckets=(1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144),
+)
+UPLOAD_BYTES = Counter(
+    "hack3d_upload_bytes_total", "Размер изображений задач до и после подготовки к отправке", ["stage"]
+)
+DOWNLOAD_BYTES = Counter("hack3d_download_bytes_total", "Скачано байт файлов задач", ["kind"])
+DOWNLOAD_THROUGHPUT = Histogram(
+    "hack3d_download_throughput_bytes_per_second", "Скорость скачивания одного файла",
+    ["kind"], buckets=(64e3, 256e3, 1e6, 4e6, 16e6, 64e6, 256e6),
+)
+TASK_PHASE_DURATION = Histogram(
+    "hack3d_task_phase_duration_seconds", "Длительность этапов задачи: queued, generating, downloading",
+    ["phase"], buckets=PHASE_BUCKETS,
+)
+TASK_DURATION = Histogram(
+    "hack3d_task_duration_seconds", "Время от создания задачи до завершения",
+    ["status"], buckets=PHASE_BUCKETS,
+)
+TASKS_ACTIVE = Gauge("hack3d_tasks_active", "Незавершенные задачи", ["state"], multiprocess_mode="livesum")
+EVENT_LOOP_LAG = Gauge(
+    "hack3d_event_loop_lag_seconds", "Запаздывание event loop при последнем замере", multiprocess_mode="livemax"
+)
+EVENT_LOOP_LAG_MAX = Gauge(
+    "hack3d_event_loop_lag_max_seconds", "Наибольшее запаздывание event loop", multiprocess_mode="max"
+)
+WEBHOOK_EVENTS = Counter("hack3d_webhook_events_total", "События вебхуков Meshy по результату обработки", ["result"])
+STORAGE_BYTES = Gauge(
+    "hack3d_models_storage_bytes", "Место на диске под файлы моделей (жесткие ссылки считаются один раз)",
+    multiprocess_mode="mostrecent",
+)
+STORAGE_EVICTIONS = Counter("hack3d_models_evicted_total", "Модели, вытесненные по квоте")
+STORAGE_DEDUP_BYTES = Counter("hack3d_models_dedup_bytes_total", "Байт, сэкономленных жесткими ссылками")
+DB_OPERATION_DURATION = Histogram(
+    "hack3d_db_operation_duration_seconds", "Получение соединения из пула и запросы к базе пользователей",
+    ["operation"], buckets=LATENCY_BUCKETS,
+)
+
+
+_active_sources: dict[str, Callable[[], int]] = {}
+
+
+def render() -> bytes:
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest()
+
+
+def mark_process_dead() -> None:
+    """Живые (live*) показатели остановленного процесса больше не учитываются"""
+    if MULTIPROCESS:
+        multiprocess.mark_process_dead(os.getpid())
+
+
+@contextmanager
+def observe_db(operation: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        DB_OPERATION_DURATION.labels(operation).observe(time.perf_counter() - started)
+
+
+def observe_task_phase(phase: str, started_at, finished_at: float) -> None:
+    """Этап учитывается, только если известно его начало (у задач до появления метрик его нет)"""
+    if started_at:
+        TASK_PHASE_DURATION.labels(phase).observe(max(0.0, finished_at - started_at))
+
+
+def bind_active_tasks(queue, scheduler) -> None:
+    """Число задач в очереди отправки и на опросе обновляется вместе с замером event loop
+    (set_function в многопроцессном режиме не работает)"""
+    _active_sources.update(queued=lambda: len(queue), polling=lambda: len(scheduler))
+
+
+async def monitor_event_loop_lag(interval: float = 1.0) -> None:
+    """Насколько позже заказанного просыпается sleep() — мера блокировки event loop"""
+    loop = asyncio.get_running_loop()
+    max_lag = 0.0
+    while True:
+        started = loop.time()
+        await asyncio.sleep(interval)
+        lag = max(0.0, loop.time() - started - interval)
+        EVENT_LOOP_LAG.set(lag)
+        for state, size in _active_sources.items():
+            TASKS_ACTIVE.labels(state).set(size())
+        if lag > max_lag:
+            max_lag = lag
+            EVENT_LOOP_LAG_MAX.set(lag)
+        if lag > 0.5:
+            logger.warning(f"Event loop lagged by {lag:.3f}s")
+
+
+class MetricsMiddleware:
+    """Гистограмма времени ответа по шаблону маршрута (а не по пути с task_id)"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+
+        async def tracking_send(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, tracking_send)
+        finally:
+            route = scope.get("route")
+            HTTP_REQUEST_DURATION.labels(
+                scope["method"], getattr(route, "path", "unmatched"), str(status)
+            ).observe(time.perf_counter() - started)
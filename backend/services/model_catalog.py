@@ -0,0 +1,247 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+from backend import config
+from backend.services.generation import PREVIEW_FILE_RE
+from backend.services.glb import GLBError, read_glb_summary
+from backend.services.lod import LOD_FILE_RE
+from backend.services.model_storage import TASK_ID_RE, file_sha256, iter_model_files, shard_path
+
+logger = logging.getLogger(__name__)
+
+# Индекс моделей из MODELS_DIR для галереи: метаданные GLB читаются один раз
+# при появлении файла, а запросы каталога обслуживаются из SQLite без обращения к диску
+
+SORT_COLUMNS = {"created_at", "size", "triangles", "vertices", "filename"}
+
+_COLUMNS = (
+    "filename", "task_id", "size", "mtime_ns", "content_hash", "meshes", "primitives",
+    "vertices", "triangles", "bbox_min", "bbox_max", "thumbnail", "created_at",
+)
+# Заполняются стадией превью после индексации, повторная индексация их не сбрасывает
+_DERIVED_COLUMNS = ("thumbnails", "sprite")
+
+
+def _is_derived_model(filename: str) -> bool:
+    return bool(LOD_FILE_RE.search(filename) or PREVIEW_FILE_RE.search(filename))
+
+
+def _thumbnail_for(models_dir: str, filename: str) -> Optional[str]:
+    thumbnail = f"{filename[:-len('.glb')]}_thumbnail.png"
+    return thumbnail if os.path.exists(shard_path(models_dir, thumbnail)) else None
+
+
+class ModelCatalog:
+    """Инкрементально обновляемый индекс GLB-файлов"""
+
+    def __init__(self, db_path: str, models_dir: str):
+        self.db_path = db_path
+        self.models_dir = models_dir
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def open(self) -> None:
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS models (
+                filename TEXT PRIMARY KEY,
+                task_id TEXT,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                content_hash TEXT NOT NULL,
+                meshes INTEGER,
+                primitives INTEGER,
+                vertices INTEGER,
+                triangles INTEGER,
+                bbox_min TEXT,
+                bbox_max TEXT,
+                thumbnail TEXT,
+                created_at REAL NOT NULL,
+                thumbnails TEXT,
+                sprite TEXT
+            )
+            """
+        )
+        existing = {row[1] for row in self._conn.execute("PRAGMA table_info(models)")}
+        for column in _DERIVED_COLUMNS:
+            if column not in existing:
+                self._conn.execute(f"ALTER TABLE models ADD COLUMN {column} TEXT")
+        for column in ("created_at", "size", "triangles", "vertices"):
+            self._conn.execute(f"CREATE INDEX IF NOT EXISTS models_{column} ON models ({column})")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS models_task_id ON models (task_id)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self._conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('version', 0)")
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _bump_version(self) -> int:
+        # Инкремент в самой базе: каталог общий для всех процессов uvicorn,
+        # счетчик в памяти одного процесса терял бы изменения остальных
+        return int(self._conn.execute(
+            "UPDATE meta SET value = value + 1 WHERE key = 'version' RETURNING value"
+        ).fetchone()[0])
+
+    async def version(self) -> int:
+        """Номер изменения каталога (любым процессом) — для ETag и пересборки превью"""
+        def fetch():
+            with self._lock:
+                return int(self._conn.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0])
+        return await asyncio.to_thread(fetch)
+
+    def _index_file(self, filename: str, task_id: Optional[str] = None) -> None:
+        """Читает заголовок GLB, считает хэш и сохраняет запись (выполняется в потоке)"""
+        path = shard_path(self.models_dir, filename)
+        stat = os.stat(path)
+        try:
+            summary = read_glb_summary(path)
+        except (GLBError, ValueError, KeyError, IndexError) as e:
+            logger.warning(f"Skipping invalid GLB {filename}: {str(e)}")
+            return
+        if task_id is None:
+            match = TASK_ID_RE.search(filename)
+            task_id = match.group(0) if match else None
+        values = (
+            filename, task_id, stat.st_size, stat.st_mtime_ns, file_sha256(path),
+            summary["meshes"], summary["primitives"], summary["vertices"], summary["triangles"],
+            json.dumps(summary["bbox_min"]), json.dumps(summary["bbox_max"]),
+            _thumbnail_for(self.models_dir, filename), stat.st_mtime,
+        )
+        with self._lock:
+            self._conn.execute(
+                f"INSERT INTO models ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))}) "
+                f"ON CONFLICT (filename) DO UPDATE SET "
+                f"{', '.join(f'{column} = excluded.{column}' for column in _COLUMNS[1:])}",
+                values,
+            )
+            self._bump_version()
+
+    async def add_model(self, filename: str, task_id: Optional[str] = None) -> None:
+        """Добавляет в индекс только что скачанную модель"""
+        await asyncio.to_thread(self._index_file, filename, task_id)
+
+    async def remove_model(self, filename: str) -> None:
+        def remove():
+            with self._lock:
+                if self._conn.execute("DELETE FROM models WHERE filename = ?", (filename,)).rowcount:
+                    self._bump_version()
+        await asyncio.to_thread(remove)
+
+    async def thumbnail_entries(self) -> list[tuple[str, str, Optional[dict]]]:
+        """Модели с превью в порядке добавления: (файл, превью, уменьшенные копии)"""
+        def fetch():
+            with self._lock:
+                return self._conn.execute(
+                    "SELECT filename, thumbnail, thumbnails FROM models WHERE thumbnail IS NOT NULL "
+                    "ORDER BY created_at, filename"
+                ).fetchall()
+        rows = await asyncio.to_thread(fetch)
+        return [(filename, thumbnail, json.loads(variants) if variants else None) for filename, thumbnail, variants in rows]
+
+    async def _set_json_column(self, column: str, values: dict[str, Optional[dict]]) -> None:
+        def update():
+            changed = 0
+            with self._lock:
+                for filename, value in values.items():
+                    changed += self._conn.execute(
+                        f"UPDATE models SET {column} = ? WHERE filename = ? AND {column} IS NOT ?",
+                        (json.dumps(value, sort_keys=True), filename, json.dumps(value, sort_keys=True)),
+                    ).rowcount
+                if changed:
+                    self._bump_version()
+        await asyncio.to_thread(update)
+
+    async def set_thumbnails(self, variants: dict[str, dict]) -> None:
+        await self._set_json_column("thumbnails", variants)
+
+    async def set_sprites(self, placements: dict[str, dict]) -> None:
+        await self._set_json_column("sprite", placements)
+
+    def _rescan(self) -> tuple[int, int]:
+        with self._lock:
+            known = {
+                filename: (size, mtime_ns)
+                for filename, size, mtime_ns in self._conn.execute("SELECT filename, size, mtime_ns FROM models")
+            }
+        seen = set()
+        changed = 0
+        for entry in iter_model_files(self.models_dir):
+            # Уровни детализации и черновики принадлежат своей модели и в каталог не попадают
+            if not entry.name.endswith(".glb") or _is_derived_model(entry.name):
+                continue
+            seen.add(entry.name)
+            stat = entry.stat()
+            if known.get(entry.name) != (stat.st_size, stat.st_mtime_ns):
+                self._index_file(entry.name)
+                changed += 1
+        removed = [name for name in known if name not in seen]
+        if removed:
+            with self._lock:
+                self._conn.executemany("DELETE FROM models WHERE filename = ?", [(name,) for name in removed])
+                self._bump_version()
+        return changed, len(removed)
+
+    async def rescan(self) -> None:
+        """Сверяет индекс с содержимым MODELS_DIR по размеру и mtime"""
+        changed, removed = await asyncio.to_thread(self._rescan)
+        if changed or removed:
+            logger.info(f"Model catalog rescan: {changed} indexed, {removed} removed")
+
+    async def page(self, limit: int, offset: int, sort: str, descending: bool) -> tuple[list[dict], int]:
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"Unsupported sort field: {sort}")
+        order = "DESC" if descending else "ASC"
+
+        def fetch():
+            with self._lock:
+                total = self._conn.execute("SELECT COUNT(*) FROM models").fetchone()[0]
+                rows = self._conn.execute(
+                    f"SELECT {', '.join(_COLUMNS + _DERIVED_COLUMNS)} FROM models ORDER BY {sort} {order}, filename {order} "
+                    f"LIMIT ? OFFSET ?",
+                    (limit, offset),
+                ).fetchall()
+            return rows, total
+
+        rows, total = await asyncio.to_thread(fetch)
+        return [self._item(row) for row in rows], total
+
+    @staticmethod
+    def _item(row) -> dict:
+        values = dict(zip(_COLUMNS + _DERIVED_COLUMNS, row))
+        thumbnail = values.pop("thumbnail")
+        values.pop("mtime_ns")
+        values["bbox_min"] = json.loads(values["bbox_min"])
+        values["bbox_max"] = json.loads(values["bbox_max"])
+        for column in _DERIVED_COLUMNS:
+            values[column] = json.loads(values[column]) if values[column] else None
+        values["model_url"] = f"/models/{values['filename']}"
+        values["thumbnail_url"] = f"/models/{thumbnail}" if thumbnail else None
+        return values
+
+
+async def rescan_periodically(
+    catalog: ModelCatalog, interval: float, after_rescan: Optional[Callable[[], Awaitable[None]]] = None
+) -> None:
+    """Фоновое пересканирование: подхватывает файлы, добавленные в MODELS_DIR вручную"""
+    while True:
+        try:
+            await catalog.rescan()
+            if after_rescan is not None:
+                await after_rescan()
+        except Exception as e:
+            logger.error(f"Error rescanning model catalog: {str(e)}")
+        await asyncio.sleep(interval)
+
+
+model_catalog = ModelCatalog(config.CATALOG_DB_PATH, config.MODELS_DIR)
@@ -0,0 +1,223 @@
+import asyncio
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import secrets
+from collections import OrderedDict
+from typing import Optional
+
+import anyio
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+from backend import config
+from backend.services.model_storage import TASK_ID_RE
+
+try:
+    import brotli
+except ImportError:  # brotli необязателен: без него отдаем только gzip
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Раздача моделей: сильные ETag по хэшу содержимого, immutable-кэширование,
+# заранее сжатые варианты (.br/.gz), Range с несколькими диапазонами. Файл читается кусками
+# в потоке: uvicorn не поддерживает ASGI-расширения pathsend/zerocopysend, поэтому sendfile
+# здесь недоступен — для него раздавайте MODELS_DIR через nginx
+
+mimetypes.add_type("model/gltf-binary", ".glb")
+mimetypes.add_type("image/webp", ".webp")
+mimetypes.add_type("image/avif", ".avif")
+
+# Файлы, для которых при скачивании готовятся сжатые копии
+PRECOMPRESS_SUFFIXES = (".glb",)
+# Расширение варианта → значение Content-Encoding, в порядке предпочтения
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def precompress_file(path: str) -> None:
+    """Создает сжатые варианты файла рядом с ним (выполняется один раз при скачивании)"""
+    with open(path, "rb") as f:
+        data = f.read()
+    variants = [(".gz", lambda: gzip.compress(data, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append((".br", lambda: brotli.compress(data, quality=11)))
+    for suffix, compress in variants:
+        compressed = compress()
+        if len(compressed) >= len(data):
+            continue  # сжатие не помогло — отдаем оригинал
+        tmp_path = f"{path}{suffix}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(compressed)
+        os.replace(tmp_path, path + suffix)
+
+
+def remove_variants(path: str) -> None:
+    for _, suffix in ENCODINGS:
+        try:
+            os.remove(path + suffix)
+        except FileNotFoundError:
+            pass
+
+
+class _ETagCache:
+    """Хэши содержимого по (путь, размер, mtime): файл читается один раз"""
+
+    def __init__(self, max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[int, int, str]] = OrderedDict()
+
+    async def get(self, path: str, stat: os.stat_result) -> str:
+        cached = self._entries.get(path)
+        if cached and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+            self._entries.move_to_end(path)
+            return cached[2]
+        etag = '"' + await asyncio.to_thread(self._hash, path) + '"'
+        self._entries[path] = (stat.st_size, stat.st_mtime_ns, etag)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return etag
+
+    @staticmethod
+    def _hash(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+
+etag_cache = _ETagCache()
+
+
+def parse_accept_encoding(header: str) -> dict[str, float]:
+    accepted = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip().lower()] = q
+    return accepted
+
+
+def parse_range(header: str, size: int, max_ranges: int) -> Optional[list[tuple[int, int]]]:
+    """Разбирает Range: bytes=... в список (start, end) включительно.
+
+    Возвращает None, если заголовок нужно проигнорировать, и [] — если диапазоны невыполнимы.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or not spec:
+        return None
+    ranges = []
+    for part in spec.split(","):
+        start_text, sep, end_text = part.strip().partition("-")
+        if not sep:
+            return None
+        try:
+            if start_text:
+                start = int(start_text)
+                end = int(end_text) if end_text else size - 1
+            else:
+                suffix = int(end_text)
+                if suffix == 0:
+                    continue
+                start, end = max(size - suffix, 0), size - 1
+        except ValueError:
+            return None
+        if start > end and end_text:
+            return None
+        if start >= size:
+            continue
+        ranges.append((start, min(end, size - 1)))
+    if len(ranges) > max_ranges:
+        return None  # слишком много диапазонов — отдаем файл целиком
+    return ranges
+
+
+class ModelFileResponse(Response):
+    """Отдает файл целиком или по диапазонам, читая его кусками в потоке"""
+
+    def __init__(
+        self,
+        path: str,
+        size: int,
+        headers: dict,
+        status_code: int = 200,
+        ranges: Optional[list[tuple[int, int]]] = None,
+        content_type: str = "application/octet-stream",
+        send_body: bool = True,
+    ):
+        self.path = path
+        self.size = size
+        self.status_code = status_code
+        self.background = None
+        self.send_body = send_body
+        self.chunk_size = config.MODELS_SEND_CHUNK_SIZE
+        headers = dict(headers)
+
+        if ranges and len(ranges) > 1:
+            # multipart/byteranges: каждая часть со своими заголовками
+            boundary = secrets.token_hex(16)
+            self.parts = []
+            length = 0
+            for start, end in ranges:
+                part_head = (
+                    f"--{boundary}\r\nContent-Type: {content_type}\r\n"
+                    f"Content-Range: bytes {start}-{end}/{size}\r\n\r\n"
+                ).encode()
+                self.parts.append((part_head, start, end - start + 1))
+                length += len(part_head) + end - start + 1 + 2
+            self.closing = f"--{boundary}--\r\n".encode()
+            length += len(self.closing)
+            headers["Content-Type"] = f"multipart/byteranges; boundary={boundary}"
+        else:
+            start, end = ranges[0] if ranges else (0, size - 1)
+            self.parts = [(b"", start, end - start + 1)]
+            self.closing = b""
+            length = end - start + 1
+            headers["Content-Type"] = content_type
+            if ranges:
+                headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        headers["Content-Length"] = str(max(length, 0))
+        self.raw_headers = [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers.items()]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if not self.send_body:
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        with open(self.path, "rb") as f:
+            for index, (part_head, offset, count) in enumerate(self.parts):
+                if part_head:
+                    await send({"type": "http.response.body", "body": part_head, "more_body": True})
+                await self._send_chunks(f, offset, count, send)
+                if self.closing:
+                    await send({"type": "http.response.body", "body": b"\r\n", "more_body": True})
+            await send({"type": "http.response.body", "body": self.closing})
+
+    async def _send_chunks(self, f, offset: int, count: int, send: Send) -> None:
+        await anyio.to_thread.run_sync(f.seek, offset)
+        while count > 0:
+            chunk = await anyio.to_thread.run_sync(f.read, min(self.chunk_size, count))
+            if not chunk:
+                break
+            count -= len(chunk)
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+
+
+def cache_control_for(filename: str) -> str:
+    """Файлы с task_id в имени после записи не меняются — кэшируем навсегда"""
+    if TASK_ID_RE.search(filename):
+        return f"public, max-age={config.MODELS_CACHE_MAX_AGE}, immutable"
+    return "no-cache"
+
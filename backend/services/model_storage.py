@@ -0,0 +1,401 @@
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, Iterator, Optional
+
+from backend import config
+from backend.services.glb_optimizer import ORIGINAL_SUFFIX
+from backend.services.metrics import STORAGE_BYTES, STORAGE_DEDUP_BYTES, STORAGE_EVICTIONS
+
+logger = logging.getLogger(__name__)
+
+# Хранилище файлов моделей. Все файлы задачи (модель, LOD, сжатые варианты,
+# текстуры, превью) лежат в одном подкаталоге MODELS_DIR/ab/cd/ по хэшу task_id,
+# поэтому ни один каталог не разрастается. Общие файлы (спрайт-листы галереи,
+# модели, добавленные вручную) остаются в корне. Индекс в SQLite хранит размеры,
+# хэши содержимого и время последнего обращения: одинаковые файлы заменяются
+# жесткими ссылками, а при превышении квоты удаляются давно не запрашивавшиеся модели
+
+TASK_ID_RE = re.compile(r"[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}")
+# Файлы в процессе записи и оригиналы до оптимизации GLB: в индекс и квоту не попадают
+UNINDEXED_SUFFIXES = (".part", ".tmp", ORIGINAL_SUFFIX)
+_SHARD_RE = re.compile(r"^[0-9a-f]{2}$")
+
+EvictFn = Callable[[str, list[str]], Awaitable[None]]
+
+
+def task_id_of(filename: str) -> Optional[str]:
+    match = TASK_ID_RE.search(filename)
+    return match.group(0) if match else None
+
+
+def shard_path(models_dir: str, filename: str) -> str:
+    """x_<task_id>.glb → MODELS_DIR/ab/cd/x_<task_id>.glb; файлы без task_id — в корне.
+
+    task_id хэшируется: идентификаторы Meshy упорядочены по времени и делили бы подкаталоги неравномерно.
+    """
+    task_id = task_id_of(filename)
+    if task_id is None:
+        return os.path.join(models_dir, filename)
+    digest = hashlib.sha1(task_id.encode()).hexdigest()
+    return os.path.join(models_dir, digest[:2], digest[2:4], filename)
+
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _shards(path: str) -> Iterator[os.DirEntry]:
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir() and _SHARD_RE.match(entry.name):
+                yield entry
+
+
+def iter_model_files(models_dir: str) -> Iterator[os.DirEntry]:
+    """Все готовые файлы MODELS_DIR: корень и подкаталоги задач"""
+    def files(path: str) -> Iterator[os.DirEntry]:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_file() and not entry.name.endswith(UNINDEXED_SUFFIXES):
+                    yield entry
+
+    yield from files(models_dir)
+    for top in _shards(models_dir):
+        for shard in _shards(top.path):
+            yield from files(shard.path)
+
+
+class ModelStorage:
+    """Индекс файлов моделей: учет места, дедупликация и вытеснение по квоте"""
+
+    def __init__(
+        self,
+        db_path: str,
+        models_dir: str,
+        quota_bytes: int = config.MODELS_QUOTA_BYTES,
+        low_watermark: float = config.MODELS_QUOTA_LOW_WATERMARK,
+        min_age: float = config.MODELS_EVICT_MIN_AGE,
+    ):
+        self.db_path = db_path
+        self.models_dir = models_dir
+        self.quota_bytes = quota_bytes
+        self.low_watermark = low_watermark
+        self.min_age = min_age
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        # Обращения копятся в памяти и записываются в индекс пачкой
+        self._accessed: dict[str, float] = {}
+        self._runner: Optional[asyncio.Task] = None
+
+    def path(self, filename: str) -> str:
+        return shard_path(self.models_dir, filename)
+
+    def open(self) -> None:
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        Path(self.models_dir).mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # Группа — все файлы одной задачи (или отдельный файл без task_id); вытесняется целиком
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS files (
+                filename TEXT PRIMARY KEY,
+                group_key TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                inode INTEGER NOT NULL,
+                sha256 TEXT NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS files_group ON files (group_key)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS files_sha256 ON files (sha256)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS files_inode ON files (inode)")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS groups (
+                group_key TEXT PRIMARY KEY,
+                task_id TEXT,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS groups_accessed ON groups (accessed_at)")
+        moved = self._migrate_flat_files()
+        if moved:
+            logger.info(f"Moved {moved} model files into sharded directories")
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _migrate_flat_files(self) -> int:
+        """Файлы задач из плоского MODELS_DIR (до разбиения на подкаталоги) переносятся на свои места"""
+        moved = 0
+        with os.scandir(self.models_dir) as entries:
+            for entry in entries:
+                if not entry.is_file() or task_id_of(entry.name) is None:
+                    continue
+                target = self.path(entry.name)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                try:
+                    os.replace(entry.path, target)
+                except FileNotFoundError:
+                    continue  # перенес другой процесс
+                moved += 1
+        return moved
+
+    def touch(self, filename: str) -> None:
+        """Отмечает обращение к файлу (вызывается при раздаче)"""
+        self._accessed[task_id_of(filename) or filename] = time.time()
+
+    def _flush_accessed(self) -> None:
+        accessed, self._accessed = self._accessed, {}
+        if not accessed:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE groups SET accessed_at = MAX(accessed_at, ?) WHERE group_key = ?",
+                [(accessed_at, group_key) for group_key, accessed_at in accessed.items()],
+            )
+
+    def _link_duplicate(self, path: str, filename: str, sha256: str, stat: os.stat_result) -> bool:
+        """Заменяет файл жесткой ссылкой на уже известный файл с тем же содержимым"""
+        with self._lock:
+            candidates = self._conn.execute(
+                "SELECT filename, mtime_ns FROM files WHERE sha256 = ? AND size = ? AND filename != ?",
+                (sha256, stat.st_size, filename),
+            ).fetchall()
+        for candidate, mtime_ns in candidates:
+            existing = self.path(candidate)
+            try:
+                existing_stat = os.stat(existing)
+            except FileNotFoundError:
+                continue
+            if existing_stat.st_ino == stat.st_ino:
+                return False  # уже одна копия
+            # Файл изменился после индексации или лежит на другом разделе
+            if existing_stat.st_mtime_ns != mtime_ns or existing_stat.st_dev != stat.st_dev:
+                continue
+            tmp_path = f"{path}.link.tmp"
+            try:
+                os.link(existing, tmp_path)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                # Например, исчерпан лимит ссылок на inode
+                logger.warning(f"Could not hardlink {filename} to {candidate}: {str(e)}")
+                continue
+            STORAGE_DEDUP_BYTES.inc(stat.st_size)
+            return True
+        return False
+
+    def _index_file(self, filename: str, accessed_at: float) -> bool:
+        """Добавляет файл в индекс; возвращает True, если файл заменен жесткой ссылкой"""
+        path = self.path(filename)
+        stat = os.stat(path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime_ns, inode FROM files WHERE filename = ?", (filename,)
+            ).fetchone()
+        if row == (stat.st_size, stat.st_mtime_ns, stat.st_ino):
+            return False
+        sha256 = file_sha256(path)
+        linked = self._link_duplicate(path, filename, sha256, stat)
+        if linked:
+            stat = os.stat(path)
+        task_id = task_id_of(filename)
+        group_key = task_id or filename
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO files (filename, group_key, size, mtime_ns, inode, sha256) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (filename) DO UPDATE SET size = excluded.size, mtime_ns = excluded.mtime_ns, "
+                "inode = excluded.inode, sha256 = excluded.sha256",
+                (filename, group_key, stat.st_size, stat.st_mtime_ns, stat.st_ino, sha256),
+            )
+            self._conn.execute(
+                "INSERT OR IGNORE INTO groups (group_key, task_id, accessed_at) VALUES (?, ?, ?)",
+                (group_key, task_id, accessed_at),
+            )
+        return linked
+
+    def _task_files(self, task_id: str) -> list[str]:
+        """Файлы задачи в ее подкаталоге (читается один небольшой каталог)"""
+        directory = os.path.dirname(self.path(task_id))
+        try:
+            with os.scandir(directory) as entries:
+                return [entry.name for entry in entries if entry.is_file() and task_id in entry.name]
+        except FileNotFoundError:
+            return []
+
+    def _register_task(self, task_id: str) -> list[str]:
+        now = time.time()
+        linked = []
+        for filename in self._task_files(task_id):
+            if filename.endswith(UNINDEXED_SUFFIXES):
+                continue
+            try:
+                if self._index_file(filename, now):
+                    linked.append(filename)
+            except FileNotFoundError:
+                continue
+        return linked
+
+    async def register_task(self, task_id: str) -> list[str]:
+        """Индексирует файлы завершенной задачи; возвращает файлы, замененные жесткими ссылками"""
+        return await asyncio.to_thread(self._register_task, task_id)
+
+    def _remove_group(self, group_key: str) -> tuple[int, list[str]]:
+        """Удаляет файлы группы; возвращает освобожденные байты и имена файлов"""
+        with self._lock:
+            indexed = [row[0] for row in self._conn.execute(
+                "SELECT filename FROM files WHERE group_key = ?", (group_key,)
+            )]
+        # Непроиндексированные файлы задачи (недокачанные, производные превью) удаляются тоже
+        filenames = set(indexed)
+        if TASK_ID_RE.fullmatch(group_key):
+            filenames.update(self._task_files(group_key))
+        freed = 0
+        removed = []
+        for filename in sorted(filenames):
+            path = self.path(filename)
+            try:
+                stat = os.stat(path)
+                os.remove(path)
+            except FileNotFoundError:
+                continue
+            # Место освобождается, только если это была последняя ссылка на inode
+            if stat.st_nlink == 1:
+                freed += stat.st_size
+            removed.append(filename)
+        with self._lock:
+            self._conn.execute("DELETE FROM files WHERE group_key = ?", (group_key,))
+            self._conn.execute("DELETE FROM groups WHERE group_key = ?", (group_key,))
+        if TASK_ID_RE.fullmatch(group_key):
+            shard = os.path.dirname(self.path(group_key))
+            for directory in (shard, os.path.dirname(shard)):
+                try:
+                    os.rmdir(directory)
+                except OSError:
+                    break  # в подкаталоге остались файлы других задач
+        return freed, removed
+
+    async def remove_task(self, task_id: str) -> list[str]:
+        """Удаляет все файлы задачи; возвращает их имена"""
+        _, removed = await asyncio.to_thread(self._remove_group, task_id)
+        return removed
+
+    def _usage(self) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM (SELECT MAX(size) AS size FROM files GROUP BY inode)"
+            ).fetchone()[0]
+
+    def _eviction_candidates(self, limit: int) -> list[tuple[str, str]]:
+        """Группы задач в порядке давности последнего обращения"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT group_key, task_id FROM groups WHERE task_id IS NOT NULL AND accessed_at < ? "
+                "ORDER BY accessed_at LIMIT ?",
+                (time.time() - self.min_age, limit),
+            ).fetchall()
+
+    async def collect(self, on_evict: Optional[EvictFn] = None) -> int:
+        """Записывает накопленные обращения и при превышении квоты вытесняет давно не запрашивавшиеся модели"""
+        await asyncio.to_thread(self._flush_accessed)
+        usage = await asyncio.to_thread(self._usage)
+        STORAGE_BYTES.set(usage)
+        if not self.quota_bytes or usage <= self.quota_bytes:
+            return 0
+        # Освобождаем с запасом, чтобы не вытеснять по одной модели на каждой проверке
+        target = self.quota_bytes * self.low_watermark
+        evicted = 0
+        while usage > target:
+            candidates = await asyncio.to_thread(self._eviction_candidates, 100)
+            if not candidates:
+                logger.warning(f"Model storage uses {usage} bytes over quota {self.quota_bytes}, nothing to evict")
+                break
+            for group_key, task_id in candidates:
+                if usage <= target:
+                    break
+                freed, removed = await asyncio.to_thread(self._remove_group, group_key)
+                usage -= freed
+                evicted += 1
+                STORAGE_EVICTIONS.inc()
+                logger.info(f"Evicted model files of task {task_id}: {len(removed)} files, {freed} bytes")
+                if on_evict is not None:
+                    await on_evict(task_id, removed)
+        STORAGE_BYTES.set(usage)
+        return evicted
+
+    def _reconcile(self) -> tuple[int, int]:
+        """Сверяет индекс с диском: новые и измененные файлы индексируются, исчезнувшие — удаляются"""
+        with self._lock:
+            known = {row[0] for row in self._conn.execute("SELECT filename FROM files")}
+        now = time.time()
+        seen = set()
+        indexed = 0
+        for entry in iter_model_files(self.models_dir):
+            seen.add(entry.name)
+            try:
+                self._index_file(entry.name, now)
+            except FileNotFoundError:
+                continue
+            indexed += entry.name not in known
+        missing = known - seen
+        with self._lock:
+            self._conn.executemany("DELETE FROM files WHERE filename = ?", [(name,) for name in missing])
+            self._conn.execute("DELETE FROM groups WHERE group_key NOT IN (SELECT group_key FROM files)")
+        return indexed, len(missing)
+
+    async def reconcile(self) -> None:
+        indexed, missing = await asyncio.to_thread(self._reconcile)
+        if indexed or missing:
+            logger.info(f"Model storage reconcile: {indexed} indexed, {missing} removed")
+
+    def start(self, on_evict: EvictFn, after_collect: Optional[Callable[[], Awaitable[None]]] = None,
+              interval: float = config.MODELS_GC_INTERVAL) -> None:
+        if self._runner is None:
+            self._runner = asyncio.create_task(self._run(on_evict, after_collect, interval))
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+            self._runner = None
+        try:
+            await asyncio.to_thread(self._flush_accessed)
+        except Exception as e:
+            logger.error(f"Error saving model access times: {str(e)}")
+
+    async def _run(self, on_evict: EvictFn, after_collect: Optional[Callable[[], Awaitable[None]]],
+                   interval: float) -> None:
+        # Файлы, появившиеся без ведома индекса (до обновления, вручную), учитываются один раз при старте
+        try:
+            await self.reconcile()
+        except Exception as e:
+            logger.error(f"Error reconciling model storage: {str(e)}")
+        while True:
+            try:
+                if await self.collect(on_evict) and after_collect is not None:
+                    await after_collect()
+            except Exception as e:
+                logger.error(f"Error collecting model storage: {str(e)}")
+            await asyncio.sleep(interval)
+
+
+model_storage = ModelStorage(config.STORAGE_DB_PATH, config.MODELS_DIR)
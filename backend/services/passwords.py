@@ -0,0 +1,42 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from passlib.context import CryptContext
+
+from backend import config
+
+# bcrypt занимает сотни миллисекунд CPU, поэтому хэширование и проверка идут
+# в отдельном ограниченном пуле потоков, а не в event loop. Число потоков
+# ограничивает и параллельность: поток логинов не вытесняет остальную работу
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=config.BCRYPT_ROUNDS)
+
+
+class PasswordHasher:
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def start(self) -> None:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bcrypt")
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def _run(self, fn, *args):
+        self.start()
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(pwd_context.hash, password)
+
+    async def verify(self, password: str, hashed: str) -> tuple[bool, Optional[str]]:
+        """Проверяет пароль; второй элемент — новый хэш, если сменилась стоимость bcrypt"""
+        return await self._run(pwd_context.verify_and_update, password, hashed)
+
+
+password_hasher = PasswordHasher(config.BCRYPT_WORKERS)
@@ -0,0 +1,253 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
+
+from fastapi import Request
+
+from backend import config
+from backend.services.metrics import POLL_ATTEMPTS
+from backend.services.rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Единый планировщик опроса задач: вместо отдельной корутины со sleep()
+# на каждую задачу все ожидающие задачи лежат в куче по времени следующего опроса
+
+
+@dataclass
+class PollOutcome:
+    """Результат одного опроса задачи"""
+    done: bool
+    progress: int = 0
+    error: bool = False
+
+
+@dataclass
+class _PolledTask:
+    task_id: str
+    kind: str
+    deadline: float
+    started_at: float
+    interval: float
+    last_progress: int = -1
+    errors: int = 0
+    attempts: int = 0
+    due: float = 0.0          # срок действующей записи в куче; остальные записи задачи устарели
+    polling: bool = False
+    repoll: bool = False      # внеочередной опрос запрошен во время текущего
+    event: Optional[dict] = None  # присланный источником статус — опрос обойдется без запроса
+
+
+PollFn = Callable[[str, str, Optional[dict]], Awaitable[PollOutcome]]
+TimeoutFn = Callable[[str, str], Awaitable[None]]
+FinishFn = Callable[[str], None]
+
+
+class PollScheduler:
+    """Опрашивает все задачи из одной корутины с адаптивными интервалами"""
+
+    def __init__(
+        self,
+        poll_fn: PollFn,
+        on_timeout: TimeoutFn,
+        on_finished: Optional[FinishFn] = None,
+        min_interval: float = config.POLL_MIN_INTERVAL,
+        max_interval: float = config.POLL_MAX_INTERVAL,
+        error_interval: float = config.POLL_ERROR_INTERVAL,
+        requests_per_second: float = config.POLL_REQUESTS_PER_SECOND,
+        max_concurrency: int = config.POLL_MAX_CONCURRENCY,
+        initial_delay: float = 0.0,
+    ):
+        self._poll_fn = poll_fn
+        self._on_timeout = on_timeout
+        # Вызывается, когда задача уходит из опроса по любой причине
+        self._on_finished = on_finished
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.error_interval = error_interval
+        # Пауза до первого опроса новой задачи (при вебхуках о завершении сообщит источник)
+        self.initial_delay = initial_delay
+        self._budget = TokenBucket(rate=requests_per_second, capacity=max(1.0, requests_per_second))
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._heap: list[tuple[float, int, str]] = []
+        self._tasks: dict[str, _PolledTask] = {}
+        self._counter = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._runner: Optional[asyncio.Task] = None
+        self._inflight: set[asyncio.Task] = set()
+        # Скользящая доля ошибок по всем задачам: при сбоях Meshy замедляем весь опрос
+        self._error_rate = 0.0
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def task_ids(self) -> list[str]:
+        return list(self._tasks)
+
+    def schedule(self, task_id: str, kind: str, timeout: float, delay: Optional[float] = None) -> None:
+        """Ставит задачу на опрос; повторная постановка той же задачи игнорируется"""
+        if task_id in self._tasks:
+            return
+        if delay is None:
+            delay = self.initial_delay
+        now = time.monotonic()
+        self._tasks[task_id] = _PolledTask(
+            task_id=task_id,
+            kind=kind,
+            deadline=now + timeout,
+            started_at=now,
+            interval=self.min_interval,
+        )
+        self._push(task_id, now + delay)
+
+    def poll_now(self, task_id: str, event: Optional[dict] = None) -> bool:
+        """Внеочередной опрос (источник прислал событие); False — задача опрашивается не этим процессом"""
+        task = self._tasks.get(task_id)
+        if task is None:
+            return False
+        task.event = event
+        if task.polling:
+            task.repoll = True
+        else:
+            self._push(task_id, time.monotonic())
+        return True
+
+    def cancel(self, task_id: str) -> None:
+        """Снимает задачу с опроса (запись в куче отбрасывается лениво)"""
+        task = self._tasks.pop(task_id, None)
+        if task is not None:
+            self._finished(task)
+
+    def start(self) -> None:
+        if self._runner is None:
+            self._runner = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+            self._runner = None
+        for task in list(self._inflight):
+            task.cancel()
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+
+    def _push(self, task_id: str, due: float) -> None:
+        self._tasks[task_id].due = due
+        heapq.heappush(self._heap, (due, next(self._counter), task_id))
+        self._wakeup.set()
+
+    async def _run(self) -> None:
+        while True:
+            if not self._heap:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            due, _, task_id = self._heap[0]
+            delay = due - time.monotonic()
+            if delay > 0:
+                # Спим до ближайшего срока, но просыпаемся, если пришла более срочная задача
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heapq.heappop(self._heap)
+            task = self._tasks.get(task_id)
+            if task is None or task.due != due:
+                continue  # задачу сняли с опроса или перенесли внеочередным опросом
+
+            if time.monotonic() >= task.deadline:
+                self._tasks.pop(task_id, None)
+                self._finished(task)
+                logger.warning(f"Task {task_id} timed out after {task.attempts} poll attempts")
+                self._spawn(self._on_timeout(task_id, task.kind))
+                continue
+
+            wait = self._budget.take()
+            if wait > 0:
+                # Бюджет исчерпан: переносим задачу, не блокируя остальные
+                self._push(task_id, time.monotonic() + wait)
+                continue
+
+            await self._semaphore.acquire()
+            task.polling = True
+            self._spawn(self._poll(task))
+
+    def _finished(self, task: _PolledTask) -> None:
+        POLL_ATTEMPTS.observe(task.attempts)
+        if self._on_finished is not None:
+            self._on_finished(task.task_id)
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.create_task(coro)
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    async def _poll(self, task: _PolledTask) -> None:
+        try:
+            event, task.event = task.event, None
+            if event is None:
+                task.attempts += 1  # в метрике — только запросы статуса к источнику
+            try:
+                outcome = await self._poll_fn(task.task_id, task.kind, event)
+            except Exception as e:
+                logger.error(f"Exception during status check for {task.task_id}: {str(e)}")
+                outcome = PollOutcome(done=False, progress=max(task.last_progress, 0), error=True)
+        finally:
+            task.polling = False
+            self._semaphore.release()
+
+        self._error_rate = 0.9 * self._error_rate + 0.1 * (1.0 if outcome.error else 0.0)
+
+        if outcome.done:
+            if self._tasks.get(task.task_id) is task:
+                self._tasks.pop(task.task_id)
+                self._finished(task)
+            return
+        if self._tasks.get(task.task_id) is not task:
+            return  # задачу отменили, пока шел запрос
+
+        interval = self._next_interval(task, outcome)
+        if task.repoll:
+            task.repoll = False
+            interval = 0.0
+        self._push(task.task_id, time.monotonic() + interval)
+
+    def _next_interval(self, task: _PolledTask, outcome: PollOutcome) -> float:
+        if outcome.error:
+            task.errors += 1
+            interval = self.error_interval * (2 ** min(task.errors - 1, 5))
+        else:
+            task.errors = 0
+            elapsed = time.monotonic() - task.started_at
+            if 0 < outcome.progress < 100:
+                # Оцениваем оставшееся время по скорости прогресса и опрашиваем
+                # несколько раз до ожидаемого завершения
+                remaining = elapsed * (100 - outcome.progress) / outcome.progress
+                interval = remaining / 4
+            elif outcome.progress == task.last_progress:
+                interval = task.interval * 1.5
+            else:
+                interval = task.interval
+            task.last_progress = outcome.progress
+
+        # Высокая доля ошибок по сервису — растягиваем интервалы всех задач
+        interval *= 1 + 4 * self._error_rate
+        task.interval = min(self.max_interval, max(self.min_interval, interval))
+        return task.interval
+
+
+def get_poll_scheduler(request: Request) -> PollScheduler:
+    """Зависимость FastAPI: планировщик опроса, созданный в lifespan приложения"""
+    return request.app.state.poll_scheduler
@@ -0,0 +1,54 @@
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+# Общие примитивы ограничения частоты запросов к источнику генерации
+
+
+@dataclass
+class TokenBucket:
+    """Токен-бакет: rate токенов в секунду, не больше capacity про запас"""
+    rate: float
+    capacity: float
+    tokens: float = field(init=False)
+    updated: float = field(default_factory=time.monotonic)
+
+    def __post_init__(self):
+        self.tokens = self.capacity
+
+    def available(self) -> float:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return self.tokens
+
+    def wait_time(self) -> float:
+        """Сколько ждать до свободного токена (токен не расходуется)"""
+        return max(0.0, (1 - self.available()) / self.rate)
+
+    def take(self) -> float:
+        """Забирает токен, если он есть; иначе возвращает время ожидания"""
+        wait = self.wait_time()
+        if wait == 0:
+            self.tokens -= 1
+        return wait
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After в секундах: заголовок бывает числом секунд или HTTP-датой"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return max(0.0, (moment - datetime.now(timezone.utc)).total_seconds())
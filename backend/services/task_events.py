@@ -0,0 +1,82 @@
+import asyncio
+from typing import AsyncIterator, Optional
+
+# Рассылка обновлений статуса задач подписчикам (SSE / WebSocket).
+# Каждое обновление сериализуется один раз и отдается всем подписчикам задачи
+
+
+class _Channel:
+    def __init__(self):
+        self.version = 0
+        self.payload: Optional[str] = None
+        self.changed = asyncio.Event()
+        self.subscribers = 0
+
+
+class TaskEventHub:
+    """Хранит последнее событие по каждой задаче и будит ее подписчиков"""
+
+    def __init__(self):
+        self._channels: dict[str, _Channel] = {}
+
+    def publish(self, task_id: str, payload: str) -> None:
+        """Публикует новое состояние задачи (payload — готовый JSON)"""
+        channel = self._channels.get(task_id)
+        if channel is None:
+            return  # нет подписчиков — новые получат снимок из хранилища
+        channel.version += 1
+        channel.payload = payload
+        # Будим всех ожидающих одним событием и сразу готовим следующее
+        changed, channel.changed = channel.changed, asyncio.Event()
+        changed.set()
+
+    def subscribers(self, task_id: str) -> int:
+        channel = self._channels.get(task_id)
+        return channel.subscribers if channel else 0
+
+    def subscribe(self, task_id: str, heartbeat: float) -> "Subscription":
+        """Регистрирует подписчика сразу, до первого чтения событий"""
+        channel = self._channels.setdefault(task_id, _Channel())
+        channel.subscribers += 1
+        return Subscription(self, task_id, channel, heartbeat)
+
+    def _release(self, task_id: str, channel: _Channel) -> None:
+        channel.subscribers -= 1
+        if channel.subscribers == 0 and self._channels.get(task_id) is channel:
+            del self._channels[task_id]
+
+
+class Subscription:
+    """Поток событий одной задачи; None — сигнал отправить heartbeat"""
+
+    def __init__(self, hub: TaskEventHub, task_id: str, channel: _Channel, heartbeat: float):
+        self._hub = hub
+        self._task_id = task_id
+        self._channel = channel
+        self._heartbeat = heartbeat
+        self._seen = channel.version
+        self._closed = False
+
+    def __aiter__(self) -> AsyncIterator[Optional[str]]:
+        return self
+
+    async def __anext__(self) -> Optional[str]:
+        if self._closed:
+            raise StopAsyncIteration
+        channel = self._channel
+        if channel.version == self._seen:
+            try:
+                await asyncio.wait_for(channel.changed.wait(), timeout=self._heartbeat)
+            except asyncio.TimeoutError:
+                return None
+        self._seen = channel.version
+        return channel.payload
+
+    def close(self) -> None:
+        if not self._closed:
+            self._closed = True
+            self._hub._release(self._task_id, self._channel)
+
+
+# Хаб один на процесс: его наполняет планировщик опроса, читают эндпоинты стриминга
+task_events = TaskEventHub()
@@ -0,0 +1,106 @@
+import asyncio
+import logging
+import os
+import socket
+import uuid
+from typing import Awaitable, Callable, Iterable, Optional
+
+from backend import config
+from backend.services.task_store import TaskRecord, TaskStore, task_store
+
+logger = logging.getLogger(__name__)
+
+# Координация нескольких процессов uvicorn через общее хранилище задач.
+# Незавершенной задачей (в очереди отправки или на опросе) занимается только
+# процесс, владеющий ее арендой. Владелец продлевает аренду, пока жив;
+# аренды упавшего процесса истекают, и его задачи подбирают остальные
+
+OwnedFn = Callable[[], Iterable[str]]
+LostFn = Callable[[str], None]
+AdoptFn = Callable[[list[TaskRecord]], Awaitable[None]]
+
+
+class TaskLeases:
+    """Аренды задач этого процесса: взятие, продление и подбор задач без владельца"""
+
+    def __init__(
+        self,
+        store: TaskStore,
+        ttl: float = config.TASK_LEASE_TTL,
+        renew_interval: float = config.TASK_LEASE_RENEW_INTERVAL,
+        claim_limit: int = config.TASK_LEASE_CLAIM_LIMIT,
+    ):
+        self.store = store
+        self.ttl = ttl
+        self.renew_interval = renew_interval
+        self.claim_limit = claim_limit
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._owned: Optional[OwnedFn] = None
+        self._on_lost: Optional[LostFn] = None
+        self._adopt: Optional[AdoptFn] = None
+        self._runner: Optional[asyncio.Task] = None
+
+    async def acquire(self, task_id: str) -> bool:
+        return task_id in await self.store.acquire_leases([task_id], self.owner, self.ttl)
+
+    async def claim_orphans(self) -> int:
+        """Берет задачи без действующей аренды и передает их в очередь или на опрос"""
+        if self._adopt is None:
+            return 0
+        orphans = await self.store.list_orphaned(self.claim_limit)
+        if not orphans:
+            return 0
+        acquired = await self.store.acquire_leases([record.task_id for record in orphans], self.owner, self.ttl)
+        # Другой процесс мог успеть взять часть задач между выборкой и арендой
+        adopted = [record for record in orphans if record.task_id in acquired]
+        if adopted:
+            await self._adopt(adopted)
+        return len(adopted)
+
+    async def renew(self) -> None:
+        """Продлевает аренды своих задач; задачи с перехваченной арендой отпускает"""
+        owned = list(self._owned()) if self._owned is not None else []
+        if not owned:
+            return
+        renewed = await self.store.acquire_leases(owned, self.owner, self.ttl)
+        for task_id in owned:
+            if task_id not in renewed:
+                # Процесс не продлевал аренду дольше ttl (например, event loop был заблокирован)
+                logger.warning(f"Lease on task {task_id} was taken over by another worker")
+                self._on_lost(task_id)
+
+    def start(self, owned: OwnedFn, on_lost: LostFn, adopt: AdoptFn) -> None:
+        self._owned = owned
+        self._on_lost = on_lost
+        self._adopt = adopt
+        if self._runner is None:
+            self._runner = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Отпускает аренды, чтобы остальные процессы подобрали задачи сразу, а не через ttl"""
+        if self._runner is not None:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+            self._runner = None
+        try:
+            await self.store.release_leases(self.owner)
+        except Exception as e:
+            logger.error(f"Error releasing task leases: {str(e)}")
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.renew()
+                claimed = await self.claim_orphans()
+                if claimed:
+                    logger.info(f"Picked up {claimed} tasks without an owner")
+            except Exception as e:
+                logger.error(f"Error maintaining task leases: {str(e)}")
+            await asyncio.sleep(self.renew_interval)
+
+
+# Один экземпляр на процесс: владелец аренд — этот процесс uvicorn
+task_leases = TaskLeases(task_store)
@@ -0,0 +1,624 @@
+import asyncio
+import base64
+import json
+import logging
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
+
+from backend import config
+
+logger = logging.getLogger(__name__)
+
+# Долговременное хранилище задач генерации вместо словаря в памяти.
+# Локально — SQLite (WAL), в продакшене — PostgreSQL через asyncpg
+
+# Статусы, после которых задача больше не меняется
+TERMINAL_STATUSES = {"SUCCEEDED", "FAILED", "CANCELED", "TIMEOUT", "ERROR"}
+
+# Поля ответа Meshy, которые нужны клиентам; остальное не храним
+MESHY_DATA_FIELDS = ("model_urls", "thumbnail_url", "texture_urls", "created_at", "finished_at", "stage")
+
+_COLUMNS = (
+    "task_id", "type", "status", "progress", "created_at", "updated_at",
+    "error", "local_model_path", "local_thumbnail_path", "data", "extra",
+)
+_UPDATABLE = set(_COLUMNS) - {"task_id", "created_at", "updated_at"}
+
+
+def _column_values(fields: dict) -> dict:
+    """Значения колонок для UPDATE: проверка имен, updated_at и JSON-колонки"""
+    unknown = set(fields) - _UPDATABLE
+    if unknown:
+        raise ValueError(f"Unknown task fields: {unknown}")
+    values = {**fields, "updated_at": time.time()}
+    for key in ("data", "extra"):
+        if key in values:
+            values[key] = json.dumps(values[key])
+    return values
+
+
+@dataclass
+class TaskRecord:
+    task_id: str
+    type: str
+    status: str = "PENDING"
+    progress: int = 0
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+    error: Optional[str] = None
+    local_model_path: Optional[str] = None
+    local_thumbnail_path: Optional[str] = None
+    data: dict = field(default_factory=dict)   # компактная выжимка ответа Meshy
+    extra: dict = field(default_factory=dict)  # локальные метаданные (размеры, LOD и т.п.)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+
+
+def compact_meshy_data(data: dict) -> dict:
+    """Оставляет из ответа Meshy только поля, которые отдаются клиенту"""
+    return {key: data[key] for key in MESHY_DATA_FIELDS if data.get(key) is not None}
+
+
+def _encode_cursor(record: TaskRecord) -> str:
+    return base64.urlsafe_b64encode(f"{record.created_at!r}|{record.task_id}".encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> tuple[float, str]:
+    try:
+        created_at, task_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+        return float(created_at), task_id
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+class TaskStore(ABC):
+    """Интерфейс хранилища задач"""
+
+    async def open(self) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    @abstractmethod
+    async def get(self, task_id: str) -> Optional[TaskRecord]:
+        ...
+
+    @abstractmethod
+    async def get_many(self, task_ids: list[str]) -> dict[str, TaskRecord]:
+        """Несколько задач одним запросом; отсутствующих в ответе нет"""
+
+    @abstractmethod
+    async def find_by_remote_id(self, remote_id: str) -> Optional[TaskRecord]:
+        """Задача по идентификатору в источнике генерации (extra.remote_id)"""
+
+    @abstractmethod
+    async def put(self, record: TaskRecord) -> None:
+        """Создает или полностью перезаписывает задачу"""
+
+    @abstractmethod
+    async def update(self, task_id: str, **fields) -> None:
+        """Обновляет отдельные колонки задачи"""
+
+    @abstractmethod
+    async def update_unfinished(self, task_id: str, **fields) -> bool:
+        """Как update, но только пока задача не завершена; False — ее уже завершили
+        (например, отменили, пока шел опрос)"""
+
+    @abstractmethod
+    async def update_extra(self, task_id: str, **values) -> None:
+        """Заменяет значения ключей верхнего уровня extra, не трогая остальные ключи;
+        вложенные объекты заменяются целиком, None сохраняется как null"""
+
+    @abstractmethod
+    async def delete(self, task_id: str) -> bool:
+        ...
+
+    @abstractmethod
+    async def list_tasks(
+        self,
+        status: Optional[str] = None,
+        type: Optional[str] = None,
+        cursor: Optional[str] = None,
+        limit: int = 50,
+    ) -> tuple[list[TaskRecord], Optional[str]]:
+        """Страница задач от новых к старым и курсор следующей страницы"""
+
+    @abstractmethod
+    async def list_unfinished(self) -> list[TaskRecord]:
+        ...
+
+    @abstractmethod
+    async def evict_finished(self, ttl: float) -> int:
+        """Удаляет завершенные задачи старше ttl секунд"""
+
+    @abstractmethod
+    async def acquire_leases(self, task_ids: list[str], owner: str, ttl: float) -> set[str]:
+        """Берет или продлевает аренду задач на ttl секунд; возвращает задачи, которые теперь за owner.
+
+        Чужая аренда перехватывается только после истечения срока.
+        """
+
+    @abstractmethod
+    async def release_leases(self, owner: str) -> None:
+        """Отпускает все аренды владельца (штатная остановка процесса)"""
+
+    @abstractmethod
+    async def list_orphaned(self, limit: int) -> list[TaskRecord]:
+        """Незавершенные задачи без действующей аренды: их владелец упал или задача создана до аренд"""
+
+    @abstractmethod
+    async def remember_event(self, key: str, ttl: float) -> bool:
+        """Запоминает событие источника на ttl секунд; False — оно уже обработано (любым процессом)"""
+
+    @abstractmethod
+    async def forget_event(self, key: str) -> None:
+        """Забывает событие, чтобы повторная доставка обработалась заново"""
+
+
+class SQLiteTaskStore(TaskStore):
+    """Хранилище на SQLite; запросы выполняются в пуле потоков"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    async def open(self) -> None:
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS tasks (
+                task_id TEXT PRIMARY KEY,
+                type TEXT NOT NULL,
+                status TEXT NOT NULL,
+                progress INTEGER NOT NULL DEFAULT 0,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                error TEXT,
+                local_model_path TEXT,
+                local_thumbnail_path TEXT,
+                data TEXT NOT NULL DEFAULT '{}',
+                extra TEXT NOT NULL DEFAULT '{}'
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tasks_status_created ON tasks (status, created_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tasks_type_created ON tasks (type, created_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tasks_created ON tasks (created_at)")
+        # Поиск задачи по событиям источника генерации (вебхуки Meshy)
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS tasks_remote_id ON tasks (json_extract(extra, '$.remote_id'))"
+        )
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS task_leases (
+                task_id TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            )
+            """
+        )
+        # Обработанные события вебхуков: повторная доставка в любой процесс отсеивается
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS webhook_events (
+                event_key TEXT PRIMARY KEY,
+                expires_at REAL NOT NULL
+            )
+            """
+        )
+
+    async def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _run(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._conn.execute(sql, params)
+
+    async def _fetch(self, sql: str, params: tuple = ()) -> list[TaskRecord]:
+        def fetch():
+            with self._lock:
+                return self._conn.execute(sql, params).fetchall()
+        return [self._record(row) for row in await asyncio.to_thread(fetch)]
+
+    @staticmethod
+    def _record(row) -> TaskRecord:
+        values = dict(zip(_COLUMNS, row))
+        values["data"] = json.loads(values["data"])
+        values["extra"] = json.loads(values["extra"])
+        return TaskRecord(**values)
+
+    async def get(self, task_id: str) -> Optional[TaskRecord]:
+        rows = await self._fetch(f"SELECT {', '.join(_COLUMNS)} FROM tasks WHERE task_id = ?", (task_id,))
+        return rows[0] if rows else None
+
+    async def get_many(self, task_ids: list[str]) -> dict[str, TaskRecord]:
+        records = {}
+        # Число параметров запроса SQLite ограничено — читаем пачками
+        for start in range(0, len(task_ids), 500):
+            chunk = tuple(task_ids[start:start + 500])
+            rows = await self._fetch(
+                f"SELECT {', '.join(_COLUMNS)} FROM tasks WHERE task_id IN ({', '.join('?' * len(chunk))})", chunk
+            )
+            records.update((record.task_id, record) for record in rows)
+        return records
+
+    async def find_by_remote_id(self, remote_id: str) -> Optional[TaskRecord]:
+        rows = await self._fetch(
+            f"SELECT {', '.join(_COLUMNS)} FROM tasks WHERE json_extract(extra, '$.remote_id') = ?", (remote_id,)
+        )
+        return rows[0] if rows else None
+
+    async def put(self, record: TaskRecord) -> None:
+        record.updated_at = time.time()
+        values = (
+            record.task_id, record.type, record.status, record.progress, record.created_at,
+            record.updated_at, record.error, record.local_model_path, record.local_thumbnail_path,
+            json.dumps(record.data), json.dumps(record.extra),
+        )
+        await asyncio.to_thread(
+            self._run,
+            f"INSERT OR REPLACE INTO tasks ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})",
+            values,
+        )
+
+    async def update(self, task_id: str, **fields) -> None:
+        fields = _column_values(fields)
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        await asyncio.to_thread(
+            self._run, f"UPDATE tasks SET {assignments} WHERE task_id = ?", (*fields.values(), task_id)
+        )
+
+    async def update_unfinished(self, task_id: str, **fields) -> bool:
+        fields = _column_values(fields)
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        placeholders = ", ".join("?" * len(TERMINAL_STATUSES))
+        cursor = await asyncio.to_thread(
+            self._run,
+            f"UPDATE tasks SET {assignments} WHERE task_id = ? AND status NOT IN ({placeholders})",
+            (*fields.values(), task_id, *TERMINAL_STATUSES),
+        )
+        return cursor.rowcount > 0
+
+    async def update_extra(self, task_id: str, **values) -> None:
+        if not values:
+            return
+        # json_set по ключу, а не json_patch: тот сливает вложенные объекты и удаляет ключи со значением null
+        assignments, params = [], []
+        for key, value in values.items():
+            assignments.append("?, json(?)")
+            params.extend([f'$."{key}"', json.dumps(value)])
+        await asyncio.to_thread(
+            self._run,
+            f"UPDATE tasks SET extra = json_set(extra, {', '.join(assignments)}), updated_at = ? WHERE task_id = ?",
+            (*params, time.time(), task_id),
+        )
+
+    async def delete(self, task_id: str) -> bool:
+        cursor = await asyncio.to_thread(self._run, "DELETE FROM tasks WHERE task_id = ?", (task_id,))
+        return cursor.rowcount > 0
+
+    async def list_tasks(self, status=None, type=None, cursor=None, limit=50):
+        conditions, params = [], []
+        if status:
+            conditions.append("status = ?")
+            params.append(status)
+        if type:
+            conditions.append("type = ?")
+            params.append(type)
+        if cursor:
+            created_at, task_id = _decode_cursor(cursor)
+            conditions.append("(created_at, task_id) < (?, ?)")
+            params.extend([created_at, task_id])
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        records = await self._fetch(
+            f"SELECT {', '.join(_COLUMNS)} FROM tasks {where} "
+            f"ORDER BY created_at DESC, task_id DESC LIMIT ?",
+            (*params, limit + 1),
+        )
+        next_cursor = _encode_cursor(records[limit - 1]) if len(records) > limit else None
+        return records[:limit], next_cursor
+
+    async def list_unfinished(self) -> list[TaskRecord]:
+        placeholders = ", ".join("?" * len(TERMINAL_STATUSES))
+        return await self._fetch(
+            f"SELECT {', '.join(_COLUMNS)} FROM tasks WHERE status NOT IN ({placeholders})",
+            tuple(TERMINAL_STATUSES),
+        )
+
+    async def evict_finished(self, ttl: float) -> int:
+        placeholders = ", ".join("?" * len(TERMINAL_STATUSES))
+        cursor = await asyncio.to_thread(
+            self._run,
+            f"DELETE FROM tasks WHERE status IN ({placeholders}) AND updated_at < ?",
+            (*TERMINAL_STATUSES, time.time() - ttl),
+        )
+        # Аренды завершенных и удаленных задач больше не нужны
+        await asyncio.to_thread(
+            self._run,
+            f"DELETE FROM task_leases WHERE task_id NOT IN "
+            f"(SELECT task_id FROM tasks WHERE status NOT IN ({placeholders}))",
+            tuple(TERMINAL_STATUSES),
+        )
+        await asyncio.to_thread(self._run, "DELETE FROM webhook_events WHERE expires_at < ?", (time.time(),))
+        return cursor.rowcount
+
+    async def acquire_leases(self, task_ids: list[str], owner: str, ttl: float) -> set[str]:
+        def acquire() -> set[str]:
+            now = time.time()
+            acquired = set()
+            with self._lock:
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    for task_id in task_ids:
+                        cursor = self._conn.execute(
+                            "INSERT INTO task_leases (task_id, owner, expires_at) VALUES (?, ?, ?) "
+                            "ON CONFLICT (task_id) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+                            "WHERE task_leases.owner = excluded.owner OR task_leases.expires_at < ?",
+                            (task_id, owner, now + ttl, now),
+                        )
+                        if cursor.rowcount:
+                            acquired.add(task_id)
+                    self._conn.execute("COMMIT")
+                except Exception:
+                    self._conn.execute("ROLLBACK")
+                    raise
+            return acquired
+
+        return await asyncio.to_thread(acquire) if task_ids else set()
+
+    async def release_leases(self, owner: str) -> None:
+        await asyncio.to_thread(self._run, "DELETE FROM task_leases WHERE owner = ?", (owner,))
+
+    async def list_orphaned(self, limit: int) -> list[TaskRecord]:
+        placeholders = ", ".join("?" * len(TERMINAL_STATUSES))
+        columns = ", ".join(f"t.{name}" for name in _COLUMNS)
+        return await self._fetch(
+            f"SELECT {columns} FROM tasks t LEFT JOIN task_leases l ON l.task_id = t.task_id "
+            f"WHERE t.status NOT IN ({placeholders}) AND (l.task_id IS NULL OR l.expires_at < ?) "
+            f"ORDER BY t.created_at LIMIT ?",
+            (*TERMINAL_STATUSES, time.time(), limit),
+        )
+
+    async def remember_event(self, key: str, ttl: float) -> bool:
+        now = time.time()
+        # Истекшая запись перезаписывается; действующая означает повтор
+        cursor = await asyncio.to_thread(
+            self._run,
+            "INSERT INTO webhook_events (event_key, expires_at) VALUES (?, ?) "
+            "ON CONFLICT (event_key) DO UPDATE SET expires_at = excluded.expires_at "
+            "WHERE webhook_events.expires_at < ?",
+            (key, now + ttl, now),
+        )
+        return cursor.rowcount > 0
+
+    async def forget_event(self, key: str) -> None:
+        await asyncio.to_thread(self._run, "DELETE FROM webhook_events WHERE event_key = ?", (key,))
+
+
+class PostgresTaskStore(TaskStore):
+    """Хранилище на PostgreSQL (asyncpg)"""
+
+    def __init__(self, dsn: str, min_size: int = 1, max_size: int = 10):
+        self.dsn = dsn
+        self.min_size = min_size
+        self.max_size = max_size
+        self._pool = None
+
+    async def open(self) -> None:
+        import asyncpg
+
+        self._pool = await asyncpg.create_pool(self.dsn, min_size=self.min_size, max_size=self.max_size)
+        async with self._pool.acquire() as conn:
+            await conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS tasks (
+                    task_id TEXT PRIMARY KEY,
+                    type TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    progress INTEGER NOT NULL DEFAULT 0,
+                    created_at DOUBLE PRECISION NOT NULL,
+                    updated_at DOUBLE PRECISION NOT NULL,
+                    error TEXT,
+                    local_model_path TEXT,
+                    local_thumbnail_path TEXT,
+                    data JSONB NOT NULL DEFAULT '{}',
+                    extra JSONB NOT NULL DEFAULT '{}'
+                );
+                CREATE INDEX IF NOT EXISTS tasks_status_created ON tasks (status, created_at);
+                CREATE INDEX IF NOT EXISTS tasks_type_created ON tasks (type, created_at);
+                CREATE INDEX IF NOT EXISTS tasks_created ON tasks (created_at);
+                CREATE INDEX IF NOT EXISTS tasks_remote_id ON tasks ((extra->>'remote_id'));
+                CREATE TABLE IF NOT EXISTS task_leases (
+                    task_id TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    expires_at DOUBLE PRECISION NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS webhook_events (
+                    event_key TEXT PRIMARY KEY,
+                    expires_at DOUBLE PRECISION NOT NULL
+                );
+                """
+            )
+
+    async def close(self) -> None:
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+    @staticmethod
+    def _record(row) -> TaskRecord:
+        values = dict(row)
+        values["data"] = json.loads(values["data"])
+        values["extra"] = json.loads(values["extra"])
+        return TaskRecord(**values)
+
+    async def get(self, task_id: str) -> Optional[TaskRecord]:
+        row = await self._pool.fetchrow(f"SELECT {', '.join(_COLUMNS)} FROM tasks WHERE task_id = $1", task_id)
+        return self._record(row) if row else None
+
+    async def get_many(self, task_ids: list[str]) -> dict[str, TaskRecord]:
+        rows = await self._pool.fetch(f"SELECT {', '.join(_COLUMNS)} FROM tasks WHERE task_id = ANY($1::text[])", task_ids)
+        return {row["task_id"]: self._record(row) for row in rows}
+
+    async def find_by_remote_id(self, remote_id: str) -> Optional[TaskRecord]:
+        row = await self._pool.fetchrow(
+            f"SELECT {', '.join(_COLUMNS)} FROM tasks WHERE extra->>'remote_id' = $1", remote_id
+        )
+        return self._record(row) if row else None
+
+    async def put(self, record: TaskRecord) -> None:
+        record.updated_at = time.time()
+        placeholders = ", ".join(f"${i}" for i in range(1, len(_COLUMNS) + 1))
+        updates = ", ".join(f"{name} = EXCLUDED.{name}" for name in _COLUMNS if name != "task_id")
+        await self._pool.execute(
+            f"INSERT INTO tasks ({', '.join(_COLUMNS)}) VALUES ({placeholders}) "
+            f"ON CONFLICT (task_id) DO UPDATE SET {updates}",
+            record.task_id, record.type, record.status, record.progress, record.created_at,
+            record.updated_at, record.error, record.local_model_path, record.local_thumbnail_path,
+            json.dumps(record.data), json.dumps(record.extra),
+        )
+
+    async def update(self, task_id: str, **fields) -> None:
+        fields = _column_values(fields)
+        assignments = ", ".join(f"{name} = ${i}" for i, name in enumerate(fields, start=2))
+        await self._pool.execute(f"UPDATE tasks SET {assignments} WHERE task_id = $1", task_id, *fields.values())
+
+    async def update_unfinished(self, task_id: str, **fields) -> bool:
+        fields = _column_values(fields)
+        assignments = ", ".join(f"{name} = ${i}" for i, name in enumerate(fields, start=3))
+        result = await self._pool.execute(
+            f"UPDATE tasks SET {assignments} WHERE task_id = $1 AND NOT (status = ANY($2::text[]))",
+            task_id, list(TERMINAL_STATUSES), *fields.values(),
+        )
+        return result != "UPDATE 0"
+
+    async def update_extra(self, task_id: str, **values) -> None:
+        if not values:
+            return
+        await self._pool.execute(
+            "UPDATE tasks SET extra = extra || $2::jsonb, updated_at = $3 WHERE task_id = $1",
+            task_id, json.dumps(values), time.time(),
+        )
+
+    async def delete(self, task_id: str) -> bool:
+        result = await self._pool.execute("DELETE FROM tasks WHERE task_id = $1", task_id)
+        return result != "DELETE 0"
+
+    async def list_tasks(self, status=None, type=None, cursor=None, limit=50):
+        conditions, params = [], []
+        if status:
+            params.append(status)
+            conditions.append(f"status = ${len(params)}")
+        if type:
+            params.append(type)
+            conditions.append(f"type = ${len(params)}")
+        if cursor:
+            params.extend(_decode_cursor(cursor))
+            conditions.append(f"(created_at, task_id) < (${len(params) - 1}, ${len(params)})")
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        params.append(limit + 1)
+        rows = await self._pool.fetch(
+            f"SELECT {', '.join(_COLUMNS)} FROM tasks {where} "
+            f"ORDER BY created_at DESC, task_id DESC LIMIT ${len(params)}",
+            *params,
+        )
+        records = [self._record(row) for row in rows]
+        next_cursor = _encode_cursor(records[limit - 1]) if len(records) > limit else None
+        return records[:limit], next_cursor
+
+    async def list_unfinished(self) -> list[TaskRecord]:
+        rows = await self._pool.fetch(
+            f"SELECT {', '.join(_COLUMNS)} FROM tasks WHERE NOT (status = ANY($1::text[]))",
+            list(TERMINAL_STATUSES),
+        )
+        return [self._record(row) for row in rows]
+
+    async def evict_finished(self, ttl: float) -> int:
+        result = await self._pool.execute(
+            "DELETE FROM tasks WHERE status = ANY($1::text[]) AND updated_at < $2",
+            list(TERMINAL_STATUSES), time.time() - ttl,
+        )
+        await self._pool.execute(
+            "DELETE FROM task_leases l WHERE NOT EXISTS "
+            "(SELECT 1 FROM tasks t WHERE t.task_id = l.task_id AND NOT (t.status = ANY($1::text[])))",
+            list(TERMINAL_STATUSES),
+        )
+        await self._pool.execute("DELETE FROM webhook_events WHERE expires_at < $1", time.time())
+        return int(result.split()[-1])
+
+    async def acquire_leases(self, task_ids: list[str], owner: str, ttl: float) -> set[str]:
+        if not task_ids:
+            return set()
+        now = time.time()
+        rows = await self._pool.fetch(
+            "INSERT INTO task_leases (task_id, owner, expires_at) SELECT unnest($1::text[]), $2, $3 "
+            "ON CONFLICT (task_id) DO UPDATE SET owner = EXCLUDED.owner, expires_at = EXCLUDED.expires_at "
+            "WHERE task_leases.owner = EXCLUDED.owner OR task_leases.expires_at < $4 "
+            "RETURNING task_id",
+            task_ids, owner, now + ttl, now,
+        )
+        return {row["task_id"] for row in rows}
+
+    async def release_leases(self, owner: str) -> None:
+        await self._pool.execute("DELETE FROM task_leases WHERE owner = $1", owner)
+
+    async def list_orphaned(self, limit: int) -> list[TaskRecord]:
+        columns = ", ".join(f"t.{name}" for name in _COLUMNS)
+        rows = await self._pool.fetch(
+            f"SELECT {columns} FROM tasks t LEFT JOIN task_leases l ON l.task_id = t.task_id "
+            f"WHERE NOT (t.status = ANY($1::text[])) AND (l.task_id IS NULL OR l.expires_at < $2) "
+            f"ORDER BY t.created_at LIMIT $3",
+            list(TERMINAL_STATUSES), time.time(), limit,
+        )
+        return [self._record(row) for row in rows]
+
+    async def remember_event(self, key: str, ttl: float) -> bool:
+        now = time.time()
+        row = await self._pool.fetchrow(
+            "INSERT INTO webhook_events (event_key, expires_at) VALUES ($1, $2) "
+            "ON CONFLICT (event_key) DO UPDATE SET expires_at = EXCLUDED.expires_at "
+            "WHERE webhook_events.expires_at < $3 RETURNING event_key",
+            key, now + ttl, now,
+        )
+        return row is not None
+
+    async def forget_event(self, key: str) -> None:
+        await self._pool.execute("DELETE FROM webhook_events WHERE event_key = $1", key)
+
+
+def create_task_store(url: str) -> TaskStore:
+    """Создает хранилище по URL: sqlite:///path или postgresql://..."""
+    if url.startswith("sqlite:///"):
+        return SQLiteTaskStore(url[len("sqlite:///"):])
+    if url.startswith(("postgresql://", "postgres://")):
+        return PostgresTaskStore(url)
+    raise ValueError(f"Unsupported task store URL: {url}")
+
+
+async def evict_finished_periodically(store: TaskStore, ttl: float, interval: float) -> None:
+    """Фоновая очистка завершенных задач по TTL"""
+    while True:
+        try:
+            removed = await store.evict_finished(ttl)
+            if removed:
+                logger.info(f"Evicted {removed} finished tasks")
+        except Exception as e:
+            logger.error(f"Error evicting finished tasks: {str(e)}")
+        await asyncio.sleep(interval)
+
+
+task_store = create_task_store(config.TASK_STORE_URL)
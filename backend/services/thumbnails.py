@@ -0,0 +1,217 @@
+import asyncio
+import fcntl
+import hashlib
+import json
+import logging
+import os
+from typing import Optional
+
+from PIL import Image, ImageOps, features
+
+from backend import config
+from backend.services.model_catalog import ModelCatalog, model_catalog
+from backend.services.model_storage import shard_path
+from backend.services.worker_pool import worker_pool
+
+logger = logging.getLogger(__name__)
+
+# Превью моделей для галереи: уменьшенные WebP/AVIF-копии нескольких размеров
+# и спрайт-листы, чтобы страница галереи грузила одно изображение вместо N PNG.
+# Листы заполняются в порядке добавления моделей, поэтому новая модель
+# перестраивает только последний лист
+
+THUMBNAIL_FORMATS = ("avif", "webp") if features.check("avif") else ("webp",)
+SAVE_OPTIONS = {
+    "webp": {"quality": 80, "method": 6},
+    "avif": {"quality": 60, "speed": 6},
+}
+MANIFEST_FILENAME = "gallery_sprites.json"
+# Скрытый файл блокировки: листы перестраивает один процесс за раз, остальные ждут
+SPRITES_LOCK_FILENAME = ".gallery_sprites.lock"
+
+
+def variant_filename(thumbnail: str, size: int, fmt: str) -> str:
+    """x_thumbnail.png → x_thumbnail.256.webp"""
+    return f"{os.path.splitext(thumbnail)[0]}.{size}.{fmt}"
+
+
+def _save_atomic(image: Image.Image, path: str, fmt: str) -> None:
+    # Имя временного файла уникально для процесса: воркеры uvicorn пишут в один каталог
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    image.save(tmp_path, format=fmt.upper(), **SAVE_OPTIONS[fmt])
+    os.replace(tmp_path, path)
+
+
+def _open_fitted(path: str, size: int) -> Image.Image:
+    """Открывает изображение и вписывает его в квадрат size×size без увеличения"""
+    with Image.open(path) as image:
+        fitted = ImageOps.exif_transpose(image).convert("RGBA")
+    fitted.thumbnail((size, size), Image.Resampling.LANCZOS)
+    return fitted
+
+
+def derive_thumbnails(models_dir: str, thumbnail: str, sizes: list[int], formats: tuple[str, ...]) -> dict:
+    """Создает уменьшенные копии превью; возвращает {размер: {формат: url}}"""
+    # Уменьшенные копии лежат рядом с превью, в подкаталоге задачи
+    source = shard_path(models_dir, thumbnail)
+    variants = {}
+    for size in sorted(sizes, reverse=True):
+        image = _open_fitted(source, size)
+        variants[str(size)] = {}
+        for fmt in formats:
+            name = variant_filename(thumbnail, size, fmt)
+            _save_atomic(image, shard_path(models_dir, name), fmt)
+            variants[str(size)][fmt] = f"/models/{name}"
+    return variants
+
+
+def _load_manifest(path: str, layout: dict) -> dict:
+    try:
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {**layout, "sheets": []}
+    if {key: manifest.get(key) for key in layout} != layout:
+        # Раскладка поменялась — старые листы больше не годятся
+        for sheet in manifest.get("sheets", []):
+            if sheet.get("filename"):
+                try:
+                    os.remove(os.path.join(os.path.dirname(path), sheet["filename"]))
+                except FileNotFoundError:
+                    pass
+        return {**layout, "sheets": []}
+    return manifest
+
+
+def _render_sheet(models_dir: str, index: int, sheet: dict, tile: int, columns: int, rows: int) -> str:
+    canvas = Image.new("RGBA", (columns * tile, rows * tile))
+    for slot, entry in enumerate(sheet["tiles"]):
+        if entry is None:
+            continue
+        try:
+            image = _open_fitted(shard_path(models_dir, entry[1]), tile)
+        except (FileNotFoundError, OSError) as e:
+            logger.warning(f"Skipping sprite tile {entry[1]}: {str(e)}")
+            continue
+        column, row = slot % columns, slot // columns
+        canvas.paste(image, (column * tile + (tile - image.width) // 2, row * tile + (tile - image.height) // 2))
+
+    digest = hashlib.sha1(json.dumps(sheet["tiles"]).encode()).hexdigest()[:12]
+    filename = f"gallery_sprite_{index}.{digest}.webp"
+    _save_atomic(canvas, os.path.join(models_dir, filename), "webp")
+    if sheet.get("filename") and sheet["filename"] != filename:
+        try:
+            os.remove(os.path.join(models_dir, sheet["filename"]))
+        except FileNotFoundError:
+            pass
+    return filename
+
+
+def update_sprite_sheets(models_dir: str, entries: list[tuple[str, str]], tile: int, columns: int, rows: int) -> dict:
+    """Обновляет спрайт-листы по списку (модель, превью); возвращает {модель: положение в листе}"""
+    with open(os.path.join(models_dir, SPRITES_LOCK_FILENAME), "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        return _update_sprite_sheets(models_dir, entries, tile, columns, rows)
+
+
+def _update_sprite_sheets(models_dir: str, entries: list[tuple[str, str]], tile: int, columns: int, rows: int) -> dict:
+    manifest_path = os.path.join(models_dir, MANIFEST_FILENAME)
+    manifest = _load_manifest(manifest_path, {"tile": tile, "columns": columns, "rows": rows})
+    sheets = manifest["sheets"]
+
+    current = {}
+    for filename, thumbnail in entries:
+        try:
+            current[filename] = [thumbnail, os.stat(shard_path(models_dir, thumbnail)).st_mtime_ns]
+        except FileNotFoundError:
+            continue
+
+    # Удаленные модели освобождают ячейку, измененные превью перерисовываются на месте
+    dirty = set()
+    placed = {}
+    for index, sheet in enumerate(sheets):
+        for slot, entry in enumerate(sheet["tiles"]):
+            if entry is None:
+                continue
+            if entry[0] not in current:
+                sheet["tiles"][slot] = None
+                dirty.add(index)
+                continue
+            placed[entry[0]] = (index, slot)
+            if entry[1:] != current[entry[0]]:
+                sheet["tiles"][slot] = [entry[0], *current[entry[0]]]
+                dirty.add(index)
+        if not sheet.get("filename") or not os.path.exists(os.path.join(models_dir, sheet["filename"])):
+            dirty.add(index)
+
+    for filename, _ in entries:
+        if filename in placed or filename not in current:
+            continue
+        if not sheets or len(sheets[-1]["tiles"]) >= columns * rows:
+            sheets.append({"filename": None, "tiles": []})
+        sheets[-1]["tiles"].append([filename, *current[filename]])
+        placed[filename] = (len(sheets) - 1, len(sheets[-1]["tiles"]) - 1)
+        dirty.add(len(sheets) - 1)
+
+    for index in sorted(dirty):
+        sheets[index]["filename"] = _render_sheet(models_dir, index, sheets[index], tile, columns, rows)
+
+    if dirty or not os.path.exists(manifest_path):
+        tmp_path = f"{manifest_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, manifest_path)
+
+    return {
+        filename: {
+            "url": f"/models/{sheets[index]['filename']}",
+            "column": slot % columns,
+            "row": slot // columns,
+            "columns": columns,
+            "rows": rows,
+        }
+        for filename, (index, slot) in placed.items()
+    }
+
+
+class ThumbnailStage:
+    """Доводит превью каталога до актуального состояния; запуски сериализуются"""
+
+    def __init__(self, catalog: ModelCatalog):
+        self.catalog = catalog
+        self._lock = asyncio.Lock()
+        self._built_version: Optional[int] = None
+
+    async def refresh(self) -> None:
+        async with self._lock:
+            # Версия на момент чтения моделей: изменения других процессов во время сборки
+            # (и собственные записи ниже) вызовут еще один проход, ничего не пропустив
+            version = await self.catalog.version()
+            if self._built_version == version:
+                return
+            entries = await self.catalog.thumbnail_entries()
+
+            derived = {}
+            for filename, thumbnail, variants in entries:
+                if variants is not None:
+                    continue
+                try:
+                    derived[filename] = await worker_pool.run(
+                        derive_thumbnails, self.catalog.models_dir, thumbnail,
+                        config.THUMBNAIL_SIZES, THUMBNAIL_FORMATS
+                    )
+                except Exception as e:
+                    logger.error(f"Error deriving thumbnails for {filename}: {str(e)}")
+            if derived:
+                await self.catalog.set_thumbnails(derived)
+
+            placements = await worker_pool.run(
+                update_sprite_sheets, self.catalog.models_dir,
+                [(filename, thumbnail) for filename, thumbnail, _ in entries],
+                config.SPRITE_TILE_SIZE, config.SPRITE_COLUMNS, config.SPRITE_ROWS
+            )
+            await self.catalog.set_sprites(placements)
+            self._built_version = version
+
+
+thumbnail_stage = ThumbnailStage(model_catalog)
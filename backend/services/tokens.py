@@ -0,0 +1,74 @@
+import logging
+import os
+import secrets
+import time
+from typing import Optional
+
+import jwt
+from fastapi import Depends, HTTPException
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
+
+from backend import config
+
+logger = logging.getLogger(__name__)
+
+# Подписанные access-токены: последующие запросы проверяются по подписи,
+# без обращения к базе пользователей
+
+
+def _shared_secret(path: str) -> str:
+    """Один случайный секрет на все процессы uvicorn: первый создает файл, остальные читают"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}"
+    with open(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as f:
+        f.write(secrets.token_urlsafe(32))
+    try:
+        os.link(tmp_path, path)  # атомарно и только если файла еще нет
+    except FileExistsError:
+        pass
+    finally:
+        os.remove(tmp_path)
+    with open(path) as f:
+        return f.read()
+
+
+_secret = config.JWT_SECRET
+if not _secret and config.WORKERS > 1:
+    # Токен, выданный одним процессом, должен приниматься остальными
+    logger.warning(f"JWT_SECRET is not set, using a generated secret from {config.JWT_SECRET_FILE}")
+    _secret = _shared_secret(config.JWT_SECRET_FILE)
+elif not _secret:
+    # Без JWT_SECRET токены действуют только до рестарта и только в этом процессе
+    logger.warning("JWT_SECRET is not set, using a random per-process secret")
+    _secret = secrets.token_urlsafe(32)
+
+_bearer = HTTPBearer(auto_error=False)
+
+
+def create_access_token(username: str) -> str:
+    now = int(time.time())
+    payload = {"sub": username, "iat": now, "exp": now + config.JWT_ACCESS_TTL}
+    return jwt.encode(payload, _secret, algorithm=config.JWT_ALGORITHM)
+
+
+def decode_access_token(token: str) -> dict:
+    try:
+        return jwt.decode(token, _secret, algorithms=[config.JWT_ALGORITHM], options={"require": ["sub", "exp"]})
+    except jwt.InvalidTokenError as e:
+        raise HTTPException(
+            status_code=401, detail=f"Invalid token: {str(e)}", headers={"WWW-Authenticate": "Bearer"}
+        )
+
+
+def get_optional_user(credentials: Optional[HTTPAuthorizationCredentials] = Depends(_bearer)) -> Optional[str]:
+    """Зависимость FastAPI: имя пользователя из токена, если он передан"""
+    if credentials is None:
+        return None
+    return decode_access_token(credentials.credentials)["sub"]
+
+
+def get_current_user(username: Optional[str] = Depends(get_optional_user)) -> str:
+    """Зависимость FastAPI: требует действительный токен"""
+    if username is None:
+        raise HTTPException(status_code=401, detail="Not authenticated", headers={"WWW-Authenticate": "Bearer"})
+    return username
@@ -0,0 +1,239 @@
+import base64
+import json
+from typing import AsyncIterator, Optional
+
+import python_multipart as multipart
+from fastapi import HTTPException, UploadFile
+from python_multipart.multipart import parse_options_header
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from backend import config
+
+# Потоковая отправка загруженных изображений в Meshy: base64 кодируется
+# кусками прямо в тело исходящего запроса, без копий файла в памяти
+
+
+class _MultipartFileSizes:
+    """Размеры файлов multipart-формы по мере поступления тела запроса"""
+
+    def __init__(self, boundary: bytes, max_file_size: int):
+        self.max_file_size = max_file_size
+        self._header_name = b""
+        self._header_value = b""
+        self._filename: Optional[str] = None
+        self._size = 0
+        self.too_large: Optional[str] = None
+        self._parser = multipart.MultipartParser(boundary, {
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_part_data": self._on_part_data,
+        })
+
+    def _on_part_begin(self) -> None:
+        self._filename = None
+        self._size = 0
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_name += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        if self._header_name.lower() == b"content-disposition":
+            _, options = parse_options_header(self._header_value)
+            if b"filename" in options:
+                self._filename = options[b"filename"].decode("latin-1")
+        self._header_name = self._header_value = b""
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._filename is None:
+            return
+        self._size += end - start
+        if self._size > self.max_file_size and self.too_large is None:
+            self.too_large = self._filename
+
+    def feed(self, chunk: bytes) -> Optional[str]:
+        """Имя файла, превысившего лимит, если такой уже встретился"""
+        self._parser.write(chunk)
+        return self.too_large
+
+
+class UploadLimitMiddleware:
+    """Отклоняет слишком большие загрузки (весь запрос и каждый файл) еще во время чтения тела"""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        max_body_size: int = config.UPLOAD_MAX_REQUEST_BYTES,
+        max_file_size: int = config.UPLOAD_MAX_FILE_BYTES,
+        path_prefix: str = "/api/",
+        path_limits: Optional[dict[str, int]] = None,
+    ):
+        self.app = app
+        self.max_body_size = max_body_size
+        self.max_file_size = max_file_size
+        self.path_prefix = path_prefix
+        # Отдельные лимиты для путей с большими загрузками (пакеты)
+        self.path_limits = path_limits or {}
+
+    def _limit_for(self, path: str) -> int:
+        for prefix, limit in self.path_limits.items():
+            if path.startswith(prefix):
+                return limit
+        return self.max_body_size
+
+    def _file_sizes(self, headers: dict) -> Optional[_MultipartFileSizes]:
+        content_type, options = parse_options_header(headers.get(b"content-type", b""))
+        if content_type != b"multipart/form-data" or b"boundary" not in options:
+            return None
+        return _MultipartFileSizes(options[b"boundary"], self.max_file_size)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        max_body_size = self._limit_for(scope["path"])
+        headers = dict(scope["headers"])
+        content_length = headers.get(b"content-length")
+        if content_length is not None and int(content_length) > max_body_size:
+            await self._reject(send, f"Request body exceeds {max_body_size} bytes")
+            return
+
+        # Content-Length может отсутствовать (chunked), а размер отдельного файла из него
+        # не виден — считаем байты по мере чтения. При превышении ответ 413 отправляется
+        # отсюда, а приложение получает http.disconnect и прекращает разбор формы
+        file_sizes = self._file_sizes(headers)
+        received = 0
+        response_started = False
+        rejected = False
+
+        async def reject(detail: str) -> None:
+            nonlocal rejected
+            rejected = True
+            if not response_started:
+                await self._reject(send, detail)
+
+        async def limited_receive() -> Message:
+            nonlocal received, file_sizes
+            if rejected:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] != "http.request":
+                return message
+            chunk = message.get("body", b"")
+            received += len(chunk)
+            if received > max_body_size:
+                await reject(f"Request body exceeds {max_body_size} bytes")
+                return {"type": "http.disconnect"}
+            if file_sizes is not None and chunk:
+                try:
+                    too_large = file_sizes.feed(chunk)
+                except multipart.exceptions.FormParserError:
+                    # Ошибку формата вернет разбор формы в приложении
+                    file_sizes = too_large = None
+                if too_large is not None:
+                    await reject(f"File {too_large} exceeds {self.max_file_size} bytes")
+                    return {"type": "http.disconnect"}
+            return message
+
+        async def tracking_send(message: Message) -> None:
+            nonlocal response_started
+            if rejected:
+                return  # ответ 413 уже отправлен
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except Exception:
+            # Разбор формы, оборванный http.disconnect, может завершиться исключением
+            if not rejected:
+                raise
+
+    async def _reject(self, send: Send, detail: str) -> None:
+        body = json.dumps({"detail": detail}).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 413,
+            "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+def check_upload_sizes(files: list[UploadFile]) -> None:
+    """Проверяет лимиты на размер каждого файла и на запрос целиком
+    (для запросов, прошедших мимо UploadLimitMiddleware)"""
+    total = 0
+    for file in files:
+        size = file.size or 0
+        if size > config.UPLOAD_MAX_FILE_BYTES:
+            raise HTTPException(
+                status_code=413,
+                detail=f"File {file.filename} exceeds {config.UPLOAD_MAX_FILE_BYTES} bytes"
+            )
+        total += size
+    if total > config.UPLOAD_MAX_REQUEST_BYTES:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds {config.UPLOAD_MAX_REQUEST_BYTES} bytes")
+
+
+def _base64_length(size: int) -> int:
+    return 4 * ((size + 2) // 3)
+
+
+async def _encode_file(file: UploadFile, chunk_size: int) -> AsyncIterator[bytes]:
+    """Кодирует файл в base64 кусками; длина куска кратна 3, остаток переносится"""
+    await file.seek(0)
+    tail = b""
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            break
+        chunk = tail + chunk
+        cut = len(chunk) - len(chunk) % 3
+        tail = chunk[cut:]
+        if cut:
+            yield base64.b64encode(chunk[:cut])
+    if tail:
+        yield base64.b64encode(tail)
+
+
+def build_image_request_body(
+    params: dict,
+    files: list[UploadFile],
+    image_field: str,
+    as_list: bool,
+    chunk_size: Optional[int] = None,
+) -> tuple[AsyncIterator[bytes], int]:
+    """Готовит потоковое JSON-тело запроса к Meshy и его точную длину.
+
+    Изображения передаются как data URI в поле image_field (строка или список).
+    Длина известна заранее, поэтому запрос уходит с Content-Length, а не chunked.
+    """
+    chunk_size = chunk_size or config.UPLOAD_CHUNK_SIZE
+    prefixes = [f'"data:{file.content_type};base64,'.encode() for file in files]
+
+    head = (f'{{"{image_field}": ' + ("[" if as_list else "")).encode()
+    rest = json.dumps(params)[1:]  # параметры без открывающей скобки
+    tail = (("]" if as_list else "") + (", " + rest if params else "}")).encode()
+
+    length = len(head) + len(tail) + max(len(files) - 1, 0)
+    for prefix, file in zip(prefixes, files):
+        length += len(prefix) + _base64_length(file.size or 0) + 1
+
+    async def body() -> AsyncIterator[bytes]:
+        yield head
+        for index, (prefix, file) in enumerate(zip(prefixes, files)):
+            if index:
+                yield b","
+            yield prefix
+            async for encoded in _encode_file(file, chunk_size):
+                yield encoded
+            yield b'"'
+        yield tail
+
+    return body(), length
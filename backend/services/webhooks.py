@@ -0,0 +1,35 @@
+import hashlib
+import hmac
+import time
+from typing import Optional
+
+# Вебхуки источника генерации: проверка подписи (повторные доставки отсеивает хранилище задач).
+# Заголовок подписи: "t=<unix time>,v1=<hex>", где v1 — HMAC-SHA256 секрета
+# над "<t>.<тело запроса>"; по t отбрасываются старые (перехваченные) запросы.
+# При смене секрета можно передать несколько v1
+
+
+def sign_payload(secret: str, body: bytes, timestamp: Optional[int] = None) -> str:
+    """Значение заголовка подписи для тела запроса"""
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    digest = hmac.new(secret.encode(), f"{timestamp}.".encode() + body, hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={digest}"
+
+
+def verify_signature(secret: str, header: str, body: bytes, tolerance: float, now: Optional[float] = None) -> bool:
+    timestamp = None
+    signatures = []
+    for part in header.split(","):
+        name, _, value = part.strip().partition("=")
+        if name == "t" and value.isdigit():
+            timestamp = int(value)
+        elif name == "v1":
+            signatures.append(value)
+    if timestamp is None or not signatures:
+        return False
+    now = time.time() if now is None else now
+    if abs(now - timestamp) > tolerance:
+        return False
+    expected = sign_payload(secret, body, timestamp).rpartition("v1=")[2]
+    return any(hmac.compare_digest(expected, signature) for signature in signatures)
+
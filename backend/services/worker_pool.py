@@ -0,0 +1,36 @@
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Callable, Optional
+
+from backend import config
+
+logger = logging.getLogger(__name__)
+
+# Пул процессов для CPU-тяжелой обработки моделей, чтобы не блокировать event loop
+
+
+class WorkerPool:
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def start(self) -> None:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def run(self, fn: Callable, *args, **kwargs):
+        """Выполняет fn в пуле процессов (или в потоке, если пул не запущен)"""
+        call = partial(fn, *args, **kwargs)
+        if self._executor is None:
+            return await asyncio.to_thread(call)
+        return await asyncio.get_running_loop().run_in_executor(self._executor, call)
+
+
+worker_pool = WorkerPool(config.PROCESS_POOL_WORKERS)
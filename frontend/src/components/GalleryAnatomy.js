@@ -24,56 +24,38 @@ const usePointerGlow = () => {
   return [status];
 };
 
+// Превью берется из общего спрайт-листа: одна картинка на страницу галереи
+const spriteStyle = ({ url, column, row, columns, rows }) => ({
+  backgroundImage: `url(${url})`,
+  backgroundSize: `${columns * 100}% ${rows * 100}%`,
+  backgroundPosition: `${columns > 1 ? (column / (columns - 1)) * 100 : 0}% ${rows > 1 ? (row / (rows - 1)) * 100 : 0}%`
+});
+
 const GalleryAnatomy = () => {
   const [status] = usePointerGlow();
   const [models, setModels] = useState([]);
   const navigate = useNavigate();
 
-  // Список всех файлов моделей из каталога
-  const modelFiles = [
-    'multi_01989ebf-e6f9-7162-9a82-5fa5d4d5b447.glb',
-    '01989eb6-a504-7151-b976-bcfd1c604b84.glb',
-    'multi_01989ebf-e6f9-7162-9a82-5fa5d4d5b448_Kacheksia.glb',
-    '0198a3ab-3b6d-79ef-9b93-5ea203387881.glb',
-    '0198a3b0-fdfb-79fb-a9f4-17df3bb58923.glb'
-  ];
-
-  // Функция для извлечения UUID из имени файла
-  const extractModelNumber = (filename) => {
-    const match = filename.match(/^([0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12})/);
-    return match ? match[1] : filename.replace('_thumbnail.png', '');
-  };
-
-  // Функция для поиска соответствующего имени модели
-  const getModelName = (thumbnailName) => {
-    const uuid = extractModelNumber(thumbnailName);
-    // Ищем файл модели, который содержит UUID или совпадает с ним
-    const modelFile = modelFiles.find(file => 
-      file.includes(uuid) || file === `${uuid}_model.glb` || file === `${uuid}.glb`
-    );
-    // Возвращаем имя модели, если найдено, иначе возвращаем исходное имя файла
-    return modelFile || 'Kacheksia.glb'; // Фallback на skeleton.glb для неизвестных файлов
-  };
-
   useEffect(() => {
     const fetchModels = async () => {
       try {
-        // Демо данные для примера
-        const demoModels = [
-          { filename: 'multi_01989ebf-e6f9-7162-9a82-5fa5d4d5b447_thumbnail.png' }, 
-          { filename: '01989eb6-a504-7151-b976-bcfd1c604b84_thumbnail.png' },
-          { filename: 'multi_01989ebf-e6f9-7162-9a82-5fa5d4d5b448_Kacheksia.png' },
-          { filename: '0198a3ab-3b6d-79ef-9b93-5ea203387881_thumbnail.png' }, 
-          { filename: '0198a3b0-fdfb-79fb-a9f4-17df3bb58923_thumbnail.png' }  
-        ];
+        // Каталог моделей строится на бэкенде по содержимому MODELS_DIR
+        const response = await fetch('http://localhost:8000/api/models?limit=100&sort=created_at&order=desc');
+        if (!response.ok) {
+          throw new Error(`HTTP error! status: ${response.status}`);
+        }
+        const catalog = await response.json();
         
-        const modelsWithData = demoModels.map((model, index) => ({
-          id: index + 1,
-          filename: model.filename,
-          imageUrl: `/models/${model.filename}`,
-          modelNumber: extractModelNumber(model.filename),
-          modelName: getModelName(model.filename)
-        }));
+        const modelsWithData = catalog.items
+          .filter((model) => model.thumbnail_url)
+          .map((model, index) => ({
+            id: index + 1,
+            filename: model.filename,
+            imageUrl: model.thumbnails?.['256']?.webp || model.thumbnail_url,
+            sprite: model.sprite,
+            modelNumber: model.task_id || model.filename.replace('.glb', ''),
+            modelName: model.filename
+          }));
         
         setModels(modelsWithData);
       } catch (error) {
@@ -102,7 +84,16 @@ const GalleryAnatomy = () => {
             >
               <span data-glow />
               <div className="card-content">
-                <img src={model.imageUrl} alt={`Модель ${model.modelNumber}`} />
+                {model.sprite ? (
+                  <div
+                    className="sprite-thumb"
+                    role="img"
+                    aria-label={`Модель ${model.modelNumber}`}
+                    style={spriteStyle(model.sprite)}
+                  />
+                ) : (
+                  <img src={model.imageUrl} alt={`Модель ${model.modelNumber}`} loading="lazy" />
+                )}
                 <h2>#{model.modelNumber}</h2>
                 <button 
                   type="button" 
@@ -32,7 +32,10 @@ const LoadModel = () => {
     
     if (modelParam) {
       setModelName(modelParam);
-      const modelPath = `/models/${modelParam}`;
+      // На слабых устройствах загружаем упрощенный уровень детализации
+      const lowEndDevice = (navigator.deviceMemory && navigator.deviceMemory <= 2) ||
+        (navigator.hardwareConcurrency && navigator.hardwareConcurrency <= 2);
+      const modelPath = `/models/${modelParam}${lowEndDevice ? '?lod=1' : ''}`;
       setModelPath(modelPath);
     } else {
       setError('Не указано название модели');
@@ -21,9 +21,11 @@ function LoginPage() {
       });
       const data = await response.json();
       if (response.ok) {
+        // Токен передается в заголовке Authorization последующих запросов
+        localStorage.setItem('accessToken', data.access_token);
         navigate('/home');
       } else {
-        setError(data.message || 'Произошла ошибка');
+        setError(data.detail || data.message || 'Произошла ошибка');
       }
     } catch (error) {
       setError('Ошибка соединения с сервером. Пожалуйста, попробуйте позже.');
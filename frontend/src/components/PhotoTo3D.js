@@ -42,6 +42,32 @@ const PhotoTo3D = () => {
   });
 
   const pollInterval = useRef(null);
+  const eventSource = useRef(null);
+
+  const stopTaskUpdates = () => {
+    if (eventSource.current) {
+      eventSource.current.close();
+      eventSource.current = null;
+    }
+    if (pollInterval.current) {
+      clearInterval(pollInterval.current);
+      pollInterval.current = null;
+    }
+  };
+
+  const handleTaskStatus = (data) => {
+    setTaskStatus(data);
+
+    if (data.status === 'SUCCEEDED') {
+      setSuccessMessage('🎉 3D модель успешно создана и добавлена в галерею!');
+      stopTaskUpdates();
+    } else if (data.status === 'FAILED' || data.status === 'CANCELED' || data.status === 'TIMEOUT' || data.status === 'ERROR') {
+      const errorMsg = data.status === 'TIMEOUT' ? 'Время ожидания истекло' : 
+                      data.error || 'Генерация модели не удалась';
+      setError(errorMsg);
+      stopTaskUpdates();
+    }
+  };
 
   const pollTaskStatus = async (taskId, isMultiImage = false) => {
     try {
@@ -51,28 +77,37 @@ const PhotoTo3D = () => {
         throw new Error(`HTTP error! status: ${response.status}`);
       }
       const data = await response.json();
-      setTaskStatus(data);
-
-      if (data.status === 'SUCCEEDED') {
-        setSuccessMessage('🎉 3D модель успешно создана и добавлена в галерею!');
-        if (pollInterval.current) {
-          clearInterval(pollInterval.current);
-          pollInterval.current = null;
-        }
-      } else if (data.status === 'FAILED' || data.status === 'CANCELED' || data.status === 'TIMEOUT') {
-        const errorMsg = data.status === 'TIMEOUT' ? 'Время ожидания истекло' : 
-                        data.error || 'Генерация модели не удалась';
-        setError(errorMsg);
-        if (pollInterval.current) {
-          clearInterval(pollInterval.current);
-          pollInterval.current = null;
-        }
-      }
+      handleTaskStatus(data);
     } catch (error) {
       setError(`Ошибка при проверке статуса задачи: ${error.message}`);
     }
   };
 
+  // Сервер сам присылает обновления статуса; при обрыве потока возвращаемся к опросу
+  const subscribeTaskStatus = (taskId, isMultiImage = false) => {
+    stopTaskUpdates();
+    if (!window.EventSource) {
+      pollInterval.current = setInterval(() => {
+        pollTaskStatus(taskId, isMultiImage);
+      }, 3000);
+      return;
+    }
+
+    const source = new EventSource(`http://localhost:8000/api/meshy/task-events/${taskId}`);
+    source.addEventListener('status', (event) => {
+      handleTaskStatus(JSON.parse(event.data));
+    });
+    source.onerror = () => {
+      if (eventSource.current !== source) return;
+      source.close();
+      eventSource.current = null;
+      pollInterval.current = setInterval(() => {
+        pollTaskStatus(taskId, isMultiImage);
+      }, 3000);
+    };
+    eventSource.current = source;
+  };
+
   const handleFileSelect = (event) => {
     const files = Array.from(event.target.files);
     if (files.length > 0) {
@@ -93,10 +128,7 @@ const PhotoTo3D = () => {
     setError(null);
     setSuccessMessage(null);
     setIsUploading(false);
-    if (pollInterval.current) {
-      clearInterval(pollInterval.current);
-      pollInterval.current = null;
-    }
+    stopTaskUpdates();
     const fileInput = document.querySelector('input[type="file"]');
     if (fileInput) {
       fileInput.value = '';
@@ -139,17 +171,18 @@ const PhotoTo3D = () => {
         formData.append('texture_prompt', settings.texture_prompt);
       }
 
+      // С токеном лимиты очереди считаются на пользователя, а не на адрес
+      const accessToken = localStorage.getItem('accessToken');
       const response = await fetch(`http://localhost:8000/api/meshy/${endpoint}`, {
         method: 'POST',
         body: formData,
+        headers: accessToken ? { Authorization: `Bearer ${accessToken}` } : {},
       });
 
       if (response.ok) {
         const data = await response.json();
         setCurrentTask(data);
-        pollInterval.current = setInterval(() => {
-          pollTaskStatus(data.task_id, isMultiImage);
-        }, 3000);
+        subscribeTaskStatus(data.task_id, isMultiImage);
       } else {
         const errorData = await response.json();
         setError(errorData.detail || 'Ошибка при загрузке файлов');
@@ -161,9 +194,11 @@ const PhotoTo3D = () => {
     }
   };
 
+  useEffect(() => stopTaskUpdates, []);
+
   useEffect(() => {
     const handleBeforeUnload = (e) => {
-      if (currentTask && taskStatus && taskStatus.status === 'IN_PROGRESS') {
+      if (currentTask && taskStatus && (taskStatus.status === 'QUEUED' || taskStatus.status === 'IN_PROGRESS' || taskStatus.status === 'DOWNLOADING')) {
         e.preventDefault();
         e.returnValue = 'Генерация 3D модели в процессе. Вы уверены, что хотите покинуть страницу?';
       }
@@ -172,19 +207,31 @@ const PhotoTo3D = () => {
     window.addEventListener('beforeunload', handleBeforeUnload);
     return () => {
       window.removeEventListener('beforeunload', handleBeforeUnload);
-      if (pollInterval.current) {
-        clearInterval(pollInterval.current);
-      }
     };
   }, [currentTask, taskStatus]);
 
   const getStatusMessage = () => {
     if (!taskStatus) return null;
     switch (taskStatus.status) {
+      case 'QUEUED': {
+        const queue = taskStatus.queue;
+        if (queue) {
+          const wait = queue.estimated_wait > 0 ? `, ожидание ~${Math.ceil(queue.estimated_wait / 60)} мин` : '';
+          return `Задача в очереди: ${queue.position} из ${queue.length}${wait}`;
+        }
+        return 'Задача в очереди...';
+      }
       case 'PENDING':
         return 'Задача в очереди...';
       case 'IN_PROGRESS':
         return `Создание 3D модели... ${taskStatus.progress}%`;
+      case 'DOWNLOADING': {
+        const download = taskStatus.download;
+        if (download && download.total) {
+          return `Загрузка файлов модели... ${Math.round((download.bytes / download.total) * 100)}%`;
+        }
+        return 'Загрузка файлов модели...';
+      }
       case 'SUCCEEDED':
         return 'Модель успешно создана!';
       case 'FAILED':
@@ -361,6 +408,19 @@ const PhotoTo3D = () => {
                       <div className="progress-fill" style={{ width: `${taskStatus.progress}%` }}></div>
                     </div>
                   )}
+                  {taskStatus && taskStatus.preview_url && (
+                    <p className="status-text">
+                      <a
+                        href={`/load-model?model=${encodeURIComponent(taskStatus.preview_url.split('/').pop())}`}
+                        target="_blank"
+                        rel="noopener noreferrer"
+                      >
+                        👁 {taskStatus.previews[taskStatus.previews.length - 1].stage === 'preview'
+                          ? 'Открыть черновую модель'
+                          : 'Открыть модель без текстуры'}
+                      </a>
+                    </p>
+                  )}
                   {currentTask && (
                     <div className="task-info">
                       <p><strong>ID задачи:</strong> {currentTask.task_id}</p>
@@ -0,0 +1,63 @@
+import multiprocessing
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+# Настройки читаются при импорте backend.config, поэтому каталоги данных
+# и источник генерации для тестов задаются до первого импорта backend
+_DATA_DIR = tempfile.mkdtemp(prefix="hack3d-tests-")
+os.environ.update({
+    "DATA_DIR": os.path.join(_DATA_DIR, "data"),
+    "MODELS_DIR": os.path.join(_DATA_DIR, "models"),
+    "GENERATION_BACKEND": "fake",
+    "FAKE_GENERATION_SECONDS": "0.5",
+    "POLL_MIN_INTERVAL": "0.1",
+    "POLL_MAX_INTERVAL": "0.5",
+    "PROCESS_POOL_WORKERS": "1",
+    "WEB_CONCURRENCY": "1",
+    "BCRYPT_ROUNDS": "4",
+})
+for name in ("DATABASE_URL", "JWT_SECRET", "TASK_STORE_URL", "MESHY_WEBHOOK_SECRET", "PROMETHEUS_MULTIPROC_DIR"):
+    os.environ.pop(name, None)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# fork из процесса pytest с потоком TestClient наследует захваченные блокировки
+# логирования и зависает; в пул процессов обработки моделей воркеры запускаются через spawn
+multiprocessing.set_start_method("spawn", force=True)
+
+
+def make_grid_gltf(side: int, low: tuple, high: tuple) -> tuple[dict, bytes]:
+    """Волнистая сетка-поверхность в заданном bounding box: валидный GLB для оптимизатора и LOD"""
+    grid = np.linspace(0.0, 1.0, side, dtype=np.float32)
+    x, z = np.meshgrid(grid, grid)
+    y = (np.sin(4 * x) * np.cos(4 * z) + 1) / 2
+    unit = np.stack([x, y, z], axis=-1).reshape(-1, 3)
+    unit = (unit - unit.min(axis=0)) / (unit.max(axis=0) - unit.min(axis=0))
+    positions = (np.array(low) + unit * (np.array(high) - np.array(low))).astype(np.float32)
+
+    rows = np.arange(side - 1)
+    corner = (rows[:, None] * side + rows[None, :]).reshape(-1).astype(np.uint32)
+    indices = np.stack(
+        [corner, corner + side, corner + 1, corner + 1, corner + side, corner + side + 1], axis=-1
+    ).reshape(-1).astype(np.uint32)
+
+    binary = positions.tobytes() + indices.tobytes()
+    gltf = {
+        "asset": {"version": "2.0"},
+        "scene": 0,
+        "scenes": [{"nodes": [0]}],
+        "nodes": [{"mesh": 0}],
+        "meshes": [{"primitives": [{"attributes": {"POSITION": 0}, "indices": 1, "mode": 4}]}],
+        "accessors": [
+            {"bufferView": 0, "componentType": 5126, "count": len(positions), "type": "VEC3",
+             "min": positions.min(axis=0).tolist(), "max": positions.max(axis=0).tolist()},
+            {"bufferView": 1, "componentType": 5125, "count": len(indices), "type": "SCALAR"},
+        ],
+        "bufferViews": [
+            {"buffer": 0, "byteOffset": 0, "byteLength": positions.nbytes},
+            {"buffer": 0, "byteOffset": positions.nbytes, "byteLength": indices.nbytes},
+        ],
+        "buffers": [{"byteLength": len(binary)}],
+    }
+    return gltf, binary
@@ -0,0 +1,194 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from backend.services.admission import AdmissionQueue, Submission
+from backend.services.generation import SubmissionError
+
+# Лимиты, которые в тесте не должны мешать, — заведомо большие
+UNLIMITED = dict(
+    rate_per_minute=60000, burst=1000, user_rate_per_minute=60000, user_burst=1000,
+    max_in_flight=100, max_in_flight_per_user=100, max_in_flight_batch=100,
+    max_queued=100, max_queued_per_user=100,
+)
+
+
+def make_queue(submitted: list, **limits) -> AdmissionQueue:
+    async def submit(submission: Submission) -> None:
+        submitted.append(submission.task_id)
+
+    async def fail(submission: Submission, error: str) -> None:
+        raise AssertionError(f"unexpected failure of {submission.task_id}: {error}")
+
+    return AdmissionQueue(submit_fn=submit, on_failure=fail, **{**UNLIMITED, **limits})
+
+
+def run_queue(queue: AdmissionQueue, scenario, start: bool = True) -> None:
+    async def main():
+        if start:
+            queue.start()
+        try:
+            await scenario()
+        finally:
+            await queue.stop()
+
+    asyncio.run(main())
+
+
+async def settle() -> None:
+    await asyncio.sleep(0.05)
+
+
+def test_per_user_in_flight_limit_lets_other_users_pass():
+    submitted = []
+    queue = make_queue(submitted, max_in_flight_per_user=1)
+
+    async def scenario():
+        queue.enqueue(Submission("alice-1", "single-image", "alice"))
+        queue.enqueue(Submission("alice-2", "single-image", "alice"))
+        queue.enqueue(Submission("bob-1", "single-image", "bob"))
+        await settle()
+        assert submitted == ["alice-1", "bob-1"]
+        assert queue.describe("alice-2")["position"] == 1
+        queue.release("alice-1")
+        await settle()
+        assert submitted == ["alice-1", "bob-1", "alice-2"]
+
+    run_queue(queue, scenario)
+
+
+def test_check_rejects_when_user_queue_is_full():
+    queue = make_queue([], max_queued_per_user=2, max_queued=3)
+    queue.enqueue(Submission("alice-1", "single-image", "alice"))
+    queue.enqueue(Submission("alice-2", "single-image", "alice"))
+
+    with pytest.raises(HTTPException) as error:
+        queue.check("alice")
+    assert error.value.status_code == 429
+    assert "Retry-After" in error.value.headers
+    queue.check("bob")
+    queue.enqueue(Submission("bob-1", "single-image", "bob"))
+    with pytest.raises(HTTPException) as error:
+        queue.check("carol")
+    assert error.value.status_code == 503
+
+
+def test_per_user_rate_limit_lets_other_users_pass():
+    submitted = []
+    queue = make_queue(submitted, user_rate_per_minute=1, user_burst=1)
+
+    async def scenario():
+        queue.enqueue(Submission("alice-1", "single-image", "alice"))
+        queue.enqueue(Submission("alice-2", "single-image", "alice"))
+        queue.enqueue(Submission("bob-1", "single-image", "bob"))
+        await settle()
+        # Второй задаче alice ждать минуту, задача bob уходит сразу
+        assert submitted == ["alice-1", "bob-1"]
+        assert queue.describe("alice-2")["position"] == 1
+
+    run_queue(queue, scenario)
+
+
+def test_retryable_rejection_is_resubmitted():
+    attempts = []
+    failed = []
+
+    async def submit(submission: Submission) -> None:
+        attempts.append(submission.task_id)
+        if len(attempts) == 1:
+            raise SubmissionError("Too Many Requests", retryable=True, retry_after=0.05)
+        if submission.task_id == "broken":
+            raise SubmissionError("Bad image")
+
+    async def fail(submission: Submission, error: str) -> None:
+        failed.append((submission.task_id, error))
+
+    queue = AdmissionQueue(submit_fn=submit, on_failure=fail, **UNLIMITED)
+
+    async def scenario():
+        queue.enqueue(Submission("task", "single-image", "alice"))
+        await settle()
+        # 429 приостанавливает очередь на retry_after, задача остается в ней
+        assert attempts == ["task"]
+        assert queue.describe("task") is not None
+        await asyncio.sleep(0.1)
+        assert attempts == ["task", "task"]
+        queue.enqueue(Submission("broken", "single-image", "alice"))
+        await settle()
+        assert failed == [("broken", "Bad image")]
+
+    run_queue(queue, scenario)
+
+
+def test_interactive_lane_goes_before_batch():
+    submitted = []
+    queue = make_queue(submitted, max_in_flight=1)
+
+    async def scenario():
+        queue.enqueue(Submission("batch-1", "single-image", "alice", lane="batch"))
+        queue.enqueue(Submission("interactive-1", "single-image", "bob"))
+        assert queue.describe("interactive-1")["position"] == 1
+        queue.start()
+        await settle()
+        assert submitted == ["interactive-1"]
+        queue.release("interactive-1")
+        await settle()
+        assert submitted == ["interactive-1", "batch-1"]
+
+    # Задачи ставятся до запуска очереди, чтобы порядок определялся полосой, а не временем
+    run_queue(queue, scenario, start=False)
+
+
+def test_batch_lane_is_capped_and_leaves_room_for_interactive():
+    submitted = []
+    queue = make_queue(submitted, max_in_flight=3, max_in_flight_batch=1)
+
+    async def scenario():
+        for index in range(3):
+            queue.enqueue(Submission(f"batch-{index}", "single-image", "alice", lane="batch"))
+        await settle()
+        assert submitted == ["batch-0"]
+        queue.enqueue(Submission("interactive-1", "single-image", "alice"))
+        await settle()
+        assert submitted == ["batch-0", "interactive-1"]
+        queue.release("batch-0")
+        await settle()
+        assert submitted == ["batch-0", "interactive-1", "batch-1"]
+
+    run_queue(queue, scenario)
+
+
+def test_per_user_rate_limit_does_not_apply_to_batch_lane():
+    submitted = []
+    queue = make_queue(submitted, user_rate_per_minute=1, user_burst=1)
+
+    async def scenario():
+        queue.enqueue(Submission("alice-1", "single-image", "alice"))
+        queue.enqueue(Submission("alice-2", "single-image", "alice"))
+        queue.enqueue(Submission("bob-1", "single-image", "bob"))
+        queue.enqueue(Submission("alice-batch", "single-image", "alice", lane="batch"))
+        await settle()
+        # Второй интерактивной задаче alice ждать минуту; остальные уходят сразу
+        assert submitted == ["alice-1", "bob-1", "alice-batch"]
+        assert queue.describe("alice-2") is not None
+
+    run_queue(queue, scenario)
+
+
+def test_unknown_lane_is_rejected():
+    queue = make_queue([])
+    with pytest.raises(ValueError):
+        queue.enqueue(Submission("task", "single-image", "alice", lane="bulk"))
+
+
+def test_batch_lane_counts_only_against_the_global_queue_cap():
+    queue = make_queue([], max_queued_per_user=2, max_queued=3)
+    queue.enqueue(Submission("alice-1", "single-image", "alice"))
+    queue.enqueue(Submission("alice-2", "single-image", "alice"))
+
+    # Пакетная полоса пользовательскому лимиту очереди не подчиняется, общему — да
+    queue.check("alice", lane="batch")
+    with pytest.raises(HTTPException) as error:
+        queue.check("alice", lane="batch", count=2)
+    assert error.value.status_code == 503
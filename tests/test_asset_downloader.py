@@ -0,0 +1,157 @@
+import asyncio
+import hashlib
+import os
+
+import aiohttp
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from backend import config
+from backend.services.asset_downloader import (
+    PARTIAL_SUFFIX,
+    Asset,
+    DownloadError,
+    _Progress,
+    download_asset,
+    download_assets,
+    plan_task_assets,
+)
+from backend.services.model_storage import shard_path
+
+BLOB = bytes(range(256)) * 64
+
+
+@pytest.fixture(autouse=True)
+def no_retry_delay(monkeypatch):
+    monkeypatch.setattr(config, "DOWNLOAD_RETRY_DELAY", 0.0)
+
+
+class AssetServer:
+    """Отдает BLOB с поддержкой Range; первые cut_first ответов обрываются на середине"""
+
+    def __init__(self, cut_first: int = 0, ranges: bool = True, status: int = 200):
+        self.cut_first = cut_first
+        self.ranges = ranges
+        self.status = status
+        self.requests: list[dict] = []
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        self.requests.append(dict(request.headers))
+        if self.status != 200:
+            return web.Response(status=self.status)
+        start = 0
+        range_header = request.headers.get("Range")
+        if self.ranges and range_header:
+            start = int(range_header.removeprefix("bytes=").rstrip("-"))
+        body = BLOB[start:]
+        response = web.StreamResponse(status=206 if start else 200, headers={"ETag": '"blob"'})
+        if start:
+            response.headers["Content-Range"] = f"bytes {start}-{len(BLOB) - 1}/{len(BLOB)}"
+        response.content_length = len(body)
+        await response.prepare(request)
+        if len(self.requests) <= self.cut_first:
+            await response.write(body[:len(body) // 2])
+            # Даем клиенту прочитать первую половину, прежде чем оборвать соединение
+            await asyncio.sleep(0.05)
+            request.transport.close()
+            return response
+        await response.write(body)
+        return response
+
+    async def download(self, models_dir: str, filename: str = "model.glb", retries: int = 3, **asset) -> dict:
+        app = web.Application()
+        app.router.add_get("/{name}", self.handle)
+        async with TestServer(app) as server, aiohttp.ClientSession() as session:
+            url = str(server.make_url(f"/{filename}"))
+            return await download_asset(
+                session, Asset(url, filename, "model", **asset), models_dir, _Progress(1, None),
+                chunk_size=1024, retries=retries,
+            )
+
+
+def test_interrupted_download_resumes_with_range(tmp_path):
+    server = AssetServer(cut_first=1)
+    result = asyncio.run(server.download(str(tmp_path)))
+
+    assert result["size"] == len(BLOB)
+    assert result["sha256"] == hashlib.sha256(BLOB).hexdigest()
+    assert len(server.requests) == 2
+    assert server.requests[1]["Range"] == f"bytes={len(BLOB) // 2}-"
+    assert server.requests[1]["If-Range"] == '"blob"'
+    path = shard_path(str(tmp_path), "model.glb")
+    with open(path, "rb") as f:
+        assert f.read() == BLOB
+    assert not os.path.exists(path + PARTIAL_SUFFIX)
+
+
+def test_server_without_range_support_restarts_from_scratch(tmp_path):
+    server = AssetServer(cut_first=1, ranges=False)
+    result = asyncio.run(server.download(str(tmp_path)))
+    assert result["sha256"] == hashlib.sha256(BLOB).hexdigest()
+    with open(shard_path(str(tmp_path), "model.glb"), "rb") as f:
+        assert f.read() == BLOB
+
+
+def test_client_errors_are_not_retried(tmp_path):
+    server = AssetServer(status=404)
+    with pytest.raises(DownloadError) as error:
+        asyncio.run(server.download(str(tmp_path)))
+    assert not error.value.retryable
+    assert len(server.requests) == 1
+
+
+def test_server_errors_are_retried_until_the_limit(tmp_path):
+    server = AssetServer(status=503)
+    with pytest.raises(DownloadError):
+        asyncio.run(server.download(str(tmp_path), retries=2))
+    assert len(server.requests) == 3
+    assert not os.path.exists(shard_path(str(tmp_path), "model.glb"))
+
+
+def test_optional_asset_failure_is_recorded(tmp_path):
+    async def main():
+        async with aiohttp.ClientSession() as session:
+            return await download_assets(
+                session, [Asset("file:///etc/passwd", "model_thumbnail.png", "thumbnail")], str(tmp_path),
+                local_root=str(tmp_path),
+            )
+
+    [result] = asyncio.run(main())
+    assert result["filename"] == "model_thumbnail.png"
+    assert "outside" in result["error"]
+
+
+def test_file_urls_only_from_the_local_jobs_directory(tmp_path):
+    jobs_dir = tmp_path / "jobs"
+    jobs_dir.mkdir()
+    (jobs_dir / "model.glb").write_bytes(BLOB)
+    models_dir = str(tmp_path / "models")
+
+    async def copy(url: str, local_root):
+        async with aiohttp.ClientSession() as session:
+            asset = Asset(url, "model.glb", "model", required=True)
+            return await download_asset(session, asset, models_dir, _Progress(1, None), local_root=local_root)
+
+    url = (jobs_dir / "model.glb").as_uri()
+    assert asyncio.run(copy(url, str(jobs_dir)))["sha256"] == hashlib.sha256(BLOB).hexdigest()
+    for bad_url, root in ((url, None), ("file:///etc/passwd", str(jobs_dir)), (f"{jobs_dir.as_uri()}/../../etc/passwd", str(jobs_dir))):
+        with pytest.raises(DownloadError) as error:
+            asyncio.run(copy(bad_url, root))
+        assert not error.value.retryable
+
+
+def test_plan_task_assets(monkeypatch):
+    monkeypatch.setattr(config, "DOWNLOAD_MODEL_FORMATS", ["glb", "fbx"])
+    monkeypatch.setattr(config, "DOWNLOAD_TEXTURES", True)
+    assets = plan_task_assets("task", "", {
+        "model_urls": {"glb": "https://cdn/a.glb", "fbx": "https://cdn/a.fbx", "obj": "https://cdn/a.obj"},
+        "texture_urls": [{"base_color": "https://cdn/t.jpg?sig=1", "normal": None}],
+        "thumbnail_url": "https://cdn/t.png",
+    })
+    assert [(asset.filename, asset.kind, asset.required) for asset in assets] == [
+        ("task.glb", "model", True),
+        ("task.fbx", "model", False),
+        ("task_texture_0_base_color.jpg", "texture", False),
+        ("task_thumbnail.png", "thumbnail", False),
+    ]
@@ -0,0 +1,108 @@
+from contextlib import asynccontextmanager
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.routers import auth
+from backend.services.db_pool import DatabasePool, get_db_pool
+from backend.services.passwords import pwd_context
+from backend.services.tokens import decode_access_token
+
+
+class FakeConnection:
+    """Таблица users в памяти; отвечает на те же запросы, что и PostgreSQL"""
+
+    def __init__(self, users: dict, queries: list):
+        self.users = users
+        self.queries = queries
+
+    async def fetchrow(self, query: str, username: str, *args):
+        self.queries.append(query)
+        if query == auth.SELECT_USER:
+            password = self.users.get(username)
+            return None if password is None else {"username": username, "password": password}
+        if query == auth.INSERT_USER:
+            if username in self.users:
+                return None
+            self.users[username] = args[0]
+            return {"username": username}
+        raise AssertionError(f"unexpected query {query}")
+
+    async def execute(self, query: str, username: str, password: str):
+        self.queries.append(query)
+        assert query == auth.UPDATE_PASSWORD
+        self.users[username] = password
+
+
+class FakePool:
+    def __init__(self):
+        self.users: dict[str, str] = {}
+        self.queries: list[str] = []
+        # Регистрация того же имени другим запросом между SELECT и INSERT
+        self.race: dict[str, str] = {}
+
+    @asynccontextmanager
+    async def acquire(self):
+        conn = FakeConnection(self.users, self.queries)
+        if self.race and self.queries and self.queries[-1] == auth.SELECT_USER:
+            self.users.update(self.race)
+            self.race = {}
+        yield conn
+
+
+@pytest.fixture
+def pool():
+    return FakePool()
+
+
+@pytest.fixture
+def client(pool):
+    app = FastAPI()
+    app.include_router(auth.router, prefix="/api/auth")
+    app.dependency_overrides[get_db_pool] = lambda: pool
+    return TestClient(app)
+
+
+def login(client, password: str = "secret"):
+    return client.post("/api/auth/login-or-register", json={"username": "alice", "password": password})
+
+
+def test_first_login_registers_the_user(client, pool):
+    response = login(client)
+    assert response.status_code == 200
+    assert response.json()["message"] == "User created successfully"
+    assert decode_access_token(response.json()["access_token"])["sub"] == "alice"
+    assert pool.users["alice"].startswith("$2")
+    assert pool.queries == [auth.SELECT_USER, auth.INSERT_USER]
+
+
+def test_existing_user_logs_in_with_one_query(client, pool):
+    login(client)
+    pool.queries.clear()
+    response = login(client)
+    assert response.status_code == 200
+    assert response.json()["message"] == "User already exists, no changes made"
+    assert pool.queries == [auth.SELECT_USER]
+
+
+def test_wrong_password_is_401(client):
+    login(client)
+    assert login(client, password="wrong").status_code == 401
+
+
+def test_concurrent_registration_checks_the_password(client, pool):
+    pool.race = {"alice": pwd_context.hash("other-password")}
+
+    # Вставка проиграла гонку — пароль сверяется с хэшем победителя, а не перезаписывает его
+    assert login(client, password="secret").status_code == 401
+    assert pool.queries == [auth.SELECT_USER, auth.INSERT_USER, auth.SELECT_USER]
+    assert login(client, password="other-password").status_code == 200
+
+
+def test_unconfigured_database_is_503():
+    app = FastAPI()
+    app.include_router(auth.router, prefix="/api/auth")
+    app.dependency_overrides[get_db_pool] = lambda: DatabasePool("")
+    response = login(TestClient(app))
+    assert response.status_code == 503
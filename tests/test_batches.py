@@ -0,0 +1,85 @@
+import io
+import json
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from backend.main import app
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app) as client:
+        yield client
+
+
+def make_png(color: tuple) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def create_batch(client: TestClient, images: dict, manifest: dict = None) -> dict:
+    files = [("files", (name, image, "image/png")) for name, image in images.items()]
+    data = {"manifest": json.dumps(manifest)} if manifest is not None else {}
+    response = client.post("/api/meshy/batches", files=files, data=data)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def wait_for_batch(client: TestClient, batch_id: str, timeout: float = 30.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        body = client.get(f"/api/meshy/batches/{batch_id}").json()
+        if body["state"] != "running":
+            return body
+        time.sleep(0.1)
+    raise AssertionError(f"Batch {batch_id} did not finish in {timeout}s, last state: {body['state']}")
+
+
+def test_batch_of_files_succeeds(client):
+    created = create_batch(client, {"femur.png": make_png((120, 30, 30)), "tibia.png": make_png((30, 120, 30))})
+    assert created["total"] == 2
+    assert [item["label"] for item in created["items"]] == ["femur", "tibia"]
+
+    finished = wait_for_batch(client, created["batch_id"])
+    assert finished["state"] == "succeeded", finished
+    assert finished["counts"] == {"SUCCEEDED": 2}
+    assert finished["progress"] == 100
+    assert all(item["local_model_path"].startswith("/models/") for item in finished["items"])
+
+
+def test_invalid_manifest_is_rejected(client):
+    image = {"femur.png": make_png((30, 30, 120))}
+    for manifest in ({"items": []}, {"items": [{"files": ["missing.png"]}]}, {"params": {"unknown": 1}}):
+        assert client.post(
+            "/api/meshy/batches", files=[("files", ("femur.png", image["femur.png"], "image/png"))],
+            data={"manifest": json.dumps(manifest)}
+        ).status_code == 400
+
+
+def test_cancel_leaves_reused_tasks_running(client):
+    shared = make_png((90, 90, 10))
+    single = client.post("/api/meshy/create-task", files={"file": ("skull.png", shared, "image/png")}).json()
+
+    created = create_batch(client, {"skull.png": shared, "rib.png": make_png((10, 90, 90))})
+    reused, own = created["items"]
+    assert reused["task_id"] == single["task_id"]
+
+    canceled = client.post(f"/api/meshy/batches/{created['batch_id']}/cancel").json()
+    statuses = {item["task_id"]: item["status"] for item in canceled["items"]}
+    assert statuses[own["task_id"]] == "CANCELED"
+    assert statuses[reused["task_id"]] != "CANCELED"
+
+    finished = wait_for_batch(client, created["batch_id"])
+    assert finished["state"] == "canceled"
+    assert {item["task_id"]: item["status"] for item in finished["items"]}[reused["task_id"]] == "SUCCEEDED"
+
+    # Перезапуск отправляет заново только отмененный элемент
+    retried = client.post(f"/api/meshy/batches/{created['batch_id']}/retry").json()
+    items = {item["index"]: item for item in retried["items"]}
+    assert items[0]["task_id"] == reused["task_id"]
+    assert items[1]["task_id"] != own["task_id"]
+    assert wait_for_batch(client, created["batch_id"])["state"] == "succeeded"
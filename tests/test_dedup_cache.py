@@ -0,0 +1,108 @@
+import asyncio
+import io
+
+import pytest
+from fastapi import UploadFile
+
+from backend.services.dedup_cache import DedupCache, compute_dedup_key
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = DedupCache(str(tmp_path / "dedup.sqlite3"), ttl=3600, max_entries=2)
+    cache.open()
+    yield cache
+    cache.close()
+
+
+def key_for(image: bytes, kind: str = "single-image", **params) -> str:
+    return asyncio.run(compute_dedup_key(kind, params, [UploadFile(io.BytesIO(image))], chunk_size=3))
+
+
+async def always_usable(entry):
+    return True
+
+
+def test_key_depends_on_image_kind_and_result_params():
+    base = key_for(b"image", ai_model="meshy-5")
+    assert key_for(b"image", ai_model="meshy-5") == base
+    assert key_for(b"other", ai_model="meshy-5") != base
+    assert key_for(b"image", kind="multi-image", ai_model="meshy-5") != base
+    assert key_for(b"image", ai_model="meshy-4") != base
+    # Параметры, не влияющие на результат, в ключ не входят
+    assert key_for(b"image", ai_model="meshy-5", callback="x") == base
+
+
+def test_second_request_reuses_the_task(cache):
+    submitted = []
+
+    async def submit():
+        submitted.append(1)
+        return f"task-{len(submitted)}"
+
+    async def main():
+        first = await cache.get_or_submit("key", "single-image", submit, always_usable)
+        second = await cache.get_or_submit("key", "single-image", submit, always_usable)
+        return first, second
+
+    assert asyncio.run(main()) == (("task-1", False), ("task-1", True))
+    assert len(submitted) == 1
+
+
+def test_concurrent_duplicates_share_one_submission(cache):
+    submitted = []
+
+    async def submit():
+        submitted.append(1)
+        await asyncio.sleep(0.05)
+        return "task-1"
+
+    async def main():
+        return await asyncio.gather(*[
+            cache.get_or_submit("key", "single-image", submit, always_usable) for _ in range(3)
+        ])
+
+    results = asyncio.run(main())
+    assert len(submitted) == 1
+    assert sorted(results) == [("task-1", False), ("task-1", True), ("task-1", True)]
+
+
+def test_failed_submission_is_not_cached(cache):
+    async def fail():
+        raise RuntimeError("Meshy is down")
+
+    async def submit():
+        return "task-2"
+
+    async def main():
+        with pytest.raises(RuntimeError):
+            await cache.get_or_submit("key", "single-image", fail, always_usable)
+        return await cache.get_or_submit("key", "single-image", submit, always_usable)
+
+    assert asyncio.run(main()) == ("task-2", False)
+
+
+def test_unusable_entry_is_replaced(cache):
+    async def unusable(entry):
+        return False
+
+    async def main():
+        await cache.get_or_submit("key", "single-image", lambda: asyncio.sleep(0, "task-1"), always_usable)
+        return await cache.get_or_submit("key", "single-image", lambda: asyncio.sleep(0, "task-2"), unusable)
+
+    assert asyncio.run(main()) == ("task-2", False)
+
+
+def test_result_paths_and_eviction(cache):
+    async def main():
+        for index in range(3):
+            await cache.get_or_submit(f"key-{index}", "single-image", lambda: asyncio.sleep(0, f"task-{index}"), always_usable)
+            await asyncio.sleep(0.01)
+        await cache.record_result("task-2", "/models/task-2.glb", None)
+
+    asyncio.run(main())
+    # Сверх max_entries вытесняется самая давно использованная запись
+    assert cache._get("key-0") is None
+    assert cache._get("key-2").local_model_path == "/models/task-2.glb"
+    asyncio.run(cache.forget_task("task-2"))
+    assert cache._get("key-2") is None
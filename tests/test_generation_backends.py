@@ -0,0 +1,53 @@
+import asyncio
+import importlib.util
+import time
+
+import pytest
+
+from backend.services.generation import FakeBackend, LocalBackend, SubmissionError
+
+KIND_INFO = {"log_name": "image-to-3d"}
+
+
+def test_fake_task_is_visible_to_another_worker(tmp_path):
+    async def main():
+        # Второй экземпляр — источник в другом процессе uvicorn с тем же каталогом заданий
+        submitter = FakeBackend(str(tmp_path), duration=0.2)
+        poller = FakeBackend(str(tmp_path), duration=0.2)
+        task_id = await submitter.submit("image-to-3d", KIND_INFO, {}, [])
+
+        first = await poller.fetch_status(task_id, KIND_INFO)
+        await asyncio.sleep(0.25)
+        done = await poller.fetch_status(task_id, KIND_INFO)
+        await submitter.release(task_id)
+        return first, done, await poller.fetch_status(task_id, KIND_INFO)
+
+    first, done, released = asyncio.run(main())
+    assert first["status"] == "IN_PROGRESS"
+    assert done["status"] == "SUCCEEDED"
+    assert done["model_urls"]["glb"].startswith("file://")
+    assert released["task_error"]["message"] == "Unknown fake task"
+
+
+@pytest.mark.skipif(importlib.util.find_spec("hy3dgen") is not None, reason="hy3dgen would load real pipelines")
+def test_worker_load_failure_fails_submissions(tmp_path):
+    async def main():
+        backend = LocalBackend(str(tmp_path))
+        await backend.start()
+        try:
+            # hy3dgen здесь не установлен — воркер сообщает об ошибке загрузки и завершается
+            deadline = time.monotonic() + 60
+            while backend._worker_error is None and time.monotonic() < deadline:
+                await asyncio.sleep(0.1)
+            pid = backend._process.pid
+            with pytest.raises(SubmissionError) as error:
+                await backend.submit("image-to-3d", KIND_INFO, {}, [])
+            return pid, backend._process.pid, error.value
+        finally:
+            await backend.stop()
+
+    pid, pid_after, error = asyncio.run(main())
+    assert "Failed to load pipelines" in str(error)
+    assert not error.retryable
+    # Воркер не перезапускается на каждую отправку
+    assert pid_after == pid
@@ -0,0 +1,74 @@
+import io
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from backend.main import app
+
+
+@pytest.fixture(scope="module")
+def client():
+    # Весь lifespan приложения: хранилище задач, очередь отправки, опрос и источник fake
+    with TestClient(app) as client:
+        yield client
+
+
+def make_png(color: tuple) -> bytes:
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+def create_task(client: TestClient, image: bytes) -> dict:
+    response = client.post("/api/meshy/create-task", files={"file": ("bone.png", image, "image/png")})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def wait_for_status(client: TestClient, task_id: str, timeout: float = 30.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        body = client.get(f"/api/meshy/task-status/{task_id}").json()
+        if body["status"] in ("SUCCEEDED", "FAILED", "ERROR", "TIMEOUT", "CANCELED"):
+            return body
+        time.sleep(0.1)
+    raise AssertionError(f"Task {task_id} did not finish in {timeout}s, last status: {body['status']}")
+
+
+def test_task_goes_from_queued_to_succeeded(client):
+    created = create_task(client, make_png((200, 10, 10)))
+    assert created["status"] == "QUEUED"
+    assert not created["cached"]
+
+    finished = wait_for_status(client, created["task_id"])
+    assert finished["status"] == "SUCCEEDED", finished
+    assert finished["local_model_path"].startswith("/models/")
+
+    model = client.get(finished["local_model_path"])
+    assert model.status_code == 200
+    assert model.content[:4] == b"glTF"
+
+
+def test_same_image_reuses_the_task(client):
+    image = make_png((10, 200, 10))
+    first = create_task(client, image)
+    second = create_task(client, image)
+    assert second["task_id"] == first["task_id"]
+    assert second["cached"]
+
+    wait_for_status(client, first["task_id"])
+    third = create_task(client, image)
+    assert third["task_id"] == first["task_id"]
+    assert third["status"] == "SUCCEEDED"
+
+    # Без кэша — новая задача
+    response = client.post(
+        "/api/meshy/create-task", params={"no_cache": "true"}, files={"file": ("bone.png", image, "image/png")}
+    )
+    assert response.json()["task_id"] != first["task_id"]
+
+
+def test_unknown_task_is_404(client):
+    assert client.get("/api/meshy/task-status/no-such-task").status_code == 404
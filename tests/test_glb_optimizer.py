@@ -0,0 +1,82 @@
+import asyncio
+import os
+
+import numpy as np
+import pytest
+
+from backend.services.glb import read_glb, read_glb_summary, write_glb
+from backend.services.glb_optimizer import QUANTIZATION_EXTENSION, optimize_glb_file, read_accessor
+from backend.services.model_catalog import ModelCatalog
+from backend.services.model_storage import shard_path
+from conftest import make_grid_gltf
+
+SIDE = 60
+LOW = (5.0, 15.0, 25.0)
+HIGH = (15.0, 25.0, 35.0)
+
+
+@pytest.fixture
+def model_path(tmp_path):
+    gltf, binary = make_grid_gltf(SIDE, LOW, HIGH)
+    path = shard_path(str(tmp_path), "model.glb")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_glb(path, gltf, binary)
+    return path
+
+
+def _world_positions(path: str) -> np.ndarray:
+    """Позиции в единицах модели: с деквантованием через узел меша, как в просмотрщике"""
+    gltf, binary = read_glb(path)
+    positions = read_accessor(gltf, binary, gltf["meshes"][0]["primitives"][0]["attributes"]["POSITION"])
+    node = next(node for node in gltf["nodes"] if node.get("mesh") == 0)
+    return positions * np.array(node.get("scale", [1, 1, 1])) + np.array(node.get("translation", [0, 0, 0]))
+
+
+def _grid_order(positions: np.ndarray) -> np.ndarray:
+    """Вершины по клеткам сетки x/z: порядок не зависит от переупорядочивания оптимизатором"""
+    spacing = (HIGH[0] - LOW[0]) / (SIDE - 1)
+    cells = np.round((positions[:, [0, 2]] - np.array([LOW[0], LOW[2]])) / spacing).astype(int)
+    return positions[np.lexsort((cells[:, 1], cells[:, 0]))]
+
+
+def test_optimize_round_trip(model_path):
+    original = _world_positions(model_path)
+    result = optimize_glb_file(model_path)
+
+    assert result["optimized"]
+    assert result["optimized_size"] < result["original_size"]
+    assert os.path.exists(model_path + ".orig")
+    gltf, _ = read_glb(model_path)
+    assert QUANTIZATION_EXTENSION in gltf["extensionsRequired"]
+
+    optimized = _world_positions(model_path)
+    assert optimized.shape == original.shape
+    # Погрешность квантования int16 — доли процента размера модели
+    error = np.abs(_grid_order(optimized) - _grid_order(original)).max()
+    assert error < (HIGH[0] - LOW[0]) / 32767 * 2
+
+
+def test_summary_bbox_is_in_model_units(model_path):
+    before = read_glb_summary(model_path)
+    optimize_glb_file(model_path)
+    after = read_glb_summary(model_path)
+
+    assert after["vertices"] == before["vertices"]
+    assert after["triangles"] == before["triangles"]
+    np.testing.assert_allclose(after["bbox_min"], LOW, atol=1e-3)
+    np.testing.assert_allclose(after["bbox_max"], HIGH, atol=1e-3)
+
+
+def test_catalog_reports_dequantized_bbox(model_path, tmp_path):
+    optimize_glb_file(model_path)
+    catalog = ModelCatalog(str(tmp_path / "catalog.sqlite3"), str(tmp_path))
+    catalog.open()
+    try:
+        asyncio.run(catalog.add_model("model.glb"))
+        items, total = asyncio.run(catalog.page(limit=10, offset=0, sort="created_at", descending=True))
+    finally:
+        catalog.close()
+
+    assert total == 1
+    np.testing.assert_allclose(items[0]["bbox_min"], LOW, atol=1e-3)
+    np.testing.assert_allclose(items[0]["bbox_max"], HIGH, atol=1e-3)
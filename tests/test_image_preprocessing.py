@@ -0,0 +1,82 @@
+import os
+import time
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from backend.services.image_preprocessing import ORIENTATION_TAG, preprocess_image, prune_cache
+
+SETTINGS = {"version": 1, "max_edge": 256, "jpeg_quality": 85, "remove_background": False}
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    return str(tmp_path / "cache")
+
+
+def save_photo(path: str, size: tuple, orientation: int = 1, mode: str = "RGB") -> str:
+    image = Image.new(mode, size, (200, 30, 30, 255)[:len(mode)])
+    exif = Image.Exif()
+    exif[ORIENTATION_TAG] = orientation
+    if mode == "RGB":
+        image.save(path, "JPEG", quality=95, exif=exif)
+    else:
+        image.save(path, "PNG")
+    return path
+
+
+def test_large_photo_is_rotated_and_shrunk(tmp_path, cache_dir):
+    # Ориентация 6: кадр снят повернутым на 90°, после поворота он вертикальный
+    path = save_photo(str(tmp_path / "photo.jpg"), (1200, 800), orientation=6)
+    result = preprocess_image(path, cache_dir, SETTINGS)
+
+    assert result["content_type"] == "image/jpeg"
+    assert not result["cached"]
+    assert result["size"] < result["original_size"]
+    with Image.open(result["path"]) as image:
+        assert image.size == (171, 256)
+        assert image.getexif().get(ORIENTATION_TAG, 1) == 1
+
+
+def test_transparency_is_kept_as_png(tmp_path, cache_dir):
+    path = save_photo(str(tmp_path / "cutout.png"), (600, 300), mode="RGBA")
+    result = preprocess_image(path, cache_dir, SETTINGS)
+    assert result["content_type"] == "image/png"
+    with Image.open(result["path"]) as image:
+        assert image.mode == "RGBA"
+        assert image.size == (256, 128)
+
+
+def test_small_image_is_not_reencoded(tmp_path, cache_dir):
+    # Шум, сжатый с quality 50: перекодирование с quality 85 только увеличило бы файл
+    path = str(tmp_path / "small.jpg")
+    pixels = np.random.default_rng(0).integers(0, 256, (64, 64, 3), dtype=np.uint8)
+    Image.fromarray(pixels).save(path, "JPEG", quality=50)
+    result = preprocess_image(path, cache_dir, SETTINGS)
+    with open(path, "rb") as original, open(result["path"], "rb") as prepared:
+        assert prepared.read() == original.read()
+
+
+def test_result_is_cached_per_settings(tmp_path, cache_dir):
+    path = save_photo(str(tmp_path / "photo.jpg"), (1200, 800))
+    first = preprocess_image(path, cache_dir, SETTINGS)
+    again = preprocess_image(path, cache_dir, SETTINGS)
+    assert again["cached"] and again["path"] == first["path"]
+
+    # Другие настройки — другой результат
+    other = preprocess_image(path, cache_dir, {**SETTINGS, "max_edge": 128})
+    assert not other["cached"] and other["path"] != first["path"]
+    assert not [name for name in os.listdir(cache_dir) if name.endswith(".tmp")]
+
+
+def test_unused_results_are_pruned(tmp_path, cache_dir):
+    path = save_photo(str(tmp_path / "photo.jpg"), (1200, 800))
+    old = preprocess_image(path, cache_dir, SETTINGS)["path"]
+    fresh = preprocess_image(path, cache_dir, {**SETTINGS, "max_edge": 128})["path"]
+    stale = time.time() - 3600
+    os.utime(old, (stale, stale))
+
+    assert prune_cache(cache_dir, ttl=600) == 1
+    assert not os.path.exists(old)
+    assert os.path.exists(fresh)
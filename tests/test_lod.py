@@ -0,0 +1,105 @@
+import os
+
+import numpy as np
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.routers import model_files
+from backend.services.glb import read_glb_summary, write_glb
+from backend.services.glb_optimizer import optimize_glb_file
+from backend.services.lod import generate_lods, lod_filename, simplify
+from backend.services.model_storage import model_storage, shard_path
+from conftest import make_grid_gltf
+
+SIDE = 60
+LOW = (5.0, 15.0, 25.0)
+HIGH = (15.0, 25.0, 35.0)
+TASK_ID = "0a1b2c3d-0000-4000-8000-000000000010"
+
+
+@pytest.fixture
+def model_path(tmp_path):
+    gltf, binary = make_grid_gltf(SIDE, LOW, HIGH)
+    path = shard_path(str(tmp_path), "model.glb")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_glb(path, gltf, binary)
+    return path
+
+
+def test_lod_filename():
+    assert lod_filename("model.glb", 0) == "model.glb"
+    assert lod_filename("model.glb", 2) == "model.lod2.glb"
+
+
+def test_simplify_stays_under_target():
+    gltf, binary = make_grid_gltf(SIDE, LOW, HIGH)
+    positions = np.frombuffer(binary, dtype=np.float32, count=SIDE * SIDE * 3).reshape(-1, 3).astype(np.float64)
+    indices = np.frombuffer(binary, dtype=np.uint32, offset=positions.size * 4).astype(np.int64)
+    source_triangles = len(indices) // 3
+
+    representative, optimal, triangles = simplify(positions, indices, source_triangles // 10)
+    assert 0 < len(triangles) <= source_triangles // 10
+    # Точка кластера ограничена окрестностью его ячейки — далеко за модель она не уходит
+    used = np.unique(triangles)
+    margin = 0.2 * (np.array(HIGH) - np.array(LOW))
+    assert (optimal[used] >= np.array(LOW) - margin).all()
+    assert (optimal[used] <= np.array(HIGH) + margin).all()
+
+
+def test_levels_are_written_next_to_the_model(model_path):
+    levels = generate_lods(model_path, [0.25, 0.05])
+
+    assert [level["level"] for level in levels] == [0, 1, 2]
+    triangles = [level["triangles"] for level in levels]
+    assert triangles[0] > triangles[1] > triangles[2] > 0
+    for level in levels[1:]:
+        path = os.path.join(os.path.dirname(model_path), level["filename"])
+        assert read_glb_summary(path)["triangles"] == level["triangles"]
+        assert os.path.getsize(path) == level["size"]
+    assert not [name for name in os.listdir(os.path.dirname(model_path)) if name.endswith(".tmp")]
+
+
+def test_lod_bbox_is_in_model_units(model_path):
+    optimize_glb_file(model_path)
+    levels = generate_lods(model_path, [0.25])
+
+    assert [level["level"] for level in levels] == [0, 1]
+    lod_path = os.path.join(os.path.dirname(model_path), lod_filename("model.glb", 1))
+    summary = read_glb_summary(lod_path)
+    assert summary["triangles"] < read_glb_summary(model_path)["triangles"]
+    # Упрощение может немного сжать bbox, но не выводит его за пределы модели
+    assert all(low - 1e-3 <= value for value, low in zip(summary["bbox_min"], LOW))
+    assert all(value <= high + 1e-3 for value, high in zip(summary["bbox_max"], HIGH))
+    assert all(value > low + 1 for value, low in zip(summary["bbox_max"], LOW))
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(model_files.router, prefix="/models")
+    gltf, binary = make_grid_gltf(SIDE, LOW, HIGH)
+    path = model_storage.path(f"{TASK_ID}.glb")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_glb(path, gltf, binary)
+    generate_lods(path, [0.25])
+    yield TestClient(app)
+    for level in (0, 1):
+        os.remove(model_storage.path(lod_filename(f"{TASK_ID}.glb", level)))
+
+
+def test_lod_query_selects_level(client):
+    full = client.get(f"/models/{TASK_ID}.glb")
+    lod1 = client.get(f"/models/{TASK_ID}.glb", params={"lod": 1})
+    assert lod1.status_code == 200
+    assert len(lod1.content) < len(full.content)
+    assert lod1.content == client.get(f"/models/{TASK_ID}.lod1.glb").content
+    assert "immutable" in lod1.headers["cache-control"]
+
+
+def test_missing_level_falls_back_without_long_caching(client):
+    lod2 = client.get(f"/models/{TASK_ID}.glb", params={"lod": 2})
+    assert lod2.status_code == 200
+    assert lod2.content == client.get(f"/models/{TASK_ID}.lod1.glb").content
+    assert lod2.headers["cache-control"] == "no-cache"
+    assert client.get(f"/models/{TASK_ID}.glb", params={"lod": 10}).status_code == 422
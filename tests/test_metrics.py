@@ -0,0 +1,66 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from backend.services.metrics import MetricsMiddleware, monitor_event_loop_lag, observe_db, observe_task_phase, render
+
+
+def sample(name: str, **labels) -> float:
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_requests_are_labeled_by_route_template():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/items/{item_id}")
+    async def get_item(item_id: str):
+        if item_id == "missing":
+            raise HTTPException(status_code=404)
+        return {"item_id": item_id}
+
+    labels = dict(method="GET", route="/items/{item_id}")
+    before_ok = sample("hack3d_http_request_duration_seconds_count", status="200", **labels)
+    before_missing = sample("hack3d_http_request_duration_seconds_count", status="404", **labels)
+    client = TestClient(app)
+    for item_id in ("a", "b", "missing"):
+        client.get(f"/items/{item_id}")
+    client.get("/no/such/route")
+
+    # task_id и прочие параметры пути в метки не попадают
+    assert sample("hack3d_http_request_duration_seconds_count", status="200", **labels) == before_ok + 2
+    assert sample("hack3d_http_request_duration_seconds_count", status="404", **labels) == before_missing + 1
+    assert sample("hack3d_http_request_duration_seconds_count", method="GET", route="unmatched", status="404") >= 1
+
+
+def test_db_operation_is_timed_even_on_error():
+    before = sample("hack3d_db_operation_duration_seconds_count", operation="test")
+    with pytest.raises(RuntimeError):
+        with observe_db("test"):
+            raise RuntimeError("connection lost")
+    assert sample("hack3d_db_operation_duration_seconds_count", operation="test") == before + 1
+
+
+def test_phase_without_start_is_skipped():
+    before = sample("hack3d_task_phase_duration_seconds_count", phase="queued")
+    observe_task_phase("queued", None, 100.0)
+    observe_task_phase("queued", 90.0, 100.0)
+    assert sample("hack3d_task_phase_duration_seconds_count", phase="queued") == before + 1
+    assert b"hack3d_task_phase_duration_seconds_bucket" in render()
+
+
+def test_event_loop_lag_is_measured():
+    async def main():
+        monitor = asyncio.create_task(monitor_event_loop_lag(interval=0.01))
+        await asyncio.sleep(0.02)
+        # Блокирующий вызов в event loop — именно то, что должен заметить замер
+        time.sleep(0.1)
+        await asyncio.sleep(0.02)
+        monitor.cancel()
+
+    asyncio.run(main())
+    assert sample("hack3d_event_loop_lag_max_seconds") >= 0.05
@@ -0,0 +1,71 @@
+import asyncio
+import os
+
+import aiohttp
+from aiohttp.test_utils import TestServer
+
+from backend.bench.mock_meshy import MockSettings, MockTask, build_model, create_app, progress_at
+from backend.services.glb import read_glb_summary
+
+# Мгновенные ответы: в тестах задержки сети не нужны
+FAST = dict(generation_seconds=0.3, generation_jitter=0.0, submit_latency=0.0, poll_latency=0.0, download_latency=0.0)
+
+
+async def run_mock(settings: MockSettings, scenario):
+    async with TestServer(create_app(settings)) as server, aiohttp.ClientSession() as session:
+        return await scenario(session, lambda path: str(server.make_url(path)))
+
+
+def test_progress_curve_is_monotonic():
+    task = MockTask("task", "image-to-3d", created_at=0.0, duration=10.0, fails=False)
+    values = [progress_at(task, moment / 2) for moment in range(22)]
+    assert values[0] == 0 and values[-1] == 100
+    assert values == sorted(values)
+
+
+def test_model_is_a_valid_glb_of_about_the_requested_size(tmp_path):
+    content = build_model(256 * 1024)
+    path = os.path.join(tmp_path, "model.glb")
+    with open(path, "wb") as f:
+        f.write(content)
+    assert read_glb_summary(path)["triangles"] > 0
+    assert 128 * 1024 < len(content) < 512 * 1024
+
+
+def test_task_lifecycle_and_resumable_download():
+    async def scenario(session, url):
+        async with session.post(url("/image-to-3d"), json={"image_url": "data:"}) as response:
+            assert response.status == 202
+            task_id = (await response.json())["result"]
+        async with session.get(url(f"/image-to-3d/{task_id}")) as response:
+            assert (await response.json())["status"] in ("PENDING", "IN_PROGRESS")
+        await asyncio.sleep(0.35)
+        async with session.get(url(f"/image-to-3d/{task_id}")) as response:
+            body = await response.json()
+        assert body["status"] == "SUCCEEDED"
+        async with session.get(body["model_urls"]["glb"]) as response:
+            full = await response.read()
+        async with session.get(body["model_urls"]["glb"], headers={"Range": "bytes=100-"}) as response:
+            assert response.status == 206
+            assert await response.read() == full[100:]
+        async with session.get(url(f"/multi-image-to-3d/{task_id}")) as response:
+            assert response.status == 404
+
+    asyncio.run(run_mock(MockSettings(model_size=64 * 1024, **FAST), scenario))
+
+
+def test_submit_rate_limit_answers_429_with_retry_after():
+    async def scenario(session, url):
+        statuses = []
+        for _ in range(3):
+            async with session.post(url("/image-to-3d"), json={}) as response:
+                statuses.append(response.status)
+                retry_after = response.headers.get("Retry-After")
+        async with session.get(url("/_stats")) as response:
+            stats = await response.json()
+        return statuses, retry_after, stats
+
+    statuses, retry_after, stats = asyncio.run(run_mock(MockSettings(submit_rate_per_minute=2, **FAST), scenario))
+    assert statuses == [202, 202, 429]
+    assert 0 < int(retry_after) <= 60
+    assert stats["requests"] == {"submit:202": 2, "submit:429": 1}
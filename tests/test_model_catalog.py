@@ -0,0 +1,137 @@
+import asyncio
+import os
+import threading
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.routers import models
+from backend.services.glb import write_glb
+from backend.services.model_catalog import ModelCatalog, model_catalog
+from backend.services.model_storage import shard_path
+from conftest import make_grid_gltf
+
+TASK_ID = "0a1b2c3d-0000-4000-8000-000000000001"
+
+
+def add_glb(models_dir: str, filename: str, side: int = 4) -> str:
+    gltf, binary = make_grid_gltf(side, (0.0, 0.0, 0.0), (1.0, 2.0, 3.0))
+    path = shard_path(models_dir, filename)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_glb(path, gltf, binary)
+    return path
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    catalog = ModelCatalog(str(tmp_path / "catalog.sqlite3"), str(tmp_path / "models"))
+    catalog.open()
+    yield catalog
+    catalog.close()
+
+
+def page(catalog: ModelCatalog, **options) -> tuple[list[dict], int]:
+    options = {"limit": 50, "offset": 0, "sort": "created_at", "descending": True, **options}
+    return asyncio.run(catalog.page(**options))
+
+
+def test_added_model_has_glb_metadata(catalog):
+    add_glb(catalog.models_dir, f"{TASK_ID}.glb", side=4)
+    asyncio.run(catalog.add_model(f"{TASK_ID}.glb"))
+
+    items, total = page(catalog)
+    assert total == 1
+    item = items[0]
+    assert item["task_id"] == TASK_ID
+    assert (item["vertices"], item["triangles"]) == (16, 18)
+    assert item["bbox_min"] == [0.0, 0.0, 0.0]
+    assert item["bbox_max"] == [1.0, 2.0, 3.0]
+    assert item["model_url"] == f"/models/{TASK_ID}.glb"
+    assert item["thumbnail_url"] is None
+
+
+def test_rescan_follows_the_models_directory(catalog):
+    add_glb(catalog.models_dir, "femur.glb", side=3)
+    add_glb(catalog.models_dir, "skull.glb", side=5)
+    # Уровни детализации и черновики в каталог не попадают
+    add_glb(catalog.models_dir, "skull.lod1.glb")
+    add_glb(catalog.models_dir, "skull.preview.glb")
+    asyncio.run(catalog.rescan())
+    assert [item["filename"] for item in page(catalog, sort="triangles")[0]] == ["skull.glb", "femur.glb"]
+
+    os.remove(shard_path(catalog.models_dir, "femur.glb"))
+    asyncio.run(catalog.rescan())
+    items, total = page(catalog)
+    assert total == 1
+    assert items[0]["filename"] == "skull.glb"
+
+
+def test_paging_and_sort_validation(catalog):
+    for name in ("a.glb", "b.glb", "c.glb"):
+        add_glb(catalog.models_dir, name)
+    asyncio.run(catalog.rescan())
+    items, total = page(catalog, sort="filename", descending=False, limit=2, offset=1)
+    assert total == 3
+    assert [item["filename"] for item in items] == ["b.glb", "c.glb"]
+    with pytest.raises(ValueError):
+        page(catalog, sort="content_hash; DROP TABLE models")
+
+
+def test_invalid_glb_is_skipped(catalog):
+    path = shard_path(catalog.models_dir, "broken.glb")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"not a glb")
+    asyncio.run(catalog.rescan())
+    assert page(catalog)[1] == 0
+
+
+@pytest.fixture
+def client():
+    model_catalog.open()
+    app = FastAPI()
+    app.include_router(models.router, prefix="/api/models")
+    yield TestClient(app)
+    model_catalog.close()
+
+
+def test_catalog_etag_changes_with_content(client):
+    first = client.get("/api/models")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert client.get("/api/models", headers={"If-None-Match": etag}).status_code == 304
+    # Другие параметры страницы — другой ETag
+    assert client.get("/api/models", params={"limit": 5}, headers={"If-None-Match": etag}).status_code == 200
+
+    add_glb(model_catalog.models_dir, "catalog_etag.glb")
+    asyncio.run(model_catalog.add_model("catalog_etag.glb"))
+    changed = client.get("/api/models", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert "catalog_etag.glb" in [item["filename"] for item in changed.json()["items"]]
+
+
+def test_version_is_shared_between_processes(catalog):
+    # Второй экземпляр с той же базой — каталог другого процесса uvicorn
+    other = ModelCatalog(catalog.db_path, catalog.models_dir)
+    other.open()
+    try:
+        before = asyncio.run(catalog.version())
+        add_glb(catalog.models_dir, "femur.glb")
+        asyncio.run(other.add_model("femur.glb"))
+        assert asyncio.run(catalog.version()) == before + 1
+
+        # Одновременные изменения из разных соединений не теряются
+        def bump(target: ModelCatalog):
+            with target._lock:
+                target._bump_version()
+
+        threads = [threading.Thread(target=bump, args=(target,)) for target in (catalog, other) * 10]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert asyncio.run(other.version()) == before + 21
+    finally:
+        other.close()
@@ -0,0 +1,109 @@
+import os
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.routers import model_files
+from backend.services.model_serving import parse_range
+from backend.services.model_storage import model_storage
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", [(0, 99)]),
+    ("bytes=100-", [(100, 999)]),
+    ("bytes=-100", [(900, 999)]),
+    ("bytes=-5000", [(0, 999)]),
+    ("bytes=900-5000", [(900, 999)]),
+    ("bytes=0-9, 20-29", [(0, 9), (20, 29)]),
+    ("bytes=1000-", []),
+    ("bytes=-0", []),
+    ("bytes=5-1", None),
+    ("items=0-9", None),
+    ("bytes=abc", None),
+    ("bytes=0-9,20-29,40-49", None),  # больше max_ranges — файл целиком
+])
+def test_parse_range(header, expected):
+    assert parse_range(header, 1000, max_ranges=2) == expected
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(model_files.router, prefix="/models")
+    path = model_storage.path("serving_test.glb")
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(bytes(range(256)) * 4)
+    yield TestClient(app)
+    os.remove(path)
+
+
+def test_full_file_with_validators(client):
+    response = client.get("/models/serving_test.glb")
+    assert response.status_code == 200
+    assert response.content == bytes(range(256)) * 4
+    assert response.headers["etag"].startswith('"')
+    assert response.headers["accept-ranges"] == "bytes"
+    assert "last-modified" in response.headers
+
+
+def test_if_none_match_returns_304(client):
+    etag = client.get("/models/serving_test.glb").headers["etag"]
+    response = client.get("/models/serving_test.glb", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert client.get("/models/serving_test.glb", headers={"If-None-Match": f"W/{etag}"}).status_code == 304
+    assert client.get("/models/serving_test.glb", headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+def test_single_range(client):
+    response = client.get("/models/serving_test.glb", headers={"Range": "bytes=10-19"})
+    assert response.status_code == 206
+    assert response.content == bytes(range(10, 20))
+    assert response.headers["content-range"] == "bytes 10-19/1024"
+
+
+def test_multiple_ranges(client):
+    response = client.get("/models/serving_test.glb", headers={"Range": "bytes=0-1,4-5"})
+    assert response.status_code == 206
+    assert response.headers["content-type"].startswith("multipart/byteranges")
+    assert b"Content-Range: bytes 0-1/1024" in response.content
+    assert b"Content-Range: bytes 4-5/1024" in response.content
+
+
+def test_unsatisfiable_range(client):
+    response = client.get("/models/serving_test.glb", headers={"Range": "bytes=5000-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == "bytes */1024"
+
+
+def test_if_range_with_stale_etag_sends_full_file(client):
+    etag = client.get("/models/serving_test.glb").headers["etag"]
+    fresh = client.get("/models/serving_test.glb", headers={"Range": "bytes=0-9", "If-Range": etag})
+    assert fresh.status_code == 206
+    stale = client.get("/models/serving_test.glb", headers={"Range": "bytes=0-9", "If-Range": '"stale"'})
+    assert stale.status_code == 200
+    assert len(stale.content) == 1024
+
+
+def test_head_has_no_body(client):
+    response = client.head("/models/serving_test.glb")
+    assert response.status_code == 200
+    assert response.headers["content-length"] == "1024"
+    assert response.content == b""
+
+
+def test_partial_and_hidden_files_are_not_served(client):
+    assert client.get("/models/serving_test.glb.part").status_code == 404
+    assert client.get("/models/.hidden").status_code == 404
+
+
+def test_original_before_optimization_is_not_served(client):
+    path = model_storage.path("serving_test.glb.orig")
+    with open(path, "wb") as f:
+        f.write(b"original")
+    try:
+        assert client.get("/models/serving_test.glb.orig").status_code == 404
+    finally:
+        os.remove(path)
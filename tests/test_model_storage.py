@@ -0,0 +1,113 @@
+import asyncio
+import os
+import time
+
+import pytest
+
+from backend.services.model_storage import ModelStorage, iter_model_files, shard_path
+
+TASKS = [f"0a1b2c3d-0000-4000-8000-00000000002{index}" for index in range(4)]
+
+
+@pytest.fixture
+def storage(tmp_path):
+    storage = ModelStorage(
+        str(tmp_path / "storage.sqlite3"), str(tmp_path / "models"), quota_bytes=0, low_watermark=0.5, min_age=0
+    )
+    storage.open()
+    yield storage
+    storage.close()
+
+
+def write(storage: ModelStorage, filename: str, content: bytes) -> str:
+    path = storage.path(filename)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(content)
+    return path
+
+
+def test_task_files_share_one_shard(storage):
+    model = storage.path(f"{TASKS[0]}.glb")
+    assert os.path.dirname(storage.path(f"multi_{TASKS[0]}_thumbnail.png")) == os.path.dirname(model)
+    assert os.path.relpath(model, storage.models_dir).count(os.sep) == 2
+    assert storage.path("gallery_sprites.json") == os.path.join(storage.models_dir, "gallery_sprites.json")
+
+
+def test_flat_files_are_moved_into_shards(tmp_path):
+    models_dir = tmp_path / "models"
+    models_dir.mkdir()
+    (models_dir / f"{TASKS[0]}.glb").write_bytes(b"model")
+    (models_dir / "manual.glb").write_bytes(b"manual")
+
+    storage = ModelStorage(str(tmp_path / "storage.sqlite3"), str(models_dir))
+    storage.open()
+    storage.close()
+    assert os.path.exists(shard_path(str(models_dir), f"{TASKS[0]}.glb"))
+    assert sorted(entry.name for entry in iter_model_files(str(models_dir))) == [f"{TASKS[0]}.glb", "manual.glb"]
+
+
+def test_identical_files_become_hardlinks(storage):
+    content = os.urandom(4096)
+    first = write(storage, f"{TASKS[0]}.glb", content)
+    second = write(storage, f"{TASKS[1]}.glb", content)
+    write(storage, f"{TASKS[1]}_thumbnail.png", b"different")
+
+    assert asyncio.run(storage.register_task(TASKS[0])) == []
+    assert asyncio.run(storage.register_task(TASKS[1])) == [f"{TASKS[1]}.glb"]
+    assert os.stat(first).st_ino == os.stat(second).st_ino
+    # Жесткая ссылка занимает место один раз
+    assert storage._usage() == 4096 + len(b"different")
+
+
+def test_least_recently_used_tasks_are_evicted_over_quota(storage):
+    for task_id in TASKS:
+        write(storage, f"{task_id}.glb", os.urandom(1000))
+        asyncio.run(storage.register_task(task_id))
+        time.sleep(0.01)
+    # К самой старой модели недавно обращались — вытесняются следующие по давности
+    storage.touch(f"{TASKS[0]}.glb")
+    storage.quota_bytes = 3000
+
+    evicted = []
+
+    async def on_evict(task_id: str, removed: list[str]):
+        evicted.append((task_id, removed))
+
+    assert asyncio.run(storage.collect(on_evict)) == 3
+    assert evicted == [(task_id, [f"{task_id}.glb"]) for task_id in TASKS[1:]]
+    assert os.path.exists(storage.path(f"{TASKS[0]}.glb"))
+    assert storage._usage() == 1000
+
+
+def test_shared_inode_is_freed_only_with_its_last_link(storage):
+    content = os.urandom(2000)
+    for task_id in TASKS[:2]:
+        write(storage, f"{task_id}.glb", content)
+        asyncio.run(storage.register_task(task_id))
+
+    freed, removed = storage._remove_group(TASKS[0])
+    assert (freed, removed) == (0, [f"{TASKS[0]}.glb"])
+    assert storage._remove_group(TASKS[1])[0] == 2000
+
+
+def test_reconcile_picks_up_unknown_files(storage):
+    write(storage, f"{TASKS[0]}.glb", b"model")
+    write(storage, "manual.glb", b"manual")
+    asyncio.run(storage.reconcile())
+    assert storage._usage() == len(b"model") + len(b"manual")
+
+    os.remove(storage.path("manual.glb"))
+    asyncio.run(storage.reconcile())
+    assert storage._usage() == len(b"model")
+
+
+def test_original_before_optimization_is_not_counted_but_evicted(storage):
+    write(storage, f"{TASKS[0]}.glb", b"optimized")
+    write(storage, f"{TASKS[0]}.glb.orig", b"original model")
+    asyncio.run(storage.register_task(TASKS[0]))
+    asyncio.run(storage.reconcile())
+    assert storage._usage() == len(b"optimized")
+
+    # Вытеснение задачи удаляет и оригинал
+    assert asyncio.run(storage.remove_task(TASKS[0])) == [f"{TASKS[0]}.glb", f"{TASKS[0]}.glb.orig"]
@@ -0,0 +1,128 @@
+import asyncio
+import time
+
+import pytest
+
+from backend.services.poll_scheduler import PollOutcome, PollScheduler, _PolledTask
+
+
+def make_scheduler(poll_fn=None, on_timeout=None, **options) -> PollScheduler:
+    async def never_done(task_id, kind, event):
+        return PollOutcome(done=False)
+
+    async def ignore_timeout(task_id, kind):
+        pass
+
+    return PollScheduler(poll_fn=poll_fn or never_done, on_timeout=on_timeout or ignore_timeout, **options)
+
+
+def make_task(started_ago: float = 0.0) -> _PolledTask:
+    now = time.monotonic()
+    return _PolledTask(task_id="task", kind="single-image", deadline=now + 600, started_at=now - started_ago, interval=1.0)
+
+
+def run_scheduler(scheduler: PollScheduler, scenario) -> None:
+    async def main():
+        scheduler.start()
+        try:
+            await scenario()
+        finally:
+            await scheduler.stop()
+
+    asyncio.run(main())
+
+
+def test_errors_back_off_exponentially_up_to_max_interval():
+    scheduler = make_scheduler(min_interval=0.1, max_interval=10.0, error_interval=1.0)
+    task = make_task()
+    intervals = [scheduler._next_interval(task, PollOutcome(done=False, error=True)) for _ in range(5)]
+    assert intervals == [1.0, 2.0, 4.0, 8.0, 10.0]
+
+    # Успешный опрос сбрасывает счетчик ошибок
+    scheduler._next_interval(task, PollOutcome(done=False, progress=0))
+    assert task.errors == 0
+
+
+def test_interval_follows_progress_rate():
+    scheduler = make_scheduler(min_interval=0.1, max_interval=100.0)
+    task = make_task(started_ago=10.0)
+    # Половина за 10 секунд — до конца еще ~10 секунд, опрашиваем четыре раза
+    assert scheduler._next_interval(task, PollOutcome(done=False, progress=50)) == pytest.approx(2.5, rel=0.05)
+
+
+def test_stalled_progress_stretches_interval():
+    scheduler = make_scheduler(min_interval=1.0, max_interval=100.0)
+    task = make_task()
+    assert scheduler._next_interval(task, PollOutcome(done=False, progress=0)) == 1.0
+    assert scheduler._next_interval(task, PollOutcome(done=False, progress=0)) == 1.5
+    assert scheduler._next_interval(task, PollOutcome(done=False, progress=0)) == 2.25
+
+
+def test_service_error_rate_slows_every_task():
+    scheduler = make_scheduler(min_interval=1.0, max_interval=100.0)
+    scheduler._error_rate = 0.5
+    assert scheduler._next_interval(make_task(), PollOutcome(done=False, progress=0)) == 3.0
+
+
+def test_request_budget_is_shared_by_all_tasks():
+    polled = []
+
+    async def poll(task_id, kind, event):
+        polled.append(task_id)
+        return PollOutcome(done=True)
+
+    scheduler = make_scheduler(poll, requests_per_second=2.0)
+
+    async def scenario():
+        for index in range(5):
+            scheduler.schedule(f"task-{index}", "single-image", timeout=60)
+        await asyncio.sleep(0.2)
+        # Запас бакета — два запроса, дальше не чаще двух в секунду
+        assert len(polled) == 2
+        await asyncio.sleep(0.6)
+        assert len(polled) == 3
+
+    run_scheduler(scheduler, scenario)
+
+
+def test_finished_and_timed_out_tasks_leave_the_schedule():
+    finished, timed_out = [], []
+
+    async def poll(task_id, kind, event):
+        return PollOutcome(done=task_id == "done")
+
+    async def on_timeout(task_id, kind):
+        timed_out.append(task_id)
+
+    scheduler = make_scheduler(poll, on_timeout, on_finished=finished.append, min_interval=0.05)
+
+    async def scenario():
+        scheduler.schedule("done", "single-image", timeout=60)
+        scheduler.schedule("slow", "single-image", timeout=0.2)
+        await asyncio.sleep(0.5)
+        assert sorted(finished) == ["done", "slow"]
+        assert timed_out == ["slow"]
+        assert len(scheduler) == 0
+
+    run_scheduler(scheduler, scenario)
+
+
+def test_poll_now_delivers_event_without_waiting():
+    events = []
+
+    async def poll(task_id, kind, event):
+        events.append(event)
+        return PollOutcome(done=event is not None)
+
+    scheduler = make_scheduler(poll, initial_delay=60.0)
+
+    async def scenario():
+        scheduler.schedule("task", "single-image", timeout=600)
+        await asyncio.sleep(0.05)
+        assert events == []
+        assert scheduler.poll_now("task", {"status": "SUCCEEDED"})
+        await asyncio.sleep(0.05)
+        assert events == [{"status": "SUCCEEDED"}]
+        assert not scheduler.poll_now("task")
+
+    run_scheduler(scheduler, scenario)
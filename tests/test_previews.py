@@ -0,0 +1,79 @@
+import asyncio
+import os
+
+import aiohttp
+import pytest
+
+from backend.routers import meshy
+from backend.services.generation import preview_filename
+from backend.services.glb import write_glb
+from backend.services.model_catalog import ModelCatalog
+from backend.services.model_storage import model_storage, shard_path
+from backend.services.task_store import SQLiteTaskStore, TaskRecord
+from conftest import make_grid_gltf
+
+TASK_ID = "0a1b2c3d-0000-4000-8000-000000000016"
+KIND_INFO = {"file_prefix": ""}
+
+
+def write_model(path: str, side: int) -> str:
+    gltf, binary = make_grid_gltf(side, (0.0, 0.0, 0.0), (1.0, 1.0, 1.0))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    write_glb(path, gltf, binary)
+    return path
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = SQLiteTaskStore(str(tmp_path / "tasks.sqlite3"))
+    asyncio.run(store.open())
+    monkeypatch.setattr(meshy, "task_store", store)
+    yield store
+    asyncio.run(store.close())
+
+
+def test_preview_filename():
+    assert preview_filename("task.glb", "preview") == "task.preview.glb"
+    assert preview_filename("multi_task.glb", "shape") == "multi_task.shape.glb"
+
+
+def test_catalog_skips_previews(tmp_path):
+    catalog = ModelCatalog(str(tmp_path / "catalog.sqlite3"), str(tmp_path / "models"))
+    catalog.open()
+    try:
+        write_model(shard_path(catalog.models_dir, f"{TASK_ID}.glb"), 4)
+        write_model(shard_path(catalog.models_dir, preview_filename(f"{TASK_ID}.glb", "preview")), 2)
+        asyncio.run(catalog.rescan())
+        items, total = asyncio.run(catalog.page(limit=50, offset=0, sort="created_at", descending=True))
+    finally:
+        catalog.close()
+    assert total == 1
+    assert items[0]["filename"] == f"{TASK_ID}.glb"
+
+
+def test_previews_accumulate_in_stage_order(tmp_path, store):
+    jobs_dir = tmp_path / "jobs"
+    preview_urls = {}
+    for stage, side in (("preview", 2), ("shape", 4)):
+        write_model(str(jobs_dir / f"{stage}.glb"), side)
+        preview_urls[stage] = (jobs_dir / f"{stage}.glb").as_uri()
+    record = TaskRecord(task_id=TASK_ID, type="single-image")
+    asyncio.run(store.put(record))
+
+    async def fetch(urls: dict):
+        async with aiohttp.ClientSession() as session:
+            await meshy.fetch_previews(session, record, KIND_INFO, urls, str(jobs_dir))
+
+    # Сначала готов только черновик, затем и полная сетка без текстуры
+    asyncio.run(fetch({"preview": preview_urls["preview"]}))
+    asyncio.run(fetch(preview_urls))
+    previews = asyncio.run(store.get(TASK_ID)).extra["previews"]
+    assert [preview["stage"] for preview in previews] == ["preview", "shape"]
+    assert previews[1]["url"] == f"/models/{preview_filename(f'{TASK_ID}.glb', 'shape')}"
+    paths = [model_storage.path(os.path.basename(preview["url"])) for preview in previews]
+    assert all(os.path.exists(path) for path in paths)
+
+    # Готовая модель заменяет черновики
+    asyncio.run(meshy.remove_previews(record))
+    assert asyncio.run(store.get(TASK_ID)).extra["previews"] is None
+    assert not any(os.path.exists(path) for path in paths)
@@ -0,0 +1,68 @@
+import asyncio
+
+from backend.services.task_events import TaskEventHub
+
+
+def test_every_subscriber_gets_the_update():
+    hub = TaskEventHub()
+
+    async def main():
+        first = hub.subscribe("task", heartbeat=5)
+        second = hub.subscribe("task", heartbeat=5)
+        reads = asyncio.gather(first.__anext__(), second.__anext__())
+        await asyncio.sleep(0)
+        hub.publish("task", '{"progress": 10}')
+        assert await reads == ['{"progress": 10}', '{"progress": 10}']
+
+    asyncio.run(main())
+
+
+def test_slow_subscriber_gets_only_the_latest_state():
+    hub = TaskEventHub()
+
+    async def main():
+        events = hub.subscribe("task", heartbeat=5)
+        hub.publish("task", '{"progress": 10}')
+        hub.publish("task", '{"progress": 20}')
+        assert await events.__anext__() == '{"progress": 20}'
+
+    asyncio.run(main())
+
+
+def test_heartbeat_when_nothing_changes():
+    hub = TaskEventHub()
+
+    async def main():
+        events = hub.subscribe("task", heartbeat=0.01)
+        assert await events.__anext__() is None
+
+    asyncio.run(main())
+
+
+def test_channel_lives_while_it_has_subscribers():
+    hub = TaskEventHub()
+    # Без подписчиков публиковать некому — канал не заводится
+    hub.publish("task", "{}")
+    assert hub.subscribers("task") == 0
+
+    first = hub.subscribe("task", heartbeat=5)
+    second = hub.subscribe("task", heartbeat=5)
+    assert hub.subscribers("task") == 2
+    first.close()
+    first.close()
+    assert hub.subscribers("task") == 1
+    second.close()
+    assert hub.subscribers("task") == 0
+    assert "task" not in hub._channels
+
+
+def test_closed_subscription_stops_iteration():
+    hub = TaskEventHub()
+
+    async def main():
+        events = hub.subscribe("task", heartbeat=5)
+        hub.publish("task", "{}")
+        events.close()
+        assert [payload async for payload in events] == []
+
+    asyncio.run(main())
@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+from backend.services.task_leases import TaskLeases
+from backend.services.task_store import SQLiteTaskStore, TaskRecord
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SQLiteTaskStore(str(tmp_path / "tasks.sqlite3"))
+    asyncio.run(store.open())
+    for index, status in enumerate(("QUEUED", "IN_PROGRESS", "SUCCEEDED")):
+        asyncio.run(store.put(TaskRecord(task_id=f"task-{index}", type="single-image", status=status)))
+    yield store
+    asyncio.run(store.close())
+
+
+def test_lease_is_exclusive_until_it_expires(store):
+    assert asyncio.run(store.acquire_leases(["task-0", "task-1"], "worker-a", ttl=60)) == {"task-0", "task-1"}
+    # Владелец продлевает свою аренду, чужая действующая аренда не перехватывается
+    assert asyncio.run(store.acquire_leases(["task-0"], "worker-a", ttl=60)) == {"task-0"}
+    assert asyncio.run(store.acquire_leases(["task-0", "task-1"], "worker-b", ttl=60)) == set()
+
+    asyncio.run(store.acquire_leases(["task-1"], "worker-a", ttl=-1))
+    assert asyncio.run(store.acquire_leases(["task-0", "task-1"], "worker-b", ttl=60)) == {"task-1"}
+
+
+def test_orphans_are_unfinished_tasks_without_a_live_lease(store):
+    assert [record.task_id for record in asyncio.run(store.list_orphaned(10))] == ["task-0", "task-1"]
+    asyncio.run(store.acquire_leases(["task-0"], "worker-a", ttl=60))
+    assert [record.task_id for record in asyncio.run(store.list_orphaned(10))] == ["task-1"]
+
+    # Остановленный процесс отпускает аренды — задачи сразу доступны остальным
+    asyncio.run(store.release_leases("worker-a"))
+    assert len(asyncio.run(store.list_orphaned(10))) == 2
+
+
+def test_worker_adopts_orphans_and_notices_takeover(store):
+    adopted = []
+    lost = []
+    owned = set()
+
+    async def adopt(records):
+        adopted.extend(record.task_id for record in records)
+        owned.update(record.task_id for record in records)
+
+    async def main():
+        leases = TaskLeases(store, ttl=60, renew_interval=3600, claim_limit=10)
+        # Первый проход фонового цикла сразу подбирает задачи без владельца
+        leases.start(lambda: owned, lost.append, adopt)
+        try:
+            await asyncio.sleep(0.1)
+            assert await leases.claim_orphans() == 0
+
+            # Аренду перехватил другой процесс, пока этот не продлевал ее
+            await store.release_leases(leases.owner)
+            await store.acquire_leases(["task-1"], "worker-b", ttl=60)
+            await store.acquire_leases(["task-0"], leases.owner, ttl=60)
+            await leases.renew()
+        finally:
+            await leases.stop()
+
+    asyncio.run(main())
+    assert sorted(adopted) == ["task-0", "task-1"]
+    assert lost == ["task-1"]
+    assert [record.task_id for record in asyncio.run(store.list_orphaned(10))] == ["task-0"]
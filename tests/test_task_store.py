@@ -0,0 +1,105 @@
+import asyncio
+
+import pytest
+
+from backend.services.task_store import SQLiteTaskStore, TaskRecord, create_task_store
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = SQLiteTaskStore(str(tmp_path / "tasks.sqlite3"))
+    asyncio.run(store.open())
+    yield store
+    asyncio.run(store.close())
+
+
+def add_tasks(store, count: int, **fields) -> list[TaskRecord]:
+    records = [
+        TaskRecord(task_id=f"task-{index:02d}", type="single-image", created_at=1000.0 + index, **fields)
+        for index in range(count)
+    ]
+    for record in records:
+        asyncio.run(store.put(record))
+    return records
+
+
+def test_records_survive_reopen(tmp_path):
+    path = str(tmp_path / "tasks.sqlite3")
+    store = SQLiteTaskStore(path)
+    asyncio.run(store.open())
+    asyncio.run(store.put(TaskRecord(task_id="task", type="single-image", data={"stage": "shape"})))
+    asyncio.run(store.update("task", status="IN_PROGRESS", progress=40))
+    asyncio.run(store.close())
+
+    reopened = create_task_store(f"sqlite:///{path}")
+    asyncio.run(reopened.open())
+    record = asyncio.run(reopened.get("task"))
+    # Незавершенные задачи после рестарта снова ставятся на опрос
+    unfinished = asyncio.run(reopened.list_unfinished())
+    asyncio.run(reopened.close())
+    assert (record.status, record.progress, record.data) == ("IN_PROGRESS", 40, {"stage": "shape"})
+    assert [task.task_id for task in unfinished] == ["task"]
+
+
+def test_update_rejects_unknown_fields(store):
+    add_tasks(store, 1)
+    with pytest.raises(ValueError):
+        asyncio.run(store.update("task-00", owner="someone"))
+
+
+def test_update_extra_replaces_top_level_keys(store):
+    asyncio.run(store.put(TaskRecord(task_id="task", type="single-image", extra={"lods": {"1": "a"}, "keep": 1})))
+    asyncio.run(store.update_extra("task", lods={"2": "b"}, submission=None))
+    extra = asyncio.run(store.get("task")).extra
+    assert extra == {"lods": {"2": "b"}, "keep": 1, "submission": None}
+
+
+def test_cursor_pagination_walks_all_tasks_newest_first(store):
+    add_tasks(store, 7)
+    seen, cursor = [], None
+    while True:
+        page, cursor = asyncio.run(store.list_tasks(cursor=cursor, limit=3))
+        seen.extend(record.task_id for record in page)
+        if cursor is None:
+            break
+    assert seen == [f"task-{index:02d}" for index in reversed(range(7))]
+
+
+def test_pagination_filters_and_bad_cursor(store):
+    add_tasks(store, 4)
+    asyncio.run(store.update("task-01", status="SUCCEEDED"))
+    asyncio.run(store.update("task-03", status="SUCCEEDED"))
+    page, cursor = asyncio.run(store.list_tasks(status="SUCCEEDED", limit=1))
+    assert [record.task_id for record in page] == ["task-03"]
+    page, cursor = asyncio.run(store.list_tasks(status="SUCCEEDED", cursor=cursor, limit=1))
+    assert [record.task_id for record in page] == ["task-01"]
+    assert cursor is None
+    with pytest.raises(ValueError):
+        asyncio.run(store.list_tasks(cursor="not-a-cursor"))
+
+
+def test_get_many_and_delete(store):
+    add_tasks(store, 3)
+    assert sorted(asyncio.run(store.get_many(["task-00", "task-02", "missing"]))) == ["task-00", "task-02"]
+    assert asyncio.run(store.delete("task-00"))
+    assert not asyncio.run(store.delete("task-00"))
+
+
+def test_only_old_finished_tasks_are_evicted(store):
+    add_tasks(store, 3)
+    asyncio.run(store.update("task-00", status="SUCCEEDED"))
+    asyncio.run(store.update("task-01", status="FAILED"))
+    assert asyncio.run(store.evict_finished(ttl=3600)) == 0
+    assert asyncio.run(store.evict_finished(ttl=-1)) == 2
+    assert [record.task_id for record in asyncio.run(store.list_unfinished())] == ["task-02"]
+
+
+def test_update_unfinished_leaves_finished_tasks_alone(store):
+    add_tasks(store, 1)
+    assert asyncio.run(store.update_unfinished("task-00", status="IN_PROGRESS", progress=30))
+    asyncio.run(store.update("task-00", status="CANCELED"))
+
+    # Опрос, начатый до отмены, не возвращает задаче прежний статус
+    assert not asyncio.run(store.update_unfinished("task-00", status="IN_PROGRESS", progress=60))
+    record = asyncio.run(store.get("task-00"))
+    assert (record.status, record.progress) == ("CANCELED", 30)
@@ -0,0 +1,159 @@
+import asyncio
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+from PIL import Image
+
+from backend import config
+
+from backend.services.glb import write_glb
+from backend.services.model_catalog import ModelCatalog
+from backend.services.model_storage import shard_path
+from backend.services.thumbnails import (
+    MANIFEST_FILENAME, ThumbnailStage, derive_thumbnails, update_sprite_sheets, variant_filename
+)
+from conftest import make_grid_gltf
+
+LAYOUT = dict(tile=32, columns=2, rows=1)
+
+
+def add_thumbnail(models_dir: str, name: str, color=(200, 20, 20), size=(300, 150)) -> str:
+    thumbnail = f"{name}_thumbnail.png"
+    path = shard_path(models_dir, thumbnail)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    Image.new("RGB", size, color).save(path)
+    return thumbnail
+
+
+def add_glb(models_dir: str, filename: str) -> None:
+    gltf, binary = make_grid_gltf(2, (0.0, 0.0, 0.0), (1.0, 1.0, 1.0))
+    write_glb(shard_path(models_dir, filename), gltf, binary)
+
+
+def manifest(models_dir: str) -> dict:
+    with open(os.path.join(models_dir, MANIFEST_FILENAME), encoding="utf-8") as f:
+        return json.load(f)
+
+
+@pytest.fixture
+def models_dir(tmp_path):
+    return str(tmp_path)
+
+
+def test_variants_fit_each_size_without_upscaling(models_dir):
+    thumbnail = add_thumbnail(models_dir, "skull")
+    variants = derive_thumbnails(models_dir, thumbnail, [64, 512], ("webp",))
+
+    assert variants == {
+        "512": {"webp": f"/models/{variant_filename(thumbnail, 512, 'webp')}"},
+        "64": {"webp": f"/models/{variant_filename(thumbnail, 64, 'webp')}"},
+    }
+    with Image.open(shard_path(models_dir, variant_filename(thumbnail, 64, "webp"))) as image:
+        assert image.size == (64, 32)
+    with Image.open(shard_path(models_dir, variant_filename(thumbnail, 512, "webp"))) as image:
+        assert image.size == (300, 150)
+
+
+def test_models_are_placed_in_order(models_dir):
+    entries = [(f"model-{index}.glb", add_thumbnail(models_dir, f"model-{index}")) for index in range(3)]
+    placements = update_sprite_sheets(models_dir, entries, **LAYOUT)
+
+    assert [(p["column"], p["row"]) for p in placements.values()] == [(0, 0), (1, 0), (0, 0)]
+    sheets = manifest(models_dir)["sheets"]
+    assert len(sheets) == 2
+    assert placements["model-2.glb"]["url"] == f"/models/{sheets[1]['filename']}"
+    with Image.open(os.path.join(models_dir, sheets[0]["filename"])) as image:
+        assert image.size == (64, 32)
+
+
+def test_unchanged_sheets_are_not_rewritten(models_dir):
+    entries = [(f"model-{index}.glb", add_thumbnail(models_dir, f"model-{index}")) for index in range(3)]
+    update_sprite_sheets(models_dir, entries, **LAYOUT)
+    before = manifest(models_dir)
+    first_sheet = os.path.join(models_dir, before["sheets"][0]["filename"])
+    mtime = os.stat(first_sheet).st_mtime_ns
+
+    # Новая модель дописывается в последний лист, первый остается как был
+    entries.append(("model-3.glb", add_thumbnail(models_dir, "model-3")))
+    update_sprite_sheets(models_dir, entries, **LAYOUT)
+    after = manifest(models_dir)
+    assert after["sheets"][0] == before["sheets"][0]
+    assert os.stat(first_sheet).st_mtime_ns == mtime
+    assert after["sheets"][1]["filename"] != before["sheets"][1]["filename"]
+    assert not os.path.exists(os.path.join(models_dir, before["sheets"][1]["filename"]))
+
+
+def test_removed_model_frees_its_slot(models_dir):
+    entries = [(f"model-{index}.glb", add_thumbnail(models_dir, f"model-{index}")) for index in range(2)]
+    update_sprite_sheets(models_dir, entries, **LAYOUT)
+
+    placements = update_sprite_sheets(models_dir, entries[1:], **LAYOUT)
+    assert list(placements) == ["model-1.glb"]
+    assert manifest(models_dir)["sheets"][0]["tiles"][0] is None
+
+    # Новые модели только дописываются в конец: освободившаяся ячейка остается пустой
+    placements = update_sprite_sheets(models_dir, entries[1:] + [("model-2.glb", add_thumbnail(models_dir, "model-2"))], **LAYOUT)
+    assert placements["model-1.glb"]["column"] == 1
+    assert placements["model-2.glb"]["url"] != placements["model-1.glb"]["url"]
+
+
+def test_layout_change_rebuilds_sheets(models_dir):
+    entries = [("model-0.glb", add_thumbnail(models_dir, "model-0"))]
+    update_sprite_sheets(models_dir, entries, **LAYOUT)
+
+    update_sprite_sheets(models_dir, entries, tile=16, columns=4, rows=4)
+    rebuilt = manifest(models_dir)
+    assert (rebuilt["tile"], rebuilt["columns"], rebuilt["rows"]) == (16, 4, 4)
+    with Image.open(os.path.join(models_dir, rebuilt["sheets"][0]["filename"])) as image:
+        assert image.size == (64, 64)
+
+
+def test_concurrent_rebuilds_from_several_processes(models_dir):
+    entries = [(f"model-{index}.glb", add_thumbnail(models_dir, f"model-{index}")) for index in range(5)]
+    # Каждый воркер uvicorn перестраивает листы сам; блокировка не дает им мешать друг другу
+    with ProcessPoolExecutor(4, mp_context=multiprocessing.get_context("fork")) as pool:
+        futures = [pool.submit(update_sprite_sheets, models_dir, entries, **LAYOUT) for _ in range(4)]
+        results = [future.result() for future in futures]
+
+    assert all(result == results[0] for result in results)
+    sheets = manifest(models_dir)["sheets"]
+    assert {placement["url"] for placement in results[0].values()} == {f"/models/{sheet['filename']}" for sheet in sheets}
+    assert all(os.path.exists(os.path.join(models_dir, sheet["filename"])) for sheet in sheets)
+    assert not [name for name in os.listdir(models_dir) if name.endswith(".tmp")]
+
+
+def test_stage_rebuilds_after_a_change_by_another_process(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "THUMBNAIL_SIZES", [64])
+    monkeypatch.setattr(config, "SPRITE_TILE_SIZE", LAYOUT["tile"])
+    monkeypatch.setattr(config, "SPRITE_COLUMNS", LAYOUT["columns"])
+    monkeypatch.setattr(config, "SPRITE_ROWS", LAYOUT["rows"])
+    models_dir = str(tmp_path / "models")
+    catalog = ModelCatalog(str(tmp_path / "catalog.sqlite3"), models_dir)
+    other = ModelCatalog(catalog.db_path, models_dir)
+    catalog.open()
+    other.open()
+    stage = ThumbnailStage(catalog)
+    try:
+        add_thumbnail(models_dir, "femur")
+        add_glb(models_dir, "femur.glb")
+        asyncio.run(catalog.add_model("femur.glb"))
+        asyncio.run(stage.refresh())
+        asyncio.run(stage.refresh())
+        built = asyncio.run(catalog.version())
+        asyncio.run(stage.refresh())
+        # Пересобирать нечего — версия не меняется
+        assert asyncio.run(catalog.version()) == built
+
+        # Модель добавил другой процесс: эта стадия узнает о ней по версии в базе
+        add_thumbnail(models_dir, "tibia")
+        add_glb(models_dir, "tibia.glb")
+        asyncio.run(other.add_model("tibia.glb"))
+        asyncio.run(stage.refresh())
+        entries = asyncio.run(catalog.thumbnail_entries())
+    finally:
+        catalog.close()
+        other.close()
+    assert [variants is not None for _, _, variants in entries] == [True, True]
@@ -0,0 +1,90 @@
+import asyncio
+import threading
+import time
+
+import jwt
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from passlib.context import CryptContext
+
+from backend import config
+from backend.routers import auth
+from backend.services import tokens
+from backend.services.passwords import PasswordHasher, pwd_context
+from backend.services.tokens import create_access_token, decode_access_token
+
+
+def test_token_round_trip():
+    payload = decode_access_token(create_access_token("alice"))
+    assert payload["sub"] == "alice"
+    assert payload["exp"] - payload["iat"] == config.JWT_ACCESS_TTL
+
+
+def test_expired_and_forged_tokens_are_rejected():
+    now = int(time.time())
+    expired = jwt.encode({"sub": "alice", "iat": now - 20, "exp": now - 10}, tokens._secret, algorithm=config.JWT_ALGORITHM)
+    forged = jwt.encode({"sub": "alice", "exp": now + 60}, "other-secret", algorithm=config.JWT_ALGORITHM)
+    without_exp = jwt.encode({"sub": "alice"}, tokens._secret, algorithm=config.JWT_ALGORITHM)
+    for token in (expired, forged, without_exp, "garbage"):
+        with pytest.raises(HTTPException) as error:
+            decode_access_token(token)
+        assert error.value.status_code == 401
+
+
+def test_me_needs_a_valid_token():
+    app = FastAPI()
+    app.include_router(auth.router, prefix="/api/auth")
+    client = TestClient(app)
+    assert client.get("/api/auth/me").status_code == 401
+    assert client.get("/api/auth/me", headers={"Authorization": "Bearer garbage"}).status_code == 401
+    token = create_access_token("alice")
+    response = client.get("/api/auth/me", headers={"Authorization": f"Bearer {token}"})
+    assert response.json() == {"username": "alice"}
+
+
+def test_shared_secret_is_created_once(tmp_path):
+    path = str(tmp_path / "jwt_secret")
+    first = tokens._shared_secret(path)
+    assert tokens._shared_secret(path) == first
+    assert len(first) >= 32
+    assert [p.name for p in tmp_path.iterdir()] == ["jwt_secret"]
+
+
+def test_hashing_runs_in_the_bounded_pool(monkeypatch):
+    hasher = PasswordHasher(max_workers=2)
+    threads = set()
+    original = pwd_context.hash
+
+    def hash_and_record(password):
+        threads.add(threading.current_thread().name)
+        return original(password)
+
+    monkeypatch.setattr(pwd_context, "hash", hash_and_record)
+
+    async def main():
+        hashes = await asyncio.gather(*[hasher.hash(f"password-{index}") for index in range(6)])
+        return threading.current_thread().name, hashes
+
+    try:
+        loop_thread, hashes = asyncio.run(main())
+    finally:
+        hasher.shutdown()
+    assert loop_thread not in threads
+    assert len(threads) <= 2
+    assert all(name.startswith("bcrypt") for name in threads)
+    assert len(set(hashes)) == 6
+
+
+def test_verify_rehashes_when_cost_changes(monkeypatch):
+    hasher = PasswordHasher(max_workers=1)
+    cheap = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash("secret")
+    monkeypatch.setattr("backend.services.passwords.pwd_context", CryptContext(schemes=["bcrypt"], bcrypt__rounds=5))
+
+    try:
+        valid, new_hash = asyncio.run(hasher.verify("secret", cheap))
+        assert valid
+        assert new_hash is not None and new_hash.startswith("$2b$05$")
+        assert asyncio.run(hasher.verify("wrong", cheap)) == (False, None)
+    finally:
+        hasher.shutdown()
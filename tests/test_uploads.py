@@ -0,0 +1,99 @@
+import asyncio
+import base64
+import io
+import json
+
+import pytest
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+from starlette.datastructures import Headers
+
+from backend.services.uploads import UploadLimitMiddleware, build_image_request_body
+
+
+def make_upload(data: bytes, content_type: str = "image/png") -> UploadFile:
+    return UploadFile(
+        io.BytesIO(data), size=len(data), filename="bone.png",
+        headers=Headers({"content-type": content_type}),
+    )
+
+
+def collect(body) -> bytes:
+    async def main():
+        return b"".join([chunk async for chunk in body])
+
+    return asyncio.run(main())
+
+
+@pytest.mark.parametrize("sizes", [[0], [1], [2], [3], [100], [7, 8]])
+def test_request_body_is_valid_json_of_declared_length(sizes):
+    images = [bytes(range(256)) * (size // 256) + bytes(size % 256) for size in sizes]
+    files = [make_upload(image) for image in images]
+    body, length = build_image_request_body(
+        {"enable_pbr": True}, files, "image_urls", as_list=True, chunk_size=3,
+    )
+    payload = collect(body)
+    assert len(payload) == length
+
+    decoded = json.loads(payload)
+    assert decoded["enable_pbr"] is True
+    for url, image in zip(decoded["image_urls"], images):
+        prefix, encoded = url.split(",", 1)
+        assert prefix == "data:image/png;base64"
+        assert base64.b64decode(encoded) == image
+
+
+def test_single_image_without_params():
+    body, length = build_image_request_body({}, [make_upload(b"abcd")], "image_url", as_list=False)
+    payload = collect(body)
+    assert len(payload) == length
+    assert json.loads(payload) == {"image_url": "data:image/png;base64," + base64.b64encode(b"abcd").decode()}
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+
+    @app.post("/api/upload")
+    async def upload(file: UploadFile = File(...)):
+        return {"size": len(await file.read())}
+
+    app.add_middleware(UploadLimitMiddleware, max_body_size=10_000, max_file_size=1_000)
+    return TestClient(app)
+
+
+def test_upload_within_limits(client):
+    response = client.post("/api/upload", files={"file": ("bone.png", b"x" * 500, "image/png")})
+    assert response.status_code == 200
+    assert response.json() == {"size": 500}
+
+
+def test_file_over_limit_is_413(client):
+    response = client.post("/api/upload", files={"file": ("bone.png", b"x" * 2_000, "image/png")})
+    assert response.status_code == 413
+    assert response.json()["detail"] == "File bone.png exceeds 1000 bytes"
+
+
+def test_body_over_limit_is_413(client):
+    response = client.post("/api/upload", files={"file": ("bone.png", b"x" * 20_000, "image/png")})
+    assert response.status_code == 413
+    assert response.json()["detail"] == "Request body exceeds 10000 bytes"
+
+
+def test_chunked_body_is_counted_while_streaming(client):
+    boundary = "limit-test"
+    body = (
+        f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"big.png\"\r\n"
+        f"Content-Type: image/png\r\n\r\n"
+    ).encode() + b"x" * 2_000 + f"\r\n--{boundary}--\r\n".encode()
+
+    def chunks():
+        for start in range(0, len(body), 256):
+            yield body[start:start + 256]
+
+    response = client.post(
+        "/api/upload", content=chunks(),
+        headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+    )
+    assert response.status_code == 413
+    assert response.json()["detail"] == "File big.png exceeds 1000 bytes"
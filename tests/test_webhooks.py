@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend import config
+from backend.routers import meshy
+from backend.services.poll_scheduler import get_poll_scheduler
+from backend.services.task_store import SQLiteTaskStore, TaskRecord
+from backend.services.webhooks import sign_payload, verify_signature
+
+SECRET = "webhook-secret"
+BODY = b'{"id": "task-1", "status": "SUCCEEDED", "progress": 100}'
+
+
+def test_valid_signature():
+    header = sign_payload(SECRET, BODY, timestamp=1_000_000)
+    assert verify_signature(SECRET, header, BODY, tolerance=300, now=1_000_100)
+
+
+def test_wrong_secret_or_modified_body():
+    header = sign_payload(SECRET, BODY, timestamp=1_000_000)
+    assert not verify_signature("other-secret", header, BODY, tolerance=300, now=1_000_000)
+    assert not verify_signature(SECRET, header, BODY + b" ", tolerance=300, now=1_000_000)
+
+
+def test_replay_outside_tolerance_is_rejected():
+    header = sign_payload(SECRET, BODY, timestamp=1_000_000)
+    assert not verify_signature(SECRET, header, BODY, tolerance=300, now=1_000_301)
+    # Подпись "из будущего" тоже вне окна
+    assert not verify_signature(SECRET, header, BODY, tolerance=300, now=999_699)
+
+
+def test_timestamp_is_covered_by_signature():
+    header = sign_payload(SECRET, BODY, timestamp=1_000_000)
+    digest = header.split("v1=")[1]
+    assert not verify_signature(SECRET, f"t=1000200,v1={digest}", BODY, tolerance=300, now=1_000_200)
+
+
+def test_any_of_several_signatures_matches():
+    header = sign_payload(SECRET, BODY, timestamp=1_000_000)
+    rotated = f"t=1000000,v1={'0' * 64},{header.split(',')[1]}"
+    assert verify_signature(SECRET, rotated, BODY, tolerance=300, now=1_000_000)
+
+
+def test_malformed_headers():
+    for header in ("", "v1=abc", "t=abc,v1=abc", "t=1000000"):
+        assert not verify_signature(SECRET, header, BODY, tolerance=300, now=1_000_000)
+
+
+def test_event_is_remembered_until_it_expires(tmp_path):
+    async def main():
+        store = SQLiteTaskStore(str(tmp_path / "tasks.sqlite3"))
+        await store.open()
+        try:
+            results = [await store.remember_event("task-1:SUCCEEDED:100", ttl=60) for _ in range(2)]
+            await store.forget_event("task-1:SUCCEEDED:100")
+            results.append(await store.remember_event("task-1:SUCCEEDED:100", ttl=-1))
+            # Истекшая запись не мешает обработать событие снова
+            results.append(await store.remember_event("task-1:SUCCEEDED:100", ttl=60))
+            await store.remember_event("task-2:SUCCEEDED:100", ttl=-1)
+            await store.evict_finished(ttl=3600)
+            results.append(await store.remember_event("task-2:SUCCEEDED:100", ttl=60))
+            return results
+        finally:
+            await store.close()
+
+    assert asyncio.run(main()) == [True, False, True, True, True]
+
+
+class FakeScheduler:
+    def __init__(self):
+        self.events = []
+
+    def poll_now(self, task_id: str, event: dict) -> bool:
+        self.events.append((task_id, event))
+        return True
+
+
+@pytest.fixture
+def stores(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "MESHY_WEBHOOK_SECRET", SECRET)
+    # Два процесса uvicorn с общим хранилищем задач
+    stores = [SQLiteTaskStore(str(tmp_path / "tasks.sqlite3")) for _ in range(2)]
+    for store in stores:
+        asyncio.run(store.open())
+    asyncio.run(stores[0].put(TaskRecord(task_id="task-1", type="single-image", status="IN_PROGRESS")))
+    yield stores
+    for store in stores:
+        asyncio.run(store.close())
+
+
+def test_repeated_delivery_to_another_worker_is_dropped(stores, monkeypatch):
+    scheduler = FakeScheduler()
+    app = FastAPI()
+    app.include_router(meshy.router, prefix="/api/meshy")
+    app.dependency_overrides[get_poll_scheduler] = lambda: scheduler
+    client = TestClient(app)
+
+    def deliver(store):
+        monkeypatch.setattr(meshy, "task_store", store)
+        headers = {config.MESHY_WEBHOOK_SIGNATURE_HEADER: sign_payload(SECRET, BODY)}
+        return client.post("/api/meshy/webhook", content=BODY, headers=headers).json()["status"]
+
+    assert deliver(stores[0]) == "accepted"
+    assert deliver(stores[1]) == "duplicate"
+    assert [task_id for task_id, _ in scheduler.events] == ["task-1"]
+    assert client.post("/api/meshy/webhook", content=BODY).status_code == 401